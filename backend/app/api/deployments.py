@@ -21,6 +21,7 @@ from app.models.machine import Machine
 from app.schemas.deployment import DeploymentCreate, DeploymentResponse, DeployInfo, DeploymentUpdate
 from app.api.deps import get_current_user
 from app.utils.ssh import SSHClient
+from app.utils.keyed_lock import deployment_locks
 from app.db.database import async_session_factory
 from app.models.user import User
 from app.config import settings
@@ -87,6 +88,7 @@ async def create_deployment(
         machine_id=deployment.machine_id,
         environment=deployment.environment,
         deploy_path=deployment.deploy_path,
+        auto_sync=deployment.auto_sync,
         status="not_deployed",
         deployed_at=None  # 确保部署时间为空
     )
@@ -332,12 +334,16 @@ async def stop_application(
 async def sync_project(
     deployment_id: int,
     background_tasks: BackgroundTasks,
+    transfer_mode: Optional[str] = Query(None, description="本地项目的传输方式: sftp, bundle，为空时使用默认配置"),
     db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """同步项目代码（拉取最新代码但不启动）"""
     logger.info(f"接收到同步项目请求，部署ID: {deployment_id}")
     
+    if transfer_mode not in (None, "sftp", "bundle"):
+        raise HTTPException(status_code=400, detail=f"不支持的传输方式: {transfer_mode}")
+    
     try:
         # 添加更详细的日志
         logger.info(f"开始查询部署记录，ID: {deployment_id}")
@@ -411,7 +417,8 @@ async def sync_project(
         background_tasks.add_task(
             sync_project_task,
             deployment_id=deployment.id,
-            db=db
+            db=db,
+            transfer_mode=transfer_mode
         )
         
         return deployment
@@ -432,6 +439,20 @@ async def sync_project(
         
         raise HTTPException(status_code=500, detail=error_msg)
 
+@router.post("/{deployment_id}/auto-sync", response_model=DeploymentResponse)
+async def set_deployment_auto_sync(
+    deployment_id: int,
+    enabled: bool = Query(..., description="项目存储目录变化时是否自动推送到该部署"),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """开启或关闭自动推送（项目需开启自动同步，仅支持类Unix机器）"""
+    deployment = await get_deployment_or_404(db, deployment_id, current_user)
+    deployment.auto_sync = enabled
+    await db.commit()
+
+    return await get_deployment_or_404(db, deployment_id, current_user)
+
 # 4. 最后定义通用的id参数路由
 @router.get("/{deployment_id}", response_model=DeploymentResponse)
 async def get_deployment(
@@ -785,6 +806,7 @@ async def run_deployment(deployment_id: int, db: AsyncSession):
         await update_deployment_status(db, deployment, "failed", "缺少部署路径")
         return
     
+    ssh = None
     try:
         # 连接到远程服务器
         ssh = SSHClient(
@@ -792,7 +814,8 @@ async def run_deployment(deployment_id: int, db: AsyncSession):
             port=machine.port,
             username=machine.username,
             password=machine.password,
-            key_file=machine.key_file
+            key_file=machine.key_file,
+            machine_id=machine.id
         )
         
         # 部署日志
@@ -851,6 +874,10 @@ async def run_deployment(deployment_id: int, db: AsyncSession):
     except Exception as e:
         logger.exception(f"部署失败: {str(e)}")
         await update_deployment_status(db, deployment, "failed", f"部署失败: {str(e)}")
+    finally:
+        # 归还SSH连接
+        if ssh:
+            await ssh.close()
 
 async def update_deployment_status(db: AsyncSession, deployment: Deployment, status: str, log: str = None):
     """更新部署状态"""
@@ -859,8 +886,17 @@ async def update_deployment_status(db: AsyncSession, deployment: Deployment, sta
     deployment.updated_at = datetime.now()
     await db.commit()
 
-async def sync_project_task(deployment_id: int, db: AsyncSession):
-    """后台任务：同步项目代码"""
+async def sync_project_task(deployment_id: int, db: AsyncSession, transfer_mode: Optional[str] = None):
+    """后台任务：同步项目代码
+    
+    transfer_mode为本地项目的传输方式（sftp或bundle），为空时使用DEPLOY_TRANSFER_MODE。
+    与自动推送共用部署锁，正在自动推送时等待推送结束。
+    """
+    async with deployment_locks.hold(deployment_id):
+        await _sync_project(deployment_id, transfer_mode)
+
+
+async def _sync_project(deployment_id: int, transfer_mode: Optional[str] = None):
     logger.info(f"开始后台同步任务，部署ID：{deployment_id}")
     
     # 使用新的会话以确保数据库连接可用
@@ -906,7 +942,8 @@ async def sync_project_task(deployment_id: int, db: AsyncSession):
                         port=machine.port,
                         username=machine.username,
                         password=machine.password if hasattr(machine, 'password') and machine.password else None,
-                        key_file=machine.key_file if hasattr(machine, 'key_file') and machine.key_file else None
+                        key_file=machine.key_file if hasattr(machine, 'key_file') and machine.key_file else None,
+                        machine_id=machine.id
                     )
                     
                     # 连接到服务器
@@ -1095,8 +1132,8 @@ async def sync_project_task(deployment_id: int, db: AsyncSession):
                                 else:
                                     log_messages.append("pip install完成")
                     else:
-                        # 本地项目，改为逐个文件上传
-                        logger.info(f"检测到本地项目，准备逐个文件上传")
+                        # 本地项目，通过SFTP上传文件
+                        logger.info(f"检测到本地项目，准备上传文件")
                         log_messages.append("本地项目，准备文件上传")
                         
                         # 获取项目存储路径
@@ -1111,117 +1148,87 @@ async def sync_project_task(deployment_id: int, db: AsyncSession):
                         log_messages.append(f"项目本地存储路径: {project_storage_path}")
                         
                         try:
-                            # 使用SFTP逐个上传文件
-                            logger.info(f"开始SFTP逐个文件传输")
-                            log_messages.append("开始SFTP文件传输")
+                            def report_progress(snapshot):
+                                logger.info(
+                                    f"上传进度: {snapshot['files_done']}/{snapshot['files_total']} 个文件, "
+                                    f"{snapshot['bytes_done']}/{snapshot['bytes_total']} 字节, "
+                                    f"{snapshot['throughput'] / 1024:.1f} KB/s"
+                                )
                             
-                            # 打开SFTP会话
-                            sftp = await ssh_client.open_sftp()
+                            mode = transfer_mode or settings.DEPLOY_TRANSFER_MODE
+                            sync_result = None
+                            if mode == "bundle" and is_windows:
+                                log_messages.append("Windows服务器不支持打包传输，改用SFTP上传")
+                                mode = "sftp"
                             
-                            # 确保目标目录存在
-                            if is_windows:
-                                mkdir_cmd = f"if not exist \"{deploy_path}\" mkdir \"{deploy_path}\""
-                            else:
-                                mkdir_cmd = f"mkdir -p \"{deploy_path}\""
-                            await ssh_client.execute_command(mkdir_cmd)
+                            if mode == "bundle" or is_windows:
+                                # 这两种方式不维护远程文件清单，缓存的清单不再可信
+                                deployment.sync_manifest = None
                             
-                            # 定义递归上传函数
-                            async def upload_directory(local_dir, remote_dir):
-                                logger.info(f"上传目录: {local_dir} -> {remote_dir}")
-                                
-                                # 确保远程目录存在
-                                if is_windows:
-                                    mkdir_cmd = f"if not exist \"{remote_dir}\" mkdir \"{remote_dir}\""
-                                else:
-                                    mkdir_cmd = f"mkdir -p \"{remote_dir}\""
-                                await ssh_client.execute_command(mkdir_cmd)
-                                
-                                # 获取远程目录文件列表
-                                try:
-                                    remote_files = []
-                                    if is_windows:
-                                        ls_cmd = f"dir \"{remote_dir}\" /b"
-                                        exit_status, stdout, stderr = await ssh_client.execute_command(ls_cmd)
-                                        if exit_status == 0 and stdout.strip():
-                                            remote_files = [line.strip() for line in stdout.strip().split('\n') if line.strip()]
-                                    else:
-                                        # 在Linux上使用sftp的listdir更可靠
-                                        try:
-                                            remote_files = await asyncio.to_thread(sftp.listdir, remote_dir)
-                                        except:
-                                            # 如果目录还不存在或无法访问
-                                            remote_files = []
-                                    
-                                    logger.debug(f"远程目录 {remote_dir} 中有 {len(remote_files)} 个文件")
-                                except Exception as e:
-                                    logger.warning(f"获取远程文件列表失败: {str(e)}，继续上传")
-                                    remote_files = []
-
-                                # 计数器
-                                uploaded_count = 0
-                                skipped_count = 0
-                                
-                                # 遍历本地目录中的文件和子目录
-                                for item in os.listdir(local_dir):
-                                    # 跳过隐藏文件和临时文件
-                                    if item.startswith('.') or item.endswith('.tmp') or item.endswith('.temp'):
-                                        continue
-                                        
-                                    local_path = os.path.join(local_dir, item)
-                                    # 确保路径分隔符一致
-                                    remote_path = os.path.join(remote_dir, item).replace('\\', '/')
-                                    
-                                    if os.path.isdir(local_path):
-                                        # 递归处理子目录
-                                        sub_uploaded, sub_skipped = await upload_directory(local_path, remote_path)
-                                        uploaded_count += sub_uploaded
-                                        skipped_count += sub_skipped
-                                    else:
-                                        # 上传文件
-                                        try:
-                                            # 检查文件是否已存在
-                                            file_exists = item in remote_files
-                                            
-                                            if file_exists:
-                                                # 如果存在，检查是否需要更新（这里可以添加时间戳或哈希值比较）
-                                                local_mtime = os.path.getmtime(local_path)
-                                                local_size = os.path.getsize(local_path)
-                                                
-                                                # 获取远程文件信息（通过SFTP的stat函数）
-                                                try:
-                                                    remote_stat = await asyncio.to_thread(sftp.stat, remote_path)
-                                                    remote_mtime = remote_stat.st_mtime
-                                                    remote_size = remote_stat.st_size
-                                                    
-                                                    # 如果文件大小和修改时间相同，则跳过
-                                                    if abs(local_size - remote_size) < 10 and abs(local_mtime - remote_mtime) < 5:
-                                                        logger.debug(f"跳过未修改文件: {item}")
-                                                        skipped_count += 1
-                                                        continue
-                                                except:
-                                                    # 无法获取远程文件信息，上传文件
-                                                    pass
-                                            
-                                            # 上传文件
-                                            logger.debug(f"上传文件: {local_path} -> {remote_path}")
-                                            await asyncio.to_thread(sftp.put, local_path, remote_path)
-                                            uploaded_count += 1
-                                            
-                                        except Exception as e:
-                                            # 记录错误但继续上传其他文件
-                                            logger.error(f"上传文件 {local_path} 失败: {str(e)}")
-                                            log_messages.append(f"警告: 文件 {item} 上传失败: {str(e)}")
-                                
-                                return uploaded_count, skipped_count
+                            if mode == "bundle":
+                                # 边打包边写入远程 tar -x，一个通道完成全部传输
+                                logger.info(f"开始打包流式传输")
+                                log_messages.append(f"开始打包传输，压缩方式: {settings.DEPLOY_BUNDLE_COMPRESSION}")
+                                progress = await ssh_client.upload_bundle(
+                                    project_storage_path,
+                                    deploy_path,
+                                    on_progress=report_progress
+                                )
+                            elif is_windows:
+                                # 在同一连接上打开多个SFTP通道并行上传
+                                parallelism = machine.sftp_parallelism or settings.SFTP_UPLOAD_PARALLELISM
+                                logger.info(f"开始SFTP并行文件传输，通道数: {parallelism}")
+                                log_messages.append(f"开始SFTP文件传输，并行通道数: {parallelism}")
+                                progress = await ssh_client.upload_directory(
+                                    project_storage_path,
+                                    deploy_path,
+                                    parallelism=parallelism,
+                                    is_windows=is_windows,
+                                    on_progress=report_progress
+                                )
+                            else:
+                                # 比较本地和远程文件清单，只上传变化的文件，删除上次同步过、本地已删除的文件
+                                parallelism = machine.sftp_parallelism or settings.SFTP_UPLOAD_PARALLELISM
+                                logger.info(f"开始增量同步，通道数: {parallelism}")
+                                log_messages.append(f"开始增量同步，并行通道数: {parallelism}")
+                                # 清单在同步完成前先清空，同步中途失败时下次重新读取远程清单
+                                # 只删除上次同步过、本地已删除的文件，远程运行时生成的文件保留
+                                previous_manifest = deployment.sync_manifest
+                                cached_manifest = previous_manifest if settings.DEPLOY_MANIFEST_CACHE else None
+                                deployment.sync_manifest = None
+                                sync_result = await ssh_client.sync_directory(
+                                    project_storage_path,
+                                    deploy_path,
+                                    parallelism=parallelism,
+                                    cached_manifest=cached_manifest,
+                                    previous_manifest=previous_manifest,
+                                    on_progress=report_progress
+                                )
+                                deployment.sync_manifest = sync_result.manifest
+                                progress = sync_result.progress
+                                summary = sync_result.summary()
+                                log_messages.append(
+                                    f"文件清单比较完成（{'使用缓存的清单' if summary['cache_hit'] else '读取远程清单'}），"
+                                    f"未修改: {summary['unchanged']}个，"
+                                    f"块级增量: {summary['delta']}个，删除: {summary['deleted']}个，"
+                                    f"远程往返: {summary['round_trips']}次"
+                                )
                             
-                            # 开始上传整个目录
-                            uploaded_files, skipped_files = await upload_directory(project_storage_path, deploy_path)
+                            for failed_path, error in progress.errors:
+                                log_messages.append(f"警告: 文件 {os.path.basename(failed_path)} 上传失败: {error}")
                             
-                            # 关闭SFTP会话
-                            await asyncio.to_thread(sftp.close)
+                            snapshot = progress.snapshot()
+                            uploaded_files = snapshot["files_done"] - snapshot["files_skipped"] - snapshot["files_failed"]
+                            skipped_files = snapshot["files_skipped"]
+                            if sync_result is not None:
+                                skipped_files = sync_result.summary()["unchanged"]
                             
                             logger.info(f"文件上传完成，上传: {uploaded_files}个，跳过: {skipped_files}个")
-                            log_messages.append(f"文件上传完成，上传: {uploaded_files}个，跳过: {skipped_files}个")
+                            log_messages.append(
+                                f"文件上传完成，上传: {uploaded_files}个，跳过: {skipped_files}个，"
+                                f"发送: {snapshot['bytes_sent']}字节，"
+                                f"耗时: {snapshot['elapsed']:.1f}秒，速度: {snapshot['throughput'] / 1024:.1f} KB/s"
+                            )
                             
                         except Exception as e:
                             error_msg = f"文件上传过程中出错: {str(e)}"
@@ -1262,6 +1269,10 @@ async def sync_project_task(deployment_id: int, db: AsyncSession):
                         else:
                             log_messages.append("pip install完成")
                     
+                    if deployment.sync_manifest and ("package.json" in ls_result or "requirements.txt" in ls_result):
+                        # 安装依赖会改写顶层的锁文件，更新清单的目录指纹，否则下次同步总是读取远程清单
+                        deployment.sync_manifest = await ssh_client.refresh_sync_manifest(deploy_path, deployment.sync_manifest)
+                    
                     # 同步完成，更新状态
                     log_messages.append(f"[{datetime.now()}] 同步完成")
                     logger.info(f"项目同步成功，部署ID: {deployment_id}")
@@ -1317,6 +1328,7 @@ async def start_application_task(deployment_id: int, db: AsyncSession):
             logger.error(f"启动应用任务：找不到部署ID {deployment_id}")
             return
         
+        ssh_client = None
         try:
             # 获取必要信息
             machine = deployment.machine
@@ -1327,7 +1339,8 @@ async def start_application_task(deployment_id: int, db: AsyncSession):
                 host=machine.host,
                 port=machine.port,
                 username=machine.username,
-                password=machine.password if hasattr(machine, 'password') else None
+                password=machine.password if hasattr(machine, 'password') else None,
+                machine_id=machine.id
             )
             
             # 连接到服务器
@@ -1457,6 +1470,10 @@ async def start_application_task(deployment_id: int, db: AsyncSession):
             deployment.status = "start_failed"
             deployment.log = (deployment.log or "") + f"\n\n[{datetime.now()}] 启动失败：\n{error_message}"
             await db.commit()
+        finally:
+            # 归还SSH连接
+            if ssh_client:
+                await ssh_client.close()
 
 async def stop_application_task(deployment_id: int, db: AsyncSession):
     """后台任务：停止应用"""
@@ -1472,6 +1489,7 @@ async def stop_application_task(deployment_id: int, db: AsyncSession):
             logger.error(f"停止应用任务：找不到部署ID {deployment_id}")
             return
         
+        ssh_client = None
         try:
             # 获取必要信息
             machine = deployment.machine
@@ -1482,7 +1500,8 @@ async def stop_application_task(deployment_id: int, db: AsyncSession):
                 host=machine.host,
                 port=machine.port,
                 username=machine.username,
-                password=machine.password if hasattr(machine, 'password') else None
+                password=machine.password if hasattr(machine, 'password') else None,
+                machine_id=machine.id
             )
             
             # 连接到服务器
@@ -1612,6 +1631,10 @@ async def stop_application_task(deployment_id: int, db: AsyncSession):
             deployment.status = "stop_failed"
             deployment.log = (deployment.log or "") + f"\n\n[{datetime.now()}] 停止失败：\n{error_message}"
             await db.commit()
+        finally:
+            # 归还SSH连接
+            if ssh_client:
+                await ssh_client.close()
 
 # 辅助函数
 async def get_deployment_or_404(db: AsyncSession, deployment_id: int, current_user: User) -> Deployment:
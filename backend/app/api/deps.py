@@ -19,6 +19,11 @@ async def get_current_user(
     token: str = Depends(oauth2_scheme)
 ) -> User:
     """获取当前用户"""
+    return await get_user_from_token(db, token)
+
+
+async def get_user_from_token(db: AsyncSession, token: str) -> User:
+    """校验访问令牌并返回对应用户（WebSocket等无法使用OAuth2依赖的场景也使用此函数）"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据",
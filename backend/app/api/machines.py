@@ -1,16 +1,26 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Path, BackgroundTasks
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
+import asyncio
 
-from app.core.machines import MachineManager
+from app.core.machines import MachineManager, REMOTE_LOG_PATTERNS
+from app.core.machine_sweep import stream_sweep
+from app.core.metrics_store import metrics_store, FIELDS as METRIC_FIELDS
+from app.core.monitor_scheduler import monitor_scheduler
+from app.core.log_tail import log_tail_hub, LogTailError
+from app.core.log_search import search_logs, LogSearchError
+from app.db.database import async_session_factory
 from app.db.database import get_db
 from app.schemas.machine import (
     Machine, MachineCreate, MachineUpdate, MachineStatus, 
     MachineLog, DeployRequest, LogRequest, OperationResponse,
-    MachineMetrics
+    MachineMetrics, MachineCheckRequest, MachineMetricsHistory, MetricPoint,
+    MonitorStats, LogSearchRequest, LogSearchResult
 )
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_user_from_token
 from app.models.user import User
 
 router = APIRouter()
@@ -40,6 +50,32 @@ async def create_machine(
     
     return await MachineManager.create_machine(db, machine)
 
+@router.post("/check")
+async def check_machines(
+    check_request: Optional[MachineCheckRequest] = None,
+    concurrency: Optional[int] = Query(None, ge=1, le=256, description="同时检查的机器数"),
+    timeout: Optional[float] = Query(None, gt=0, le=300, description="单台机器检查超时（秒）"),
+    current_user: User = Depends(get_current_user)
+):
+    """批量检查机器状态
+    
+    并发检查所有机器（或请求中指定的机器），每台机器完成后立即以一行JSON返回结果（NDJSON）。
+    """
+    machine_ids = check_request.machine_ids if check_request else None
+    
+    async def generate():
+        async for result in stream_sweep(machine_ids, concurrency, timeout):
+            yield result.model_dump_json() + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.get("/monitor/stats", response_model=MonitorStats)
+async def get_monitor_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """获取监控调度器状态（排队深度、调度延迟等）"""
+    return monitor_scheduler.stats()
+
 @router.get("/{machine_id}", response_model=Machine)
 async def get_machine(
     machine_id: int = Path(..., description="机器ID"),
@@ -81,6 +117,7 @@ async def delete_machine(
 async def check_machine_status(
     check_data: dict = None,
     machine_id: int = Path(..., description="机器ID"),
+    refresh: bool = Query(False, description="忽略缓存的检查结果，重新探测"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -92,7 +129,7 @@ async def check_machine_status(
     if db_machine:
         logger.info(f"检查机器状态: {db_machine.name}, 使用SSH密钥: {bool(db_machine.key_file)}")
     
-    success, status, error = await MachineManager.check_machine_status(db, machine_id)
+    success, status, error = await MachineManager.check_machine_status_shared(machine_id, use_cache=not refresh)
     if not success:
         logger.error(f"检查状态失败: {error}")
         raise HTTPException(status_code=400, detail=error)
@@ -163,9 +200,98 @@ async def get_logs(
     
     return {"success": True, "message": logs}
 
+@router.post("/{machine_id}/logs/search", response_model=LogSearchResult)
+async def search_machine_logs(
+    search_request: LogSearchRequest,
+    machine_id: int = Path(..., description="机器ID"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """在远程机器上搜索日志，只返回匹配的行
+    
+    结果按时间顺序分页，next_cursor不为空时作为下一次请求的cursor继续搜索。
+    """
+    machine = await MachineManager.get_machine(db, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="机器不存在")
+    
+    try:
+        return await search_logs(machine, search_request)
+    except LogSearchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.websocket("/{machine_id}/logs/tail")
+async def tail_logs(
+    websocket: WebSocket,
+    machine_id: int,
+    log_type: str = "backend",
+    lines: int = 100,
+    token: str = ""
+):
+    """实时跟踪远程日志
+    
+    同一台机器同一类日志的所有查看者共享一个远程 tail -F 通道。
+    推送的消息：
+    - {"type": "lines", "lines": [...]}: 新的日志行
+    - {"type": "dropped", "batches": n}: 查看者处理过慢，丢弃了n批日志
+    - {"type": "closed", "message": "..."}: 远程跟踪已结束
+    """
+    await websocket.accept()
+    
+    async with async_session_factory() as db:
+        try:
+            await get_user_from_token(db, token)
+        except HTTPException as e:
+            await websocket.close(code=1008, reason=e.detail)
+            return
+        machine = await MachineManager.get_machine(db, machine_id)
+    if not machine:
+        await websocket.close(code=1008, reason="机器不存在")
+        return
+    # 每种日志类型占用一个独立连接，只接受已知的类型
+    if log_type not in REMOTE_LOG_PATTERNS:
+        await websocket.close(code=1008, reason="不支持的日志类型")
+        return
+    
+    try:
+        subscriber = await log_tail_hub.subscribe(machine, log_type, max(0, min(lines, 5000)))
+    except LogTailError as e:
+        await websocket.send_json({"type": "closed", "message": str(e)})
+        await websocket.close()
+        return
+    
+    async def forward():
+        while True:
+            message = await subscriber.get()
+            if message is None:
+                break
+            await websocket.send_json(message)
+    
+    async def watch_disconnect():
+        # 客户端不需要发送消息，这里只用于感知断开
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(watch_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        log_tail_hub.unsubscribe(subscriber)
+    
+    try:
+        await websocket.close()
+    except (RuntimeError, WebSocketDisconnect):
+        pass
+
 @router.get("/{machine_id}/metrics", response_model=MachineMetrics)
 async def get_machine_metrics(
     machine_id: int = Path(..., description="机器ID"),
+    refresh: bool = Query(False, description="忽略缓存的监控指标，重新探测"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -176,8 +302,40 @@ async def get_machine_metrics(
         raise HTTPException(status_code=404, detail="机器不存在")
     
     # 获取监控指标
-    success, metrics, error = await MachineManager.get_machine_metrics(db, machine_id)
+    success, metrics, error = await MachineManager.get_machine_metrics_shared(machine_id, use_cache=not refresh)
     if not success:
         raise HTTPException(status_code=400, detail=error)
     
-    return metrics 
\ No newline at end of file
+    return metrics 
+
+@router.get("/{machine_id}/metrics/history", response_model=MachineMetricsHistory)
+async def get_machine_metrics_history(
+    machine_id: int = Path(..., description="机器ID"),
+    start: Optional[datetime] = Query(None, alias="from", description="开始时间，默认为一小时前"),
+    end: Optional[datetime] = Query(None, alias="to", description="结束时间，默认为当前时间"),
+    step: Optional[int] = Query(None, ge=0, description="采样点间隔（秒），默认按最多500个点自动计算，0表示原始采样"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取机器历史监控指标（从本地时序存储读取，不连接机器）"""
+    machine = await MachineManager.get_machine(db, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="机器不存在")
+    
+    end = end or datetime.now()
+    start = start or end - timedelta(hours=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="开始时间必须早于结束时间")
+    
+    tier, actual_step, points = await metrics_store.query(
+        machine_id, start.timestamp(), end.timestamp(), step
+    )
+    return MachineMetricsHistory(
+        machine_id=machine_id,
+        tier=tier,
+        step=actual_step,
+        points=[
+            MetricPoint(timestamp=datetime.fromtimestamp(timestamp), **dict(zip(METRIC_FIELDS, values)))
+            for timestamp, values in points
+        ]
+    )
@@ -6,25 +6,36 @@
 
 import os
 import shutil
+import asyncio
+import hashlib
+import logging
 import zipfile
 import tempfile
 from datetime import datetime
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import and_, func
-from typing import Dict, List
+from typing import Dict, List, Optional
 
+from app.core.config import settings
 from app.db.database import get_db
 from app.models.project import Project
 from app.models.user import User
-from app.schemas.project import ProjectResponse
+from app.schemas.project import ProjectResponse, ProjectUploadResponse, UploadResult
 from app.api.deps import get_current_active_user
-from app.utils.ignore_handler import parse_ignore_file, should_ignore_file, get_ignore_patterns
+from app.utils.ignore_handler import get_ignore_patterns, get_project_ignore_matcher
+from app.utils.file_utils import format_size
+from app.utils.zip_extract import ZipExtractProgress, extract_project_zip
+from app.utils.zip_stream import iter_project_zip
+from app.utils.archive_cache import archive_cache, tree_fingerprint
+from app.api.projects.websocket import manager
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.get("/{project_id}/files", response_model=Dict)
 async def list_project_files(
@@ -310,11 +321,12 @@ async def get_file_content(
             }
 
 
-@router.post("/upload/{project_id}", response_model=ProjectResponse)
+@router.post("/upload/{project_id}", response_model=ProjectUploadResponse)
 async def upload_project_files(
     project_id: int,
     file: UploadFile = File(...),
     mode: str = Form("replace"),  # 默认为替换模式
+    expected_sha256: Optional[str] = Form(None),  # 提供时校验上传文件的sha256
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
@@ -323,6 +335,9 @@ async def upload_project_files(
     mode:
     - replace: 替换现有文件
     - increment: 增量更新
+    
+    上传内容分块写入临时文件，解压在线程池中并行执行，进度推送到项目WebSocket。
+    增量模式跳过大小和CRC32与ZIP记录一致的文件，响应中返回新增和更新的文件。
     """
     # 获取项目
     if current_user.is_admin:
@@ -351,94 +366,109 @@ async def upload_project_files(
             detail="只能上传ZIP格式的文件",
         )
     
-    # 保存上传的文件
+    if settings.UPLOAD_MAX_SIZE and file.size is not None and file.size > settings.UPLOAD_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"上传文件超过大小上限 {format_size(settings.UPLOAD_MAX_SIZE)}",
+        )
+    
+    # 分块写入临时文件，同时计算哈希，不把整个文件读入内存
     temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
     try:
-        # 将上传的文件保存到临时文件
-        content = await file.read()
-        temp_file.write(content)
+        digest = hashlib.sha256()
+        received = 0
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if settings.UPLOAD_MAX_SIZE and received > settings.UPLOAD_MAX_SIZE:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"上传文件超过大小上限 {format_size(settings.UPLOAD_MAX_SIZE)}",
+                )
+            digest.update(chunk)
+            await asyncio.to_thread(temp_file.write, chunk)
         temp_file.close()
+        sha256 = digest.hexdigest()
         
-        # 确保目标目录存在
-        os.makedirs(project.storage_path, exist_ok=True)
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"上传文件校验失败: sha256为 {sha256}，与期望值不一致",
+            )
+        if not zipfile.is_zipfile(temp_file.name):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="上传的文件不是有效的ZIP文件",
+            )
+        logger.info(f"项目 {project_id} 上传ZIP包 {file.filename}: {received}字节, sha256={sha256}")
         
-        # 读取.gitignore文件(如果存在)
-        gitignore_file_path = os.path.join(project.storage_path, ".gitignore")
-        ignore_patterns = parse_ignore_file(gitignore_file_path)  # 使用兼容函数名
+        await manager.broadcast_to_project(
+            project_id,
+            {"status": "start", "message": f"上传完成（{format_size(received)}），开始解压...", "progress": 0, "sha256": sha256}
+        )
         
-        # 在替换模式下，如果.gitignore文件存在，需要保存它
-        gitignore_content = None
-        if mode == "replace" and os.path.exists(gitignore_file_path):
-            with open(gitignore_file_path, 'r', encoding='utf-8') as f:
-                gitignore_content = f.read()
+        # 在线程中并行解压，按固定间隔推送计数
+        progress = ZipExtractProgress()
+        extract_task = asyncio.create_task(asyncio.to_thread(
+            extract_project_zip, temp_file.name, project.storage_path, mode, progress,
+            workers=settings.ZIP_EXTRACT_WORKERS, large_size=settings.ZIP_EXTRACT_LARGE_SIZE
+        ))
+        while not extract_task.done():
+            await asyncio.wait({extract_task}, timeout=settings.UPLOAD_PROGRESS_INTERVAL)
+            if extract_task.done():
+                break
+            stats = progress.snapshot()
+            percent = int(100 * stats["files_done"] / stats["files_total"]) if stats["files_total"] else 0
+            await manager.broadcast_to_project(
+                project_id,
+                {
+                    "status": "progress",
+                    "message": f"解压文件中... {stats['files_done']}/{stats['files_total']}",
+                    "progress": percent,
+                    "stats": stats
+                }
+            )
+        try:
+            stats = extract_task.result().snapshot()
+        except (zipfile.BadZipFile, OSError) as e:
+            await manager.broadcast_to_project(
+                project_id,
+                {"status": "error", "message": f"解压失败: {str(e)}", "progress": 100}
+            )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"解压失败: {str(e)}",
+            )
         
-        # 处理ZIP文件
-        with zipfile.ZipFile(temp_file.name, 'r') as zip_ref:
-            # 获取所有文件名列表
-            file_list = zip_ref.namelist()
-            
-            # 检查是否有.gitignore文件
-            gitignore_in_zip = next((f for f in file_list if f == ".gitignore" or f.endswith("/.gitignore")), None)
-            if gitignore_in_zip:
-                # 从ZIP中提取.gitignore文件
-                gitignore_content = zip_ref.read(gitignore_in_zip).decode('utf-8', errors='ignore')
-                # 更新忽略模式
-                ignore_patterns = [line.strip() for line in gitignore_content.splitlines() 
-                                  if line.strip() and not line.strip().startswith('#')]
-            
-            # 如果是替换模式，先清空目录
-            if mode == "replace":
-                for item in os.listdir(project.storage_path):
-                    item_path = os.path.join(project.storage_path, item)
-                    # 保留.gitignore文件
-                    if item == ".gitignore":
-                        continue
-                    if os.path.isdir(item_path):
-                        shutil.rmtree(item_path)
-                    else:
-                        os.remove(item_path)
-            
-            # 计算需要解压的文件
-            files_to_extract = []
-            root_files_to_extract = []  # 专门存储根目录文件
-            
-            for file_info in zip_ref.infolist():
-                if file_info.is_dir():
-                    continue
-                
-                file_path = file_info.filename
-                
-                # 检查文件是否应该被忽略
-                if should_ignore_file(file_path, ignore_patterns):
-                    print(f"忽略文件: {file_path}")
-                    continue
-                
-                # 检查是否为直接在根目录下的文件
-                is_root_file = '/' not in file_path and '\\' not in file_path
-                
-                # 添加到要解压的文件列表
-                if is_root_file:
-                    root_files_to_extract.append(file_info)
-                    print(f"添加根目录文件: {file_path}")
-                else:
-                    files_to_extract.append(file_info)
-            
-            # 解压文件
-            for file_info in files_to_extract:
-                # 解压文件
-                zip_ref.extract(file_info, project.storage_path)
-                print(f"已解压文件: {file_info.filename}")
-            
-            # 特别处理根目录文件
-            for file_info in root_files_to_extract:
-                zip_ref.extract(file_info, project.storage_path)
-                print(f"已解压根目录文件: {file_info.filename}")
+        await manager.broadcast_to_project(
+            project_id,
+            {
+                "status": "complete",
+                "message": (
+                    f"解压完成，新增 {stats['files_added']} 个，更新 {stats['files_updated']} 个，"
+                    f"未变化 {stats['files_unchanged']} 个，忽略 {stats['files_ignored']} 个文件"
+                ),
+                "progress": 100,
+                "sha256": sha256,
+                "stats": stats
+            }
+        )
         
-        # 保存.gitignore文件内容（如果存在）
-        if gitignore_content:
-            with open(gitignore_file_path, 'w', encoding='utf-8') as f:
-                f.write(gitignore_content)
-                print(f"已更新.gitignore文件")
+        # 返回变化的文件，列表过长时截断
+        upload_result = UploadResult(
+            sha256=sha256,
+            size=received,
+            mode=mode,
+            added=sorted(progress.added)[:settings.UPLOAD_REPORT_MAX_PATHS],
+            updated=sorted(progress.updated)[:settings.UPLOAD_REPORT_MAX_PATHS],
+            truncated=max(len(progress.added), len(progress.updated)) > settings.UPLOAD_REPORT_MAX_PATHS,
+            **{key: value for key, value in stats.items() if key != "files_done"}
+        )
+        
+        # 旧的下载包已过期
+        archive_cache.invalidate(project_id)
         
         # 更新项目最后更新时间
         project.last_updated = func.now()
@@ -462,11 +492,13 @@ async def upload_project_files(
             "project_type": project.project_type,
             "tech_stack": project.tech_stack,
             "storage_path": project.storage_path,
+            "auto_sync": project.auto_sync,
             "created_at": project.created_at,
-            "last_updated": project.last_updated
+            "last_updated": project.last_updated,
+            "upload": upload_result
         }
         
-        return ProjectResponse(**project_data)
+        return ProjectUploadResponse(**project_data)
         
     finally:
         # 清理临时文件
@@ -474,13 +506,18 @@ async def upload_project_files(
             os.unlink(temp_file.name)
 
 
+@router.get("/download/{project_id}")
 @router.post("/download/{project_id}")
 async def download_project_files(
     project_id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """下载项目文件（ZIP格式）"""
+    """下载项目文件（ZIP格式）
+    
+    项目未变化时使用缓存的ZIP包，支持ETag/If-None-Match和Range（断点续传）。
+    """
     # 获取项目
     if current_user.is_admin:
         result = await db.execute(
@@ -508,24 +545,40 @@ async def download_project_files(
             detail="项目文件不存在",
         )
     
-    # 创建临时zip文件
-    temp_dir = tempfile.gettempdir()
     zip_file_name = f"{project.name}_{project_id}.zip"
-    zip_file_path = os.path.join(temp_dir, zip_file_name)
+    matcher = get_project_ignore_matcher(project.storage_path)
+    chunks = iter_project_zip(project.storage_path, matcher=matcher, threads=settings.TREE_WALK_THREADS)
+    if not settings.DOWNLOAD_CACHE_ENABLED:
+        return StreamingResponse(
+            chunks,
+            media_type="application/zip",
+            headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(zip_file_name)}"}
+        )
     
-    # 创建zip文件
-    with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(project.storage_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, project.storage_path)
-                zipf.write(file_path, arcname)
+    # 相同指纹生成的ZIP包内容相同，指纹即ETag
+    fingerprint = await asyncio.to_thread(
+        tree_fingerprint, project.storage_path, matcher, settings.TREE_WALK_THREADS
+    )
+    etag = f'"{fingerprint}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    cached_path = await asyncio.to_thread(archive_cache.get, project_id, fingerprint)
+    if cached_path:
+        return FileResponse(
+            path=cached_path,
+            filename=zip_file_name,
+            media_type="application/zip",
+            headers=headers
+        )
     
-    # 返回zip文件
-    return FileResponse(
-        path=zip_file_path,
-        filename=zip_file_name,
-        media_type="application/zip"
+    # 未命中时边生成边发送，同时写入缓存
+    headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(zip_file_name)}"
+    return StreamingResponse(
+        archive_cache.store(project_id, fingerprint, chunks),
+        media_type="application/zip",
+        headers=headers
     )
 
 
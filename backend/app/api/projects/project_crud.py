@@ -7,6 +7,7 @@
 import os
 import shutil
 import uuid
+import asyncio
 import logging
 import time
 import subprocess
@@ -14,83 +15,69 @@ import traceback
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import undefer
 from sqlalchemy import and_, func
-from typing import List
+from typing import List, Optional, Tuple
 from datetime import datetime
 
 from app.core.config import settings
-from app.db.database import get_db
+from app.db.database import get_db, async_session_factory
 from app.models.project import Project, Deployment
 from app.models.user import User
-from app.schemas.project import ProjectCreate, ProjectUpdate, ProjectResponse, ProjectWithDeployments
+from app.schemas.project import ProjectCreate, ProjectUpdate, ProjectResponse, ProjectResponseWithStats, ProjectStats, ProjectWithDeployments
 from app.api.deps import get_current_active_user
-from app.utils.file_utils import format_size
+from app.utils.archive_cache import archive_cache
+from app.utils.ignore_handler import get_gitignore_file_matcher
+from app.utils.project_stats import compute_project_stats, decode_stats_index, encode_stats_index
+from app.utils.singleflight import SingleFlight
 from app.api.projects.repository_sync import sync_git_repository, sync_local_folder
 from app.models.machine import Machine
 
 router = APIRouter()
 
-# 项目统计功能
-async def count_project_stats(storage_path: str) -> dict:
-    """统计项目文件数量、总大小和代码行数"""
-    from app.utils.ignore_handler import parse_ignore_file, should_ignore_file
-    
-    stats = {
-        "file_count": 0,
-        "total_size_bytes": 0,
-        "code_lines": 0,
-        "total_size_human": "",
-        "ignore_file_exists": False
-    }
-    
-    # 检查.gitignore文件是否存在
-    gitignore_file_path = os.path.join(storage_path, ".gitignore")
-    ignore_patterns = parse_ignore_file(gitignore_file_path)
-    stats["ignore_file_exists"] = os.path.exists(gitignore_file_path)
+# 项目统计的请求合并
+stats_flight = SingleFlight()
+
+
+def _compute_stats(storage_path: str, index_blob: Optional[bytes]) -> Tuple[dict, Optional[bytes]]:
+    """增量统计项目（阻塞），行数缓存有变化时返回新的缓存"""
+    ignore_matcher = get_gitignore_file_matcher(os.path.join(storage_path, ".gitignore"))
+    index = decode_stats_index(index_blob)
+    result = compute_project_stats(
+        storage_path, ignore_matcher, index, settings.TREE_WALK_THREADS, settings.PROJECT_STATS_WORKERS
+    )
+    if result.recounted or len(result.index) != len(index):
+        return result.stats, encode_stats_index(result.index)
+    return result.stats, None
+
+
+async def count_project_stats(project_id: int) -> Optional[dict]:
+    """统计项目文件数量、总大小、代码行数和按语言的分项，并保存到项目记录
     
-    # 统计文件
-    for root, dirs, files in os.walk(storage_path):
-        # 转换为相对路径
-        rel_path = os.path.relpath(root, storage_path)
-        rel_path = "" if rel_path == "." else rel_path
-        
-        # 检查当前目录是否应该被忽略
-        if should_ignore_file(rel_path, ignore_patterns):
-            dirs[:] = []  # 清空子目录列表，不再遍历
-            continue
-        
-        # 对目录列表进行过滤
-        dirs[:] = [d for d in dirs if not should_ignore_file(os.path.join(rel_path, d), ignore_patterns)]
-        
-        for file in files:
-            file_path = os.path.join(rel_path, file)
-            # 检查文件是否应该被忽略
-            if should_ignore_file(file_path, ignore_patterns):
-                continue
-            
-            # 增加文件计数
-            stats["file_count"] += 1
-            
-            # 获取文件大小
-            full_path = os.path.join(root, file)
-            file_size = os.path.getsize(full_path)
-            stats["total_size_bytes"] += file_size
-            
-            # 计算代码行数 (仅对常见代码文件)
-            code_extensions = ['.py', '.js', '.jsx', '.ts', '.tsx', '.html', '.css', 
-                               '.java', '.c', '.cpp', '.h', '.hpp', '.cs', '.php', 
-                               '.rb', '.go', '.rs', '.swift', '.kt', '.sql']
+    只重新统计变化的代码文件，遍历和读取文件在线程中执行。
+    同一项目的并发统计只执行一次，在独立的数据库会话中保存结果。
+    """
+    async def run():
+        async with async_session_factory() as db:
+            result = await db.execute(
+                select(Project).options(undefer(Project.stats_index)).where(Project.id == project_id)
+            )
+            project = result.scalars().first()
+            if not project:
+                return None
+            if not os.path.isdir(project.storage_path):
+                logging.warning(f"项目存储路径不存在或不是目录: {project.storage_path}")
+                return None
             
-            if any(full_path.endswith(ext) for ext in code_extensions):
-                try:
-                    with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        stats["code_lines"] += sum(1 for _ in f)
-                except Exception as e:
-                    logging.warning(f"统计代码行数出错: {full_path}, {e}")
-    
-    # 格式化总大小为人类可读格式
-    stats["total_size_human"] = format_size(stats["total_size_bytes"])
+            stats, index_blob = await asyncio.to_thread(_compute_stats, project.storage_path, project.stats_index)
+            if index_blob is not None or stats != project.stats:
+                project.stats = stats
+                if index_blob is not None:
+                    project.stats_index = index_blob
+                await db.commit()
+            return stats
     
+    stats, _ = await stats_flight.do(project_id, run)
     return stats
 
 
@@ -181,14 +168,17 @@ async def create_project(
     return ProjectResponse(**project_data)
 
 
-@router.get("/", response_model=List[ProjectResponse])
+@router.get("/", response_model=List[ProjectResponseWithStats])
 async def read_projects(
     skip: int = 0,
     limit: int = 100,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """获取项目列表"""
+    """获取项目列表
+    
+    统计信息为上次查看项目详情时保存的结果，从未统计过的项目为空。
+    """
     # 管理员可以看到所有项目，普通用户只能看到自己的项目
     if current_user.is_admin:
         result = await db.execute(
@@ -215,10 +205,12 @@ async def read_projects(
             "project_type": project.project_type,
             "tech_stack": project.tech_stack,
             "storage_path": project.storage_path,
+            "auto_sync": project.auto_sync,
             "created_at": project.created_at,
-            "last_updated": project.last_updated
+            "last_updated": project.last_updated,
+            "stats": project.stats
         }
-        project_responses.append(ProjectResponse(**project_data))
+        project_responses.append(ProjectResponseWithStats(**project_data))
     
     return project_responses
 
@@ -295,12 +287,9 @@ async def read_project(
                 # 继续处理其他部署记录，不中断流程
         
         # 获取项目统计信息
-        stats = {"file_count": 0, "total_size_bytes": 0, "code_lines": 0, "total_size_human": "0 B", "ignore_file_exists": False}
+        stats = ProjectStats().dict()
         try:
-            if os.path.exists(project.storage_path) and os.path.isdir(project.storage_path):
-                stats = await count_project_stats(project.storage_path)
-            else:
-                logging.warning(f"项目存储路径不存在或不是目录: {project.storage_path}")
+            stats = await count_project_stats(project.id) or stats
         except Exception as e:
             logging.error(f"计算项目统计信息时出错: {e}")
             logging.error(traceback.format_exc())
@@ -317,6 +306,7 @@ async def read_project(
             "project_type": project.project_type,
             "tech_stack": project.tech_stack,
             "storage_path": project.storage_path,
+            "auto_sync": project.auto_sync,
             "created_at": project.created_at,
             "last_updated": project.last_updated,
             "deployments": deployments,
@@ -374,6 +364,14 @@ async def update_project(
     )
     project = result.scalars().first()
     
+    # 按自动同步设置开始或停止监听本地文件夹
+    if {"auto_sync", "repository_url", "repository_type", "is_active"} & update_data.keys():
+        from app.core.project_watcher import project_watcher
+        if project.repository_type == "local" and project.auto_sync and project.is_active:
+            await project_watcher.watch(project)
+        else:
+            await project_watcher.unwatch(project.id)
+    
     # 创建一个安全的响应数据字典
     project_data = {
         "id": project.id,
@@ -386,6 +384,7 @@ async def update_project(
         "project_type": project.project_type,
         "tech_stack": project.tech_stack,
         "storage_path": project.storage_path,
+        "auto_sync": project.auto_sync,
         "created_at": project.created_at,
         "last_updated": project.last_updated
     }
@@ -420,6 +419,11 @@ async def delete_project(
             detail="项目不存在或没有访问权限",
         )
     
+    # 停止监听，避免删除过程中继续写入存储目录
+    from app.core.project_watcher import project_watcher
+    await project_watcher.unwatch(project.id)
+    archive_cache.invalidate(project.id)
+    
     # 删除项目文件
     storage_path = project.storage_path
     deletion_success = True
@@ -13,13 +13,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import and_, func
 
+from app.core.config import settings
 from app.db.database import get_db
 from app.models.project import Project
 from app.models.user import User
 from app.schemas.project import ProjectResponse
 from app.api.deps import get_current_active_user
-from app.utils.ignore_handler import get_gitignore_patterns as get_ignore_patterns, should_ignore_file
-from app.utils.file_utils import custom_copytree
+from app.utils.ignore_handler import get_gitignore_patterns as get_ignore_patterns, get_project_ignore_matcher
+from app.utils.local_sync import LocalFolderSync
+from app.utils.archive_cache import archive_cache
+from app.utils.tree_walker import walk_tree
 from app.api.projects.websocket import manager
 
 router = APIRouter()
@@ -82,6 +85,8 @@ async def clone_from_git(
                 detail=f"Git克隆失败: {stderr.decode()}"
             )
         
+        archive_cache.invalidate(project.id)
+        
         # 更新项目的仓库URL
         project.repository_url = repository_url
         await db.commit()
@@ -136,6 +141,8 @@ async def sync_project(
             detail="不支持的仓库类型",
         )
     
+    archive_cache.invalidate(project.id)
+    
     # 更新项目最后更新时间
     project.last_updated = func.now()
     await db.commit()
@@ -158,6 +165,7 @@ async def sync_project(
         "project_type": project.project_type,
         "tech_stack": project.tech_stack,
         "storage_path": project.storage_path,
+        "auto_sync": project.auto_sync,
         "created_at": project.created_at,
         "last_updated": project.last_updated
     }
@@ -449,46 +457,36 @@ async def sync_git_repository(project: Project):
                 shutil.copy2(root_gitignore_path, os.path.join(storage_path, ".gitignore"))
                 
             # 重新获取忽略规则，包括项目目录中可能存在的规则
-            ignore_patterns = get_ignore_patterns(storage_path)
+            ignore_matcher = get_project_ignore_matcher(storage_path)
         
-            # 遍历项目目录并删除应该被忽略的文件
-            for root, dirs, files in os.walk(storage_path, topdown=True):
-                # 转换为相对路径(相对于项目目录)
-                rel_path = os.path.relpath(root, storage_path)
-                rel_path = "" if rel_path == "." else rel_path
-                
-                # 过滤要忽略的目录
-                dirs_to_remove = []
-                for i, dir_name in enumerate(dirs):
-                    dir_path = os.path.join(rel_path, dir_name) if rel_path else dir_name
+            # 遍历项目目录并删除应该被忽略的文件，被忽略的目录整个删除，不再进入
+            ignored_dirs = []
+            
+            def prune_dir(dir_path, entry):
+                # 不要进入或删除.git目录
+                if entry.name == ".git":
+                    return True
+                if ignore_matcher.match_dir(dir_path):
+                    ignored_dirs.append(entry.path)
+                    return True
+                return False
+            
+            for file_path, entry in walk_tree(storage_path, prune=prune_dir, threads=settings.TREE_WALK_THREADS):
+                # 保护重要文件
+                if entry.name in important_files:
+                    continue
                     
-                    # 不要删除.git目录
-                    if dir_name == ".git":
-                        continue
-                        
-                    if should_ignore_file(dir_path, ignore_patterns):
-                        dirs_to_remove.append(i)
-                        print(f"忽略目录: {dir_path}")
-                
-                # 从后向前删除，避免索引混乱
-                for i in sorted(dirs_to_remove, reverse=True):
-                    full_dir_path = os.path.join(root, dirs[i])
-                    if os.path.exists(full_dir_path) and os.path.isdir(full_dir_path):
-                        shutil.rmtree(full_dir_path)
-                    dirs.pop(i)
-                
-                # 删除要忽略的文件
-                for file_name in files:
-                    # 保护重要文件
-                    if file_name in important_files:
-                        continue
-                        
-                    file_path = os.path.join(rel_path, file_name) if rel_path else file_name
-                    if should_ignore_file(file_path, ignore_patterns):
-                        full_file_path = os.path.join(root, file_name)
-                        if os.path.exists(full_file_path):
-                            os.remove(full_file_path)
-                            print(f"删除忽略的文件: {file_path}")
+                if ignore_matcher.match(file_path):
+                    try:
+                        os.remove(entry.path)
+                        print(f"删除忽略的文件: {file_path}")
+                    except FileNotFoundError:
+                        pass
+            
+            for full_dir_path in ignored_dirs:
+                if os.path.isdir(full_dir_path):
+                    shutil.rmtree(full_dir_path)
+                    print(f"忽略目录: {os.path.relpath(full_dir_path, storage_path)}")
                 
         except Exception as e:
             print(f"应用.gitignore规则时出错: {str(e)}")
@@ -526,24 +524,9 @@ async def sync_local_folder(project: Project):
             detail=f"本地路径不存在或不是文件夹: {local_path}",
         )
     
-    # 更新进度消息
-    await manager.broadcast_to_project(
-        project_id, 
-        {"status": "progress", "message": "清理存储路径...", "progress": 20}
-    )
-    
-    # 清空存储路径
-    if os.path.exists(storage_path):
-        shutil.rmtree(storage_path)
     os.makedirs(storage_path, exist_ok=True)
     
     try:
-        # 更新进度消息
-        await manager.broadcast_to_project(
-            project_id, 
-            {"status": "progress", "message": "复制文件中...", "progress": 40}
-        )
-        
         # 获取根目录.gitignore文件并复制到项目目录
         # 修正根目录路径计算，避免过度嵌套
         project_root = os.path.dirname(os.path.dirname(os.path.dirname(storage_path)))
@@ -553,28 +536,62 @@ async def sync_local_folder(project: Project):
             shutil.copy2(root_gitignore_path, os.path.join(storage_path, ".gitignore"))
             await manager.broadcast_to_project(
                 project_id, 
-                {"status": "progress", "message": "已复制根目录.gitignore文件到项目", "progress": 45}
+                {"status": "progress", "message": "已复制根目录.gitignore文件到项目", "progress": 10}
             )
         
-        # 获取忽略模式
-        ignore_patterns = get_ignore_patterns(storage_path)
+        # 获取忽略规则
+        matcher = get_project_ignore_matcher(storage_path)
         
-        if ignore_patterns:
+        if matcher.patterns:
             await manager.broadcast_to_project(
                 project_id, 
-                {"status": "progress", "message": f"应用忽略规则，将排除 {len(ignore_patterns)} 个模式", "progress": 50}
+                {"status": "progress", "message": f"应用忽略规则，将排除 {len(matcher.patterns)} 个模式", "progress": 15}
             )
         
         # 指定必须包含的重要文件
         important_files = ["start_all.bat", "README.md", "prompt.txt", ".gitignore"]
         
-        # 使用自定义复制函数
-        custom_copytree(local_path, storage_path, ignore_patterns, important_files)
+        # 增量同步：只复制变化的文件，删除源目录中已不存在的文件
+        folder_sync = LocalFolderSync(
+            matcher,
+            important_files=important_files,
+            keep=[".gitignore"],
+            link_mode=settings.LOCAL_SYNC_LINK_MODE,
+            compare=settings.LOCAL_SYNC_COMPARE,
+            workers=settings.LOCAL_SYNC_WORKERS,
+            walk_threads=settings.TREE_WALK_THREADS
+        )
+        sync_task = asyncio.create_task(asyncio.to_thread(folder_sync.sync, local_path, storage_path))
+        
+        # 按固定间隔推送计数，不逐个文件推送
+        while not sync_task.done():
+            await asyncio.wait({sync_task}, timeout=settings.LOCAL_SYNC_PROGRESS_INTERVAL)
+            if sync_task.done():
+                break
+            stats = folder_sync.stats.snapshot()
+            if stats["files_total"]:
+                progress = 20 + int(75 * stats["files_checked"] / stats["files_total"])
+                message = f"同步文件中... {stats['files_checked']}/{stats['files_total']}"
+            else:
+                progress = 20
+                message = "比较文件中..."
+            await manager.broadcast_to_project(
+                project_id, 
+                {"status": "progress", "message": message, "progress": progress, "stats": stats}
+            )
+        
+        stats = sync_task.result().snapshot()
+        message = (
+            f"本地文件夹同步完成! 复制 {stats['files_copied'] + stats['files_linked']} 个，"
+            f"未变化 {stats['files_unchanged']} 个，删除 {stats['files_deleted']} 个文件"
+        )
+        if stats["files_failed"]:
+            message += f"，{stats['files_failed']} 个文件同步失败"
         
         # 更新进度消息 - 成功
         await manager.broadcast_to_project(
             project_id, 
-            {"status": "complete", "message": "本地文件夹同步完成!", "progress": 100}
+            {"status": "complete", "message": message, "progress": 100, "stats": stats}
         )
     except Exception as e:
         # 更新进度消息 - 错误
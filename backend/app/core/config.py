@@ -2,6 +2,7 @@ from pydantic_settings import BaseSettings
 from pydantic import Field
 from typing import Optional, List
 import os
+import tempfile
 from pathlib import Path
 
 
@@ -28,6 +29,87 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8011
     
+    # SSH连接池配置
+    SSH_POOL_MAX_PER_HOST: int = 4  # 每台机器最多同时借出的连接数
+    SSH_DEDICATED_MAX_PER_HOST: int = 2  # 每台机器最多同时建立的独立连接数（实时跟踪日志等长期占用连接的场景，不计入借出上限）
+    SSH_POOL_IDLE_TIMEOUT: int = 300  # 空闲连接保留时间（秒）
+    SSH_KEEPALIVE_INTERVAL: int = 30  # SSH keepalive间隔（秒）
+    SSH_MAX_CONCURRENCY: int = 32  # 同时执行的阻塞SSH操作上限（线程数）
+    SSH_TRANSFER_CONCURRENCY: int = 16  # 同时执行的批量传输上限（SFTP上传通道、打包传输、增量传输，线程数），不占用上面的线程
+    SSH_BREAKER_FAILURE_THRESHOLD: int = 2  # 连续连接失败多少次后熔断
+    SSH_BREAKER_BASE_BACKOFF: float = 5  # 首次熔断时长（秒），之后每次加倍
+    SSH_BREAKER_MAX_BACKOFF: float = 300  # 最长熔断时长（秒）
+    
+    # 机器状态检查配置
+    MACHINE_CHECK_CONCURRENCY: int = 16  # 批量检查时同时探测的机器数
+    MACHINE_CHECK_TIMEOUT: int = 20  # 单台机器探测超时（秒）
+    MACHINE_SWEEP_INTERVAL: int = 300  # 后台检查每台机器状态的间隔（秒），0表示禁用
+    MACHINE_STATUS_CACHE_TTL: float = 5  # 状态检查结果缓存时间（秒），0表示只合并并发请求
+    MACHINE_METRICS_CACHE_TTL: float = 5  # 监控指标结果缓存时间（秒），0表示只合并并发请求
+    
+    # 监控指标采集配置
+    METRICS_SAMPLE_INTERVAL: int = 60  # 后台采集每台机器监控指标的间隔（秒），0表示禁用
+    METRICS_FLUSH_INTERVAL: int = 60  # 监控指标写入数据库的间隔（秒）
+    
+    # 监控调度配置
+    MONITOR_MAX_CONCURRENCY: int = 32  # 同时执行的监控任务上限
+    MONITOR_MAX_PER_HOST: int = 1  # 每台机器同时执行的监控任务上限
+    MONITOR_JITTER: float = 0.1  # 调度时间随机抖动比例（相对间隔）
+    MONITOR_REFRESH_INTERVAL: int = 60  # 同步机器列表的间隔（秒）
+    MONITOR_SHUTDOWN_TIMEOUT: int = 10  # 关闭时等待正在执行的监控任务的时间（秒）
+    
+    # 远程日志实时跟踪配置
+    LOG_TAIL_BATCH_LINES: int = 200  # 累积多少行立即推送
+    LOG_TAIL_FLUSH_MS: int = 200  # 未满一批时最长等待多久推送（毫秒）
+    LOG_TAIL_BACKLOG: int = 200  # 为新加入的查看者保留的最近行数
+    LOG_TAIL_QUEUE_SIZE: int = 100  # 每个查看者最多积压的批次数，超出后丢弃最旧的批次
+    
+    # SFTP上传配置
+    SFTP_UPLOAD_PARALLELISM: int = 4  # 默认的并行SFTP通道数，可按机器单独设置
+    DEPLOY_TRANSFER_MODE: str = "sftp"  # 本地项目同步到机器的方式: sftp（按文件清单增量同步，Windows为逐个文件并行上传）, bundle（打包流式传输）
+    DEPLOY_BUNDLE_COMPRESSION: str = "gzip"  # 打包传输的压缩方式: none, gzip, zstd
+    # 块级增量传输在本地和远程都逐字节计算校验和（纯Python），每32MB约2秒，每GB约1分钟，只适合网络明显慢于该速度的场景
+    DEPLOY_DELTA_MIN_SIZE: int = 8 * 1024 * 1024  # 远程已有且不小于该大小的文件只传输变化的块（需要远程python3），0表示不使用
+    DEPLOY_DELTA_MAX_SIZE: int = 256 * 1024 * 1024  # 超过该大小的文件计算校验和太慢，整体上传，0表示不限制
+    DEPLOY_MANIFEST_CACHE: bool = True  # 增量同步时使用部署记录中缓存的远程文件清单，远程目录指纹一致时不再列出远程目录
+    
+    # 远程日志搜索配置
+    LOG_SEARCH_MAX_LIMIT: int = 1000  # 每页最多返回的匹配行数
+    LOG_SEARCH_MAX_LINE_BYTES: int = 4096  # 单行最多返回的字节数，超出部分截断
+    LOG_SEARCH_TIMEOUT: int = 60  # 单次远程搜索命令的超时（秒）
+    
+    # 本地目录遍历配置
+    TREE_WALK_THREADS: int = 0  # 并行列出目录的线程数，项目存储在网络文件系统上时可调大，小于2表示单线程
+    
+    # 项目文件上传配置
+    UPLOAD_MAX_SIZE: int = 0  # 上传ZIP包的大小上限（字节），0表示不限制
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 上传时每次读取并写入磁盘的字节数
+    UPLOAD_PROGRESS_INTERVAL: float = 0.5  # 解压进度推送间隔（秒）
+    UPLOAD_REPORT_MAX_PATHS: int = 1000  # 上传响应中最多列出的新增/更新文件数
+    ZIP_EXTRACT_WORKERS: int = 8  # 并行解压的线程数
+    ZIP_EXTRACT_LARGE_SIZE: int = 4 * 1024 * 1024  # 不小于该大小的文件单独解压，小文件按该大小分批
+    
+    # 项目统计配置
+    PROJECT_STATS_WORKERS: int = 8  # 并行统计代码行数的线程数
+    
+    # 项目下载包缓存配置
+    DOWNLOAD_CACHE_ENABLED: bool = True  # 项目未变化时重复下载直接使用缓存的ZIP包
+    DOWNLOAD_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "project_center_downloads")  # 缓存目录
+    DOWNLOAD_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # 缓存总大小上限，超过时淘汰最久未使用的包
+    
+    # 本地文件夹同步配置
+    LOCAL_SYNC_WORKERS: int = 8  # 并行复制文件的线程数
+    LOCAL_SYNC_LINK_MODE: str = "reflink"  # copy, reflink（文件系统支持时共享数据块）, hardlink（与源文件共享，修改会互相影响）
+    LOCAL_SYNC_COMPARE: str = "mtime"  # mtime（大小和修改时间）, hash（修改时间不同时再比较内容）
+    LOCAL_SYNC_PROGRESS_INTERVAL: float = 0.5  # 同步进度推送间隔（秒）
+    
+    # 本地项目文件监听配置（项目需开启auto_sync）
+    LOCAL_WATCH_ENABLED: bool = True  # 是否监听开启自动同步的本地项目
+    LOCAL_WATCH_BACKEND: str = "auto"  # auto（Linux上使用inotify，不可用时轮询）, inotify, polling
+    LOCAL_WATCH_POLL_INTERVAL: float = 2  # 轮询监听的间隔（秒）
+    LOCAL_WATCH_DEBOUNCE: float = 0.5  # 最后一次变化后等待多久再同步（秒）
+    LOCAL_WATCH_MAX_DELAY: float = 5  # 持续变化时最长等待多久同步一次（秒）
+    
     # CORS配置
     ALLOWED_ORIGINS: List[str] = [
         "http://localhost:8012",
@@ -0,0 +1,264 @@
+"""
+远程日志搜索模块
+
+在远程机器上过滤日志，只传回匹配的行：
+- 按内容（纯文本或POSIX扩展正则）、时间范围、最低日志级别过滤
+- 跨轮转的 backend_*.log / frontend_*.log 文件按时间顺序搜索
+- 游标为"文件名:字节偏移"，下一页用 tail -c 直接从偏移处读取，不重复扫描
+- 按文件修改时间和文件名中的启动时间跳过时间范围外的文件
+- 结果可在远程压缩后传输
+
+没有时间戳的行（例如异常堆栈）沿用前面最近一行的时间和级别，
+文件开头没有时间戳的行以文件名中的启动时间为准。
+"""
+
+import re
+import gzip
+import shlex
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.machines import MachineManager, REMOTE_LOG_DIR, REMOTE_LOG_PATTERNS, DEFAULT_LOG_PATTERN
+from app.models.machine import Machine
+from app.schemas.machine import LogSearchRequest, LogSearchResult, LogMatch
+from app.utils.ssh_executor import run_ssh_blocking
+from app.utils.ssh_pool import PooledSSHClient
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 日志文件名中的启动时间，例如 backend_20240101_120000.log
+FILE_TIME_RE = re.compile(r"_(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})\.log$")
+
+# 扫描结束标记: @@end <下一行的偏移> <eof|more|stop>
+END_MARKER = b"@@end\t"
+
+# 在远程逐行过滤日志的awk程序
+# 输入为从偏移off开始的文件内容，ts为文件的启动时间，输出"偏移\t行内容"，最后输出结束标记：
+# eof 文件已读完，more 已达到limit，stop 已超过结束时间
+AWK_PROGRAM = r"""
+BEGIN { pos = off + 0; limit = limit + 0; n = 0; state = "eof"; pat = ENVIRON["LOG_SEARCH_PATTERN"] }
+{
+    len = length($0) + 1
+    if ($0 ~ /^[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9][ T][0-9][0-9]:[0-9][0-9]:[0-9][0-9]/) {
+        ts = substr($0, 1, 10) " " substr($0, 12, 8)
+        lvl = ""
+        if (match($0, / - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - /)) lvl = substr($0, RSTART + 3, RLENGTH - 6)
+    } else if (match($0, /^(DEBUG|INFO|WARNING|ERROR|CRITICAL):/)) {
+        lvl = substr($0, 1, RLENGTH - 1)
+    }
+    if (upto != "" && ts != "" && ts > upto) { state = "stop"; exit }
+    hit = (since == "" || ts == "" || ts >= since) && (levels == "" || index(levels, "|" lvl "|") > 0)
+    if (hit && pat != "") {
+        text = icase ? tolower($0) : $0
+        hit = rx ? (text ~ pat) : (index(text, pat) > 0)
+    }
+    if (hit) { print pos "\t" substr($0, 1, maxlen); n++ }
+    pos += len
+    if (n >= limit) { state = "more"; exit }
+}
+END { print "@@end\t" pos "\t" state }
+"""
+
+
+class LogSearchError(Exception):
+    """远程日志搜索失败"""
+
+
+def lower_pattern(pattern: str) -> str:
+    """把正则中的字母转为小写，保留转义序列（如\\S）不变"""
+    return re.sub(r"\\.|[A-Z]+", lambda m: m.group(0) if m.group(0).startswith("\\") else m.group(0).lower(), pattern)
+
+
+def parse_cursor(cursor: Optional[str]) -> Tuple[Optional[str], int]:
+    """解析"文件名:字节偏移"形式的游标"""
+    if not cursor:
+        return None, 0
+    name, sep, offset = cursor.rpartition(":")
+    if not sep or not name or not offset.isdigit() or "/" in name:
+        raise LogSearchError(f"无效的游标: {cursor}")
+    return name, int(offset)
+
+
+def file_start_time(name: str) -> Optional[str]:
+    """文件名中的启动时间"""
+    match = FILE_TIME_RE.search(name)
+    if not match:
+        return None
+    year, month, day, hour, minute, second = match.groups()
+    return f"{year}-{month}-{day} {hour}:{minute}:{second}"
+
+
+def build_list_command(log_type: str) -> str:
+    """列出日志文件的远程命令，每行输出"大小|修改时间|文件名\""""
+    pattern = REMOTE_LOG_PATTERNS.get(log_type, DEFAULT_LOG_PATTERN)
+    return (
+        f"cd {REMOTE_LOG_DIR} && for f in {pattern}; do "
+        f"[ -f \"$f\" ] && stat -c '%s|%y|%n' -- \"$f\"; done; true"
+    )
+
+
+def parse_file_list(output: str) -> List[Tuple[str, int, str]]:
+    """解析文件列表，按文件名中的启动时间排序
+
+    Returns:
+        [(文件名, 大小, 修改时间)]，修改时间为远程本地时间的"YYYY-MM-DD HH:MM:SS"
+    """
+    files = []
+    for line in output.splitlines():
+        parts = line.split("|", 2)
+        if len(parts) != 3 or not parts[0].isdigit():
+            continue
+        size, mtime, name = parts
+        files.append((name, int(size), mtime[:19]))
+    files.sort(key=lambda item: (file_start_time(item[0]) or item[2], item[0]))
+    return files
+
+
+def build_scan_command(name: str, offset: int, limit: int, request: LogSearchRequest) -> str:
+    """从偏移offset开始过滤一个日志文件的远程命令"""
+    pattern = request.pattern or ""
+    if request.ignore_case:
+        pattern = lower_pattern(pattern) if request.regex else pattern.lower()
+
+    levels = ""
+    if request.level:
+        levels = "|" + "|".join(LEVELS[LEVELS.index(request.level):]) + "|"
+
+    variables = {
+        "off": offset,
+        "limit": limit,
+        "maxlen": settings.LOG_SEARCH_MAX_LINE_BYTES,
+        "since": request.start_time.strftime(TIME_FORMAT) if request.start_time else "",
+        "upto": request.end_time.strftime(TIME_FORMAT) if request.end_time else "",
+        "ts": file_start_time(name) or "",
+        "levels": levels,
+        "rx": int(request.regex),
+        "icase": int(request.ignore_case),
+    }
+    awk_vars = " ".join(f"-v {key}={shlex.quote(str(value))}" for key, value in variables.items())
+
+    command = (
+        f"cd {REMOTE_LOG_DIR} && tail -c +{offset + 1} -- {shlex.quote(name)} | "
+        f"LOG_SEARCH_PATTERN={shlex.quote(pattern)} LC_ALL=C awk {awk_vars} {shlex.quote(AWK_PROGRAM)}"
+    )
+    if request.compress:
+        command += " | gzip -c"
+    return command
+
+
+def parse_scan_output(name: str, output: bytes) -> Tuple[List[LogMatch], int, str]:
+    """
+    解析过滤结果
+
+    Returns:
+        (匹配的行, 下一行的偏移, 结束状态)
+    """
+    matches = []
+    for line in output.split(b"\n"):
+        if line.startswith(END_MARKER):
+            _, position, state = line.decode("ascii", errors="replace").split("\t")
+            return matches, int(position), state.strip()
+        offset, sep, text = line.partition(b"\t")
+        if sep and offset.isdigit():
+            matches.append(LogMatch(file=name, offset=int(offset), line=text.decode("utf-8", errors="replace")))
+    raise LogSearchError("远程搜索输出不完整")
+
+
+def _run_binary_blocking(client: PooledSSHClient, command: str, timeout: float) -> Tuple[bytes, str, int]:
+    """执行远程命令，按字节返回标准输出"""
+    stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
+    out = stdout.read()
+    err = stderr.read().decode("utf-8", errors="replace").strip()
+    return out, err, stdout.channel.recv_exit_status()
+
+
+async def search_logs(machine: Machine, request: LogSearchRequest) -> LogSearchResult:
+    """
+    搜索远程日志
+
+    Raises:
+        LogSearchError: 参数无效、无法连接机器或远程搜索失败
+    """
+    if request.level:
+        request = request.model_copy(update={"level": request.level.upper()})
+        if request.level not in LEVELS:
+            raise LogSearchError(f"无效的日志级别: {request.level}")
+    cursor_file, cursor_offset = parse_cursor(request.cursor)
+    limit = min(request.limit, settings.LOG_SEARCH_MAX_LIMIT)
+    since = request.start_time.strftime(TIME_FORMAT) if request.start_time else None
+    upto = request.end_time.strftime(TIME_FORMAT) if request.end_time else None
+
+    client, error = await MachineManager.get_ssh_client(machine)
+    if not client:
+        raise LogSearchError(error)
+
+    matches: List[LogMatch] = []
+    next_cursor = None
+    files_scanned = bytes_scanned = bytes_transferred = 0
+    try:
+        out, err, _ = await MachineManager.execute_command(client, build_list_command(request.log_type))
+        files = parse_file_list(out)
+        if cursor_file is not None:
+            # 从游标所在文件继续；该文件已被清理时从排在它之后的文件开始
+            cursor_key = (file_start_time(cursor_file) or "", cursor_file)
+            files = [
+                item for item in files
+                if item[0] == cursor_file or (file_start_time(item[0]) or item[2], item[0]) > cursor_key
+            ]
+
+        for name, size, mtime in files:
+            offset = cursor_offset if name == cursor_file else 0
+            started = file_start_time(name)
+            if upto and started and started > upto:
+                break
+            if (since and mtime < since) or offset >= size:
+                continue
+
+            command = build_scan_command(name, offset, limit - len(matches), request)
+            output, err, _ = await run_ssh_blocking(
+                _run_binary_blocking, client, command, settings.LOG_SEARCH_TIMEOUT
+            )
+            bytes_transferred += len(output)
+            if request.compress and output:
+                output = await asyncio.to_thread(gzip.decompress, output)
+            try:
+                found, position, state = parse_scan_output(name, output)
+            except LogSearchError:
+                raise LogSearchError(f"搜索日志失败: {err or '远程搜索输出不完整'}")
+
+            files_scanned += 1
+            bytes_scanned += position - offset
+            matches.extend(found)
+            if state == "more":
+                next_cursor = f"{name}:{position}"
+                break
+            if state == "stop":
+                break
+    except asyncio.CancelledError:
+        # 远程命令可能仍在执行，该连接不再复用
+        client.discard()
+        raise
+    except LogSearchError:
+        raise
+    except Exception as e:
+        raise LogSearchError(f"搜索日志失败: {str(e)}")
+    finally:
+        client.close()
+
+    logger.debug(
+        f"远程日志搜索: 机器 {machine.name}, 扫描 {files_scanned} 个文件 {bytes_scanned} 字节, "
+        f"匹配 {len(matches)} 行, 传输 {bytes_transferred} 字节"
+    )
+    return LogSearchResult(
+        matches=matches,
+        next_cursor=next_cursor,
+        files_scanned=files_scanned,
+        bytes_scanned=bytes_scanned,
+        bytes_transferred=bytes_transferred
+    )
@@ -0,0 +1,251 @@
+"""
+远程日志实时跟踪模块
+
+同一台机器同一类日志的所有查看者共享一个远程 tail -F 通道：
+- 第一个查看者加入时在独立SSH连接上打开通道，最后一个查看者离开时关闭；
+  通道长期占用连接，不计入连接池的单机上限，避免查看日志占满名额阻塞状态检查和部署
+- 新输出按行累积，满一批或超过刷新间隔时推送
+- 每个查看者有独立的有界队列，慢速查看者积压过多时丢弃最旧的批次，不影响其他查看者
+- 远端输出不被读取时由SSH通道窗口限流
+- 保留最近若干行，新加入的查看者先收到这些行
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import paramiko
+
+from app.core.config import settings
+from app.core.machines import MachineManager, REMOTE_LOG_DIR, REMOTE_LOG_PATTERNS, DEFAULT_LOG_PATTERN
+from app.models.machine import Machine
+from app.utils.ssh_executor import run_ssh_blocking
+from app.utils.ssh_pool import DedicatedSSHClient
+
+logger = logging.getLogger(__name__)
+
+# 每次从通道读取的最大字节数
+READ_SIZE = 65536
+# 轮询通道的最长间隔（秒）
+POLL_INTERVAL = 0.05
+
+
+class LogTailError(Exception):
+    """无法开始跟踪日志"""
+
+
+def build_tail_command(log_type: str, lines: int) -> str:
+    """跟踪最新日志文件的远程命令"""
+    pattern = REMOTE_LOG_PATTERNS.get(log_type, DEFAULT_LOG_PATTERN)
+    return (
+        f"cd {REMOTE_LOG_DIR} && f=$(ls -t {pattern} 2>/dev/null | head -1) && "
+        f"[ -n \"$f\" ] && exec tail -n {int(lines)} -F \"$f\""
+    )
+
+
+class LogTailSubscriber:
+    """一个日志查看者"""
+
+    def __init__(self, tail: "LogTail", queue_size: int):
+        self.tail = tail
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._dropped = 0
+
+    def push(self, message: Optional[dict]):
+        """推送消息，队列满时丢弃最旧的消息"""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self._dropped += 1
+        self._queue.put_nowait(message)
+
+    async def get(self) -> Optional[dict]:
+        """获取下一条消息，跟踪结束时返回None"""
+        if self._dropped:
+            dropped, self._dropped = self._dropped, 0
+            return {"type": "dropped", "batches": dropped}
+        return await self._queue.get()
+
+
+class LogTail:
+    """共享的远程 tail -F 通道"""
+
+    def __init__(self, key: Tuple[int, str], machine: Machine, log_type: str, lines: int):
+        self.key = key
+        self.machine = machine
+        self.log_type = log_type
+        self.lines = lines
+        self.subscribers: Set[LogTailSubscriber] = set()
+        self.backlog: Deque[str] = deque(maxlen=settings.LOG_TAIL_BACKLOG)
+        self._client: Optional[DedicatedSSHClient] = None
+        self._channel: Optional[paramiko.Channel] = None
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self.closed = False
+
+    @staticmethod
+    def _open_channel(client: DedicatedSSHClient, command: str) -> paramiko.Channel:
+        channel = client.get_transport().open_session()
+        channel.exec_command(command)
+        return channel
+
+    async def start(self):
+        """打开远程通道（多次调用只打开一次）"""
+        async with self._start_lock:
+            if self._task is not None:
+                return
+            client, error = await MachineManager.get_ssh_client(self.machine, dedicated=True)
+            if not client:
+                raise LogTailError(error)
+            try:
+                command = build_tail_command(self.log_type, self.lines)
+                self._channel = await run_ssh_blocking(self._open_channel, client, command)
+            except Exception as e:
+                client.discard()
+                raise LogTailError(f"打开日志通道失败: {str(e)}")
+            self._client = client
+            self._task = asyncio.create_task(self._pump())
+            logger.info(f"开始跟踪远程日志: 机器 {self.machine.name} {self.log_type}")
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def _broadcast(self, message: Optional[dict]):
+        for subscriber in list(self.subscribers):
+            subscriber.push(message)
+
+    def _flush(self, pending: List[str]):
+        batch_size = settings.LOG_TAIL_BATCH_LINES
+        for start in range(0, len(pending), batch_size):
+            self._broadcast({"type": "lines", "lines": pending[start:start + batch_size]})
+        self.backlog.extend(pending)
+        pending.clear()
+
+    async def _pump(self):
+        """轮询通道输出，按批次推送给所有查看者"""
+        channel = self._channel
+        flush_interval = settings.LOG_TAIL_FLUSH_MS / 1000
+        poll_interval = min(flush_interval, POLL_INTERVAL)
+        remainder = b""
+        pending: List[str] = []
+        stderr = b""
+        last_flush = time.monotonic()
+
+        try:
+            while True:
+                while channel.recv_ready():
+                    data = remainder + channel.recv(READ_SIZE)
+                    *complete, remainder = data.split(b"\n")
+                    pending.extend(line.decode("utf-8", errors="replace") for line in complete)
+                while channel.recv_stderr_ready():
+                    stderr += channel.recv_stderr(READ_SIZE)
+
+                finished = channel.exit_status_ready() and not channel.recv_ready()
+                now = time.monotonic()
+                if pending and (
+                    finished
+                    or len(pending) >= settings.LOG_TAIL_BATCH_LINES
+                    or now - last_flush >= flush_interval
+                ):
+                    self._flush(pending)
+                    last_flush = now
+
+                if finished:
+                    if remainder:
+                        self._flush([remainder.decode("utf-8", errors="replace")])
+                    message = stderr.decode("utf-8", errors="replace").strip() or "未找到日志文件或日志跟踪已结束"
+                    self._broadcast({"type": "closed", "message": message})
+                    break
+
+                await asyncio.sleep(poll_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"跟踪远程日志出错: {str(e)}")
+            self._broadcast({"type": "closed", "message": f"跟踪远程日志出错: {str(e)}"})
+        self.closed = True
+        self._broadcast(None)
+
+    def stop(self):
+        """关闭远程通道并断开SSH连接"""
+        self.closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._channel is not None:
+            try:
+                self._channel.close()
+            except Exception as e:
+                logger.debug(f"关闭日志通道出错: {str(e)}")
+            self._channel = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        logger.info(f"停止跟踪远程日志: 机器 {self.machine.name} {self.log_type}")
+
+
+class LogTailHub:
+    """按(机器, 日志类型)共享远程日志跟踪"""
+
+    def __init__(self):
+        self._tails: Dict[Tuple[int, str], LogTail] = {}
+
+    async def subscribe(self, machine: Machine, log_type: str = "backend", lines: int = 100) -> LogTailSubscriber:
+        """
+        加入日志跟踪，没有正在进行的跟踪时打开远程通道
+
+        Raises:
+            LogTailError: 日志类型不支持、无法连接机器或打开通道
+        """
+        if log_type not in REMOTE_LOG_PATTERNS:
+            raise LogTailError(f"不支持的日志类型: {log_type}")
+        key = (machine.id, log_type)
+        tail = self._tails.get(key)
+        if tail is None or tail.closed:
+            tail = LogTail(key, machine, log_type, lines)
+            self._tails[key] = tail
+
+        subscriber = LogTailSubscriber(tail, settings.LOG_TAIL_QUEUE_SIZE)
+        if tail.started:
+            # 加入已在进行的跟踪，先收到最近的日志，之后接收新输出
+            if tail.backlog:
+                subscriber.push({"type": "lines", "lines": list(tail.backlog)})
+            tail.subscribers.add(subscriber)
+            return subscriber
+
+        tail.subscribers.add(subscriber)
+        try:
+            await tail.start()
+        except BaseException:
+            self.unsubscribe(subscriber)
+            raise
+        return subscriber
+
+    def unsubscribe(self, subscriber: LogTailSubscriber):
+        """离开日志跟踪，最后一个查看者离开时关闭远程通道"""
+        tail = subscriber.tail
+        tail.subscribers.discard(subscriber)
+        if not tail.subscribers:
+            tail.stop()
+            if self._tails.get(tail.key) is tail:
+                del self._tails[tail.key]
+
+    def stats(self) -> Dict[str, int]:
+        """正在进行的跟踪及查看者数量"""
+        return {
+            f"{machine_id}:{log_type}": len(tail.subscribers)
+            for (machine_id, log_type), tail in self._tails.items()
+        }
+
+    def shutdown(self):
+        """关闭所有跟踪"""
+        for tail in list(self._tails.values()):
+            tail._broadcast(None)
+            tail.stop()
+        self._tails.clear()
+
+
+# 进程级日志跟踪实例
+log_tail_hub = LogTailHub()
@@ -0,0 +1,148 @@
+"""
+机器探测脚本模块
+
+把状态检查和监控指标需要的所有命令合并成一个复合脚本，一次SSH往返取回全部数据。
+脚本输出按 "@@段名" 分隔，解析时一次遍历拆分成各段，再分别构建状态和监控指标。
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+from app.schemas.machine import MachineStatus, MachineMetrics
+
+logger = logging.getLogger(__name__)
+
+SECTION_PREFIX = "@@"
+END_SECTION = "end"
+
+# 进程匹配使用 [u]vicorn 写法，避免匹配到执行探测脚本的shell进程本身
+PROBE_COMMAND = "; ".join([
+    "export LC_ALL=C",
+    "echo '@@backend'", "ps aux | grep '[u]vicorn app.main:app' | head -1",
+    "echo '@@frontend'", "ps aux | grep '[p]npm dev' | head -1",
+    "echo '@@uptime'", "uptime",
+    "echo '@@memory_h'", "free -h | head -2",
+    "echo '@@disk_h'", "df -h | grep -E '^/dev/' | head -1",
+    "echo '@@cores'", "grep -c ^processor /proc/cpuinfo",
+    "echo '@@loadavg'", "cat /proc/loadavg",
+    "echo '@@cpu'", "top -bn1 | grep 'Cpu(s)' | awk '{print $2+$4}'",
+    "echo '@@memory'", "free -b | grep Mem",
+    "echo '@@disk'", "df -B1 / | tail -1",
+    "echo '@@network'", "grep -E 'eth0|ens|enp' /proc/net/dev | awk '{print $2,$10,$3,$11}'",
+    "echo '@@processes'", "ps -e -o stat=",
+    "echo '@@end'",
+])
+
+
+def parse_probe_output(output: str) -> Dict[str, List[str]]:
+    """
+    拆分探测脚本输出
+
+    Args:
+        output: 探测脚本的标准输出
+
+    Returns:
+        段名到该段非空行列表的映射
+
+    Raises:
+        ValueError: 输出不完整（缺少结束标记）
+    """
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith(SECTION_PREFIX):
+            current = line[len(SECTION_PREFIX):]
+            sections[current] = []
+        elif current is not None and line:
+            sections[current].append(line)
+
+    if END_SECTION not in sections:
+        raise ValueError(f"探测输出不完整: {output[-200:]}")
+    return sections
+
+
+def build_status(sections: Dict[str, List[str]]) -> MachineStatus:
+    """根据探测输出构建机器状态"""
+    return MachineStatus(
+        is_online=True,
+        backend_running=bool(sections.get("backend")),
+        frontend_running=bool(sections.get("frontend")),
+        cpu_usage="\n".join(sections.get("uptime", [])),
+        memory_usage="\n".join(sections.get("memory_h", [])),
+        disk_usage="\n".join(sections.get("disk_h", [])),
+        last_check=datetime.now()
+    )
+
+
+def _first_line(sections: Dict[str, List[str]], name: str) -> str:
+    lines = sections.get(name)
+    if not lines:
+        raise ValueError(f"探测输出缺少{name}信息")
+    return lines[0]
+
+
+def build_metrics(sections: Dict[str, List[str]]) -> MachineMetrics:
+    """
+    根据探测输出构建监控指标
+
+    CPU、内存、磁盘信息缺失或格式错误时抛出ValueError，
+    网络和进程信息缺失时使用默认值。
+    """
+    cpu_cores = int(_first_line(sections, "cores"))
+    load_avg = [float(x) for x in _first_line(sections, "loadavg").split()[:3]]
+    cpu_usage = float(_first_line(sections, "cpu"))
+
+    mem_info = _first_line(sections, "memory").split()
+    if len(mem_info) < 4:
+        raise ValueError(f"内存信息格式不正确: {' '.join(mem_info)}")
+    mem_total, mem_used, mem_free = int(mem_info[1]), int(mem_info[2]), int(mem_info[3])
+
+    disk_info = _first_line(sections, "disk").split()
+    if len(disk_info) < 4:
+        raise ValueError(f"磁盘信息格式不正确: {' '.join(disk_info)}")
+    disk_total, disk_used, disk_free = int(disk_info[1]), int(disk_info[2]), int(disk_info[3])
+
+    net_lines = sections.get("network", [])
+    net_info = net_lines[0].split() if net_lines else []
+    if len(net_info) >= 4:
+        rx_bytes, tx_bytes, rx_packets, tx_packets = (int(x) for x in net_info[:4])
+    else:
+        logger.warning(f"网络信息格式不正确: {net_lines}，使用默认值")
+        rx_bytes = tx_bytes = rx_packets = tx_packets = 0
+
+    # 进程状态码首字母: R运行中, S可中断睡眠
+    proc_states = sections.get("processes", [])
+
+    return MachineMetrics(
+        timestamp=datetime.now(),
+        cpu={
+            "cores": cpu_cores,
+            "usage_percent": cpu_usage,
+            "load_avg": load_avg
+        },
+        memory={
+            "total": mem_total,
+            "used": mem_used,
+            "free": mem_free,
+            "usage_percent": (mem_used / mem_total) * 100 if mem_total > 0 else 0
+        },
+        disk={
+            "total": disk_total,
+            "used": disk_used,
+            "free": disk_free,
+            "usage_percent": (disk_used / disk_total) * 100 if disk_total > 0 else 0
+        },
+        network={
+            "rx_bytes": rx_bytes,
+            "tx_bytes": tx_bytes,
+            "rx_packets": rx_packets,
+            "tx_packets": tx_packets
+        },
+        processes={
+            "total": len(proc_states),
+            "running": sum(1 for s in proc_states if s.startswith("R")),
+            "sleeping": sum(1 for s in proc_states if s.startswith("S"))
+        }
+    )
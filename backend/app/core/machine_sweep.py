@@ -0,0 +1,161 @@
+"""
+机器状态批量检查模块
+
+并发探测全部（或指定）机器的状态：
+- 全局并发上限，避免同时打开过多SSH连接
+- 单机超时，慢机器不拖累整体
+- 每台机器完成后立即回调，不必等待最慢的一台
+- 全部完成后用一次批量UPDATE和一次批量INSERT写入数据库
+
+后台定时检查由monitor_scheduler负责。
+"""
+
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.machines import MachineManager
+from app.db.database import async_session_factory
+from app.models.machine import Machine
+from app.schemas.machine import MachineStatus, MachineCheckResult
+
+logger = logging.getLogger(__name__)
+
+
+async def check_machine(machine: Machine, timeout: float) -> MachineCheckResult:
+    """探测单台机器，超时视为离线"""
+    started = time.monotonic()
+    try:
+        success, status, error = await asyncio.wait_for(
+            MachineManager.probe_status(machine), timeout
+        )
+    except asyncio.TimeoutError:
+        success = False
+        status = MachineStatus(is_online=False, last_check=datetime.now())
+        error = f"状态检查超时（{timeout}秒）"
+    except Exception as e:
+        success = False
+        status = MachineStatus(is_online=False, last_check=datetime.now())
+        error = f"状态检查出错: {str(e)}"
+
+    if not success:
+        status = MachineManager.with_circuit_state(machine, status)
+
+    return MachineCheckResult(
+        machine_id=machine.id,
+        name=machine.name,
+        success=success,
+        error=error,
+        elapsed_ms=int((time.monotonic() - started) * 1000),
+        status=status
+    )
+
+
+async def sweep_machines(
+    machines: List[Machine],
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> AsyncIterator[MachineCheckResult]:
+    """
+    并发探测多台机器，按完成顺序逐个产出结果
+
+    Args:
+        machines: 要探测的机器
+        concurrency: 同时探测的机器数上限
+        timeout: 单台机器的探测超时（秒），排队等待的时间不计入
+    """
+    concurrency = concurrency or settings.MACHINE_CHECK_CONCURRENCY
+    timeout = timeout or settings.MACHINE_CHECK_TIMEOUT
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(machine: Machine) -> MachineCheckResult:
+        async with semaphore:
+            return await check_machine(machine, timeout)
+
+    tasks = [asyncio.create_task(limited(machine)) for machine in machines]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def run_sweep(
+    machine_ids: Optional[List[int]] = None,
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    on_result: Optional[Callable[[MachineCheckResult], None]] = None
+) -> List[MachineCheckResult]:
+    """
+    检查机器状态并保存结果
+
+    Args:
+        machine_ids: 要检查的机器ID，为空时检查全部机器
+        concurrency: 同时探测的机器数上限
+        timeout: 单台机器的探测超时（秒）
+        on_result: 每台机器检查完成时的回调
+
+    Returns:
+        所有机器的检查结果
+    """
+    async with async_session_factory() as db:
+        query = select(Machine)
+        if machine_ids:
+            query = query.where(Machine.id.in_(machine_ids))
+        machines = {machine.id: machine for machine in (await db.execute(query)).scalars().all()}
+
+    started = time.monotonic()
+    results: List[MachineCheckResult] = []
+    async for result in sweep_machines(list(machines.values()), concurrency, timeout):
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    async with async_session_factory() as db:
+        await MachineManager.record_status_results(db, machines, results)
+
+    online = sum(1 for result in results if result.status.is_online)
+    logger.info(
+        f"批量状态检查完成: {len(results)} 台机器, {online} 台在线, "
+        f"耗时 {time.monotonic() - started:.2f}秒"
+    )
+    return results
+
+
+async def stream_sweep(
+    machine_ids: Optional[List[int]] = None,
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> AsyncIterator[MachineCheckResult]:
+    """
+    运行批量检查并按完成顺序产出结果
+
+    检查在独立任务中运行，即使调用方中途停止读取（例如客户端断开），
+    检查仍会完成并保存结果。
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    task = asyncio.create_task(run_sweep(machine_ids, concurrency, timeout, on_result=queue.put_nowait))
+    _running_sweeps.add(task)
+    task.add_done_callback(_running_sweeps.discard)
+    task.add_done_callback(lambda _: queue.put_nowait(done))
+
+    while True:
+        item = await queue.get()
+        if item is done:
+            break
+        yield item
+
+    # 传播检查任务中的异常
+    task.result()
+
+
+# 正在运行的批量检查任务，保持引用避免被垃圾回收
+_running_sweeps = set()
@@ -8,21 +8,44 @@ import tempfile
 import psutil
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Union
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete
+from sqlalchemy import update, delete, insert
 
 # 修改导入路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
+from app.core.config import settings
 from app.models.machine import Machine
 from app.models.machine_log import MachineLog
-from app.schemas.machine import MachineCreate, MachineUpdate, MachineStatus, MachineMetrics
+from app.models.machine_metric import MachineMetricSample
+from app.schemas.machine import MachineCreate, MachineUpdate, MachineStatus, MachineMetrics, MachineCheckResult
+from app.utils.ssh_pool import ssh_pool, PooledSSHClient, DedicatedSSHClient, DedicatedLimitError
+from app.utils.ssh_executor import run_ssh_blocking
+from app.utils.circuit_breaker import circuit_breakers, CircuitOpenError, CircuitState
+from app.utils.singleflight import SingleFlight
+from app.db.database import async_session_factory
+from app.core.machine_probe import PROBE_COMMAND, parse_probe_output, build_status, build_metrics
+from app.core.metrics_store import metrics_store
 
 logger = logging.getLogger(__name__)
 
+# 修改后需要重建SSH连接的字段
+CONNECTION_FIELDS = ("host", "port", "username", "password", "key_file")
+
+# 状态检查和监控指标探测的请求合并
+probe_flight = SingleFlight()
+
+# 远程日志目录和各类日志的文件名模式
+REMOTE_LOG_DIR = "~/project_center/logs"
+REMOTE_LOG_PATTERNS = {
+    "backend": "backend_*.log",
+    "frontend": "frontend_*.log",
+}
+DEFAULT_LOG_PATTERN = "*.log"
+
 class MachineManager:
     """机器管理服务"""
     
@@ -54,7 +77,8 @@ class MachineManager:
             username=machine.username,
             password=machine.password,  # 保存密码到数据库
             key_file=machine.key_file,
-            description=machine.description
+            description=machine.description,
+            sftp_parallelism=machine.sftp_parallelism
         )
         db.add(db_machine)
         await db.commit()
@@ -97,6 +121,11 @@ class MachineManager:
             await db.commit()
             await db.refresh(db_machine)
             
+            # 连接信息变化后，旧的池化连接和缓存的探测结果不再可用
+            if any(field in update_data for field in CONNECTION_FIELDS):
+                ssh_pool.invalidate(machine_id)
+                MachineManager.forget_probes(machine_id)
+            
             # 记录日志
             log = MachineLog(
                 machine_id=db_machine.id,
@@ -119,19 +148,28 @@ class MachineManager:
         
         machine_name = db_machine.name
         
-        # 删除机器
+        # 删除机器及其监控指标历史
+        await db.execute(delete(MachineMetricSample).where(MachineMetricSample.machine_id == machine_id))
         await db.execute(delete(Machine).where(Machine.id == machine_id))
         await db.commit()
+        ssh_pool.invalidate(machine_id)
+        MachineManager.forget_probes(machine_id)
+        metrics_store.forget(machine_id)
         
         # 记录日志
         return True
     
     @staticmethod
-    async def get_ssh_client(machine: Machine, password: Optional[str] = None) -> Tuple[Optional[paramiko.SSHClient], str]:
-        """获取SSH客户端连接"""
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    async def get_ssh_client(
+        machine: Machine,
+        password: Optional[str] = None,
+        dedicated: bool = False
+    ) -> Tuple[Optional[Union[PooledSSHClient, DedicatedSSHClient]], str]:
+        """从连接池获取SSH客户端连接
         
+        返回的连接调用close()时归还到连接池。
+        dedicated为True时建立不计入单机连接上限的独立连接，供长时间占用连接的调用方使用，close()时断开。
+        """
         # 详细日志记录
         logger.info(f"尝试连接到 {machine.host}:{machine.port} 用户名: {machine.username}")
         
@@ -145,23 +183,14 @@ class MachineManager:
         logger.info(f"密码状态: {'有密码' if has_password else '无密码'}, 密码长度: {len(str(actual_password)) if actual_password else 0}")
         
         error_msg = ""
-        
-        # 准备连接参数
-        connect_kwargs = {
-            "hostname": machine.host,
-            "port": machine.port,
-            "username": machine.username,
-            "timeout": 15,  # 增加超时时间
-        }
+        key_file = None
         
         # 添加认证参数
         if actual_password:
-            # 显式转换密码为字符串类型
-            connect_kwargs["password"] = str(actual_password)
             logger.info(f"使用密码认证，密码长度: {len(str(actual_password))}")
         elif machine.key_file:
             if os.path.exists(machine.key_file):
-                connect_kwargs["key_filename"] = machine.key_file
+                key_file = machine.key_file
                 logger.info(f"使用密钥文件: {machine.key_file}")
             else:
                 error_msg = f"密钥文件不存在: {machine.key_file}"
@@ -171,12 +200,27 @@ class MachineManager:
             # 如果既没有密码也没有密钥，尝试使用默认密钥
             logger.warning("未提供密码且无密钥文件，尝试使用默认密钥认证")
         
-        # 尝试连接
+        # 从连接池借用连接
+        connect = ssh_pool.open_dedicated if dedicated else ssh_pool.acquire
         try:
-            logger.info(f"开始SSH连接... 连接参数: {connect_kwargs['hostname']}:{connect_kwargs['port']} 用户名: {connect_kwargs['username']}")
-            client.connect(**connect_kwargs)
+            client = await connect(
+                host=machine.host,
+                port=machine.port,
+                username=machine.username,
+                password=str(actual_password) if actual_password else None,
+                key_file=key_file,
+                machine_id=machine.id,
+                timeout=15,  # 增加超时时间
+            )
             logger.info("SSH连接成功")
             return client, ""
+        except CircuitOpenError as e:
+            # 熔断期间立即返回缓存的离线信息
+            logger.info(f"SSH连接已熔断: {str(e)}")
+            return None, str(e)
+        except DedicatedLimitError as e:
+            logger.warning(f"机器 {machine.name} {str(e)}")
+            return None, str(e)
         except paramiko.AuthenticationException as e:
             error_msg = f"SSH认证失败: {str(e)}"
             logger.error(error_msg)
@@ -191,19 +235,126 @@ class MachineManager:
             return None, error_msg
     
     @staticmethod
-    async def execute_command(
-        client: paramiko.SSHClient, 
-        command: str
+    def _execute_command_blocking(
+        client: PooledSSHClient, 
+        command: str,
+        timeout: Optional[float] = None
     ) -> Tuple[str, str, int]:
-        """执行远程命令"""
-        stdin, stdout, stderr = client.exec_command(command)
-        exit_code = stdout.channel.recv_exit_status()
+        """执行远程命令（阻塞，在SSH线程池中运行）"""
+        stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
         
-        out = stdout.read().decode('utf-8').strip()
-        err = stderr.read().decode('utf-8').strip()
+        # 先读取输出再取退出码，避免输出较多时远端因通道窗口写满而挂起
+        out = stdout.read().decode('utf-8', errors='replace').strip()
+        err = stderr.read().decode('utf-8', errors='replace').strip()
+        exit_code = stdout.channel.recv_exit_status()
         
         return out, err, exit_code
     
+    @staticmethod
+    async def execute_command(
+        client: PooledSSHClient, 
+        command: str,
+        timeout: Optional[float] = None
+    ) -> Tuple[str, str, int]:
+        """执行远程命令，阻塞的SSH调用在有界线程池中执行，不阻塞事件循环"""
+        return await run_ssh_blocking(
+            MachineManager._execute_command_blocking, client, command, timeout
+        )
+    
+    @staticmethod
+    async def run_probe(client: PooledSSHClient) -> Dict[str, List[str]]:
+        """执行探测脚本，返回按段拆分的输出"""
+        out, err, _ = await MachineManager.execute_command(client, PROBE_COMMAND)
+        if not out and err:
+            raise ValueError(f"探测脚本执行失败: {err}")
+        return parse_probe_output(out)
+    
+    @staticmethod
+    async def probe_status(machine: Machine) -> Tuple[bool, MachineStatus, str]:
+        """探测机器状态，不读写数据库
+        
+        连接失败时返回is_online=False，连接成功但探测出错时返回is_online=True。
+        """
+        client, error = await MachineManager.get_ssh_client(machine)
+        if not client:
+            status = MachineStatus(is_online=False, last_check=datetime.now())
+            return False, MachineManager.with_circuit_state(machine, status), error
+        
+        try:
+            # 一次往返取回全部状态信息
+            sections = await MachineManager.run_probe(client)
+            success, status, error = True, build_status(sections), ""
+        except asyncio.CancelledError:
+            # 超时取消时远程命令可能仍在执行，该连接不再复用
+            client.discard()
+            raise
+        except Exception as e:
+            success, status, error = False, MachineStatus(is_online=True, last_check=datetime.now()), f"状态检查出错: {str(e)}"
+        finally:
+            client.close()
+        
+        return success, MachineManager.with_circuit_state(machine, status), error
+    
+    @staticmethod
+    def with_circuit_state(machine: Machine, status: MachineStatus) -> MachineStatus:
+        """在状态中附加该机器的连接熔断信息"""
+        snapshot = circuit_breakers.snapshot(ssh_pool.breaker_key(machine.host, machine.port, machine.id))
+        return status.model_copy(update=snapshot)
+    
+    @staticmethod
+    async def record_status_results(
+        db: AsyncSession,
+        machines: Dict[int, Machine],
+        results: List[MachineCheckResult]
+    ):
+        """保存状态检查结果
+        
+        所有机器的状态用一次批量UPDATE写入，检查日志用一次批量INSERT写入。
+        检查失败的机器只更新在线状态和检查时间，其余字段保持原值；
+        已离线且处于熔断中的机器不重复记录失败日志。
+        """
+        if not results:
+            return
+        
+        rows = []
+        logs = []
+        for result in results:
+            machine = machines[result.machine_id]
+            status = result.status
+            probed = result.success
+            rows.append({
+                "id": result.machine_id,
+                "is_online": status.is_online,
+                "backend_running": status.backend_running if probed else machine.backend_running,
+                "frontend_running": status.frontend_running if probed else machine.frontend_running,
+                "cpu_usage": status.cpu_usage if probed else machine.cpu_usage,
+                "memory_usage": status.memory_usage if probed else machine.memory_usage,
+                "disk_usage": status.disk_usage if probed else machine.disk_usage,
+                "last_check": status.last_check or datetime.now(),
+            })
+            
+            # 熔断期间机器持续离线，只在状态变为离线时记录一次日志
+            if not probed and not machine.is_online and status.circuit_state == CircuitState.OPEN:
+                continue
+            
+            if probed:
+                content = f"状态检查成功: 在线={status.is_online}, 后端={status.backend_running}, 前端={status.frontend_running}"
+            elif status.is_online:
+                content = result.error
+            else:
+                content = f"状态检查失败: {result.error}"
+            logs.append({
+                "machine_id": result.machine_id,
+                "log_type": "status",
+                "content": content,
+                "status": "success" if probed else "failed",
+            })
+        
+        await db.execute(update(Machine), rows)
+        if logs:
+            await db.execute(insert(MachineLog), logs)
+        await db.commit()
+    
     @staticmethod
     async def check_machine_status(
         db: AsyncSession, 
@@ -219,134 +370,40 @@ class MachineManager:
         # 记录详细日志
         logger.info(f"开始检查机器状态: ID={machine_id}, 机器名={db_machine.name}")
         
-        # 获取SSH连接
-        client, error = await MachineManager.get_ssh_client(db_machine)
-        if not client:
-            logger.error(f"无法连接到机器 {db_machine.name}: {error}")
-            
-            # 更新机器状态为离线
-            await db.execute(
-                update(Machine)
-                .where(Machine.id == machine_id)
-                .values(
-                    is_online=False,
-                    last_check=datetime.now()
-                )
-            )
-            await db.commit()
-            
-            # 确保日志内容使用UTF-8编码
-            error_msg = f"状态检查失败: {error}"
-            try:
-                # 尝试编码然后解码，确保不会有编码问题
-                error_msg_bytes = error_msg.encode('utf-8')
-                error_msg = error_msg_bytes.decode('utf-8')
-            except Exception as e:
-                logger.error(f"日志编码处理错误: {str(e)}")
-                error_msg = "状态检查失败: SSH连接错误"
-            
-            # 记录日志
-            log = MachineLog(
-                machine_id=machine_id,
-                log_type="status",
-                content=error_msg,
-                status="failed"
-            )
-            db.add(log)
-            await db.commit()
-            
-            return False, MachineStatus(is_online=False), error
+        success, status, error = await MachineManager.probe_status(db_machine)
+        if not success:
+            logger.error(f"检查机器 {db_machine.name} 状态失败: {error}")
         
-        try:
-            status = MachineStatus(is_online=True)
-            
-            # 检查后端进程
-            out, _, _ = await MachineManager.execute_command(
-                client, 
-                "ps aux | grep 'uvicorn app.main:app' | grep -v grep"
-            )
-            status.backend_running = bool(out.strip())
-            
-            # 检查前端进程
-            out, _, _ = await MachineManager.execute_command(
-                client, 
-                "ps aux | grep 'pnpm dev' | grep -v grep"
-            )
-            status.frontend_running = bool(out.strip())
-            
-            # 检查CPU使用情况
-            out, _, _ = await MachineManager.execute_command(client, "uptime")
-            status.cpu_usage = out.strip()
-            
-            # 检查内存使用情况
-            out, _, _ = await MachineManager.execute_command(client, "free -h | head -2")
-            status.memory_usage = out.strip()
-            
-            # 检查磁盘使用情况
-            out, _, _ = await MachineManager.execute_command(
-                client, 
-                "df -h | grep -E '^/dev/' | head -1"
-            )
-            status.disk_usage = out.strip()
-            
-            status.last_check = datetime.now()
-            
-            # 更新机器状态
-            await db.execute(
-                update(Machine)
-                .where(Machine.id == machine_id)
-                .values(
-                    is_online=status.is_online,
-                    backend_running=status.backend_running,
-                    frontend_running=status.frontend_running,
-                    cpu_usage=status.cpu_usage,
-                    memory_usage=status.memory_usage,
-                    disk_usage=status.disk_usage,
-                    last_check=status.last_check
-                )
-            )
-            await db.commit()
-            
-            # 记录日志
-            log = MachineLog(
-                machine_id=machine_id,
-                log_type="status",
-                content=f"状态检查成功: 在线={status.is_online}, 后端={status.backend_running}, 前端={status.frontend_running}",
-                status="success"
-            )
-            db.add(log)
-            await db.commit()
-            
-            return True, status, ""
+        result = MachineCheckResult(
+            machine_id=machine_id,
+            name=db_machine.name,
+            success=success,
+            error=error,
+            status=status
+        )
+        await MachineManager.record_status_results(db, {machine_id: db_machine}, [result])
         
-        except Exception as e:
-            error = f"状态检查出错: {str(e)}"
-            
-            # 更新机器状态
-            await db.execute(
-                update(Machine)
-                .where(Machine.id == machine_id)
-                .values(
-                    is_online=True,  # 连接成功但检查出错
-                    last_check=datetime.now()
-                )
-            )
-            await db.commit()
-            
-            # 记录日志
-            log = MachineLog(
-                machine_id=machine_id,
-                log_type="status",
-                content=f"状态检查出错: {error}",
-                status="failed"
-            )
-            db.add(log)
-            await db.commit()
-            
-            return False, MachineStatus(is_online=True), error
+        return success, status, error
+    
+    @staticmethod
+    async def check_machine_status_shared(
+        machine_id: int,
+        use_cache: bool = True
+    ) -> Tuple[bool, MachineStatus, str]:
+        """检查机器状态，合并同一台机器的并发检查
         
-        finally:
-            client.close()
+        并发的检查只执行一次SSH探测，结果在MACHINE_STATUS_CACHE_TTL内复用。
+        探测在独立的数据库会话中执行，某个调用方断开不影响其他调用方。
+        """
+        async def run():
+            async with async_session_factory() as db:
+                return await MachineManager.check_machine_status(db, machine_id)
+        
+        result, _ = await probe_flight.do(
+            ("status", machine_id), run,
+            ttl=settings.MACHINE_STATUS_CACHE_TTL, use_cache=use_cache
+        )
+        return result
     
     @staticmethod
     async def deploy_project(
@@ -374,6 +431,7 @@ class MachineManager:
             
             return False, error
         
+        sftp = None
         try:
             # 创建项目目录
             out, err, exit_code = await MachineManager.execute_command(
@@ -396,7 +454,7 @@ class MachineManager:
                 return False, error
             
             # 使用SFTP上传启动脚本
-            sftp = client.open_sftp()
+            sftp = await run_ssh_blocking(client.open_sftp)
             
             # 创建临时目录存放脚本文件
             with tempfile.TemporaryDirectory() as temp_dir:
@@ -578,8 +636,8 @@ echo "所有服务已停止"
                 
                 # 上传脚本
                 try:
-                    sftp.put(str(start_script), "/home/ubuntu/project_center/start_all.sh")
-                    sftp.put(str(stop_script), "/home/ubuntu/project_center/stop_all.sh")
+                    await run_ssh_blocking(sftp.put, str(start_script), "/home/ubuntu/project_center/start_all.sh")
+                    await run_ssh_blocking(sftp.put, str(stop_script), "/home/ubuntu/project_center/stop_all.sh")
                     
                     # 设置执行权限
                     await MachineManager.execute_command(
@@ -656,6 +714,8 @@ echo "所有服务已停止"
             return False, error
         
         finally:
+            if sftp:
+                sftp.close()
             client.close()
     
     @staticmethod
@@ -843,17 +903,12 @@ echo "所有服务已停止"
         
         try:
             # 确定日志文件模式
-            if log_type == "backend":
-                log_pattern = "backend_*.log"
-            elif log_type == "frontend":
-                log_pattern = "frontend_*.log"
-            else:
-                log_pattern = "*.log"
+            log_pattern = REMOTE_LOG_PATTERNS.get(log_type, DEFAULT_LOG_PATTERN)
             
             # 获取最新的日志文件
             out, err, exit_code = await MachineManager.execute_command(
                 client, 
-                f"cd ~/project_center/logs && ls -t {log_pattern} | head -1"
+                f"cd {REMOTE_LOG_DIR} && ls -t {log_pattern} | head -1"
             )
             
             if not out or exit_code != 0:
@@ -864,7 +919,7 @@ echo "所有服务已停止"
             # 读取日志内容
             out, err, exit_code = await MachineManager.execute_command(
                 client, 
-                f"cd ~/project_center/logs && tail -n {lines} {log_file}"
+                f"cd {REMOTE_LOG_DIR} && tail -n {lines} {log_file}"
             )
             
             if exit_code != 0:
@@ -878,6 +933,31 @@ echo "所有服务已停止"
         finally:
             client.close()
     
+    @staticmethod
+    async def get_machine_metrics_shared(
+        machine_id: int,
+        use_cache: bool = True
+    ) -> Tuple[bool, MachineMetrics, str]:
+        """获取机器监控指标，合并同一台机器的并发请求
+        
+        并发的请求只执行一次SSH探测，结果在MACHINE_METRICS_CACHE_TTL内复用。
+        """
+        async def run():
+            async with async_session_factory() as db:
+                return await MachineManager.get_machine_metrics(db, machine_id)
+        
+        result, _ = await probe_flight.do(
+            ("metrics", machine_id), run,
+            ttl=settings.MACHINE_METRICS_CACHE_TTL, use_cache=use_cache
+        )
+        return result
+    
+    @staticmethod
+    def forget_probes(machine_id: int):
+        """丢弃某台机器缓存的状态和监控指标"""
+        probe_flight.forget(("status", machine_id))
+        probe_flight.forget(("metrics", machine_id))
+    
     @staticmethod
     async def get_machine_metrics(
         db: AsyncSession, 
@@ -901,141 +981,10 @@ echo "所有服务已停止"
                 return False, None, f"连接到机器失败: {error}"
             
             try:
-                # 执行命令获取CPU信息
-                logger.debug("获取CPU信息...")
-                cpu_cmd = "cat /proc/cpuinfo | grep processor | wc -l && cat /proc/loadavg && top -bn1 | grep 'Cpu(s)' | awk '{print $2+$4}'"
-                cpu_output, cpu_error, cpu_code = await MachineManager.execute_command(ssh_client, cpu_cmd)
-                
-                if cpu_code != 0:
-                    logger.error(f"获取CPU信息失败: {cpu_error}")
-                    return False, None, f"获取CPU信息失败: {cpu_error}"
-                
-                logger.debug(f"CPU命令输出: {cpu_output}")
-                cpu_lines = cpu_output.strip().split('\n')
-                if len(cpu_lines) < 3:
-                    logger.error(f"CPU信息格式不正确: {cpu_output}")
-                    return False, None, f"CPU信息格式不正确: {cpu_output}"
-                    
-                cpu_cores = int(cpu_lines[0])
-                load_avg = [float(x) for x in cpu_lines[1].split()[:3]]
-                cpu_usage = float(cpu_lines[2])
-                
-                # 获取内存信息
-                logger.debug("获取内存信息...")
-                mem_cmd = "free -b | grep Mem"
-                mem_output, mem_error, mem_code = await MachineManager.execute_command(ssh_client, mem_cmd)
-                
-                if mem_code != 0:
-                    logger.error(f"获取内存信息失败: {mem_error}")
-                    return False, None, f"获取内存信息失败: {mem_error}"
-                
-                logger.debug(f"内存命令输出: {mem_output}")
-                mem_info = mem_output.strip().split()
-                if len(mem_info) < 4:
-                    logger.error(f"内存信息格式不正确: {mem_output}")
-                    return False, None, f"内存信息格式不正确: {mem_output}"
-                    
-                mem_total = int(mem_info[1])
-                mem_used = int(mem_info[2])
-                mem_free = int(mem_info[3])
-                mem_usage_percent = (mem_used / mem_total) * 100 if mem_total > 0 else 0
-                
-                # 获取磁盘信息
-                logger.debug("获取磁盘信息...")
-                disk_cmd = "df -B1 / | tail -1"
-                disk_output, disk_error, disk_code = await MachineManager.execute_command(ssh_client, disk_cmd)
-                
-                if disk_code != 0:
-                    logger.error(f"获取磁盘信息失败: {disk_error}")
-                    return False, None, f"获取磁盘信息失败: {disk_error}"
-                
-                logger.debug(f"磁盘命令输出: {disk_output}")
-                disk_info = disk_output.strip().split()
-                if len(disk_info) < 4:
-                    logger.error(f"磁盘信息格式不正确: {disk_output}")
-                    return False, None, f"磁盘信息格式不正确: {disk_output}"
-                    
-                disk_total = int(disk_info[1])
-                disk_used = int(disk_info[2])
-                disk_free = int(disk_info[3])
-                disk_usage_percent = (disk_used / disk_total) * 100 if disk_total > 0 else 0
-                
-                # 获取网络信息
-                logger.debug("获取网络信息...")
-                net_cmd = "cat /proc/net/dev | grep -E 'eth0|ens|enp' | awk '{print $2,$10,$3,$11}'"
-                net_output, net_error, net_code = await MachineManager.execute_command(ssh_client, net_cmd)
-                
-                if net_code != 0:
-                    logger.error(f"获取网络信息失败: {net_error}")
-                    # 网络信息获取失败不影响整体结果，使用默认值
-                    rx_bytes = tx_bytes = rx_packets = tx_packets = 0
-                else:
-                    logger.debug(f"网络命令输出: {net_output}")
-                    net_info = net_output.strip().split()
-                    if len(net_info) >= 4:
-                        rx_bytes = int(net_info[0])
-                        tx_bytes = int(net_info[1])
-                        rx_packets = int(net_info[2])
-                        tx_packets = int(net_info[3])
-                    else:
-                        logger.warning(f"网络信息格式不正确: {net_output}，使用默认值")
-                        rx_bytes = tx_bytes = rx_packets = tx_packets = 0
-                
-                # 获取进程信息
-                logger.debug("获取进程信息...")
-                proc_cmd = "ps -e | wc -l && ps -e | grep -c 'R' || echo 0 && ps -e | grep -c 'S' || echo 0"
-                proc_output, proc_error, proc_code = await MachineManager.execute_command(ssh_client, proc_cmd)
-                
-                if proc_code != 0:
-                    logger.error(f"获取进程信息失败: {proc_error}")
-                    return False, None, f"获取进程信息失败: {proc_error}"
-                
-                logger.debug(f"进程命令输出: {proc_output}")
-                proc_lines = proc_output.strip().split('\n')
-                if len(proc_lines) < 3:
-                    logger.error(f"进程信息格式不正确: {proc_output}")
-                    # 进程信息获取失败不影响整体结果，使用默认值
-                    total_procs = running_procs = sleeping_procs = 0
-                else:
-                    total_procs = int(proc_lines[0])
-                    running_procs = int(proc_lines[1])
-                    sleeping_procs = int(proc_lines[2])
-                
-                # 关闭SSH连接
-                ssh_client.close()
-                
-                # 构建监控指标
-                metrics = MachineMetrics(
-                    timestamp=datetime.now(),
-                    cpu={
-                        "cores": cpu_cores,
-                        "usage_percent": cpu_usage,
-                        "load_avg": load_avg
-                    },
-                    memory={
-                        "total": mem_total,
-                        "used": mem_used,
-                        "free": mem_free,
-                        "usage_percent": mem_usage_percent
-                    },
-                    disk={
-                        "total": disk_total,
-                        "used": disk_used,
-                        "free": disk_free,
-                        "usage_percent": disk_usage_percent
-                    },
-                    network={
-                        "rx_bytes": rx_bytes,
-                        "tx_bytes": tx_bytes,
-                        "rx_packets": rx_packets,
-                        "tx_packets": tx_packets
-                    },
-                    processes={
-                        "total": total_procs,
-                        "running": running_procs,
-                        "sleeping": sleeping_procs
-                    }
-                )
+                # 一次往返取回CPU、内存、磁盘、网络和进程信息
+                sections = await MachineManager.run_probe(ssh_client)
+                metrics = build_metrics(sections)
+                metrics_store.record(machine_id, metrics)
                 
                 return True, metrics, ""
                 
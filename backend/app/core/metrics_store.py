@@ -0,0 +1,342 @@
+"""
+机器监控指标时序存储模块
+
+每次获取到监控指标时追加一条数值采样：
+- 内存中按机器、精度保存列式环形缓冲区（array('d')，每个指标一列）
+- 原始采样自动降采样为1分钟、1小时两个精度，数值指标取平均，累计计数取最后值
+- 新采样定期批量写入SQLite，超出保留期的数据自动清理
+- 历史查询优先读取内存，内存未覆盖的时间段从数据库补齐，不需要连接机器
+"""
+
+import math
+import time
+import asyncio
+import logging
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.database import async_session_factory
+from app.models.machine_metric import MachineMetricSample
+from app.schemas.machine import MachineMetrics
+
+logger = logging.getLogger(__name__)
+
+# 存储的指标，顺序即环形缓冲区的列顺序
+FIELDS = ("cpu_percent", "load1", "mem_percent", "disk_percent", "rx_bytes", "tx_bytes", "processes")
+# 累计计数类指标，降采样时取最后值而不是平均值
+COUNTER_FIELDS = frozenset(("rx_bytes", "tx_bytes"))
+
+TIER_RAW = "raw"
+TIER_MINUTE = "1m"
+TIER_HOUR = "1h"
+
+# 精度: (时间桶秒数, 内存环形缓冲区容量, 数据库保留秒数)
+TIERS = {
+    TIER_RAW: (0, 720, 2 * 86400),
+    TIER_MINUTE: (60, 1440, 14 * 86400),
+    TIER_HOUR: (3600, 720, 365 * 86400),
+}
+
+# 未指定步长时，一次查询最多返回的点数
+MAX_POINTS = 500
+
+Point = Tuple[float, Tuple[float, ...]]
+
+
+def metrics_to_values(metrics: MachineMetrics) -> Tuple[float, ...]:
+    """把MachineMetrics转换为按FIELDS排列的数值"""
+    return (
+        float(metrics.cpu.get("usage_percent", 0)),
+        float((metrics.cpu.get("load_avg") or [0])[0]),
+        float(metrics.memory.get("usage_percent", 0)),
+        float(metrics.disk.get("usage_percent", 0)),
+        float(metrics.network.get("rx_bytes", 0)),
+        float(metrics.network.get("tx_bytes", 0)),
+        float(metrics.processes.get("total", 0)),
+    )
+
+
+def aggregate(points: Sequence[Point]) -> Tuple[float, ...]:
+    """合并多个采样：数值指标取平均，累计计数取最后值"""
+    values = []
+    for index, field in enumerate(FIELDS):
+        if field in COUNTER_FIELDS:
+            values.append(points[-1][1][index])
+        else:
+            values.append(sum(point[1][index] for point in points) / len(points))
+    return tuple(values)
+
+
+class RingBuffer:
+    """定长列式环形缓冲区，采样按时间顺序追加"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.columns = [array("d", bytes(8 * capacity)) for _ in FIELDS]
+        self.start = 0
+        self.size = 0
+
+    def append(self, timestamp: float, values: Sequence[float]):
+        """追加采样，缓冲区满时覆盖最旧的采样"""
+        if self.size == self.capacity:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        else:
+            index = (self.start + self.size) % self.capacity
+            self.size += 1
+        self.timestamps[index] = timestamp
+        for column, value in zip(self.columns, values):
+            column[index] = value
+
+    def _timestamp_at(self, position: int) -> float:
+        return self.timestamps[(self.start + position) % self.capacity]
+
+    def _bisect(self, timestamp: float) -> int:
+        """第一个时间戳不小于timestamp的逻辑位置"""
+        low, high = 0, self.size
+        while low < high:
+            mid = (low + high) // 2
+            if self._timestamp_at(mid) < timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def oldest(self) -> Optional[float]:
+        """最早的采样时间"""
+        return self._timestamp_at(0) if self.size else None
+
+    def latest(self) -> Optional[float]:
+        """最新的采样时间"""
+        return self._timestamp_at(self.size - 1) if self.size else None
+
+    def range(self, start: float, end: float) -> List[Point]:
+        """取出时间范围[start, end]内的采样"""
+        points = []
+        for position in range(self._bisect(start), self.size):
+            index = (self.start + position) % self.capacity
+            timestamp = self.timestamps[index]
+            if timestamp > end:
+                break
+            points.append((timestamp, tuple(column[index] for column in self.columns)))
+        return points
+
+
+class _Bucket:
+    """正在累积的降采样时间桶"""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.points: List[Point] = []
+
+
+class MetricsStore:
+    """机器监控指标时序存储"""
+
+    def __init__(self):
+        self._rings: Dict[Tuple[int, str], RingBuffer] = {}
+        self._buckets: Dict[Tuple[int, str], _Bucket] = {}
+        self._pending: List[dict] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _ring(self, machine_id: int, tier: str) -> RingBuffer:
+        key = (machine_id, tier)
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = RingBuffer(TIERS[tier][1])
+            self._rings[key] = ring
+        return ring
+
+    def _append(self, machine_id: int, tier: str, timestamp: float, values: Sequence[float], persist: bool = True):
+        ring = self._ring(machine_id, tier)
+        latest = ring.latest()
+        if latest is not None and timestamp <= latest:
+            # 环形缓冲区按时间有序，乱序采样直接丢弃
+            return
+        ring.append(timestamp, values)
+        if persist:
+            row = {"machine_id": machine_id, "tier": tier, "timestamp": timestamp}
+            row.update(zip(FIELDS, values))
+            self._pending.append(row)
+
+    def record(self, machine_id: int, metrics: MachineMetrics):
+        """记录一次监控指标采样，并滚动更新降采样精度"""
+        timestamp = metrics.timestamp.timestamp()
+        values = metrics_to_values(metrics)
+        self._append(machine_id, TIER_RAW, timestamp, values)
+
+        for tier in (TIER_MINUTE, TIER_HOUR):
+            width = TIERS[tier][0]
+            bucket_start = timestamp - timestamp % width
+            key = (machine_id, tier)
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket.start != bucket_start:
+                # 进入新的时间桶，上一个时间桶定稿
+                self._append(machine_id, tier, bucket.start, aggregate(bucket.points))
+                bucket = None
+            if bucket is None:
+                bucket = _Bucket(bucket_start)
+                self._buckets[key] = bucket
+            bucket.points.append((timestamp, values))
+
+    def forget(self, machine_id: int):
+        """丢弃某台机器在内存中的数据（例如机器被删除后）"""
+        for tier in TIERS:
+            self._rings.pop((machine_id, tier), None)
+            self._buckets.pop((machine_id, tier), None)
+        self._pending = [row for row in self._pending if row["machine_id"] != machine_id]
+
+    @staticmethod
+    def pick_tier(step: float) -> str:
+        """按查询步长选择精度"""
+        if step >= TIERS[TIER_HOUR][0]:
+            return TIER_HOUR
+        if step >= TIERS[TIER_MINUTE][0]:
+            return TIER_MINUTE
+        return TIER_RAW
+
+    async def _load_range(self, machine_id: int, tier: str, start: float, end: float) -> List[Point]:
+        """从数据库读取时间范围[start, end)内的采样"""
+        async with async_session_factory() as db:
+            result = await db.execute(
+                select(MachineMetricSample)
+                .where(
+                    MachineMetricSample.machine_id == machine_id,
+                    MachineMetricSample.tier == tier,
+                    MachineMetricSample.timestamp >= start,
+                    MachineMetricSample.timestamp < end
+                )
+                .order_by(MachineMetricSample.timestamp)
+            )
+            return [
+                (row.timestamp, tuple(getattr(row, field) or 0.0 for field in FIELDS))
+                for row in result.scalars().all()
+            ]
+
+    async def query(
+        self,
+        machine_id: int,
+        start: float,
+        end: float,
+        step: Optional[float] = None
+    ) -> Tuple[str, float, List[Point]]:
+        """
+        查询历史监控指标
+
+        Args:
+            machine_id: 机器ID
+            start: 开始时间（Unix时间戳）
+            end: 结束时间（Unix时间戳）
+            step: 步长（秒），为空时按最多MAX_POINTS个点自动计算，0表示原始采样
+
+        Returns:
+            (使用的精度, 步长, 按时间排序的采样点)
+        """
+        if step is None:
+            step = max((end - start) / MAX_POINTS, 0)
+        tier = self.pick_tier(step)
+
+        ring = self._rings.get((machine_id, tier))
+        points = ring.range(start, end) if ring else []
+
+        # 内存中未覆盖的较早时间段从数据库补齐
+        oldest = ring.oldest() if ring else None
+        if oldest is None or oldest > start:
+            upper = oldest if oldest is not None else math.nextafter(end, math.inf)
+            points = await self._load_range(machine_id, tier, start, upper) + points
+
+        # 尚未定稿的当前时间桶
+        bucket = self._buckets.get((machine_id, tier))
+        if bucket is not None and bucket.points and start <= bucket.start <= end:
+            points.append((bucket.start, aggregate(bucket.points)))
+
+        if step > 0:
+            points = self._resample(points, start, step)
+        return tier, step, points
+
+    @staticmethod
+    def _resample(points: List[Point], start: float, step: float) -> List[Point]:
+        """按步长重新分桶，每个桶的时间为桶起点"""
+        resampled: List[Point] = []
+        current: List[Point] = []
+        current_start = None
+        for point in points:
+            bucket_start = start + math.floor((point[0] - start) / step) * step
+            if current and bucket_start != current_start:
+                resampled.append((current_start, aggregate(current)))
+                current = []
+            current_start = bucket_start
+            current.append(point)
+        if current:
+            resampled.append((current_start, aggregate(current)))
+        return resampled
+
+    async def load(self):
+        """启动时从数据库加载各精度最近的数据到内存"""
+        now = time.time()
+        loaded = 0
+        async with async_session_factory() as db:
+            for tier, (width, capacity, _) in TIERS.items():
+                span = capacity * (width or settings.METRICS_SAMPLE_INTERVAL or 60)
+                result = await db.execute(
+                    select(MachineMetricSample)
+                    .where(MachineMetricSample.tier == tier, MachineMetricSample.timestamp >= now - span)
+                    .order_by(MachineMetricSample.timestamp)
+                )
+                for row in result.scalars().all():
+                    values = tuple(getattr(row, field) or 0.0 for field in FIELDS)
+                    self._append(row.machine_id, tier, row.timestamp, values, persist=False)
+                    loaded += 1
+        logger.info(f"已加载监控指标历史 {loaded} 条")
+
+    async def flush(self):
+        """把新采样批量写入数据库，并清理超出保留期的数据"""
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        now = time.time()
+        try:
+            async with async_session_factory() as db:
+                await db.execute(insert(MachineMetricSample), rows)
+                for tier, (_, _, retention) in TIERS.items():
+                    await db.execute(
+                        delete(MachineMetricSample).where(
+                            MachineMetricSample.tier == tier,
+                            MachineMetricSample.timestamp < now - retention
+                        )
+                    )
+                await db.commit()
+        except Exception as e:
+            # 写入失败时放回队列，下次重试
+            self._pending = rows + self._pending
+            logger.error(f"写入监控指标失败: {str(e)}")
+
+    async def _flush_forever(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    def start(self):
+        """启动后台写入任务"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_forever(settings.METRICS_FLUSH_INTERVAL))
+
+    async def shutdown(self):
+        """停止后台写入任务，写入剩余采样"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+
+# 进程级时序存储实例
+metrics_store = MetricsStore()
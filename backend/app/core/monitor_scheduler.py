@@ -0,0 +1,294 @@
+"""
+机器监控调度模块
+
+进程内的asyncio调度器，按机器定时执行状态检查和监控指标采集：
+- 每类任务有独立的间隔，调度时间加入随机抖动，避免所有机器同时探测
+- 全局并发预算和单机并发上限
+- 同一台机器上一次同类任务仍在执行时跳过本次调度
+- 状态检查结果攒批后用一次批量UPDATE写入数据库
+- 统计排队深度和调度延迟，便于为大量机器调整参数
+- 关闭时停止调度并等待正在执行的任务完成
+"""
+
+import time
+import heapq
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.machines import MachineManager
+from app.core.machine_sweep import check_machine
+from app.db.database import async_session_factory
+from app.models.machine import Machine
+from app.schemas.machine import MachineCheckResult
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUS = "status"
+JOB_METRICS = "metrics"
+
+# 用于计算平均/最大调度延迟的最近样本数
+LAG_WINDOW = 200
+# 状态检查结果的批量写入间隔（秒）
+FLUSH_INTERVAL = 1.0
+
+
+class _Job:
+    """一台机器的一类周期任务"""
+
+    def __init__(self, machine_id: int, kind: str, interval: float):
+        self.machine_id = machine_id
+        self.kind = kind
+        self.interval = interval
+        self.next_run = 0.0
+        self.running = False
+        self.removed = False
+
+
+class MonitorScheduler:
+    """机器监控调度器"""
+
+    def __init__(
+        self,
+        status_interval: Optional[float] = None,
+        metrics_interval: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        max_per_host: Optional[int] = None,
+        jitter: Optional[float] = None,
+        refresh_interval: Optional[float] = None
+    ):
+        self.intervals = {
+            JOB_STATUS: status_interval if status_interval is not None else settings.MACHINE_SWEEP_INTERVAL,
+            JOB_METRICS: metrics_interval if metrics_interval is not None else settings.METRICS_SAMPLE_INTERVAL,
+        }
+        self.max_concurrency = max_concurrency or settings.MONITOR_MAX_CONCURRENCY
+        self.max_per_host = max_per_host or settings.MONITOR_MAX_PER_HOST
+        # 抖动比例限制在[0, 0.5]，保证下次调度时间总在当前时间之后
+        self.jitter = min(max(jitter if jitter is not None else settings.MONITOR_JITTER, 0.0), 0.5)
+        self.refresh_interval = refresh_interval or settings.MONITOR_REFRESH_INTERVAL
+
+        self._runners: Dict[str, Callable[[int], Awaitable[bool]]] = {
+            JOB_STATUS: self._run_status,
+            JOB_METRICS: self._run_metrics,
+        }
+        self._jobs: Dict[Tuple[int, str], _Job] = {}
+        self._heap: List[Tuple[float, int, _Job]] = []
+        self._seq = 0
+        self._budget: Optional[asyncio.Semaphore] = None
+        self._host_limits: Dict[int, asyncio.Semaphore] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._status_results: List[MachineCheckResult] = []
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._wakeup: Optional[asyncio.Event] = None
+
+        # 统计
+        self._waiting = 0
+        self._lags = deque(maxlen=LAG_WINDOW)
+        self._counters = {"runs": 0, "skipped": 0, "failures": 0}
+
+    @property
+    def enabled_kinds(self) -> List[str]:
+        return [kind for kind, interval in self.intervals.items() if interval > 0]
+
+    def _schedule(self, job: _Job, at: float):
+        job.next_run = at
+        self._seq += 1
+        heapq.heappush(self._heap, (at, self._seq, job))
+
+    def _next_time(self, job: _Job, now: float) -> float:
+        """下次调度时间：间隔加上±jitter比例的随机抖动，积压时不补跑"""
+        spread = job.interval * self.jitter
+        next_run = job.next_run + job.interval + random.uniform(-spread, spread)
+        return max(next_run, now + job.interval * (1 - self.jitter))
+
+    async def refresh(self):
+        """同步机器列表：新机器加入调度，已删除的机器移出调度"""
+        async with async_session_factory() as db:
+            machine_ids = set((await db.execute(select(Machine.id))).scalars().all())
+        self.sync_jobs(machine_ids)
+
+    def sync_jobs(self, machine_ids: Set[int]):
+        """按机器ID集合增删周期任务"""
+        now = time.monotonic()
+        for kind in self.enabled_kinds:
+            interval = self.intervals[kind]
+            for machine_id in machine_ids:
+                if (machine_id, kind) not in self._jobs:
+                    job = _Job(machine_id, kind, interval)
+                    self._jobs[(machine_id, kind)] = job
+                    # 首次执行时间在一个间隔内均匀分布
+                    self._schedule(job, now + random.uniform(0, interval))
+
+        for key, job in list(self._jobs.items()):
+            if job.machine_id not in machine_ids:
+                job.removed = True
+                del self._jobs[key]
+                self._host_limits.pop(job.machine_id, None)
+
+    def _dispatch_due(self, now: float):
+        """派发到期的任务"""
+        while self._heap and self._heap[0][0] <= now:
+            scheduled, _, job = heapq.heappop(self._heap)
+            if job.removed:
+                continue
+            if job.running:
+                # 上一次仍在执行，跳过本次
+                self._counters["skipped"] += 1
+            else:
+                job.running = True
+                task = asyncio.create_task(self._execute(job, scheduled))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            self._schedule(job, self._next_time(job, now))
+
+    def _host_limit(self, machine_id: int) -> asyncio.Semaphore:
+        limit = self._host_limits.get(machine_id)
+        if limit is None:
+            limit = asyncio.Semaphore(self.max_per_host)
+            self._host_limits[machine_id] = limit
+        return limit
+
+    async def _execute(self, job: _Job, scheduled: float):
+        self._waiting += 1
+        waiting = True
+        try:
+            async with self._budget, self._host_limit(job.machine_id):
+                self._waiting -= 1
+                waiting = False
+                self._lags.append(time.monotonic() - scheduled)
+                self._counters["runs"] += 1
+                if not await self._runners[job.kind](job.machine_id):
+                    self._counters["failures"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._counters["failures"] += 1
+            logger.error(f"监控任务出错: 机器 {job.machine_id} {job.kind}: {str(e)}")
+        finally:
+            if waiting:
+                self._waiting -= 1
+            job.running = False
+
+    async def _run_status(self, machine_id: int) -> bool:
+        async with async_session_factory() as db:
+            machine = await MachineManager.get_machine(db, machine_id)
+        if machine is None:
+            return False
+        result = await check_machine(machine, settings.MACHINE_CHECK_TIMEOUT)
+        self._status_results.append(result)
+        return result.success
+
+    async def _run_metrics(self, machine_id: int) -> bool:
+        success, _, _ = await asyncio.wait_for(
+            MachineManager.get_machine_metrics_shared(machine_id),
+            settings.MACHINE_CHECK_TIMEOUT
+        )
+        return success
+
+    async def _flush_status(self):
+        """批量写入攒下的状态检查结果"""
+        if not self._status_results:
+            return
+        results, self._status_results = self._status_results, []
+        try:
+            async with async_session_factory() as db:
+                query = select(Machine).where(Machine.id.in_([result.machine_id for result in results]))
+                machines = {machine.id: machine for machine in (await db.execute(query)).scalars().all()}
+                await MachineManager.record_status_results(
+                    db, machines, [result for result in results if result.machine_id in machines]
+                )
+        except Exception as e:
+            logger.error(f"写入状态检查结果失败: {str(e)}")
+
+    async def _run_forever(self):
+        next_refresh = 0.0
+        while not self._stopping:
+            now = time.monotonic()
+            try:
+                if now >= next_refresh:
+                    await self.refresh()
+                    next_refresh = now + self.refresh_interval
+                self._dispatch_due(now)
+                await self._flush_status()
+            except Exception as e:
+                logger.error(f"监控调度出错: {str(e)}")
+
+            # 最多等待FLUSH_INTERVAL，期间完成的状态检查攒成一批写入
+            next_due = self._heap[0][0] if self._heap else now + self.refresh_interval
+            timeout = max(0.0, min(next_due, next_refresh, now + FLUSH_INTERVAL) - time.monotonic())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """启动调度，所有任务类型的间隔都为0时不启动"""
+        if not self.enabled_kinds:
+            logger.info("机器监控调度已禁用")
+            return
+        if self._loop_task is None or self._loop_task.done():
+            self._stopping = False
+            self._budget = asyncio.Semaphore(self.max_concurrency)
+            self._wakeup = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._run_forever())
+            logger.info(
+                f"机器监控调度已启动: 状态间隔 {self.intervals[JOB_STATUS]}秒, "
+                f"指标间隔 {self.intervals[JOB_METRICS]}秒, 并发上限 {self.max_concurrency}"
+            )
+
+    async def shutdown(self, timeout: Optional[float] = None):
+        """停止调度，等待正在执行的任务完成，超时后取消"""
+        if self._loop_task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await self._loop_task
+        except Exception:
+            pass
+        self._loop_task = None
+
+        if self._tasks:
+            timeout = timeout if timeout is not None else settings.MONITOR_SHUTDOWN_TIMEOUT
+            done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                logger.warning(f"关闭时取消了 {len(pending)} 个未完成的监控任务")
+        await self._flush_status()
+
+        self._heap.clear()
+        self._jobs.clear()
+        self._host_limits.clear()
+
+    def stats(self) -> Dict:
+        """调度器运行状态"""
+        now = time.monotonic()
+        lags = list(self._lags)
+        overdue = sum(1 for at, _, job in self._heap if at <= now and not job.removed)
+        return {
+            "running": self._loop_task is not None and not self._loop_task.done(),
+            "machines": len({job.machine_id for job in self._jobs.values()}),
+            "jobs": len(self._jobs),
+            "in_flight": len(self._tasks) - self._waiting,
+            "queue_depth": self._waiting + overdue,
+            "lag_avg_ms": int(sum(lags) / len(lags) * 1000) if lags else 0,
+            "lag_max_ms": int(max(lags) * 1000) if lags else 0,
+            "runs": self._counters["runs"],
+            "skipped": self._counters["skipped"],
+            "failures": self._counters["failures"],
+            "intervals": dict(self.intervals),
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+# 进程级调度器实例
+monitor_scheduler = MonitorScheduler()
@@ -0,0 +1,372 @@
+"""
+本地项目文件监听模块
+
+开启自动同步（auto_sync）的本地项目，监听其源文件夹（repository_url）并持续同步到存储目录：
+- 一段时间内的连续变化合并为一次同步，持续变化时最长等待LOCAL_WATCH_MAX_DELAY秒
+- 只同步变化的路径，经过项目的忽略规则，被忽略的目录不监听
+- 无法确定具体变化（事件溢出、.gitignore修改）时完整增量同步一次
+- inotify监听意外停止时改为轮询监听并完整同步一次，无法恢复时停止监听该项目
+- 同步后推送到开启自动同步的部署，每个部署同时只有一个推送，推送期间的新变化在结束后再推送一次；
+  推送与手动同步持有同一个部署锁，不会同时写入部署目录
+- 同步和推送结果以计数形式推送到项目WebSocket
+"""
+
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.db.database import async_session_factory
+from app.models.project import Deployment, Project
+from app.utils.archive_cache import archive_cache
+from app.utils.fs_watcher import BACKEND_POLLING, create_watcher
+from app.utils.ignore_handler import get_project_ignore_matcher
+from app.utils.keyed_lock import deployment_locks
+from app.utils.local_sync import LocalFolderSync, LocalSyncStats
+from app.utils.ssh import SSHClient
+from app.api.projects.websocket import manager
+
+logger = logging.getLogger(__name__)
+
+# 与手动同步本地文件夹一致的重要文件
+IMPORTANT_FILES = ["start_all.bat", "README.md", "prompt.txt", ".gitignore"]
+# 修改后需要重新加载忽略规则的文件
+IGNORE_FILE = ".gitignore"
+
+
+class ProjectWatch:
+    """一个本地项目的监听和同步"""
+
+    def __init__(self, hub: "ProjectWatcherHub", project_id: int, source: str, storage: str):
+        self.hub = hub
+        self.project_id = project_id
+        self.source = source
+        self.storage = storage
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._watcher = None
+        self._backend = settings.LOCAL_WATCH_BACKEND
+        self._recover_task: Optional[asyncio.Task] = None
+        self._pending: Set[str] = set()
+        self._rescan = False
+        self._first_pending_at: Optional[float] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _new_sync(self) -> LocalFolderSync:
+        return LocalFolderSync(
+            get_project_ignore_matcher(self.storage),
+            important_files=IMPORTANT_FILES,
+            keep=[IGNORE_FILE],
+            link_mode=settings.LOCAL_SYNC_LINK_MODE,
+            compare=settings.LOCAL_SYNC_COMPARE,
+            workers=settings.LOCAL_SYNC_WORKERS,
+            walk_threads=settings.TREE_WALK_THREADS
+        )
+
+    async def _start_watcher(self):
+        folder_sync = self._new_sync()
+        self._watcher = await asyncio.to_thread(
+            create_watcher,
+            self.source,
+            self._on_changes,
+            prune=lambda rel_path, entry: folder_sync.is_ignored(rel_path, True),
+            backend=self._backend,
+            poll_interval=settings.LOCAL_WATCH_POLL_INTERVAL,
+            on_error=self._on_watcher_error
+        )
+
+    async def _stop_watcher(self):
+        if self._watcher is not None:
+            watcher, self._watcher = self._watcher, None
+            await asyncio.to_thread(watcher.stop)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await self._start_watcher()
+        # 开始监听前的修改通过一次完整增量同步补上
+        self._enqueue(set(), True)
+
+    async def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._recover_task is not None and self._recover_task is not asyncio.current_task():
+            self._recover_task.cancel()
+            await asyncio.gather(self._recover_task, return_exceptions=True)
+        self._recover_task = None
+        await self._stop_watcher()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+
+    def _on_watcher_error(self, error: Exception):
+        """监听线程意外退出时的回调，在监听线程中执行"""
+        self._loop.call_soon_threadsafe(self._start_recover)
+
+    def _start_recover(self):
+        if self._recover_task is None or self._recover_task.done():
+            self._recover_task = asyncio.create_task(self._recover())
+
+    async def _recover(self):
+        logger.warning(f"项目 {self.project_id} 的文件监听意外停止，改为轮询监听")
+        await self._stop_watcher()
+        self._backend = BACKEND_POLLING
+        try:
+            await self._start_watcher()
+        except Exception as e:
+            logger.error(f"无法重新监听项目 {self.project_id} 的文件夹 {self.source}: {str(e)}")
+            await self.hub.remove(self)
+            return
+        # 监听中断期间的修改通过一次完整增量同步补上
+        self._enqueue(set(), True)
+
+    def _on_changes(self, paths: Set[str], rescan: bool):
+        """监听线程中的回调"""
+        self._loop.call_soon_threadsafe(self._enqueue, paths, rescan)
+
+    def _enqueue(self, paths: Set[str], rescan: bool):
+        self._pending.update(paths)
+        self._rescan = self._rescan or rescan or IGNORE_FILE in paths
+        now = time.monotonic()
+        if self._first_pending_at is None:
+            self._first_pending_at = now
+        if self._timer is not None:
+            self._timer.cancel()
+        remaining = settings.LOCAL_WATCH_MAX_DELAY - (now - self._first_pending_at)
+        self._timer = self._loop.call_later(max(0.0, min(settings.LOCAL_WATCH_DEBOUNCE, remaining)), self._kick)
+
+    def _kick(self):
+        self._timer = None
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        # 同步期间到达的变化在本轮结束后继续处理
+        while self._pending or self._rescan:
+            paths, self._pending = self._pending, set()
+            rescan, self._rescan = self._rescan, False
+            self._first_pending_at = None
+            try:
+                await self._flush(paths, rescan)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"项目 {self.project_id} 自动同步失败")
+                await manager.broadcast_to_project(
+                    self.project_id,
+                    {"status": "error", "message": f"自动同步失败: {str(e)}", "source": "watch"}
+                )
+
+    async def _flush(self, paths: Set[str], rescan: bool):
+        folder_sync = self._new_sync()
+        if rescan:
+            stats: LocalSyncStats = await asyncio.to_thread(folder_sync.sync, self.source, self.storage)
+        else:
+            stats = await asyncio.to_thread(folder_sync.apply, self.source, self.storage, paths)
+        snapshot = stats.snapshot()
+        changed = snapshot["files_copied"] + snapshot["files_linked"] + snapshot["files_deleted"] + snapshot["dirs_deleted"]
+        if not changed and not snapshot["files_failed"]:
+            return
+
+        if IGNORE_FILE in paths:
+            # 忽略规则变化后按新规则重新监听
+            await self._stop_watcher()
+            await self._start_watcher()
+
+        logger.info(f"项目 {self.project_id} 自动同步: {snapshot}")
+        await manager.broadcast_to_project(
+            self.project_id,
+            {
+                "status": "complete",
+                "message": (
+                    f"检测到文件变化，已同步 {snapshot['files_copied'] + snapshot['files_linked']} 个文件，"
+                    f"删除 {snapshot['files_deleted']} 个文件"
+                ),
+                "progress": 100,
+                "source": "watch",
+                "stats": snapshot
+            }
+        )
+        if changed:
+            archive_cache.invalidate(self.project_id)
+            await self.hub.push_project(self.project_id)
+
+
+class ProjectWatcherHub:
+    """所有本地项目的文件监听"""
+
+    def __init__(self):
+        self._watches: Dict[int, ProjectWatch] = {}
+        self._pushes: Dict[int, asyncio.Task] = {}
+        self._push_dirty: Set[int] = set()
+
+    async def start(self):
+        """监听所有开启自动同步的本地项目"""
+        if not settings.LOCAL_WATCH_ENABLED:
+            logger.info("本地项目文件监听已禁用")
+            return
+        async with async_session_factory() as db:
+            result = await db.execute(
+                select(Project).where(
+                    Project.repository_type == "local",
+                    Project.auto_sync == True,  # noqa: E712
+                    Project.is_active == True  # noqa: E712
+                )
+            )
+            projects = result.scalars().all()
+        for project in projects:
+            await self.watch(project)
+
+    async def watch(self, project: Project) -> bool:
+        """开始监听项目的源文件夹，已在监听时按新路径重新开始"""
+        if not settings.LOCAL_WATCH_ENABLED:
+            return False
+        await self.unwatch(project.id)
+        watch = ProjectWatch(self, project.id, project.repository_url, project.storage_path)
+        try:
+            await watch.start()
+        except Exception as e:
+            logger.warning(f"无法监听项目 {project.id} 的文件夹 {project.repository_url}: {str(e)}")
+            await watch.stop()
+            return False
+        self._watches[project.id] = watch
+        return True
+
+    async def unwatch(self, project_id: int):
+        watch = self._watches.pop(project_id, None)
+        if watch is not None:
+            await watch.stop()
+            logger.info(f"停止监听项目 {project_id}")
+
+    async def remove(self, watch: ProjectWatch):
+        """监听无法恢复时停止并移除，项目已重新监听时只停止旧的监听"""
+        if self._watches.get(watch.project_id) is watch:
+            del self._watches[watch.project_id]
+        await watch.stop()
+
+    def is_watching(self, project_id: int) -> bool:
+        return project_id in self._watches
+
+    async def push_project(self, project_id: int):
+        """把项目存储目录推送到开启自动同步的部署"""
+        async with async_session_factory() as db:
+            result = await db.execute(
+                select(Deployment.id).where(
+                    Deployment.project_id == project_id,
+                    Deployment.auto_sync == True  # noqa: E712
+                )
+            )
+            deployment_ids = result.scalars().all()
+        for deployment_id in deployment_ids:
+            self.push_deployment(deployment_id)
+
+    def push_deployment(self, deployment_id: int):
+        """推送到一个部署，正在推送时标记为待推送，结束后再推送一次"""
+        task = self._pushes.get(deployment_id)
+        if task is not None and not task.done():
+            self._push_dirty.add(deployment_id)
+            return
+        task = asyncio.create_task(self._push_loop(deployment_id))
+        self._pushes[deployment_id] = task
+        task.add_done_callback(lambda _: self._pushes.pop(deployment_id, None) if self._pushes.get(deployment_id) is task else None)
+
+    async def _push_loop(self, deployment_id: int):
+        while True:
+            self._push_dirty.discard(deployment_id)
+            try:
+                # 与手动同步共用部署锁，状态检查之后开始的手动同步会等待本次推送结束
+                async with deployment_locks.hold(deployment_id):
+                    await self._push_once(deployment_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"自动推送到部署 {deployment_id} 失败")
+            if deployment_id not in self._push_dirty:
+                return
+
+    async def _push_once(self, deployment_id: int):
+        async with async_session_factory() as db:
+            result = await db.execute(
+                select(Deployment)
+                .options(selectinload(Deployment.project), selectinload(Deployment.machine))
+                .filter(Deployment.id == deployment_id)
+            )
+            deployment = result.scalars().first()
+            if not deployment or not deployment.auto_sync:
+                return
+            project, machine = deployment.project, deployment.machine
+            if not deployment.deploy_path or not deployment.deploy_path.startswith("/"):
+                # 增量同步依赖远程find等命令，仅支持类Unix机器
+                logger.info(f"部署 {deployment_id} 的路径不是类Unix路径，跳过自动推送")
+                return
+            if deployment.status in ("syncing", "deploying", "pending"):
+                logger.info(f"部署 {deployment_id} 正在{deployment.status}，跳过本次自动推送")
+                return
+
+            ssh_client = SSHClient(
+                host=machine.host,
+                port=machine.port,
+                username=machine.username,
+                password=machine.password if machine.password else None,
+                key_file=machine.key_file if machine.key_file else None,
+                machine_id=machine.id
+            )
+            if not await ssh_client.connect():
+                logger.warning(f"自动推送到部署 {deployment_id} 失败: 无法连接 {machine.host}")
+                return
+            try:
+                previous_manifest = deployment.sync_manifest
+                cached_manifest = previous_manifest if settings.DEPLOY_MANIFEST_CACHE else None
+                try:
+                    sync_result = await ssh_client.sync_directory(
+                        project.storage_path,
+                        deployment.deploy_path,
+                        parallelism=machine.sftp_parallelism or settings.SFTP_UPLOAD_PARALLELISM,
+                        cached_manifest=cached_manifest,
+                        previous_manifest=previous_manifest
+                    )
+                except Exception:
+                    # 中途失败时远程状态未知，下次重新读取远程清单
+                    deployment.sync_manifest = None
+                    await db.commit()
+                    raise
+                deployment.sync_manifest = sync_result.manifest
+                await db.commit()
+            finally:
+                await ssh_client.close()
+
+        summary = sync_result.summary()
+        logger.info(f"自动推送到部署 {deployment_id} 完成: {summary}")
+        await manager.broadcast_to_project(
+            project.id,
+            {
+                "status": "complete",
+                "message": (
+                    f"已推送到 {machine.name}: 上传 {summary['uploaded']} 个，删除 {summary['deleted']} 个文件"
+                ),
+                "progress": 100,
+                "source": "push",
+                "deployment_id": deployment_id,
+                "stats": summary
+            }
+        )
+
+    async def shutdown(self):
+        for project_id in list(self._watches):
+            await self.unwatch(project_id)
+        tasks = [task for task in self._pushes.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._pushes.clear()
+        self._push_dirty.clear()
+
+
+# 进程级实例
+project_watcher = ProjectWatcherHub()
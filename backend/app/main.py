@@ -9,6 +9,12 @@ from app.api import auth, projects, files, machines, logs, deployments
 from app.core.config import settings
 from app.db.database import init_db, async_session_factory
 from app.core.auth import add_test_user
+from app.utils.ssh_pool import ssh_pool
+from app.utils.ssh_executor import shutdown_ssh_executor
+from app.core.metrics_store import metrics_store
+from app.core.monitor_scheduler import monitor_scheduler
+from app.core.log_tail import log_tail_hub
+from app.core.project_watcher import project_watcher
 
 # 配置日志
 logging.basicConfig(
@@ -34,10 +40,29 @@ async def lifespan(app: FastAPI):
         await add_test_user(db)
     logger.info("测试用户创建完成")
     
+    # 启动SSH连接池空闲回收
+    ssh_pool.start()
+    
+    # 加载监控指标历史，启动指标写入
+    await metrics_store.load()
+    metrics_store.start()
+    
+    # 启动机器状态检查和监控指标采集调度
+    monitor_scheduler.start()
+    
+    # 监听开启自动同步的本地项目
+    await project_watcher.start()
+    
     yield
     
     # 应用程序关闭时执行清理操作
     logger.info("应用程序关闭，执行清理操作")
+    log_tail_hub.shutdown()
+    await project_watcher.shutdown()
+    await monitor_scheduler.shutdown()
+    await metrics_store.shutdown()
+    await ssh_pool.shutdown()
+    shutdown_ssh_executor()
 
 
 # 创建FastAPI应用
@@ -5,5 +5,6 @@
 # 导入所有模型，确保SQLAlchemy可以找到它们
 from app.models.user import User
 from app.models.machine import Machine
+from app.models.machine_metric import MachineMetricSample
 from app.models.log import Log
 from app.models.project import Project, Deployment 
\ No newline at end of file
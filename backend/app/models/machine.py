@@ -17,6 +17,7 @@ class Machine(Base):
     password = Column(String(255), nullable=True)  # 存储SSH密码
     key_file = Column(String(255), nullable=True)
     description = Column(Text, nullable=True)
+    sftp_parallelism = Column(Integer, nullable=True)  # 上传文件时的并行SFTP通道数，为空时使用默认值
     
     # 最后一次状态检查
     last_check = Column(DateTime(timezone=True), nullable=True)
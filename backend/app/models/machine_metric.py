@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
+
+from app.db.base_class import Base
+
+class MachineMetricSample(Base):
+    """机器监控指标采样（按原始、1分钟、1小时三个精度存储）"""
+    
+    __tablename__ = "machine_metric_samples"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    machine_id = Column(Integer, ForeignKey("machines.id", ondelete="CASCADE"), nullable=False)
+    tier = Column(String(10), nullable=False)  # raw, 1m, 1h
+    timestamp = Column(Float, nullable=False)  # Unix时间戳（秒），降采样精度为时间桶起点
+    
+    # 指标数值
+    cpu_percent = Column(Float, nullable=True)
+    load1 = Column(Float, nullable=True)
+    mem_percent = Column(Float, nullable=True)
+    disk_percent = Column(Float, nullable=True)
+    rx_bytes = Column(Float, nullable=True)  # 网卡累计接收字节数
+    tx_bytes = Column(Float, nullable=True)  # 网卡累计发送字节数
+    processes = Column(Float, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_machine_metric_samples_lookup", "machine_id", "tier", "timestamp"),
+    )
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON, LargeBinary
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.db.database import Base
 
@@ -27,6 +27,14 @@ class Project(Base):
     # 项目存储路径
     storage_path = Column(String, nullable=False)
     
+    # 本地项目：监听源文件夹并自动同步到存储目录
+    auto_sync = Column(Boolean, default=False)
+    
+    # 上次统计的结果，项目列表直接返回
+    stats = Column(JSON, nullable=True)
+    # 代码文件的行数缓存（zlib压缩的JSON），只在统计时加载
+    stats_index = deferred(Column(LargeBinary, nullable=True))
+    
     # 关系
     owner = relationship("User", backref="projects")
     deployments = relationship("Deployment", back_populates="project", cascade="all, delete-orphan")
@@ -47,6 +55,8 @@ class Deployment(Base):
     status = Column(String, nullable=False, default="not_deployed")  # not_deployed, pending, success, failed
     log = Column(Text, nullable=True)
     deployed_at = Column(DateTime(timezone=True), nullable=True)
+    sync_manifest = Column(LargeBinary, nullable=True)  # 上次同步成功后的远程文件清单（zlib压缩的JSON）
+    auto_sync = Column(Boolean, default=False)  # 项目存储目录变化时自动推送到该部署
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # 关系
@@ -13,6 +13,7 @@ class DeploymentBase(BaseModel):
 class DeploymentCreate(DeploymentBase):
     """创建部署请求"""
     deploy_path: Optional[str] = None
+    auto_sync: bool = False
 
 class DeploymentUpdate(BaseModel):
     """更新部署状态"""
@@ -33,6 +34,7 @@ class DeploymentResponse(DeploymentBase):
     deploy_path: Optional[str] = None
     log: Optional[str] = None
     deployed_at: Optional[datetime] = None
+    auto_sync: Optional[bool] = False
     created_at: datetime
     project: Optional[ProjectResponse] = None
     machine: Optional[Machine] = None
@@ -9,6 +9,7 @@ class MachineBase(BaseModel):
     port: int = Field(22, description="SSH端口", example=22)
     username: str = Field(..., description="SSH用户名", example="root")
     description: Optional[str] = Field(None, description="描述信息")
+    sftp_parallelism: Optional[int] = Field(None, ge=1, le=16, description="上传文件时的并行SFTP通道数，为空时使用默认值")
 
 # 创建机器时的请求模型
 class MachineCreate(MachineBase):
@@ -30,6 +31,7 @@ class MachineUpdate(BaseModel):
     password: Optional[str] = None
     key_file: Optional[str] = None
     description: Optional[str] = None
+    sftp_parallelism: Optional[int] = Field(None, ge=1, le=16)
 
 # 机器状态信息
 class MachineStatus(BaseModel):
@@ -40,6 +42,22 @@ class MachineStatus(BaseModel):
     memory_usage: Optional[str] = Field(None, description="内存使用情况")
     disk_usage: Optional[str] = Field(None, description="磁盘使用情况")
     last_check: Optional[datetime] = Field(None, description="最后检查时间")
+    circuit_state: str = Field("closed", description="连接熔断状态: closed, open, half_open")
+    offline_since: Optional[datetime] = Field(None, description="连续连接失败的开始时间")
+    next_retry_at: Optional[datetime] = Field(None, description="熔断期间下次尝试连接的时间")
+
+# 批量状态检查请求
+class MachineCheckRequest(BaseModel):
+    machine_ids: Optional[List[int]] = Field(None, description="要检查的机器ID，为空时检查全部机器")
+
+# 单台机器的检查结果（批量检查时逐行流式返回）
+class MachineCheckResult(BaseModel):
+    machine_id: int
+    name: str
+    success: bool
+    error: str = ""
+    elapsed_ms: int = 0
+    status: MachineStatus
 
 # 机器详情响应模型
 class MachineInDB(MachineBase):
@@ -117,4 +135,66 @@ class MachineMetrics(BaseModel):
         "total": 120,
         "running": 5,
         "sleeping": 115
-    }) 
\ No newline at end of file
+    }) 
+
+# 历史监控指标中的一个采样点
+class MetricPoint(BaseModel):
+    timestamp: datetime
+    cpu_percent: float
+    load1: float
+    mem_percent: float
+    disk_percent: float
+    rx_bytes: float
+    tx_bytes: float
+    processes: float
+
+# 历史监控指标响应模型
+class MachineMetricsHistory(BaseModel):
+    machine_id: int
+    tier: str = Field(..., description="数据精度: raw, 1m, 1h")
+    step: float = Field(..., description="采样点间隔（秒），0表示原始采样")
+    points: List[MetricPoint]
+
+
+# 监控调度器状态
+class MonitorStats(BaseModel):
+    running: bool = Field(..., description="调度器是否在运行")
+    machines: int = Field(..., description="调度中的机器数")
+    jobs: int = Field(..., description="调度中的周期任务数")
+    in_flight: int = Field(..., description="正在执行的任务数")
+    queue_depth: int = Field(..., description="已到期但尚未开始执行的任务数")
+    lag_avg_ms: int = Field(..., description="最近任务从计划时间到开始执行的平均延迟（毫秒）")
+    lag_max_ms: int = Field(..., description="最近任务的最大调度延迟（毫秒）")
+    runs: int = Field(..., description="累计执行次数")
+    skipped: int = Field(..., description="因上一次仍在执行而跳过的次数")
+    failures: int = Field(..., description="累计失败次数")
+    intervals: Dict[str, float] = Field(..., description="各类任务的间隔（秒）")
+    max_concurrency: int = Field(..., description="全局并发上限")
+
+
+# 远程日志搜索请求
+class LogSearchRequest(BaseModel):
+    log_type: str = Field("backend", description="日志类型: backend, frontend, all")
+    pattern: Optional[str] = Field(None, description="搜索内容，为空时不按内容过滤")
+    regex: bool = Field(False, description="pattern是否为正则表达式（POSIX扩展正则）")
+    ignore_case: bool = Field(False, description="是否忽略大小写")
+    level: Optional[str] = Field(None, description="最低日志级别: DEBUG, INFO, WARNING, ERROR, CRITICAL")
+    start_time: Optional[datetime] = Field(None, description="开始时间（远程机器本地时间）")
+    end_time: Optional[datetime] = Field(None, description="结束时间（远程机器本地时间）")
+    cursor: Optional[str] = Field(None, description="上一页返回的next_cursor，为空时从最早的日志开始")
+    limit: int = Field(200, ge=1, description="本页最多返回的匹配行数")
+    compress: bool = Field(False, description="远程结果是否压缩后传输")
+
+# 远程日志搜索匹配的一行
+class LogMatch(BaseModel):
+    file: str
+    offset: int = Field(..., description="该行在文件中的字节偏移")
+    line: str
+
+# 远程日志搜索结果
+class LogSearchResult(BaseModel):
+    matches: List[LogMatch]
+    next_cursor: Optional[str] = Field(None, description="下一页的游标，为空表示已搜索完毕")
+    files_scanned: int = Field(..., description="本页扫描的文件数")
+    bytes_scanned: int = Field(..., description="本页扫描的字节数")
+    bytes_transferred: int = Field(..., description="本页从远程传回的字节数")
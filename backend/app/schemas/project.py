@@ -13,6 +13,13 @@ class ProjectBase(BaseModel):
     tech_stack: Optional[Dict[str, Any]] = None
 
 
+class LanguageStats(BaseModel):
+    """单个语言的统计信息"""
+    files: int = 0
+    code_lines: int = 0
+    size_bytes: int = 0
+
+
 # 添加统计信息模型
 class ProjectStats(BaseModel):
     """项目统计信息"""
@@ -21,6 +28,7 @@ class ProjectStats(BaseModel):
     code_lines: int = 0
     total_size_human: str = "0 B"
     ignore_file_exists: bool = False
+    languages: Dict[str, LanguageStats] = {}  # 按语言分项，按代码行数从多到少排列
 
 
 class ProjectCreate(ProjectBase):
@@ -37,6 +45,7 @@ class ProjectUpdate(BaseModel):
     project_type: Optional[str] = None
     tech_stack: Optional[Dict[str, Any]] = None
     is_active: Optional[bool] = None
+    auto_sync: Optional[bool] = None
 
 
 class ProjectInDB(ProjectBase):
@@ -47,6 +56,7 @@ class ProjectInDB(ProjectBase):
     created_at: datetime
     last_updated: datetime
     is_active: bool
+    auto_sync: Optional[bool] = False
 
     class Config:
         from_attributes = True
@@ -57,6 +67,27 @@ class ProjectResponse(ProjectInDB):
     pass
 
 
+class UploadResult(BaseModel):
+    """ZIP包上传解压结果"""
+    sha256: str
+    size: int
+    mode: str
+    files_total: int = 0
+    files_added: int = 0
+    files_updated: int = 0
+    files_unchanged: int = 0
+    files_ignored: int = 0
+    bytes_extracted: int = 0
+    added: List[str] = []
+    updated: List[str] = []
+    truncated: bool = False  # 文件列表是否被截断
+
+
+class ProjectUploadResponse(ProjectResponse):
+    """上传项目文件的响应"""
+    upload: Optional[UploadResult] = None
+
+
 # 添加统计信息的响应模型
 class ProjectResponseWithStats(ProjectResponse):
     """包含统计信息的项目数据"""
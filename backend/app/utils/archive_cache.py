@@ -0,0 +1,188 @@
+"""
+项目下载包缓存模块
+
+按项目目录指纹缓存生成的ZIP包，项目未变化时重复下载直接发送缓存文件：
+- 指纹为未被忽略的文件的路径、大小和修改时间的哈希，只需遍历目录读取stat
+- 上传、同步、克隆都会改变指纹；这些操作后也会主动删除该项目的旧缓存，尽早释放磁盘
+- 缓存未命中时边生成边发送，同时写入临时文件，完整生成后才加入缓存
+- 按最近使用顺序淘汰，总大小不超过上限；使用顺序记录在文件修改时间中，重启后保留
+"""
+
+import os
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.ignore_handler import IgnoreMatcher
+from app.utils.tree_walker import walk_tree
+
+logger = logging.getLogger(__name__)
+
+# 指纹格式版本，ZIP生成方式变化时修改，使旧缓存失效
+FINGERPRINT_VERSION = b"zip-v1"
+ARCHIVE_SUFFIX = ".zip"
+TEMP_SUFFIX = ".tmp"
+
+# (项目ID, 指纹)
+CacheKey = Tuple[int, str]
+
+
+def tree_fingerprint(root: str, matcher: Optional[IgnoreMatcher] = None, threads: int = 0) -> str:
+    """项目目录指纹，任一未被忽略的文件增删或大小、修改时间变化时改变"""
+    entries = []
+    for rel_path, entry in walk_tree(root, matcher=matcher, threads=threads, prefetch_stat=True):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((rel_path, stat.st_size, stat.st_mtime_ns))
+    entries.sort()
+    digest = hashlib.sha256(FINGERPRINT_VERSION)
+    for rel_path, size, mtime_ns in entries:
+        digest.update(f"{rel_path}\0{size}\0{mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()[:32]
+
+
+class ArchiveCache:
+    """磁盘上的下载包缓存，按最近使用淘汰"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, int]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: CacheKey) -> str:
+        return os.path.join(self.directory, f"{key[0]}-{key[1]}{ARCHIVE_SUFFIX}")
+
+    def _load(self):
+        """首次使用时加载已有的缓存文件，清理未完成的临时文件"""
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(TEMP_SUFFIX):
+                    self._remove_file(entry.path)
+                    continue
+                if not entry.name.endswith(ARCHIVE_SUFFIX):
+                    continue
+                project_id, _, fingerprint = entry.name[:-len(ARCHIVE_SUFFIX)].partition("-")
+                if not project_id.isdigit() or not fingerprint:
+                    continue
+                stat = entry.stat()
+                found.append((stat.st_mtime, (int(project_id), fingerprint), stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+        self._evict()
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self, keep: Optional[CacheKey] = None):
+        while self._total > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            if key == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            size = self._entries.pop(key)
+            self._total -= size
+            self._remove_file(self._path(key))
+            logger.info(f"下载包缓存已满，淘汰 {key}")
+
+    def get(self, project_id: int, fingerprint: str) -> Optional[str]:
+        """返回缓存文件路径并标记为最近使用，未命中时返回None"""
+        key = (project_id, fingerprint)
+        with self._lock:
+            self._load()
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            if not os.path.exists(path):
+                self._total -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def _add(self, key: CacheKey, temp_path: str):
+        size = os.path.getsize(temp_path)
+        with self._lock:
+            self._load()
+            if size > self.max_bytes:
+                self._remove_file(temp_path)
+                return
+            os.replace(temp_path, self._path(key))
+            if key in self._entries:
+                self._total -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total += size
+            self._evict(keep=key)
+
+    def store(self, project_id: int, fingerprint: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        产出数据块的同时写入缓存，全部产出后加入缓存
+
+        迭代中途停止（客户端断开）或出错时丢弃临时文件。
+        """
+        key = (project_id, fingerprint)
+        with self._lock:
+            self._load()
+        temp_path = os.path.join(self.directory, f"{uuid.uuid4().hex}{TEMP_SUFFIX}")
+        complete = False
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if complete:
+                self._add(key, temp_path)
+            else:
+                self._remove_file(temp_path)
+
+    def invalidate(self, project_id: int):
+        """删除项目的所有缓存"""
+        with self._lock:
+            self._load()
+            for key in [key for key in self._entries if key[0] == project_id]:
+                self._total -= self._entries.pop(key)
+                self._remove_file(self._path(key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# 进程级缓存实例
+archive_cache = ArchiveCache(settings.DOWNLOAD_CACHE_DIR, settings.DOWNLOAD_CACHE_MAX_BYTES)
@@ -0,0 +1,158 @@
+"""
+SSH连接熔断模块
+
+机器不可达时，每次连接都要等待完整的连接超时。熔断器按机器记录连续的连接失败：
+- 关闭(closed): 正常连接
+- 打开(open): 连续失败达到阈值后打开，期间的连接请求立即失败，不再等待超时
+- 半开(half_open): 退避时间到后只放行一个探测连接，成功则关闭，失败则以加倍的退避时间重新打开
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断打开期间的连接请求"""
+
+    def __init__(self, key: Hashable, offline_since: Optional[datetime], next_retry_at: Optional[datetime], last_error: str):
+        self.key = key
+        self.offline_since = offline_since
+        self.next_retry_at = next_retry_at
+        self.last_error = last_error
+        since = offline_since.strftime("%Y-%m-%d %H:%M:%S") if offline_since else "未知时间"
+        retry = next_retry_at.strftime("%H:%M:%S") if next_retry_at else "稍后"
+        super().__init__(f"机器自 {since} 起无法连接，将于 {retry} 重试（最近错误: {last_error}）")
+
+
+class CircuitBreaker:
+    """单台机器的熔断器"""
+
+    def __init__(self, key: Hashable, failure_threshold: int, base_backoff: float, max_backoff: float):
+        self.key = key
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.open_count = 0
+        self.offline_since: Optional[datetime] = None
+        self.next_retry_at: Optional[datetime] = None
+        self.last_error = ""
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """连接前检查，熔断打开时抛出CircuitOpenError
+
+        退避时间到后转为半开状态，只放行一个探测连接，其余调用仍然立即失败。
+        """
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return
+            if self.state == CircuitState.OPEN and time.monotonic() >= self._open_until:
+                self.state = CircuitState.HALF_OPEN
+                self._probing = False
+            if self.state == CircuitState.HALF_OPEN and not self._probing:
+                self._probing = True
+                logger.info(f"熔断半开，尝试探测连接: {self.key}")
+                return
+            raise CircuitOpenError(self.key, self.offline_since, self.next_retry_at, self.last_error)
+
+    def record_success(self):
+        """连接成功，关闭熔断"""
+        with self._lock:
+            if self.state != CircuitState.CLOSED:
+                logger.info(f"机器恢复连接，熔断关闭: {self.key}")
+            self.state = CircuitState.CLOSED
+            self.failures = 0
+            self.open_count = 0
+            self.offline_since = None
+            self.next_retry_at = None
+            self.last_error = ""
+            self._probing = False
+
+    def record_failure(self, error: str):
+        """连接失败，达到阈值或半开探测失败时打开熔断"""
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            if self.offline_since is None:
+                self.offline_since = datetime.now()
+            if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.open_count += 1
+                backoff = min(self.max_backoff, self.base_backoff * (2 ** (self.open_count - 1)))
+                self.state = CircuitState.OPEN
+                self._open_until = time.monotonic() + backoff
+                self.next_retry_at = datetime.now() + timedelta(seconds=backoff)
+                self._probing = False
+                logger.warning(f"机器连接连续失败 {self.failures} 次，熔断 {backoff:.0f} 秒: {self.key}")
+
+    def release_probe(self):
+        """探测连接未得出结果（例如被取消）时释放探测名额"""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self) -> Dict:
+        """熔断状态，用于在MachineStatus中展示"""
+        with self._lock:
+            return {
+                "circuit_state": self.state,
+                "offline_since": self.offline_since,
+                "next_retry_at": self.next_retry_at,
+            }
+
+
+class CircuitBreakerRegistry:
+    """按机器管理熔断器"""
+
+    def __init__(
+        self,
+        failure_threshold: int = None,
+        base_backoff: float = None,
+        max_backoff: float = None
+    ):
+        self.failure_threshold = failure_threshold or settings.SSH_BREAKER_FAILURE_THRESHOLD
+        self.base_backoff = base_backoff or settings.SSH_BREAKER_BASE_BACKOFF
+        self.max_backoff = max_backoff or settings.SSH_BREAKER_MAX_BACKOFF
+        self._breakers: Dict[Hashable, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> CircuitBreaker:
+        """获取熔断器，不存在时创建"""
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(key, self.failure_threshold, self.base_backoff, self.max_backoff)
+                self._breakers[key] = breaker
+            return breaker
+
+    def snapshot(self, key: Hashable) -> Dict:
+        """熔断状态，没有记录的机器视为关闭"""
+        with self._lock:
+            breaker = self._breakers.get(key)
+        if breaker is None:
+            return {"circuit_state": CircuitState.CLOSED, "offline_since": None, "next_retry_at": None}
+        return breaker.snapshot()
+
+    def reset(self, key: Hashable):
+        """清除熔断记录（例如机器连接信息被修改后）"""
+        with self._lock:
+            self._breakers.pop(key, None)
+
+
+# 进程级熔断器注册表
+circuit_breakers = CircuitBreakerRegistry()
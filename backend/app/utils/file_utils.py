@@ -34,7 +34,9 @@ def custom_copytree(src: str, dst: str, ignore_patterns: List[str], important_fi
         ignore_patterns: 忽略的文件模式列表
         important_files: 重要文件列表，这些文件将始终复制，不会被忽略
     """
-    from app.utils.ignore_handler import should_ignore_file
+    from app.core.config import settings
+    from app.utils.ignore_handler import get_ignore_matcher
+    from app.utils.tree_walker import walk_tree
     
     if important_files is None:
         important_files = ["start_all.bat", "README.md", "prompt.txt", ".gitignore"]
@@ -103,209 +105,125 @@ def custom_copytree(src: str, dst: str, ignore_patterns: List[str], important_fi
     
     logger.info(f"原始忽略规则数: {len(ignore_patterns)}, 过滤后忽略规则数: {len(filtered_ignore_patterns)}")
     ignore_patterns = filtered_ignore_patterns
+    ignore_matcher = get_ignore_matcher(ignore_patterns)
     
-    # 实现自定义的目录遍历和复制
-    def _copytree(current_src, current_dst, rel_path=""):
-        nonlocal stats
+    def _is_important(rel_path: str) -> bool:
+        return any(rel_path == imp_dir or rel_path.startswith(f"{imp_dir}/") for imp_dir in stats["important_dirs"])
+    
+    def _is_backend(rel_path: str) -> bool:
+        return rel_path == "backend" or rel_path.startswith("backend/")
+    
+    # 判断目录是否跳过，跳过的目录不会被遍历
+    def _prune_dir(rel_dir_path: str, entry: os.DirEntry) -> bool:
+        stats["total_dirs"] += 1
+        if rel_dir_path.startswith("backend/"):
+            stats["backend_dirs"] += 1
         
-        # 检查是否是backend相关目录
-        is_backend = rel_path == "backend" or rel_path.startswith("backend/") or rel_path.startswith("backend\\")
+        # 检查是否应该忽略此目录，重要目录永远不忽略
+        should_ignore = ignore_matcher.match_dir(rel_dir_path)
+        if _is_important(rel_dir_path):
+            if should_ignore:
+                logger.warning(f"重要目录 {rel_dir_path} 被忽略规则匹配，但将被强制处理")
+            should_ignore = False
         
-        # 记录重要目录的处理
-        is_important_dir = False
-        for imp_dir in stats["important_dirs"]:
-            if rel_path == imp_dir or rel_path.startswith(f"{imp_dir}/") or rel_path.startswith(f"{imp_dir}\\"):
-                is_important_dir = True
-                logger.info(f"处理重要目录: {rel_path}")
-                break
-                
-        if is_backend:
-            logger.debug(f"BACKEND目录详情 - 路径: {current_src} -> {current_dst}")
-            logger.debug(f"BACKEND目录详情 - 绝对路径: {os.path.abspath(current_src)}")
-            logger.debug(f"BACKEND目录详情 - 目录存在: {os.path.exists(current_src)}")
-            logger.debug(f"BACKEND目录详情 - 目标目录存在: {os.path.exists(current_dst)}")
+        if should_ignore:
+            stats["ignored_dirs"] += 1
+            logger.info(f"忽略目录: {rel_dir_path}")
+            return True
         
-        # 检查当前源目录是否存在
-        if not os.path.exists(current_src):
-            error_msg = f"源目录不存在: {current_src}"
-            logger.error(error_msg)
-            if is_backend:
-                stats["backend_errors"].append(error_msg)
-            return
+        # 防止目录循环复制：检查目标目录是否会导致循环
+        abs_src = os.path.normpath(os.path.abspath(entry.path))
+        abs_dst = os.path.normpath(os.path.abspath(os.path.join(dst, rel_dir_path)))
+        if abs_src in processed_dirs or abs_dst.startswith(abs_src + os.sep):
+            logger.warning(f"跳过可能导致循环的目录: {rel_dir_path}")
+            return True
+        
+        # 记录已处理的目录
+        processed_dirs.add(abs_src)
+        return False
+    
+    def _on_error(path: str, error: OSError):
+        error_msg = f"无法访问目录 {path}: {error}"
+        logger.warning(error_msg)
+        if _is_backend(os.path.relpath(path, src).replace(os.sep, "/")):
+            stats["backend_errors"].append(error_msg)
+    
+    # 实现自定义的目录遍历和复制：目录先于其内容产出，先创建目标目录再复制文件
+    def _copytree():
+        for rel_path, entry in walk_tree(
+            src, prune=_prune_dir, include_dirs=True, follow_symlinks=True,
+            threads=settings.TREE_WALK_THREADS, on_error=_on_error
+        ):
+            d = os.path.join(dst, rel_path)
             
-        # 检查当前目录是否应该被忽略
-        if rel_path and should_ignore_file(rel_path, ignore_patterns):
-            # 重要目录永远不忽略
-            if not is_important_dir:
-                logger.info(f"忽略目录: {rel_path}")
-                stats["ignored_dirs"] += 1
-                return
-            else:
-                logger.warning(f"重要目录 {rel_path} 被忽略规则匹配，但将被强制处理")
+            if entry.is_dir():
+                is_backend_dir = _is_backend(rel_path)
+                try:
+                    os.makedirs(d, exist_ok=True)
+                    stats["copied_dirs"] += 1
+                    
+                    # 记录重要目录的复制
+                    if _is_important(rel_path):
+                        logger.info(f"复制重要目录: {rel_path}")
+                        if is_backend_dir:
+                            logger.debug(f"BACKEND目录创建: {d}")
+                except Exception as e:
+                    error_msg = f"创建目录 {rel_path} 失败: {str(e)}"
+                    logger.error(error_msg)
+                    logger.error(traceback.format_exc())
+                    if is_backend_dir:
+                        stats["backend_errors"].append(error_msg)
+                continue
             
-        # 确保目标目录存在
-        if not os.path.exists(current_dst):
-            try:
-                os.makedirs(current_dst, exist_ok=True)
-                logger.debug(f"已创建目标目录: {current_dst}")
-            except Exception as e:
-                error_msg = f"创建目标目录失败 {current_dst}: {str(e)}"
-                logger.error(error_msg)
-                logger.error(traceback.format_exc())
-                if is_backend:
-                    stats["backend_errors"].append(error_msg)
-                return
-        
-        # 先处理当前目录下的文件
-        files = []
-        dirs = []
-        
-        try:
-            for item in os.listdir(current_src):
-                s = os.path.join(current_src, item)
-                if os.path.isfile(s):
-                    files.append(item)
-                elif os.path.isdir(s):
-                    dirs.append(item)
-        except PermissionError as e:
-            error_msg = f"无法访问目录 {current_src}: {e}"
-            logger.warning(error_msg)
-            if is_backend:
-                stats["backend_errors"].append(error_msg)
-            return
-        except Exception as e:
-            error_msg = f"列出目录 {current_src} 时出错: {str(e)}"
-            logger.error(error_msg)
-            logger.error(traceback.format_exc())
-            if is_backend:
-                stats["backend_errors"].append(error_msg)
-            return
-        
-        # 处理文件
-        for item in files:
             stats["total_files"] += 1
+            is_backend = rel_path.startswith("backend/")
             if is_backend:
                 stats["backend_files"] += 1
-                
-            s = os.path.join(current_src, item)
-            d = os.path.join(current_dst, item)
-            rel_file_path = os.path.join(rel_path, item) if rel_path else item
-            
-            # 记录详细的backend文件信息
-            if is_backend:
+                # 记录详细的backend文件信息
                 try:
-                    file_size = os.path.getsize(s) if os.path.exists(s) else 0
-                    logger.debug(f"BACKEND文件: {rel_file_path}, 大小: {format_size(file_size)}")
-                except Exception as e:
-                    logger.warning(f"无法获取文件大小 {rel_file_path}: {str(e)}")
+                    logger.debug(f"BACKEND文件: {rel_path}, 大小: {format_size(entry.stat().st_size)}")
+                except OSError as e:
+                    logger.warning(f"无法获取文件大小 {rel_path}: {str(e)}")
             
             # 检查是否是重要文件，如果是则一定复制
-            if item in important_files:
+            if entry.name in important_files:
                 try:
-                    shutil.copy2(s, d)
+                    shutil.copy2(entry.path, d)
                     stats["copied_files"] += 1
-                    logger.info(f"复制重要文件: {rel_file_path}")
+                    logger.info(f"复制重要文件: {rel_path}")
                 except Exception as e:
-                    error_msg = f"复制重要文件 {rel_file_path} 失败: {str(e)}"
+                    error_msg = f"复制重要文件 {rel_path} 失败: {str(e)}"
                     logger.error(error_msg)
                     if is_backend:
                         stats["backend_errors"].append(error_msg)
                 continue
             
             # 检查是否应该忽略此文件
-            should_ignore = should_ignore_file(rel_file_path, ignore_patterns)
-            if should_ignore:
+            if ignore_matcher.match(rel_path):
                 stats["ignored_files"] += 1
-                logger.info(f"忽略文件: {rel_file_path}")
+                logger.info(f"忽略文件: {rel_path}")
                 if is_backend:
-                    logger.warning(f"BACKEND文件被忽略: {rel_file_path}")
+                    logger.warning(f"BACKEND文件被忽略: {rel_path}")
                 continue
             
             # 复制普通文件
             try:
-                shutil.copy2(s, d)
+                shutil.copy2(entry.path, d)
                 stats["copied_files"] += 1
                 
                 # 检查是否属于重要目录的文件
-                if is_important_dir:
-                    logger.info(f"复制重要目录文件: {rel_file_path}")
+                if _is_important(rel_path):
+                    logger.info(f"复制重要目录文件: {rel_path}")
                     if is_backend:
-                        logger.debug(f"BACKEND文件已复制: {rel_file_path}")
+                        logger.debug(f"BACKEND文件已复制: {rel_path}")
                 else:
-                    logger.info(f"复制文件: {rel_file_path}")
+                    logger.info(f"复制文件: {rel_path}")
             except Exception as e:
-                error_msg = f"复制文件 {rel_file_path} 失败: {str(e)}"
+                error_msg = f"复制文件 {rel_path} 失败: {str(e)}"
                 logger.error(error_msg)
                 logger.error(traceback.format_exc())
                 if is_backend:
                     stats["backend_errors"].append(error_msg)
-        
-        # 处理子目录
-        for item in dirs:
-            stats["total_dirs"] += 1
-            if is_backend:
-                stats["backend_dirs"] += 1
-                
-            s = os.path.join(current_src, item)
-            d = os.path.join(current_dst, item)
-            rel_dir_path = os.path.join(rel_path, item) if rel_path else item
-            
-            # 检查是否是重要目录
-            current_is_important_dir = False
-            for imp_dir in stats["important_dirs"]:
-                if rel_dir_path == imp_dir or rel_dir_path.startswith(f"{imp_dir}/") or rel_dir_path.startswith(f"{imp_dir}\\"):
-                    current_is_important_dir = True
-                    break
-                    
-            is_backend_dir = rel_dir_path == "backend" or rel_dir_path.startswith("backend/") or rel_dir_path.startswith("backend\\")
-            
-            # 记录详细的backend目录信息
-            if is_backend_dir:
-                logger.debug(f"BACKEND目录: {rel_dir_path}, 路径: {s}")
-            
-            # 检查是否应该忽略此目录
-            should_ignore = should_ignore_file(rel_dir_path, ignore_patterns)
-            
-            # 重要目录永远不忽略
-            if current_is_important_dir:
-                if should_ignore:
-                    logger.warning(f"重要目录 {rel_dir_path} 被忽略规则匹配，但将被强制处理")
-                should_ignore = False
-            
-            if should_ignore:
-                stats["ignored_dirs"] += 1
-                logger.info(f"忽略目录: {rel_dir_path}")
-                continue
-            
-            # 防止目录循环复制：检查目标目录是否会导致循环
-            abs_src = os.path.normpath(os.path.abspath(s))
-            abs_dst = os.path.normpath(os.path.abspath(d))
-            if abs_src in processed_dirs or abs_dst.startswith(abs_src + os.sep):
-                logger.warning(f"跳过可能导致循环的目录: {rel_dir_path}")
-                continue
-            
-            # 记录已处理的目录
-            processed_dirs.add(abs_src)
-            
-            # 创建目标子目录
-            try:
-                os.makedirs(d, exist_ok=True)
-                stats["copied_dirs"] += 1
-                
-                # 记录重要目录的复制
-                if current_is_important_dir:
-                    logger.info(f"复制重要目录: {rel_dir_path}")
-                    if is_backend_dir:
-                        logger.debug(f"BACKEND目录创建: {d}")
-                
-                # 递归处理子目录
-                _copytree(s, d, rel_dir_path)
-            except Exception as e:
-                error_msg = f"创建目录 {rel_dir_path} 失败: {str(e)}"
-                logger.error(error_msg)
-                logger.error(traceback.format_exc())
-                if is_backend_dir:
-                    stats["backend_errors"].append(error_msg)
     
     # 开始复制
     logger.info(f"开始复制目录: {src} -> {dst}")
@@ -336,7 +254,7 @@ def custom_copytree(src: str, dst: str, ignore_patterns: List[str], important_fi
         logger.error(f"创建BACKEND目标目录失败: {str(e)}")
     
     # 执行复制操作
-    _copytree(src, dst)
+    _copytree()
     
     # 再次确认backend目录是否已复制
     if not os.path.exists(backend_dst_path):
@@ -0,0 +1,356 @@
+"""
+目录变化监听模块
+
+监听一个目录树中的文件变化，以相对路径集合回调：
+- Linux上通过ctypes调用inotify，每个目录一个监听，新建的目录自动加入监听
+- 其他平台或inotify不可用（如监听数量超过系统上限）时定期遍历目录树比较大小和修改时间
+- 被剪枝的目录（依赖目录等）不监听，不遍历
+- 事件队列溢出等无法确定具体变化的情况下回调rescan=True，由调用方完整同步一次
+- inotify监听线程因意外错误退出时回调on_error，由调用方重新开始监听
+
+回调在监听线程中执行，调用方需自行切换到事件循环。
+"""
+
+import os
+import errno
+import select
+import struct
+import logging
+import threading
+import ctypes
+import ctypes.util
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from app.utils.tree_walker import EntryFilter, walk_tree
+
+logger = logging.getLogger(__name__)
+
+BACKEND_AUTO = "auto"
+BACKEND_INOTIFY = "inotify"
+BACKEND_POLLING = "polling"
+
+# inotify事件标志，见 <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+# struct inotify_event 的固定部分: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+# 回调参数: (变化的相对路径, 是否需要完整重新同步)
+ChangeCallback = Callable[[Set[str], bool], None]
+# 监听线程因意外错误退出时的回调
+ErrorCallback = Callable[[Exception], None]
+
+
+class WatcherError(Exception):
+    """无法开始监听"""
+
+
+def _load_libc():
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_libc()
+
+
+def inotify_available() -> bool:
+    return _libc is not None
+
+
+class InotifyWatcher:
+    """基于inotify的目录树监听"""
+
+    def __init__(
+        self,
+        root: str,
+        callback: ChangeCallback,
+        prune: Optional[EntryFilter] = None,
+        on_error: Optional[ErrorCallback] = None
+    ):
+        if _libc is None:
+            raise WatcherError("当前系统不支持inotify")
+        self.root = root
+        self.callback = callback
+        self.prune = prune
+        self.on_error = on_error
+        self._fd = -1
+        self._wake_r, self._wake_w = -1, -1
+        # 监听线程退出时关闭描述符，与stop()写唤醒管道互斥，避免写入已关闭或被复用的描述符
+        self._fd_lock = threading.Lock()
+        # 监听描述符 -> 相对路径（根目录为空字符串）
+        self._watches: Dict[int, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def _add_watch(self, rel_path: str):
+        path = os.path.join(self.root, rel_path) if rel_path else self.root
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise WatcherError("inotify监听数量超过系统上限（fs.inotify.max_user_watches）")
+            if err not in (errno.ENOENT, errno.ENOTDIR):
+                logger.warning(f"无法监听目录 {path}: {os.strerror(err)}")
+            return
+        self._watches[wd] = rel_path
+
+    def _add_tree(self, rel_path: str):
+        """监听目录及其所有未剪枝的子目录"""
+        self._add_watch(rel_path)
+        prefix = rel_path + "/" if rel_path else ""
+        top = os.path.join(self.root, rel_path) if rel_path else self.root
+
+        def prune(path: str, entry: os.DirEntry) -> bool:
+            return self.prune is not None and self.prune(prefix + path, entry)
+
+        for path, entry in walk_tree(top, prune=prune, exclude=lambda path, entry: True, include_dirs=True):
+            self._add_watch(prefix + path)
+
+    def _remove_tree(self, rel_path: str):
+        """目录被移走后移除其下的监听，移到新位置后重新监听"""
+        prefix = rel_path + "/"
+        for wd, path in list(self._watches.items()):
+            if path == rel_path or path.startswith(prefix):
+                _libc.inotify_rm_watch(self._fd, wd)
+                self._watches.pop(wd, None)
+
+    def _is_pruned(self, rel_path: str) -> bool:
+        if self.prune is None:
+            return False
+        path = os.path.join(self.root, rel_path)
+        parent = os.path.dirname(path)
+        try:
+            with os.scandir(parent) as entries:
+                for entry in entries:
+                    if entry.name == os.path.basename(path):
+                        return self.prune(rel_path, entry)
+        except OSError:
+            pass
+        return False
+
+    def _handle(self, data: bytes) -> Tuple[Set[str], bool]:
+        changed: Set[str] = set()
+        rescan = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].split(b"\0", 1)[0]
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                rescan = True
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            parent = self._watches.get(wd)
+            if parent is None:
+                continue
+            if not name:
+                # 监听的目录自身被删除或移走，由上级目录的事件处理
+                if not parent and mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    rescan = True
+                continue
+            rel_path = f"{parent}/{os.fsdecode(name)}" if parent else os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_MOVED_FROM | IN_DELETE):
+                    self._remove_tree(rel_path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    if self._is_pruned(rel_path):
+                        continue
+                    self._add_tree(rel_path)
+                elif mask & IN_ATTRIB:
+                    continue
+            changed.add(rel_path)
+        return changed, rescan
+
+    def _run(self):
+        try:
+            while not self._stopping:
+                readable, _, _ = select.select([self._fd, self._wake_r], [], [])
+                if self._stopping:
+                    break
+                if self._fd not in readable:
+                    continue
+                try:
+                    data = os.read(self._fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                try:
+                    changed, rescan = self._handle(data)
+                except WatcherError as e:
+                    logger.warning(f"{str(e)}，新目录未能加入监听，将完整同步")
+                    changed, rescan = set(), True
+                if changed or rescan:
+                    try:
+                        self.callback(changed, rescan)
+                    except Exception:
+                        logger.exception("处理文件变化时出错")
+        except Exception as e:
+            # 监听已停止，通知调用方，否则之后的变化都不会再同步
+            logger.exception(f"监听目录 {self.root} 意外停止")
+            if self.on_error is not None and not self._stopping:
+                try:
+                    self.on_error(e)
+                except Exception:
+                    logger.exception("处理监听错误时出错")
+        finally:
+            self._close_fds()
+
+    def _close_fds(self):
+        with self._fd_lock:
+            for fd in (self._fd, self._wake_r, self._wake_w):
+                if fd >= 0:
+                    try:
+                        os.close(fd)
+                    except OSError:
+                        pass
+            self._fd = self._wake_r = self._wake_w = -1
+            self._watches.clear()
+
+    def start(self):
+        self._fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise WatcherError(f"inotify初始化失败: {os.strerror(ctypes.get_errno())}")
+        self._wake_r, self._wake_w = os.pipe()
+        try:
+            self._add_tree("")
+        except WatcherError:
+            self._close_fds()
+            raise
+        self._thread = threading.Thread(target=self._run, name="fs-watch-inotify", daemon=True)
+        self._thread.start()
+        logger.info(f"开始监听目录 {self.root}（inotify，{len(self._watches)} 个目录）")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping = True
+        # 监听线程已退出时唤醒管道已关闭，无需唤醒
+        with self._fd_lock:
+            if self._wake_w >= 0 and self._thread.is_alive():
+                os.write(self._wake_w, b"\0")
+        self._thread.join()
+        self._thread = None
+
+
+class PollingWatcher:
+    """定期遍历目录树比较大小和修改时间"""
+
+    def __init__(self, root: str, callback: ChangeCallback, prune: Optional[EntryFilter] = None, interval: float = 2.0):
+        self.root = root
+        self.callback = callback
+        self.prune = prune
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _snapshot(self) -> Tuple[Set[str], Dict[str, Tuple[int, int]]]:
+        dirs: Set[str] = set()
+        files: Dict[str, Tuple[int, int]] = {}
+        for rel_path, entry in walk_tree(self.root, prune=self.prune, include_dirs=True):
+            try:
+                if entry.is_dir():
+                    dirs.add(rel_path)
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+        return dirs, files
+
+    def _run(self, dirs: Set[str], files: Dict[str, Tuple[int, int]]):
+        while not self._stop_event.wait(self.interval):
+            try:
+                new_dirs, new_files = self._snapshot()
+            except Exception:
+                logger.exception(f"遍历目录 {self.root} 失败")
+                continue
+            changed = {path for path, info in new_files.items() if files.get(path) != info}
+            changed.update(path for path in files if path not in new_files)
+            changed.update(dirs ^ new_dirs)
+            dirs, files = new_dirs, new_files
+            if changed:
+                try:
+                    self.callback(changed, False)
+                except Exception:
+                    logger.exception("处理文件变化时出错")
+
+    def start(self):
+        dirs, files = self._snapshot()
+        self._thread = threading.Thread(target=self._run, args=(dirs, files), name="fs-watch-poll", daemon=True)
+        self._thread.start()
+        logger.info(f"开始监听目录 {self.root}（轮询，间隔 {self.interval}秒）")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+
+def create_watcher(
+    root: str,
+    callback: ChangeCallback,
+    prune: Optional[EntryFilter] = None,
+    backend: str = BACKEND_AUTO,
+    poll_interval: float = 2.0,
+    on_error: Optional[ErrorCallback] = None
+):
+    """
+    创建并启动目录监听
+
+    Args:
+        root: 监听的根目录
+        callback: 变化回调，在监听线程中执行
+        prune: 返回True时不监听该目录
+        backend: auto（inotify可用时使用，否则轮询）, inotify, polling
+        poll_interval: 轮询间隔（秒）
+        on_error: inotify监听线程因意外错误退出时的回调，在监听线程中执行；轮询监听出错时跳过本次遍历，不会退出
+
+    Returns:
+        已启动的监听器，调用stop()停止
+    """
+    if backend not in (BACKEND_AUTO, BACKEND_INOTIFY, BACKEND_POLLING):
+        raise ValueError(f"不支持的监听方式: {backend}")
+    if backend != BACKEND_POLLING and inotify_available():
+        watcher = InotifyWatcher(root, callback, prune, on_error)
+        try:
+            watcher.start()
+            return watcher
+        except WatcherError as e:
+            if backend == BACKEND_INOTIFY:
+                raise
+            logger.warning(f"{str(e)}，改为轮询监听 {root}")
+    elif backend == BACKEND_INOTIFY:
+        raise WatcherError("当前系统不支持inotify")
+    watcher = PollingWatcher(root, callback, prune, poll_interval)
+    watcher.start()
+    return watcher
@@ -2,11 +2,16 @@
 .gitignore文件处理模块
 
 该模块使用pathspec库处理.gitignore规则，确保与git的行为一致。
+
+遍历目录树时使用IgnoreMatcher：规则只编译一次，并按规则集和.gitignore修改时间缓存。
 """
 
 import os
+import re
 import logging
-from typing import List, Callable
+import threading
+from collections import OrderedDict
+from typing import List, Callable, Iterable, Optional, Tuple
 
 try:
     import pathspec  # 尝试导入pathspec库
@@ -120,6 +125,11 @@ def create_gitignore_matcher(gitignore_file_path: str = None, patterns: List[str
     
     return matcher
 
+def _project_gitignore_paths(project_path: str) -> Tuple[str, str]:
+    """根目录（向上三级）和项目目录的.gitignore文件路径"""
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(project_path)))
+    return os.path.join(project_root, ".gitignore"), os.path.join(project_path, ".gitignore")
+
 def get_gitignore_patterns(project_path: str) -> List[str]:
     """
     获取项目的忽略规则，包括根目录和项目目录的.gitignore文件
@@ -130,13 +140,9 @@ def get_gitignore_patterns(project_path: str) -> List[str]:
     Returns:
         忽略规则列表
     """
-    # 检查根目录的.gitignore文件，向上查找三级
-    project_root = os.path.dirname(os.path.dirname(os.path.dirname(project_path)))
-    root_gitignore_path = os.path.join(project_root, ".gitignore")
+    # 检查根目录的.gitignore文件，向上查找三级，以及项目目录的.gitignore文件
+    root_gitignore_path, project_gitignore_path = _project_gitignore_paths(project_path)
     root_patterns = parse_gitignore_file(root_gitignore_path)
-    
-    # 检查项目目录的.gitignore文件
-    project_gitignore_path = os.path.join(project_path, ".gitignore") 
     project_patterns = parse_gitignore_file(project_gitignore_path)
     
     # 合并两个列表
@@ -144,10 +150,159 @@ def get_gitignore_patterns(project_path: str) -> List[str]:
             
     return all_patterns
 
+# 重要文件 - 永远不会被忽略
+WHITELIST = frozenset(["start_all.bat", "README.md", "prompt.txt", ".gitignore"])
+# 重要目录本身不忽略
+PROTECTED_DIRS = frozenset(["backend", "frontend", "app"])
+# 路径中包含这些名称时总是忽略
+ALWAYS_IGNORED_NAMES = ("node_modules", ".venv", "venv", "__pycache__")
+# 总是忽略的文件扩展名
+ALWAYS_IGNORED_SUFFIXES = ('.pyc', '.pyo', '.pyd', '.so', '.o', '.a', '.lib', '.dylib', '.dll')
+# 缓存的编译规则数量上限
+MATCHER_CACHE_SIZE = 64
+
+
+class IgnoreMatcher:
+    """
+    编译后的忽略规则，判断结果与should_ignore_file一致
+
+    规则在创建时编译一次；没有取反规则（!pattern）时所有规则合并为一个正则，
+    每个路径只匹配一次。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = tuple(patterns)
+        self._spec = None
+        self._regex = None
+        if HAS_PATHSPEC:
+            self._spec = pathspec.PathSpec.from_lines(pathspec.patterns.GitWildMatchPattern, self.patterns)
+            active = [pattern for pattern in self._spec.patterns if pattern.include is not None]
+            if active and all(pattern.include for pattern in active):
+                # 各规则的正则使用同名分组，合并前改为非捕获分组
+                self._regex = re.compile("|".join(
+                    f"(?:{pattern.regex.pattern.replace('(?P<ps_d>', '(?:')})" for pattern in active
+                ))
+            elif not active:
+                self._spec = None
+
+    def _match_patterns(self, normalized_path: str) -> bool:
+        if self._regex is not None:
+            return self._regex.match(normalized_path) is not None
+        if self._spec is not None:
+            return self._spec.match_file(normalized_path)
+        if HAS_PATHSPEC:
+            return False
+        return _match_simple(normalized_path, self.patterns)
+
+    def match(self, file_path: str) -> bool:
+        """
+        判断文件或目录是否应该被忽略
+
+        Args:
+            file_path: 路径，相对于项目根目录
+        """
+        normalized_path = file_path.replace('\\', '/')
+
+        if normalized_path in WHITELIST or os.path.basename(normalized_path) in WHITELIST:
+            return False
+        if normalized_path in PROTECTED_DIRS:
+            return False
+        if any(name in normalized_path for name in ALWAYS_IGNORED_NAMES):
+            return True
+        if normalized_path.endswith(ALWAYS_IGNORED_SUFFIXES):
+            return True
+        return self._match_patterns(normalized_path)
+
+    def match_dir(self, dir_path: str) -> bool:
+        """
+        判断目录是否应该整个跳过，遍历时据此剪枝
+
+        除match的规则外，只匹配目录的规则（如 build/）也会忽略整个目录，与git一致。
+        """
+        if self.match(dir_path):
+            return True
+        normalized_path = dir_path.replace('\\', '/').rstrip('/')
+        if not normalized_path or normalized_path in PROTECTED_DIRS:
+            return False
+        return self._match_patterns(normalized_path + '/')
+
+    __call__ = match
+
+
+def _match_simple(normalized_path: str, ignore_patterns: Iterable[str]) -> bool:
+    """没有pathspec库时的简化匹配"""
+    for pattern in ignore_patterns:
+        pattern = pattern.strip()
+        
+        # 忽略空行和注释
+        if not pattern or pattern.startswith('#'):
+            continue
+            
+        # 处理通配符
+        if pattern.startswith('*'):
+            if normalized_path.endswith(pattern[1:]):
+                return True
+        # 处理目录匹配
+        elif pattern.endswith('/'):
+            if normalized_path.startswith(pattern) or f"/{pattern}" in normalized_path:
+                return True
+        # 完全匹配
+        elif pattern == normalized_path or normalized_path.endswith(f"/{pattern}") or f"/{pattern}/" in normalized_path:
+            return True
+    
+    return False
+
+
+_matcher_cache: "OrderedDict[tuple, IgnoreMatcher]" = OrderedDict()
+_matcher_lock = threading.Lock()
+
+
+def _cached_matcher(key: tuple, patterns_factory: Callable[[], List[str]]) -> IgnoreMatcher:
+    with _matcher_lock:
+        matcher = _matcher_cache.get(key)
+        if matcher is not None:
+            _matcher_cache.move_to_end(key)
+            return matcher
+    matcher = IgnoreMatcher(patterns_factory())
+    with _matcher_lock:
+        _matcher_cache[key] = matcher
+        while len(_matcher_cache) > MATCHER_CACHE_SIZE:
+            _matcher_cache.popitem(last=False)
+    return matcher
+
+
+def _file_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_ignore_matcher(ignore_patterns: Iterable[str]) -> IgnoreMatcher:
+    """按规则集获取编译后的忽略规则"""
+    patterns = tuple(ignore_patterns)
+    return _cached_matcher(("patterns", patterns), lambda: list(patterns))
+
+
+def get_gitignore_file_matcher(gitignore_file_path: str) -> IgnoreMatcher:
+    """单个.gitignore文件的忽略规则，文件修改后重新编译"""
+    key = ("file", gitignore_file_path, _file_mtime(gitignore_file_path))
+    return _cached_matcher(key, lambda: parse_gitignore_file(gitignore_file_path))
+
+
+def get_project_ignore_matcher(project_path: str) -> IgnoreMatcher:
+    """项目的忽略规则（同get_gitignore_patterns），任一.gitignore修改后重新编译"""
+    root_gitignore_path, project_gitignore_path = _project_gitignore_paths(project_path)
+    key = ("project", project_path, _file_mtime(root_gitignore_path), _file_mtime(project_gitignore_path))
+    return _cached_matcher(key, lambda: get_gitignore_patterns(project_path))
+
+
 def should_ignore_file(file_path: str, ignore_patterns: List[str]) -> bool:
     """
     判断文件是否应该被忽略
     
+    遍历目录树时应先用get_ignore_matcher取得编译后的规则，避免逐个路径查找缓存。
+    
     Args:
         file_path: 文件路径，相对于项目根目录
         ignore_patterns: 忽略规则列表
@@ -155,55 +310,7 @@ def should_ignore_file(file_path: str, ignore_patterns: List[str]) -> bool:
     Returns:
         是否应该忽略
     """
-    # 规范化路径分隔符
-    normalized_path = file_path.replace('\\', '/')
-    
-    # 白名单检查 - 这些文件永远不会被忽略
-    whitelist = ["start_all.bat", "README.md", "prompt.txt", ".gitignore"]
-    if normalized_path in whitelist or os.path.basename(normalized_path) in whitelist:
-        return False
-    
-    # 重要目录本身不忽略
-    protected_dirs = ["backend", "frontend", "app"]
-    if normalized_path in protected_dirs:
-        return False
-    
-    # 特殊目录总是被忽略
-    if any(ignored in normalized_path for ignored in [
-        "node_modules", ".venv", "venv", "__pycache__"
-    ]):
-        return True
-    
-    # 特殊文件扩展名总是被忽略
-    if normalized_path.endswith(('.pyc', '.pyo', '.pyd', '.so', '.o', '.a', '.lib', '.dylib', '.dll')):
-        return True
-    
-    if HAS_PATHSPEC:
-        # 使用pathspec库进行高级匹配
-        spec = pathspec.PathSpec.from_lines(pathspec.patterns.GitWildMatchPattern, ignore_patterns)
-        return spec.match_file(normalized_path)
-    else:
-        # 如果没有pathspec库，使用简化的功能
-        for pattern in ignore_patterns:
-            pattern = pattern.strip()
-            
-            # 忽略空行和注释
-            if not pattern or pattern.startswith('#'):
-                continue
-                
-            # 处理通配符
-            if pattern.startswith('*'):
-                if normalized_path.endswith(pattern[1:]):
-                    return True
-            # 处理目录匹配
-            elif pattern.endswith('/'):
-                if normalized_path.startswith(pattern) or f"/{pattern}" in normalized_path:
-                    return True
-            # 完全匹配
-            elif pattern == normalized_path or normalized_path.endswith(f"/{pattern}") or f"/{pattern}/" in normalized_path:
-                return True
-        
-        return False
+    return get_ignore_matcher(ignore_patterns).match(file_path)
 
 # 保持向后兼容的函数名
 parse_ignore_file = parse_gitignore_file
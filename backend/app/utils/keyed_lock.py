@@ -0,0 +1,43 @@
+"""
+按键区分的互斥锁模块
+
+同一个键上的协程依次执行，不同键之间互不影响；
+没有持有者和等待者的键自动移除，键的数量不会无限增长。
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable
+
+
+class KeyedLock:
+    """按键区分的asyncio互斥锁"""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        # 每个键的持有者和等待者数量
+        self._users: Dict[Hashable, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        """等待并持有键对应的锁"""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+    def locked(self, key: Hashable) -> bool:
+        lock = self._locks.get(key)
+        return lock is not None and lock.locked()
+
+
+# 进程级实例：部署同步锁，手动同步和自动推送不会同时写入同一个部署目录和sync_manifest
+deployment_locks = KeyedLock()
@@ -0,0 +1,379 @@
+"""
+本地文件夹增量同步模块
+
+把本地源目录同步到项目存储目录，只处理变化的部分：
+- 按大小和修改时间（或内容哈希）比较源文件和已有文件，未变化的文件不再复制
+- 变化的文件由线程池并行复制，源目录中已删除的文件和目录在存储目录中删除
+- 文件系统支持时使用reflink（写时复制，不占用额外空间）；可选硬链接，
+  硬链接与源文件共享内容，修改存储目录中的文件会同时修改源文件，因此需要显式开启
+- 进度只统计计数，不逐个文件记录日志
+
+忽略规则与custom_copytree一致：重要目录永远不忽略，重要文件总是复制。
+"""
+
+import os
+import errno
+import shutil
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.utils.ignore_handler import IgnoreMatcher
+from app.utils.tree_walker import walk_tree
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+logger = logging.getLogger(__name__)
+
+LINK_COPY = "copy"
+LINK_REFLINK = "reflink"
+LINK_HARDLINK = "hardlink"
+LINK_MODES = (LINK_COPY, LINK_REFLINK, LINK_HARDLINK)
+
+COMPARE_MTIME = "mtime"
+COMPARE_HASH = "hash"
+COMPARE_MODES = (COMPARE_MTIME, COMPARE_HASH)
+
+# Linux FICLONE ioctl：让目标文件与源文件共享数据块
+FICLONE = 0x40049409
+# 修改时间相差小于该值（纳秒）视为一致，copy2保留纳秒精度
+MTIME_TOLERANCE_NS = 1000
+# 计算哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 重要目录 - 永远不会被忽略
+IMPORTANT_DIRS = ("backend", "frontend", "app", "projects")
+
+# (大小, 修改时间纳秒)
+FileInfo = Tuple[int, int]
+
+
+class LocalSyncStats:
+    """同步进度计数，复制线程并发更新"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files_total = 0
+        self.files_checked = 0
+        self.files_unchanged = 0
+        self.files_copied = 0
+        self.files_linked = 0
+        self.files_deleted = 0
+        self.dirs_deleted = 0
+        self.bytes_copied = 0
+        self.errors: List[Tuple[str, str]] = []
+    
+    def add(self, **counts: int):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+    
+    def failed(self, path: str, error: str):
+        with self._lock:
+            self.files_checked += 1
+            self.errors.append((path, error))
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "files_total": self.files_total,
+                "files_checked": self.files_checked,
+                "files_unchanged": self.files_unchanged,
+                "files_copied": self.files_copied,
+                "files_linked": self.files_linked,
+                "files_deleted": self.files_deleted,
+                "dirs_deleted": self.dirs_deleted,
+                "bytes_copied": self.bytes_copied,
+                "files_failed": len(self.errors),
+            }
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """尝试用reflink复制文件内容，文件系统不支持时返回False"""
+    if not HAS_FCNTL:
+        return False
+    try:
+        with open(src, 'rb') as source, open(dst, 'wb') as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    except OSError as e:
+        if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EPERM):
+            try:
+                os.remove(dst)
+            except OSError:
+                pass
+            return False
+        raise
+    shutil.copystat(src, dst)
+    return True
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LocalFolderSync:
+    """把源目录增量同步到目标目录"""
+    
+    def __init__(
+        self,
+        matcher: IgnoreMatcher,
+        important_files: Iterable[str] = (),
+        keep: Iterable[str] = (),
+        link_mode: str = LINK_REFLINK,
+        compare: str = COMPARE_MTIME,
+        workers: int = 8,
+        walk_threads: int = 0
+    ):
+        """
+        Args:
+            matcher: 忽略规则
+            important_files: 重要文件名，总是复制
+            keep: 目标目录中即使源目录没有也保留的相对路径
+            link_mode: copy（普通复制）, reflink（支持时共享数据块，否则复制）, hardlink（硬链接，失败时复制）
+            compare: mtime（大小和修改时间）, hash（大小相同时比较内容哈希）
+            workers: 复制线程数
+            walk_threads: 遍历目录的线程数
+        """
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"不支持的链接方式: {link_mode}")
+        if compare not in COMPARE_MODES:
+            raise ValueError(f"不支持的比较方式: {compare}")
+        self.matcher = matcher
+        self.important_files = frozenset(important_files)
+        self.keep = frozenset(keep)
+        self.link_mode = link_mode
+        self.compare = compare
+        self.workers = max(1, workers)
+        self.walk_threads = walk_threads
+        self.stats = LocalSyncStats()
+        # 文件系统不支持reflink后不再尝试
+        self._reflink_supported = link_mode == LINK_REFLINK
+    
+    @staticmethod
+    def _is_important_dir(rel_path: str) -> bool:
+        return any(rel_path == name or rel_path.startswith(f"{name}/") for name in IMPORTANT_DIRS)
+    
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """源目录中的路径是否被忽略（不检查上级目录）"""
+        if is_dir:
+            return not self._is_important_dir(rel_path) and self.matcher.match_dir(rel_path)
+        return os.path.basename(rel_path) not in self.important_files and self.matcher.match(rel_path)
+    
+    def _has_ignored_parent(self, rel_path: str) -> bool:
+        parts = rel_path.split("/")[:-1]
+        return any(self.is_ignored("/".join(parts[:i + 1]), True) for i in range(len(parts)))
+    
+    def _scan_source(self, src: str, prefix: str = "") -> Tuple[Set[str], Dict[str, FileInfo]]:
+        """列出源目录，prefix不为空时只列出该子目录（prefix以/结尾）"""
+        dirs: Set[str] = set()
+        files: Dict[str, FileInfo] = {}
+        for rel_path, entry in walk_tree(
+            os.path.join(src, prefix) if prefix else src,
+            prune=lambda rel_path, entry: self.is_ignored(prefix + rel_path, True),
+            exclude=lambda rel_path, entry: self.is_ignored(prefix + rel_path, False),
+            include_dirs=True, follow_symlinks=True, threads=self.walk_threads, prefetch_stat=True
+        ):
+            rel_path = prefix + rel_path
+            if entry.is_dir():
+                dirs.add(rel_path)
+                continue
+            try:
+                stat = entry.stat()
+            except OSError as e:
+                logger.warning(f"无法读取文件信息 {entry.path}: {str(e)}")
+                continue
+            files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+        return dirs, files
+    
+    def _scan_target(self, dst: str, src_dirs: Set[str]) -> Tuple[List[str], Dict[str, FileInfo]]:
+        """
+        列出目标目录
+    
+        Returns:
+            (源目录中已不存在的目录（整个删除）, 目标文件)
+        """
+        stale_dirs: List[str] = []
+    
+        def prune(rel_path: str, entry: os.DirEntry) -> bool:
+            if rel_path not in src_dirs and rel_path not in self.keep:
+                stale_dirs.append(rel_path)
+                return True
+            return False
+    
+        files: Dict[str, FileInfo] = {}
+        for rel_path, entry in walk_tree(dst, prune=prune, threads=self.walk_threads, prefetch_stat=True):
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+        return stale_dirs, files
+    
+    def _is_unchanged(self, src_path: str, dst_path: str, src_info: FileInfo, dst_info: Optional[FileInfo]) -> bool:
+        if dst_info is None or dst_info[0] != src_info[0]:
+            return False
+        if abs(dst_info[1] - src_info[1]) < MTIME_TOLERANCE_NS:
+            return True
+        if self.compare == COMPARE_HASH and _file_hash(src_path) == _file_hash(dst_path):
+            # 内容相同只是修改时间不同，同步修改时间，下次直接按修改时间判断
+            os.utime(dst_path, ns=(src_info[1], src_info[1]))
+            return True
+        return False
+    
+    def _place(self, src_path: str, dst_path: str) -> bool:
+        """复制或链接一个文件，返回是否共享了源文件的数据"""
+        if self.link_mode == LINK_HARDLINK:
+            tmp_path = f"{dst_path}.sync-tmp"
+            try:
+                os.link(src_path, tmp_path)
+                os.replace(tmp_path, dst_path)
+                return True
+            except OSError:
+                # 跨文件系统等情况无法硬链接，改为复制
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        elif self._reflink_supported:
+            if os.path.lexists(dst_path):
+                os.remove(dst_path)
+            if _reflink(src_path, dst_path):
+                return True
+            self._reflink_supported = False
+        if os.path.islink(dst_path) or (os.path.exists(dst_path) and os.stat(dst_path).st_nlink > 1):
+            # 之前以硬链接同步的文件，先断开链接，避免复制时改写源文件
+            os.remove(dst_path)
+        shutil.copy2(src_path, dst_path)
+        return False
+    
+    def _sync_file(self, src: str, dst: str, rel_path: str, src_info: FileInfo, dst_info: Optional[FileInfo]):
+        src_path = os.path.join(src, rel_path)
+        dst_path = os.path.join(dst, rel_path)
+        try:
+            if self._is_unchanged(src_path, dst_path, src_info, dst_info):
+                self.stats.add(files_checked=1, files_unchanged=1)
+                return
+            if self._place(src_path, dst_path):
+                self.stats.add(files_checked=1, files_linked=1)
+            else:
+                self.stats.add(files_checked=1, files_copied=1, bytes_copied=src_info[0])
+        except OSError as e:
+            logger.error(f"同步文件 {rel_path} 失败: {str(e)}")
+            self.stats.failed(rel_path, str(e))
+    
+    def sync(self, src: str, dst: str) -> LocalSyncStats:
+        """
+        同步目录（阻塞，应在线程中调用）
+    
+        Returns:
+            同步统计，单个文件的失败记录在errors中
+        """
+        os.makedirs(dst, exist_ok=True)
+        src_dirs, src_files = self._scan_source(src)
+        stale_dirs, dst_files = self._scan_target(dst, src_dirs)
+        self.stats.files_total = len(src_files)
+    
+        # 先删除源目录中已不存在的文件和目录，再创建新目录
+        for rel_path in stale_dirs:
+            shutil.rmtree(os.path.join(dst, rel_path), ignore_errors=True)
+            self.stats.add(dirs_deleted=1)
+        for rel_path in dst_files:
+            if rel_path not in src_files and rel_path not in self.keep:
+                try:
+                    os.remove(os.path.join(dst, rel_path))
+                    self.stats.add(files_deleted=1)
+                except OSError as e:
+                    logger.warning(f"删除文件 {rel_path} 失败: {str(e)}")
+        for rel_path in sorted(src_dirs):
+            os.makedirs(os.path.join(dst, rel_path), exist_ok=True)
+    
+        self._copy_files(src, dst, src_files, dst_files)
+        snapshot = self.stats.snapshot()
+        logger.info(f"本地文件夹同步完成: {src} -> {dst}, {snapshot}")
+        return self.stats
+    
+    def apply(self, src: str, dst: str, rel_paths: Iterable[str]) -> LocalSyncStats:
+        """
+        只同步指定的路径（阻塞，应在线程中调用）
+    
+        用于文件监听：路径在源目录中存在时同步该文件或整个子目录，不存在时从目标目录删除。
+        被忽略的路径（包括位于被忽略目录下的路径）不处理。
+    
+        Returns:
+            同步统计
+        """
+        src_dirs: Set[str] = set()
+        src_files: Dict[str, FileInfo] = {}
+        removed: List[str] = []
+        for rel_path in sorted(set(rel_paths)):
+            rel_path = rel_path.strip("/")
+            if not rel_path or self._has_ignored_parent(rel_path):
+                continue
+            try:
+                stat = os.stat(os.path.join(src, rel_path))
+            except FileNotFoundError:
+                if rel_path not in self.keep:
+                    removed.append(rel_path)
+                continue
+            except OSError as e:
+                logger.warning(f"无法读取文件信息 {rel_path}: {str(e)}")
+                continue
+            is_dir = os.path.isdir(os.path.join(src, rel_path))
+            if self.is_ignored(rel_path, is_dir):
+                continue
+            if is_dir:
+                src_dirs.add(rel_path)
+                dirs, files = self._scan_source(src, rel_path + "/")
+                src_dirs.update(dirs)
+                src_files.update(files)
+            else:
+                src_files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+        self.stats.files_total = len(src_files)
+    
+        for rel_path in removed:
+            dst_path = os.path.join(dst, rel_path)
+            if os.path.isdir(dst_path) and not os.path.islink(dst_path):
+                shutil.rmtree(dst_path, ignore_errors=True)
+                self.stats.add(dirs_deleted=1)
+            elif os.path.lexists(dst_path):
+                try:
+                    os.remove(dst_path)
+                    self.stats.add(files_deleted=1)
+                except OSError as e:
+                    logger.warning(f"删除文件 {rel_path} 失败: {str(e)}")
+    
+        # 文件和目录互相替换时先删除目标中类型不同的旧路径
+        for rel_path in sorted(src_dirs | {os.path.dirname(path) for path in src_files}):
+            dst_path = os.path.join(dst, rel_path)
+            if os.path.lexists(dst_path) and not os.path.isdir(dst_path):
+                os.remove(dst_path)
+            os.makedirs(dst_path, exist_ok=True)
+        dst_files: Dict[str, FileInfo] = {}
+        for rel_path in src_files:
+            dst_path = os.path.join(dst, rel_path)
+            try:
+                stat = os.stat(dst_path, follow_symlinks=False)
+            except OSError:
+                continue
+            if os.path.isdir(dst_path) and not os.path.islink(dst_path):
+                shutil.rmtree(dst_path, ignore_errors=True)
+                continue
+            dst_files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+    
+        self._copy_files(src, dst, src_files, dst_files)
+        return self.stats
+    
+    def _copy_files(self, src: str, dst: str, src_files: Dict[str, FileInfo], dst_files: Dict[str, FileInfo]):
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="local-sync") as pool:
+            for rel_path, src_info in src_files.items():
+                pool.submit(self._sync_file, src, dst, rel_path, src_info, dst_files.get(rel_path))
@@ -0,0 +1,543 @@
+"""
+清单增量同步模块
+
+按文件清单比较本地项目和远程部署目录，只传输变化的部分：
+- 本地清单：相对路径 → (大小, 修改时间)，内容哈希按需计算并按(大小, 修改时间)缓存
+- 远程清单：一条 find -printf 命令取回全部文件和目录的大小、修改时间
+- 大小和修改时间都一致的文件视为未修改；大小一致但修改时间不同的文件，
+  用一条 sha256sum 命令比较哈希，内容相同时只修正远程的修改时间
+- 新增和修改的文件通过并行SFTP通道上传
+- 只删除上次同步清单中列出、本地已删除的文件；远程运行时生成的文件（数据库、上传的文件、
+  安装依赖生成的锁文件等）从未出现在清单中，不会被删除。没有上次的清单时默认不删除
+- 被忽略的路径（依赖目录、缓存、日志等）在远程不列出也不删除
+
+未修改的重新部署只需要一次远程往返。大小在DEPLOY_DELTA_MIN_SIZE和DEPLOY_DELTA_MAX_SIZE
+之间的已有文件按块级增量传输（见block_delta），只发送变化的块。
+
+上次同步成功后的远程清单压缩保存在部署记录中。下次同步时先用一条命令核对远程
+顶层条目的修改时间指纹，指纹一致时直接用缓存的清单比较，不再列出远程目录。
+"""
+
+import os
+import json
+import zlib
+import shlex
+import fnmatch
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import paramiko
+
+from app.core.config import settings
+from app.utils.ssh_executor import run_ssh_blocking
+from app.utils.block_delta import BlockDeltaUploader
+from app.utils.sftp_transfer import (
+    SFTPUploader, TransferProgress, UploadItem, build_batched_commands, iter_upload_entries
+)
+from app.utils.ignore_handler import get_gitignore_patterns, get_ignore_matcher
+
+logger = logging.getLogger(__name__)
+
+# 清单项: (大小, 修改时间, 内容哈希)，哈希未计算时为None
+ManifestEntry = Tuple[int, float, Optional[str]]
+Manifest = Dict[str, ManifestEntry]
+
+# 本地和远程清单中都不列出的名称（find -name 模式）：隐藏文件和临时文件不上传，依赖目录在远程安装生成
+PRUNE_NAMES = ("node_modules", "venv", "__pycache__", ".*", "*.tmp", "*.temp")
+# 远程删除时额外保留的路径（启动后在远程生成的文件）
+PRESERVE_PATTERNS = ["logs/", "*.log", "*.pid"]
+# 修改时间相差小于该值视为一致（SFTP只保留整数秒）
+MTIME_TOLERANCE = 1.0
+# 计算哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+# 远程清单输出中目录指纹所在行的前缀
+FINGERPRINT_MARKER = "@@fingerprint "
+# 远程目录不存在时的指纹
+FINGERPRINT_MISSING = "missing"
+# 缓存清单的格式版本，格式变化时旧缓存自动失效
+MANIFEST_VERSION = 1
+# 缓存的本地文件哈希数量上限，按最近使用淘汰
+HASH_CACHE_SIZE = 20000
+
+# 本地文件哈希缓存: 绝对路径 → (大小, 修改时间, 哈希)
+_hash_cache: "OrderedDict[str, ManifestEntry]" = OrderedDict()
+_hash_lock = threading.Lock()
+
+
+def file_hash(path: str, size: int, mtime: float) -> str:
+    """本地文件的sha256，大小和修改时间未变化时使用缓存"""
+    with _hash_lock:
+        cached = _hash_cache.get(path)
+        if cached is not None:
+            _hash_cache.move_to_end(path)
+    if cached is not None and cached[0] == size and cached[1] == mtime:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _hash_lock:
+        _hash_cache[path] = (size, mtime, value)
+        _hash_cache.move_to_end(path)
+        while len(_hash_cache) > HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+    return value
+
+
+def is_pruned_name(name: str) -> bool:
+    """名称是否匹配PRUNE_NAMES，与远程 find -name 一样区分大小写"""
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in PRUNE_NAMES)
+
+
+def build_local_manifest(local_root: str) -> Tuple[Manifest, Set[str]]:
+    """
+    本地清单
+
+    与远程清单跳过相同的名称，否则依赖目录中的文件每次都会被当作新增文件重新上传。
+
+    Returns:
+        (文件清单, 目录集合)，路径都是相对于local_root、以/分隔
+    """
+    files: Manifest = {}
+    dirs: Set[str] = set()
+    for local_path, relative, stat in iter_upload_entries(local_root, skip_name=is_pruned_name):
+        if stat is None:
+            dirs.add(relative)
+        else:
+            files[relative] = (stat.st_size, stat.st_mtime, None)
+    return files, dirs
+
+
+def build_remote_manifest_command(remote_root: str) -> str:
+    """
+    列出远程目录清单的命令
+
+    每行输出"类型\\t大小\\t修改时间\\t相对路径"，最后一行为"@@fingerprint 目录指纹"
+    """
+    prune = " -o ".join(f"-name {shlex.quote(name)}" for name in PRUNE_NAMES)
+    return (
+        f"cd -- {shlex.quote(remote_root)} 2>/dev/null || {{ echo '{FINGERPRINT_MARKER}{FINGERPRINT_MISSING}'; exit 0; }}; "
+        f"find . -mindepth 1 \\( {prune} \\) -prune -o \\( -type f -o -type d \\) "
+        f"-printf '%y\\t%s\\t%T@\\t%P\\n'; printf '{FINGERPRINT_MARKER}'; {_fingerprint_script()}"
+    )
+
+
+def parse_remote_manifest(output: str) -> Tuple[Manifest, Set[str], Optional[str]]:
+    """
+    解析远程清单
+
+    Returns:
+        (文件清单, 目录集合, 目录指纹)
+    """
+    files: Manifest = {}
+    dirs: Set[str] = set()
+    fingerprint = None
+    for line in output.splitlines():
+        if line.startswith(FINGERPRINT_MARKER):
+            fingerprint = line[len(FINGERPRINT_MARKER):].strip()
+            continue
+        parts = line.split("\t", 3)
+        if len(parts) != 4 or not parts[3]:
+            continue
+        kind, size, mtime, path = parts
+        try:
+            if kind == "f":
+                files[path] = (int(size), float(mtime), None)
+            elif kind == "d":
+                dirs.add(path)
+        except ValueError:
+            continue
+    return files, dirs, fingerprint
+
+
+def _fingerprint_script() -> str:
+    """在远程目录中计算指纹的命令：顶层条目的类型、大小、修改时间排序后的校验和"""
+    # 远程运行时会变化的条目（依赖目录、日志、pid文件）不参与计算
+    names = PRUNE_NAMES + ("logs", "*.log", "*.pid")
+    prune = " -o ".join(f"-name {shlex.quote(name)}" for name in names)
+    return (
+        f"find . -mindepth 1 -maxdepth 1 \\( {prune} \\) -prune -o "
+        f"-printf '%y\\t%s\\t%T@\\t%P\\n' | LC_ALL=C sort | cksum"
+    )
+
+
+def build_fingerprint_command(remote_root: str) -> str:
+    """远程目录指纹的命令，目录不存在时输出missing"""
+    return f"cd -- {shlex.quote(remote_root)} 2>/dev/null || {{ echo {FINGERPRINT_MISSING}; exit 0; }}; {_fingerprint_script()}"
+
+
+def encode_manifest(remote_root: str, fingerprint: str, files: Manifest, dirs: Set[str]) -> bytes:
+    """把清单序列化为压缩的JSON，保存到部署记录"""
+    data = {
+        "version": MANIFEST_VERSION,
+        "root": remote_root,
+        "fingerprint": fingerprint,
+        "files": {path: [size, mtime, digest] for path, (size, mtime, digest) in files.items()},
+        "dirs": sorted(dirs),
+    }
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decode_manifest(blob: Optional[bytes], remote_root: str) -> Optional[Tuple[str, Manifest, Set[str]]]:
+    """
+    解析缓存的清单
+
+    Returns:
+        (指纹, 文件清单, 目录集合)，缓存为空、已损坏、版本或远程目录不一致时返回None
+    """
+    if not blob:
+        return None
+    try:
+        data = json.loads(zlib.decompress(blob).decode("utf-8"))
+        if data.get("version") != MANIFEST_VERSION or data.get("root") != remote_root:
+            return None
+        files = {path: (int(size), float(mtime), digest) for path, (size, mtime, digest) in data["files"].items()}
+        return data["fingerprint"], files, set(data["dirs"])
+    except (zlib.error, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"缓存的文件清单无效，将重新读取远程清单: {str(e)}")
+        return None
+
+
+class SyncPlan:
+    """一次同步要执行的操作"""
+
+    def __init__(self):
+        self.upload: List[str] = []
+        self.verify: List[str] = []
+        self.delete: List[str] = []
+        self.delete_dirs: List[str] = []
+        self.mkdirs: List[str] = []
+        self.unchanged = 0
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.upload or self.verify or self.delete or self.delete_dirs or self.mkdirs)
+
+
+def plan_sync(
+    local_files: Manifest,
+    local_dirs: Set[str],
+    remote_files: Manifest,
+    remote_dirs: Set[str],
+    keep: Callable[[str], bool]
+) -> SyncPlan:
+    """
+    比较本地和远程清单，得出要上传、核对哈希、删除的文件
+
+    Args:
+        keep: 远程独有的路径（目录以/结尾）是否保留
+    """
+    plan = SyncPlan()
+    for path, (size, mtime, digest) in local_files.items():
+        remote = remote_files.get(path)
+        if remote is None or remote[0] != size:
+            plan.upload.append(path)
+        elif abs(remote[1] - mtime) < MTIME_TOLERANCE:
+            plan.unchanged += 1
+        elif digest is not None and remote[2] is not None:
+            # 两边都有哈希（例如来自缓存的清单）时直接比较
+            if digest == remote[2]:
+                plan.unchanged += 1
+            else:
+                plan.upload.append(path)
+        else:
+            plan.verify.append(path)
+
+    plan.delete = sorted(path for path in remote_files if path not in local_files and not keep(path))
+    plan.mkdirs = sorted(path for path in local_dirs if path not in remote_dirs)
+    # 子目录在前，非空目录 rmdir 会失败，不会误删被忽略的内容
+    plan.delete_dirs = sorted(
+        (path for path in remote_dirs if path not in local_dirs and not keep(path + "/")),
+        key=lambda path: path.count("/"),
+        reverse=True
+    )
+    plan.upload.sort()
+    plan.verify.sort()
+    return plan
+
+
+class SyncResult:
+    """增量同步结果"""
+
+    def __init__(self, plan: SyncPlan, progress: Optional[TransferProgress] = None):
+        self.plan = plan
+        self.progress = progress or TransferProgress()
+        self.verified_unchanged = 0
+        self.delta_files = 0
+        self.round_trips = 0
+        self.local_root = ""
+        self.local_files: Manifest = {}
+        self.local_dirs: Set[str] = set()
+        self.cache_hit = False
+        # 比较前读取的远程目录指纹
+        self.fingerprint: Optional[str] = None
+        # 同步后的远程清单（压缩），远程状态不确定时为None
+        self.manifest: Optional[bytes] = None
+
+    @property
+    def uploaded(self) -> int:
+        return self.progress.files_done - len(self.progress.errors)
+
+    def summary(self) -> Dict:
+        snapshot = self.progress.snapshot()
+        return {
+            "uploaded": self.uploaded,
+            "unchanged": self.plan.unchanged + self.verified_unchanged,
+            "deleted": len(self.plan.delete),
+            "delta": self.delta_files,
+            "failed": len(self.progress.errors),
+            "bytes_sent": snapshot["bytes_sent"],
+            "elapsed": snapshot["elapsed"],
+            "round_trips": self.round_trips,
+            "cache_hit": self.cache_hit,
+        }
+
+
+class ManifestSync:
+    """基于文件清单的增量同步（仅支持类Unix远程机器）"""
+
+    def __init__(
+        self,
+        client: paramiko.SSHClient,
+        parallelism: Optional[int] = None,
+        delete: bool = False,
+        ignore_patterns: Optional[List[str]] = None,
+        delta_min_size: Optional[int] = None,
+        delta_max_size: Optional[int] = None
+    ):
+        self.client = client
+        self.parallelism = parallelism
+        # 为True时删除所有远程独有且未被忽略的路径，否则只删除上次同步过、本地已删除的路径
+        self.delete = delete
+        self.ignore_patterns = ignore_patterns
+        # 远程已有且不小于该大小的文件按块级增量传输，0表示不使用
+        self.delta_min_size = settings.DEPLOY_DELTA_MIN_SIZE if delta_min_size is None else delta_min_size
+        # 超过该大小的文件计算校验和比直接上传还慢，0表示不限制
+        self.delta_max_size = settings.DEPLOY_DELTA_MAX_SIZE if delta_max_size is None else delta_max_size
+
+    def _exec_blocking(self, command: str) -> Tuple[int, str, str]:
+        stdin, stdout, stderr = self.client.exec_command(command)
+        out = stdout.read().decode('utf-8', errors='replace')
+        err = stderr.read().decode('utf-8', errors='replace').strip()
+        return stdout.channel.recv_exit_status(), out, err
+
+    async def _exec(self, result: SyncResult, command: str) -> Tuple[int, str, str]:
+        result.round_trips += 1
+        return await run_ssh_blocking(self._exec_blocking, command)
+
+    async def fetch_remote_manifest(self, remote_root: str, result: Optional[SyncResult] = None) -> Tuple[Manifest, Set[str]]:
+        """一条命令取回远程清单和目录指纹，远程目录不存在时返回空清单"""
+        result = result or SyncResult(SyncPlan())
+        exit_status, out, err = await self._exec(result, build_remote_manifest_command(remote_root))
+        if exit_status != 0 and not out:
+            raise IOError(f"读取远程文件清单失败: {err}")
+        files, dirs, result.fingerprint = parse_remote_manifest(out)
+        return files, dirs
+
+    async def fetch_fingerprint(self, remote_root: str, result: Optional[SyncResult] = None) -> str:
+        """远程目录指纹"""
+        result = result or SyncResult(SyncPlan())
+        exit_status, out, err = await self._exec(result, build_fingerprint_command(remote_root))
+        if exit_status != 0:
+            raise IOError(f"读取远程目录指纹失败: {err}")
+        return out.strip()
+
+    async def refresh_manifest(self, remote_root: str, manifest: Optional[bytes]) -> Optional[bytes]:
+        """
+        同步后远程目录被修改（如安装依赖改写了锁文件）时，用新的目录指纹更新清单
+
+        文件清单不变：这些修改不是同步产生的，下次同步不应因此判定远程已变化。
+        清单无效或无法读取指纹时返回None。
+        """
+        cached = decode_manifest(manifest, remote_root)
+        if cached is None:
+            return None
+        _, files, dirs = cached
+        try:
+            fingerprint = await self.fetch_fingerprint(remote_root)
+        except IOError as e:
+            logger.warning(f"无法更新文件清单缓存: {str(e)}")
+            return None
+        return encode_manifest(remote_root, fingerprint, files, dirs)
+
+    async def _verify(self, result: SyncResult, local_root: str, remote_root: str, local_files: Manifest):
+        """比较大小一致但修改时间不同的文件的哈希"""
+        paths = result.plan.verify
+        local_hashes = await asyncio.to_thread(lambda: {
+            path: file_hash(os.path.join(local_root, path), local_files[path][0], local_files[path][1])
+            for path in paths
+        })
+        for path, digest in local_hashes.items():
+            size, mtime, _ = local_files[path]
+            local_files[path] = (size, mtime, digest)
+
+        remote_hashes: Dict[str, str] = {}
+        prefix = f"cd -- {shlex.quote(remote_root)} && sha256sum --"
+        for command in build_batched_commands(prefix, paths):
+            _, out, _ = await self._exec(result, command)
+            for line in out.splitlines():
+                # 文件名含特殊字符时sha256sum以\开头转义，这类文件直接重新上传
+                digest, sep, path = line.partition("  ")
+                if sep and not digest.startswith("\\"):
+                    remote_hashes[path] = digest
+
+        same = [path for path in paths if remote_hashes.get(path) == local_hashes[path]]
+        result.plan.upload.extend(path for path in paths if remote_hashes.get(path) != local_hashes[path])
+        result.verified_unchanged = len(same)
+
+        if same:
+            # 内容一致，只把远程修改时间改为本地的，下次同步不必再核对哈希
+            touches = [
+                f"touch -c -m -d @{int(local_files[path][1])} -- {shlex.quote(path)}"
+                for path in same
+            ]
+            for start in range(0, len(touches), 200):
+                command = f"cd -- {shlex.quote(remote_root)} && {{ " + "; ".join(touches[start:start + 200]) + "; } 2>/dev/null; true"
+                await self._exec(result, command)
+
+    async def _apply_deletes(self, result: SyncResult, remote_root: str):
+        root = shlex.quote(remote_root)
+        for command in build_batched_commands(f"cd -- {root} && rm -f --", result.plan.delete):
+            exit_status, _, err = await self._exec(result, command)
+            if exit_status != 0:
+                logger.warning(f"删除远程文件出错: {err}")
+        for command in build_batched_commands(f"cd -- {root} && rmdir --", result.plan.delete_dirs, suffix=" 2>/dev/null; true"):
+            await self._exec(result, command)
+
+    async def sync(
+        self,
+        local_root: str,
+        remote_root: str,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        remote_manifest: Optional[Tuple[Manifest, Set[str]]] = None,
+        cached_manifest: Optional[bytes] = None,
+        previous_manifest: Optional[bytes] = None
+    ) -> SyncResult:
+        """
+        把本地目录增量同步到远程目录
+
+        Args:
+            local_root: 本地目录
+            remote_root: 远程目录
+            on_progress: 上传进度回调
+            remote_manifest: 已知的远程清单，为空时从远程读取
+            cached_manifest: 上次同步保存的压缩清单，远程指纹一致时代替远程清单
+            previous_manifest: 上次同步保存的压缩清单，只删除其中列出、本地已删除的路径；
+                为空时使用cached_manifest
+
+        Returns:
+            同步结果，manifest为本次同步后应保存的压缩清单
+        """
+        remote_root = remote_root.rstrip('/') or '/'
+        local_files, local_dirs = await asyncio.to_thread(build_local_manifest, local_root)
+        result = SyncResult(SyncPlan())
+        if remote_manifest is None and cached_manifest:
+            cached = decode_manifest(cached_manifest, remote_root)
+            if cached is not None:
+                fingerprint, cached_files, cached_dirs = cached
+                result.fingerprint = await self.fetch_fingerprint(remote_root, result)
+                if result.fingerprint == fingerprint:
+                    remote_manifest = (cached_files, cached_dirs)
+                    result.cache_hit = True
+                else:
+                    logger.info(f"远程目录已变化，不使用缓存的文件清单: {remote_root}")
+        if remote_manifest is None:
+            remote_manifest = await self.fetch_remote_manifest(remote_root, result)
+        remote_files, remote_dirs = remote_manifest
+
+        patterns = self.ignore_patterns
+        if patterns is None:
+            patterns = await asyncio.to_thread(get_gitignore_patterns, local_root)
+        is_ignored = get_ignore_matcher(list(patterns) + PRESERVE_PATTERNS).match
+        previous = decode_manifest(previous_manifest or cached_manifest, remote_root)
+        synced_files, synced_dirs = (previous[1], previous[2]) if previous else ({}, set())
+
+        def keep(path: str) -> bool:
+            if is_ignored(path):
+                return True
+            if self.delete:
+                return False
+            # 不是由同步上传的路径（远程运行时生成的文件）保留
+            if path.endswith("/"):
+                return path[:-1] not in synced_dirs
+            return path not in synced_files
+
+        # 只有远程独有的路径需要判断是否保留，数量通常很少
+        result.plan = plan_sync(local_files, local_dirs, remote_files, remote_dirs, keep)
+        result.local_root = local_root
+        result.local_files = local_files
+        result.local_dirs = local_dirs
+
+        if result.plan.verify:
+            await self._verify(result, local_root, remote_root, local_files)
+
+        if result.plan.upload or result.plan.mkdirs:
+            dirs = [remote_root] + [f"{remote_root.rstrip('/')}/{path}" for path in result.plan.mkdirs]
+            items = [
+                (path, (os.path.join(local_root, path), f"{remote_root.rstrip('/')}/{path}",
+                        local_files[path][0], local_files[path][1]))
+                for path in sorted(result.plan.upload)
+            ]
+            progress = TransferProgress()
+
+            # 远程已有的大文件只发送变化的块，无法增量传输的退回整体上传
+            delta_items = [
+                (path, item) for path, item in items
+                if self.delta_min_size and item[2] >= self.delta_min_size and path in remote_files
+                and not (self.delta_max_size and item[2] > self.delta_max_size)
+            ]
+            if delta_items:
+                delta_paths = {path for path, _ in delta_items}
+                items = [(path, item) for path, item in items if path not in delta_paths]
+                progress.files_total += len(delta_items)
+                progress.bytes_total += sum(item[2] for _, item in delta_items)
+                delta = BlockDeltaUploader(self.client)
+                done, fallback = await delta.upload_files(delta_items, remote_root, progress)
+                result.round_trips += delta.round_trips
+                result.delta_files = len(done)
+                for path, digest in done.items():
+                    size, mtime, _ = local_files[path]
+                    local_files[path] = (size, mtime, digest)
+                progress.files_total -= len(fallback)
+                progress.bytes_total -= sum(item[2] for _, item in fallback)
+                items = sorted(items + fallback)
+
+            files: List[UploadItem] = [item for _, item in items]
+            uploader = SFTPUploader(self.client, parallelism=self.parallelism, skip_unchanged=False)
+            result.progress = await uploader.upload_files(dirs, files, remote_root, on_progress, progress=progress)
+            result.round_trips += 1
+
+        if result.plan.delete or result.plan.delete_dirs:
+            await self._apply_deletes(result, remote_root)
+
+        result.progress.finished = result.progress.finished or result.progress.started
+        result.manifest = await self._build_cache(result, remote_root, cached_manifest)
+        logger.info(f"增量同步完成: {remote_root}, {result.summary()}")
+        return result
+
+    async def _build_cache(self, result: SyncResult, remote_root: str, cached_manifest: Optional[bytes]) -> Optional[bytes]:
+        """同步后的远程清单：成功上传和未修改的文件与本地一致"""
+        if result.plan.is_empty and result.cache_hit:
+            # 远程没有任何变化，清单沿用缓存
+            return cached_manifest
+
+        files = dict(result.local_files)
+        for failed_path, _ in result.progress.errors:
+            # 上传失败的文件远程状态未知，从清单中去掉，下次重新上传
+            files.pop(os.path.relpath(failed_path, result.local_root).replace(os.sep, '/'), None)
+
+        fingerprint = result.fingerprint
+        if not result.plan.is_empty or fingerprint is None:
+            # 同步改变了远程目录，重新读取指纹
+            try:
+                fingerprint = await self.fetch_fingerprint(remote_root, result)
+            except IOError as e:
+                logger.warning(f"无法保存文件清单缓存: {str(e)}")
+                return None
+        return encode_manifest(remote_root, fingerprint, files, result.local_dirs)
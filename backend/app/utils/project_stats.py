@@ -0,0 +1,207 @@
+"""
+项目统计模块
+
+统计项目的文件数量、总大小、代码行数和按语言的分项（阻塞，应在线程中调用）：
+- 遍历目录时应用项目的忽略规则，只读取stat
+- 代码文件的行数按 相对路径 → (大小, 修改时间, 行数) 缓存，大小和修改时间都未变化的文件不再读取
+- 行数按二进制块读取后统计换行符，不解码文本；需要重新统计的文件较多时由线程池并行读取
+- 缓存压缩保存在项目记录中，统计结果另存一份，项目列表直接返回
+"""
+
+import os
+import json
+import zlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.file_utils import format_size
+from app.utils.ignore_handler import IgnoreMatcher
+from app.utils.tree_walker import walk_tree
+
+logger = logging.getLogger(__name__)
+
+# 行数缓存格式版本，统计规则变化时修改，使旧缓存失效
+STATS_INDEX_VERSION = 2
+# 统计行数时的读取块大小
+LINE_COUNT_BLOCK_SIZE = 1024 * 1024
+# 需要重新统计的文件少于该数量时不使用线程池
+PARALLEL_MIN_FILES = 64
+
+# 统计代码行数的文件类型
+LANGUAGE_EXTENSIONS = {
+    ".py": "Python",
+    ".js": "JavaScript",
+    ".jsx": "JavaScript",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".html": "HTML",
+    ".css": "CSS",
+    ".java": "Java",
+    ".c": "C",
+    ".h": "C",
+    ".cpp": "C++",
+    ".hpp": "C++",
+    ".cs": "C#",
+    ".php": "PHP",
+    ".rb": "Ruby",
+    ".go": "Go",
+    ".rs": "Rust",
+    ".swift": "Swift",
+    ".kt": "Kotlin",
+    ".sql": "SQL",
+}
+
+# 相对路径 → (大小, 修改时间ns, 行数)
+StatsIndex = Dict[str, Tuple[int, int, int]]
+
+
+def language_for(path: str) -> Optional[str]:
+    """按扩展名判断代码语言，不统计行数的文件返回None"""
+    return LANGUAGE_EXTENSIONS.get(os.path.splitext(path)[1])
+
+
+def count_lines(path: str, block_size: int = LINE_COUNT_BLOCK_SIZE) -> int:
+    """
+    统计文件行数
+
+    按块统计换行符，最后一行没有换行符时也计为一行。
+    """
+    lines = 0
+    last = b"\n"
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return lines if last == b"\n" else lines + 1
+
+
+def count_lines_many(paths: List[str], workers: int = 8) -> List[Optional[int]]:
+    """并行统计多个文件的行数，无法读取的文件为None"""
+    def count(batch: List[str]) -> List[Optional[int]]:
+        counts = []
+        for path in batch:
+            try:
+                counts.append(count_lines(path))
+            except OSError as e:
+                logger.warning(f"统计代码行数出错: {path}, {e}")
+                counts.append(None)
+        return counts
+
+    if workers < 2 or len(paths) < PARALLEL_MIN_FILES:
+        return count(paths)
+    # 按批提交，避免每个文件一个任务的调度开销
+    batch_size = max(PARALLEL_MIN_FILES // 4, min(1024, len(paths) // (workers * 4)))
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="line-count") as pool:
+        return [lines for counts in pool.map(count, batches) for lines in counts]
+
+
+def encode_stats_index(index: StatsIndex) -> bytes:
+    """把行数缓存序列化为压缩的JSON，保存到项目记录"""
+    data = {
+        "version": STATS_INDEX_VERSION,
+        "files": {path: list(value) for path, value in index.items()},
+    }
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decode_stats_index(blob: Optional[bytes]) -> StatsIndex:
+    """解析行数缓存，缓存为空、已损坏或版本不一致时返回空缓存"""
+    if not blob:
+        return {}
+    try:
+        data = json.loads(zlib.decompress(blob).decode("utf-8"))
+        if data.get("version") != STATS_INDEX_VERSION:
+            return {}
+        return {path: (int(size), int(mtime_ns), int(lines)) for path, (size, mtime_ns, lines) in data["files"].items()}
+    except (zlib.error, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"项目统计缓存无效，将重新统计: {str(e)}")
+        return {}
+
+
+class ProjectStatsResult:
+    """一次统计的结果"""
+
+    def __init__(self, stats: Dict, index: StatsIndex, recounted: int):
+        self.stats = stats
+        self.index = index
+        self.recounted = recounted  # 重新统计行数的文件数
+
+
+def compute_project_stats(
+    storage_path: str,
+    matcher: Optional[IgnoreMatcher] = None,
+    index: Optional[StatsIndex] = None,
+    threads: int = 0,
+    workers: int = 8
+) -> ProjectStatsResult:
+    """
+    统计项目，只重新读取变化的代码文件
+
+    Args:
+        storage_path: 项目存储目录
+        matcher: 忽略规则
+        index: 上次统计的行数缓存
+        threads: 遍历目录的线程数
+        workers: 统计行数的线程数
+
+    Returns:
+        统计结果和新的行数缓存
+    """
+    index = index or {}
+    stats = {
+        "file_count": 0,
+        "total_size_bytes": 0,
+        "code_lines": 0,
+        "total_size_human": "",
+        "ignore_file_exists": os.path.exists(os.path.join(storage_path, ".gitignore")),
+    }
+    # (相对路径, 语言, 大小, 修改时间ns, 行数)，行数为None的需要重新统计
+    code_files: List[list] = []
+    pending: List[int] = []
+
+    # 被忽略的目录不再遍历
+    for rel_path, entry in walk_tree(storage_path, matcher=matcher, threads=threads, prefetch_stat=True):
+        stats["file_count"] += 1
+        try:
+            stat = entry.stat()
+        except OSError as e:
+            logger.warning(f"无法读取文件信息: {entry.path}, {e}")
+            continue
+        stats["total_size_bytes"] += stat.st_size
+
+        language = language_for(rel_path)
+        if language is None:
+            continue
+        cached = index.get(rel_path)
+        lines = None
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            lines = cached[2]
+        else:
+            pending.append(len(code_files))
+        code_files.append([rel_path, language, stat.st_size, stat.st_mtime_ns, lines])
+
+    counted = count_lines_many([os.path.join(storage_path, code_files[i][0]) for i in pending], workers)
+    for i, lines in zip(pending, counted):
+        code_files[i][4] = lines
+
+    new_index: StatsIndex = {}
+    languages: Dict[str, Dict[str, int]] = {}
+    for rel_path, language, size, mtime_ns, lines in code_files:
+        if lines is None:
+            continue
+        new_index[rel_path] = (size, mtime_ns, lines)
+        stats["code_lines"] += lines
+        language_stats = languages.setdefault(language, {"files": 0, "code_lines": 0, "size_bytes": 0})
+        language_stats["files"] += 1
+        language_stats["code_lines"] += lines
+        language_stats["size_bytes"] += size
+
+    stats["total_size_human"] = format_size(stats["total_size_bytes"])
+    # 按代码行数从多到少排列
+    stats["languages"] = dict(sorted(languages.items(), key=lambda item: (-item[1]["code_lines"], item[0])))
+    return ProjectStatsResult(stats, new_index, sum(1 for lines in counted if lines is not None))
@@ -0,0 +1,346 @@
+"""
+SFTP并行上传模块
+
+在同一个池化SSH连接上打开多个SFTP通道并行上传目录：
+- 先用一条命令批量创建全部远程目录，不再每个目录执行一次mkdir
+- N个工作线程各自持有一个SFTP通道，从共享队列领取文件上传
+- 写入使用流水线模式，不逐块等待服务器确认
+- 上传后保留本地修改时间，下次同步可以跳过未修改的文件
+- 统计已上传的文件数、字节数和吞吐量
+"""
+
+import os
+import time
+import queue
+import shlex
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import paramiko
+
+from app.core.config import settings
+from app.utils.ssh_executor import run_ssh_blocking, run_transfer_blocking
+from app.utils.ignore_handler import IgnoreMatcher
+from app.utils.tree_walker import walk_tree
+
+logger = logging.getLogger(__name__)
+
+# 每次写入的块大小（SFTP单个数据包的上限）
+CHUNK_SIZE = 32768
+# 批量mkdir单条命令的最大长度
+MKDIR_BATCH_CHARS = 64 * 1024
+
+# (本地路径, 远程路径, 大小, 修改时间)
+UploadItem = Tuple[str, str, int, float]
+
+
+def should_skip_name(name: str) -> bool:
+    """跳过隐藏文件和临时文件"""
+    return name.startswith('.') or name.endswith('.tmp') or name.endswith('.temp')
+
+
+def iter_upload_entries(
+    local_root: str,
+    matcher: Optional[IgnoreMatcher] = None,
+    skip_name: Callable[[str], bool] = should_skip_name
+) -> Iterator[Tuple[str, str, Optional[os.stat_result]]]:
+    """
+    遍历要上传的目录和文件，父目录先于其内容产出
+
+    Args:
+        local_root: 本地目录
+        matcher: 忽略规则，提供时被忽略的目录不再遍历、被忽略的文件跳过
+        skip_name: 按名称跳过目录和文件的规则
+
+    Yields:
+        (本地路径, 相对路径（/分隔）, 文件信息)，目录的文件信息为None
+    """
+    prune = lambda rel_path, entry: skip_name(entry.name)
+    exclude = prune
+    if matcher is not None:
+        prune = lambda rel_path, entry: skip_name(entry.name) or matcher.match_dir(rel_path)
+        exclude = lambda rel_path, entry: skip_name(entry.name) or matcher.match(rel_path)
+    for relative, entry in walk_tree(
+        local_root, prune=prune, exclude=exclude, include_dirs=True, sort=True,
+        threads=settings.TREE_WALK_THREADS, prefetch_stat=True
+    ):
+        if entry.is_dir():
+            yield entry.path, relative, None
+            continue
+        try:
+            stat = entry.stat()
+        except OSError as e:
+            logger.warning(f"无法读取文件信息 {entry.path}: {str(e)}")
+            continue
+        yield entry.path, relative, stat
+
+
+def collect_upload_tree(local_root: str, remote_root: str) -> Tuple[List[str], List[UploadItem]]:
+    """
+    收集要上传的目录和文件
+
+    Returns:
+        (远程目录列表（父目录在前）, 文件列表)
+    """
+    remote_root = remote_root.rstrip('/') or '/'
+    dirs = [remote_root]
+    files: List[UploadItem] = []
+    for local_path, relative, stat in iter_upload_entries(local_root):
+        remote_path = f"{remote_root.rstrip('/')}/{relative}"
+        if stat is None:
+            dirs.append(remote_path)
+        else:
+            files.append((local_path, remote_path, stat.st_size, stat.st_mtime))
+    return dirs, files
+
+
+def build_batched_commands(prefix: str, paths: List[str], limit: int = MKDIR_BATCH_CHARS, suffix: str = "") -> List[str]:
+    """把路径列表拼成若干条"prefix 路径..."命令，每条不超过limit个字符"""
+    commands = []
+    current: List[str] = []
+    length = 0
+    for path in paths:
+        quoted = shlex.quote(path)
+        if current and length + len(quoted) + 1 > limit:
+            commands.append(f"{prefix} {' '.join(current)}{suffix}")
+            current, length = [], 0
+        current.append(quoted)
+        length += len(quoted) + 1
+    if current:
+        commands.append(f"{prefix} {' '.join(current)}{suffix}")
+    return commands
+
+
+def build_mkdir_commands(dirs: List[str], limit: int = MKDIR_BATCH_CHARS) -> List[str]:
+    """把目录列表拆分为若干条 mkdir -p 命令，每条不超过limit个字符"""
+    return build_batched_commands("mkdir -p --", dirs, limit)
+
+
+class TransferProgress:
+    """上传进度，工作线程并发更新"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files_total = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.files_skipped = 0
+        self.bytes_done = 0
+        self.bytes_sent = 0
+        self.errors: List[Tuple[str, str]] = []
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    def add_bytes(self, count: int, sent: Optional[int] = None):
+        """记录已传输的文件内容字节数，sent为实际发送的字节数（压缩传输时与内容字节数不同）"""
+        with self._lock:
+            self.bytes_done += count
+            self.bytes_sent += count if sent is None else sent
+
+    def file_done(self, skipped: bool = False):
+        with self._lock:
+            self.files_done += 1
+            if skipped:
+                self.files_skipped += 1
+
+    def file_failed(self, path: str, error: str):
+        with self._lock:
+            self.files_done += 1
+            self.errors.append((path, error))
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def snapshot(self) -> Dict:
+        """当前进度"""
+        elapsed = self.elapsed
+        return {
+            "files_total": self.files_total,
+            "files_done": self.files_done,
+            "files_skipped": self.files_skipped,
+            "files_failed": len(self.errors),
+            "bytes_total": self.bytes_total,
+            "bytes_done": self.bytes_done,
+            "bytes_sent": self.bytes_sent,
+            "elapsed": round(elapsed, 3),
+            "throughput": int(self.bytes_done / elapsed) if elapsed > 0 else 0,
+        }
+
+
+async def report_progress(progress: TransferProgress, on_progress: Callable[[Dict], None], interval: float):
+    """每interval秒回调一次当前进度，直到被取消"""
+    while True:
+        await asyncio.sleep(interval)
+        on_progress(progress.snapshot())
+
+
+class SFTPUploader:
+    """在一个SSH连接上用多个SFTP通道并行上传"""
+
+    def __init__(
+        self,
+        client: paramiko.SSHClient,
+        parallelism: Optional[int] = None,
+        is_windows: bool = False,
+        skip_unchanged: bool = True
+    ):
+        self.client = client
+        self.parallelism = max(1, parallelism or settings.SFTP_UPLOAD_PARALLELISM)
+        self.is_windows = is_windows
+        self.skip_unchanged = skip_unchanged
+        self._stop = threading.Event()
+
+    def _exec_blocking(self, command: str) -> Tuple[int, str]:
+        stdin, stdout, stderr = self.client.exec_command(command)
+        stdout.read()
+        err = stderr.read().decode('utf-8', errors='replace').strip()
+        return stdout.channel.recv_exit_status(), err
+
+    def _mkdir_sftp_blocking(self, dirs: List[str]):
+        """逐个创建目录（远程不支持 mkdir -p 时使用）"""
+        sftp = self.client.open_sftp()
+        try:
+            for path in dirs:
+                try:
+                    sftp.mkdir(path)
+                except IOError:
+                    # 目录已存在
+                    pass
+        finally:
+            sftp.close()
+
+    async def make_dirs(self, dirs: List[str]):
+        """批量创建远程目录"""
+        if not dirs:
+            return
+        if self.is_windows:
+            await run_ssh_blocking(self._mkdir_sftp_blocking, dirs)
+            return
+        for command in build_mkdir_commands(dirs):
+            exit_status, err = await run_ssh_blocking(self._exec_blocking, command)
+            if exit_status != 0:
+                raise IOError(f"创建远程目录失败: {err}")
+
+    def _is_unchanged(self, sftp: paramiko.SFTPClient, item: UploadItem) -> bool:
+        local_path, remote_path, size, mtime = item
+        try:
+            remote_stat = sftp.stat(remote_path)
+        except IOError:
+            return False
+        return abs(size - remote_stat.st_size) < 10 and abs(mtime - remote_stat.st_mtime) < 5
+
+    def _upload_file(self, sftp: paramiko.SFTPClient, item: UploadItem, progress: TransferProgress):
+        local_path, remote_path, size, mtime = item
+        with open(local_path, 'rb') as local_file, sftp.open(remote_path, 'wb') as remote_file:
+            remote_file.set_pipelined(True)
+            while True:
+                data = local_file.read(CHUNK_SIZE)
+                if not data:
+                    break
+                remote_file.write(data)
+                progress.add_bytes(len(data))
+            # 保留修改时间，下次同步据此跳过未修改的文件
+            remote_file.utime((mtime, mtime))
+
+    def _worker(self, items: "queue.Queue[UploadItem]", progress: TransferProgress):
+        """工作线程：持有一个SFTP通道，逐个领取文件上传"""
+        sftp = self.client.open_sftp()
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = items.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if self.skip_unchanged and self._is_unchanged(sftp, item):
+                        progress.file_done(skipped=True)
+                        continue
+                    self._upload_file(sftp, item, progress)
+                    progress.file_done()
+                except (IOError, OSError) as e:
+                    # 记录错误但继续上传其他文件
+                    logger.error(f"上传文件 {item[0]} 失败: {str(e)}")
+                    progress.file_failed(item[0], str(e))
+        finally:
+            sftp.close()
+
+    async def upload_directory(
+        self,
+        local_root: str,
+        remote_root: str,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        progress_interval: float = 1.0
+    ) -> TransferProgress:
+        """
+        上传本地目录到远程目录
+
+        Args:
+            local_root: 本地目录
+            remote_root: 远程目录
+            on_progress: 进度回调，上传期间每progress_interval秒调用一次，结束时再调用一次
+            progress_interval: 进度回调间隔（秒）
+
+        Returns:
+            上传进度统计，单个文件的失败记录在errors中
+        """
+        dirs, files = await asyncio.to_thread(collect_upload_tree, local_root, remote_root)
+        return await self.upload_files(dirs, files, remote_root, on_progress, progress_interval)
+
+    async def upload_files(
+        self,
+        dirs: List[str],
+        files: List[UploadItem],
+        label: str = "",
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        progress_interval: float = 1.0,
+        progress: Optional[TransferProgress] = None
+    ) -> TransferProgress:
+        """
+        创建远程目录并上传指定的文件
+
+        Args:
+            dirs: 要创建的远程目录（父目录在前）
+            files: 要上传的文件
+            label: 日志中显示的名称
+            on_progress: 进度回调
+            progress_interval: 进度回调间隔（秒）
+            progress: 已有的进度统计（例如同一次同步中其他方式传输的文件），为空时新建
+        """
+        self._stop.clear()
+        progress = progress or TransferProgress()
+        progress.files_total += len(files)
+        progress.bytes_total += sum(item[2] for item in files)
+
+        await self.make_dirs(dirs)
+
+        items: "queue.Queue[UploadItem]" = queue.Queue()
+        for item in files:
+            items.put_nowait(item)
+
+        reporter = None
+        if on_progress:
+            reporter = asyncio.create_task(report_progress(progress, on_progress, progress_interval))
+        workers = min(self.parallelism, len(files))
+        try:
+            await asyncio.gather(*(
+                run_transfer_blocking(self._worker, items, progress) for _ in range(workers)
+            ))
+        finally:
+            # 取消时通知工作线程在当前文件完成后退出
+            self._stop.set()
+            if reporter:
+                reporter.cancel()
+            progress.finished = time.monotonic()
+
+        if on_progress:
+            on_progress(progress.snapshot())
+        snapshot = progress.snapshot()
+        logger.info(
+            f"上传完成: {label}, {snapshot['files_done']}/{snapshot['files_total']} 个文件, "
+            f"跳过 {snapshot['files_skipped']} 个, 失败 {snapshot['files_failed']} 个, "
+            f"{snapshot['bytes_done']} 字节, 耗时 {snapshot['elapsed']}秒, {workers} 个通道"
+        )
+        return progress
@@ -0,0 +1,85 @@
+"""
+请求合并模块
+
+同一个键上并发的相同调用只执行一次，其余调用方等待并共享同一个结果；
+结果可以按TTL短暂缓存，TTL内的后续调用直接返回缓存。
+"""
+
+import time
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """合并并发的相同调用
+
+    执行中的调用不会因为某个调用方取消（例如客户端断开）而中止，
+    其余调用方仍然可以拿到结果。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._cache: Dict[Hashable, Tuple[float, Any]] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        ttl: float = 0,
+        use_cache: bool = True
+    ) -> Tuple[Any, bool]:
+        """
+        执行调用或加入正在执行的同键调用
+
+        Args:
+            key: 调用的键，相同键的调用会被合并
+            fn: 实际执行的协程函数
+            ttl: 结果缓存时间（秒），0表示不缓存
+            use_cache: 是否使用缓存结果，为False时仍会合并正在执行的调用
+
+        Returns:
+            (结果, 是否为共享结果)
+        """
+        if use_cache:
+            cached = self._cache.get(key)
+            if cached is not None:
+                expires_at, value = cached
+                if expires_at > time.monotonic():
+                    return value, True
+                self._cache.pop(key, None)
+
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._finish, key, ttl))
+
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: Hashable, ttl: float, task: asyncio.Task):
+        # 执行期间被forget的调用，结果已过时，不再缓存
+        current = self._inflight.get(key) is task
+        if current:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.debug(f"合并调用出错: {key}: {task.exception()}")
+            return
+        if current and ttl > 0:
+            self._cache[key] = (time.monotonic() + ttl, task.result())
+
+    def forget(self, key: Hashable):
+        """丢弃某个键的缓存结果，正在执行的调用完成后也不再缓存"""
+        self._cache.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        """丢弃所有缓存结果"""
+        self._cache.clear()
+        self._inflight.clear()
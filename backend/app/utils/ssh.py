@@ -6,10 +6,20 @@ import socket
 import time
 import asyncio
 
+from app.utils.ssh_pool import ssh_pool
+from app.utils.ssh_executor import run_ssh_blocking
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.sftp_transfer import SFTPUploader, TransferProgress
+from app.utils.tar_stream import TarStreamUploader
+from app.utils.manifest_sync import ManifestSync, SyncResult
+
 logger = logging.getLogger(__name__)
 
 class SSHClient:
-    """SSH客户端封装，用于执行远程命令和文件传输"""
+    """SSH客户端封装，用于执行远程命令和文件传输
+    
+    连接从进程级连接池借用，close()时归还到连接池。
+    """
     
     def __init__(
         self, 
@@ -18,7 +28,8 @@ class SSHClient:
         username: str = 'root', 
         password: Optional[str] = None, 
         key_file: Optional[str] = None,
-        timeout: int = 10
+        timeout: int = 10,
+        machine_id: Optional[int] = None
     ):
         self.host = host
         self.port = port
@@ -26,35 +37,38 @@ class SSHClient:
         self.password = password
         self.key_file = key_file
         self.timeout = timeout
+        self.machine_id = machine_id
         self._client = None
         
     async def connect(self) -> bool:
-        """建立SSH连接"""
+        """建立SSH连接（从连接池借用）"""
         try:
-            self._client = paramiko.SSHClient()
-            self._client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            connect_kwargs = {
-                'hostname': self.host,
-                'port': self.port,
-                'username': self.username,
-                'timeout': self.timeout
-            }
-            
-            if self.password:
-                connect_kwargs['password'] = self.password
-            
-            if self.key_file and os.path.exists(self.key_file):
-                connect_kwargs['key_filename'] = self.key_file
-            
-            # 在事件循环中执行阻塞操作
-            await asyncio.to_thread(self._client.connect, **connect_kwargs)
+            self._client = await ssh_pool.acquire(
+                host=self.host,
+                port=self.port,
+                username=self.username,
+                password=self.password,
+                key_file=self.key_file,
+                machine_id=self.machine_id,
+                timeout=self.timeout
+            )
             logger.info(f"成功连接到SSH服务器 {self.host}:{self.port}")
             return True
+        except CircuitOpenError as e:
+            logger.warning(f"SSH连接已熔断: {str(e)}")
+            return False
         except (paramiko.SSHException, socket.error) as e:
             logger.error(f"SSH连接失败: {str(e)}")
             return False
             
+    def _run_command_blocking(self, command: str) -> Tuple[bytes, bytes, int]:
+        """执行命令并读取全部输出（阻塞）"""
+        stdin, stdout, stderr = self._client.exec_command(command)
+        stdout_data = stdout.read()
+        stderr_data = stderr.read()
+        exit_status = stdout.channel.recv_exit_status()
+        return stdout_data, stderr_data, exit_status
+    
     async def execute_command(self, command: str) -> Tuple[int, str, str]:
         """执行远程命令并返回状态码、标准输出和标准错误"""
         if not self._client:
@@ -63,16 +77,13 @@ class SSHClient:
         try:
             logger.debug(f"执行命令: {command}")
             
-            # 在事件循环中执行阻塞操作
-            stdin, stdout, stderr = await asyncio.to_thread(self._client.exec_command, command)
+            # 阻塞操作在SSH线程池中执行
+            stdout_data, stderr_data, exit_status = await run_ssh_blocking(
+                self._run_command_blocking, command
+            )
             
-            # 获取命令输出
-            stdout_data = await asyncio.to_thread(stdout.read)
-            stderr_data = await asyncio.to_thread(stderr.read)
-            exit_status = await asyncio.to_thread(stdout.channel.recv_exit_status)
-            
-            stdout_str = stdout_data.decode('utf-8')
-            stderr_str = stderr_data.decode('utf-8')
+            stdout_str = stdout_data.decode('utf-8', errors='replace')
+            stderr_str = stderr_data.decode('utf-8', errors='replace')
             
             logger.debug(f"命令退出状态: {exit_status}")
             if stdout_str:
@@ -94,17 +105,17 @@ class SSHClient:
             logger.debug(f"上传文件: {local_path} -> {remote_path}")
             
             # 创建SFTP客户端
-            sftp = await asyncio.to_thread(self._client.open_sftp)
+            sftp = await run_ssh_blocking(self._client.open_sftp)
             
             # 确保远程目录存在
             remote_dir = os.path.dirname(remote_path)
             await self.execute_command(f"mkdir -p {remote_dir}")
             
             # 上传文件
-            await asyncio.to_thread(sftp.put, local_path, remote_path)
+            await run_ssh_blocking(sftp.put, local_path, remote_path)
             
             # 关闭SFTP会话
-            await asyncio.to_thread(sftp.close)
+            await run_ssh_blocking(sftp.close)
             
             logger.debug(f"文件上传成功")
             return True
@@ -124,12 +135,84 @@ class SSHClient:
         try:
             logger.debug(f"打开SFTP会话")
             # 创建SFTP客户端
-            sftp = await asyncio.to_thread(self._client.open_sftp)
+            sftp = await run_ssh_blocking(self._client.open_sftp)
             return sftp
         except Exception as e:
             logger.error(f"打开SFTP会话失败: {str(e)}")
             raise
     
+    async def upload_directory(
+        self,
+        local_dir: str,
+        remote_dir: str,
+        parallelism: Optional[int] = None,
+        is_windows: bool = False,
+        on_progress=None
+    ) -> TransferProgress:
+        """并行上传整个目录
+        
+        在当前连接上打开parallelism个SFTP通道并行上传，远程目录批量创建，
+        大小和修改时间未变化的文件跳过。单个文件的失败记录在返回值的errors中。
+        """
+        if not self._client:
+            raise Exception("SSH client未连接")
+        
+        uploader = SFTPUploader(self._client, parallelism=parallelism, is_windows=is_windows)
+        return await uploader.upload_directory(local_dir, remote_dir, on_progress=on_progress)
+    
+    async def sync_directory(
+        self,
+        local_dir: str,
+        remote_dir: str,
+        parallelism: Optional[int] = None,
+        delete: bool = False,
+        remote_manifest=None,
+        cached_manifest: Optional[bytes] = None,
+        previous_manifest: Optional[bytes] = None,
+        on_progress=None
+    ) -> SyncResult:
+        """按文件清单增量同步整个目录（仅支持类Unix远程机器）
+        
+        一条命令取回远程清单，只上传新增和修改的文件。
+        上次同步的清单（previous_manifest，为空时使用cached_manifest）中列出、本地已删除的文件在远程删除，
+        delete为True时删除所有远程独有的文件。被忽略的路径（依赖目录、日志等）在远程保留。
+        cached_manifest为上次同步返回的清单，远程目录指纹一致时不再列出远程目录。
+        """
+        if not self._client:
+            raise Exception("SSH client未连接")
+        
+        syncer = ManifestSync(self._client, parallelism=parallelism, delete=delete)
+        return await syncer.sync(
+            local_dir, remote_dir, on_progress=on_progress,
+            remote_manifest=remote_manifest, cached_manifest=cached_manifest,
+            previous_manifest=previous_manifest
+        )
+    
+    async def refresh_sync_manifest(self, remote_dir: str, manifest: Optional[bytes]) -> Optional[bytes]:
+        """同步后在远程执行了会修改部署目录的命令（如npm install）时，更新sync_directory返回的清单的目录指纹"""
+        if not self._client:
+            raise Exception("SSH client未连接")
+        
+        return await ManifestSync(self._client).refresh_manifest(remote_dir, manifest)
+    
+    async def upload_bundle(
+        self,
+        local_dir: str,
+        remote_dir: str,
+        compression: Optional[str] = None,
+        on_progress=None
+    ) -> TransferProgress:
+        """打包上传整个目录
+        
+        边打包边通过一个exec通道写入远程的 tar -x，不生成临时归档文件。
+        远程解包失败时抛出IOError。
+        """
+        if not self._client:
+            raise Exception("SSH client未连接")
+        
+        uploader = TarStreamUploader(self._client, compression=compression)
+        return await uploader.upload_directory(local_dir, remote_dir, on_progress=on_progress)
+    
     async def get_file(self, remote_path: str, local_path: str) -> bool:
         """从远程服务器下载文件"""
         if not self._client:
@@ -139,17 +222,17 @@ class SSHClient:
             logger.debug(f"下载文件: {remote_path} -> {local_path}")
             
             # 创建SFTP客户端
-            sftp = await asyncio.to_thread(self._client.open_sftp)
+            sftp = await run_ssh_blocking(self._client.open_sftp)
             
             # 确保本地目录存在
             local_dir = os.path.dirname(local_path)
             os.makedirs(local_dir, exist_ok=True)
             
             # 下载文件
-            await asyncio.to_thread(sftp.get, remote_path, local_path)
+            await run_ssh_blocking(sftp.get, remote_path, local_path)
             
             # 关闭SFTP会话
-            await asyncio.to_thread(sftp.close)
+            await run_ssh_blocking(sftp.close)
             
             logger.debug(f"文件下载成功")
             return True
@@ -158,11 +241,11 @@ class SSHClient:
             return False
     
     async def close(self):
-        """关闭SSH连接"""
+        """归还SSH连接到连接池"""
         if self._client:
-            await asyncio.to_thread(self._client.close)
+            self._client.close()
             self._client = None
-            logger.debug(f"已关闭SSH连接 {self.host}:{self.port}")
+            logger.debug(f"已归还SSH连接 {self.host}:{self.port}")
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
@@ -0,0 +1,73 @@
+"""
+SSH阻塞操作执行器
+
+paramiko是同步库，连接、执行命令、读取输出和SFTP传输都会阻塞。
+这些操作统一放到有界线程池中执行，避免冻结事件循环，同时限制并发SSH操作的数量。
+整个上传期间占用线程的批量传输使用单独的线程池，不会占满命令执行、状态探测使用的线程。
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_transfer_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_ssh_executor() -> ThreadPoolExecutor:
+    """获取SSH线程池，首次使用时按配置创建"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.SSH_MAX_CONCURRENCY,
+                    thread_name_prefix="ssh-worker"
+                )
+                logger.info(f"SSH线程池已创建，并发上限: {settings.SSH_MAX_CONCURRENCY}")
+    return _executor
+
+
+async def run_ssh_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在SSH线程池中执行阻塞函数，超过并发上限的调用排队等待"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_ssh_executor(), functools.partial(func, *args, **kwargs))
+
+
+def get_transfer_executor() -> ThreadPoolExecutor:
+    """获取批量传输线程池，首次使用时按配置创建"""
+    global _transfer_executor
+    if _transfer_executor is None:
+        with _executor_lock:
+            if _transfer_executor is None:
+                _transfer_executor = ThreadPoolExecutor(
+                    max_workers=settings.SSH_TRANSFER_CONCURRENCY,
+                    thread_name_prefix="ssh-transfer"
+                )
+                logger.info(f"SSH传输线程池已创建，并发上限: {settings.SSH_TRANSFER_CONCURRENCY}")
+    return _transfer_executor
+
+
+async def run_transfer_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在批量传输线程池中执行长时间的阻塞传输，超过并发上限的调用排队等待"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_transfer_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_ssh_executor():
+    """关闭SSH线程池和批量传输线程池"""
+    global _executor, _transfer_executor
+    with _executor_lock:
+        for executor in (_executor, _transfer_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _transfer_executor = None
@@ -0,0 +1,492 @@
+"""
+SSH连接池模块
+
+进程级的SSH连接池，按机器ID和认证信息复用paramiko连接，
+避免每次状态检查、部署操作都重新进行TCP握手、密钥交换和认证。
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import paramiko
+
+from app.core.config import settings
+from app.utils.ssh_executor import run_ssh_blocking
+from app.utils.circuit_breaker import circuit_breakers, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# 连接池键: (机器ID, 主机, 端口, 用户名, 认证信息摘要)
+PoolKey = Tuple[Optional[int], str, int, str, str]
+
+
+class _PoolEntry:
+    """单个连接池键对应的连接集合"""
+
+    def __init__(self, key: PoolKey, max_size: int):
+        self.key = key
+        self.idle: List[Tuple[paramiko.SSHClient, float]] = []
+        self.in_use = 0
+        self.waiting = 0  # 已取得该键、正在等待名额的借用方
+        self.closed = False
+        self.semaphore = asyncio.Semaphore(max_size)
+
+
+class PooledSSHClient:
+    """从连接池借出的SSH连接
+
+    用法与paramiko.SSHClient一致，调用close()时连接归还到连接池而不是真正断开。
+    """
+
+    def __init__(self, pool: "SSHConnectionPool", entry: _PoolEntry, client: paramiko.SSHClient):
+        self._pool = pool
+        self._entry = entry
+        self._client = client
+        self._released = False
+
+    @property
+    def client(self) -> paramiko.SSHClient:
+        """底层paramiko客户端"""
+        return self._client
+
+    def is_active(self) -> bool:
+        """底层传输通道是否可用"""
+        return _is_client_active(self._client)
+
+    def close(self):
+        """归还连接到连接池"""
+        if not self._released:
+            self._released = True
+            self._pool.release(self)
+
+    def discard(self):
+        """连接已不可用，关闭并从连接池移除"""
+        if not self._released:
+            self._released = True
+            self._pool.release(self, broken=True)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class DedicatedLimitError(Exception):
+    """机器的独立连接数已达上限"""
+
+
+class DedicatedSSHClient:
+    """不占用连接池名额的独立SSH连接
+
+    用于长时间占用连接的场景（如实时跟踪日志），用法与PooledSSHClient一致，close()时真正断开。
+    每台机器的独立连接数单独限制，机器的连接失效时一并断开。
+    """
+
+    def __init__(self, pool: "SSHConnectionPool", owner, client: paramiko.SSHClient):
+        self._pool = pool
+        self._owner = owner
+        self._client = client
+        self._released = False
+
+    @property
+    def client(self) -> paramiko.SSHClient:
+        """底层paramiko客户端"""
+        return self._client
+
+    def is_active(self) -> bool:
+        """底层传输通道是否可用"""
+        return _is_client_active(self._client)
+
+    def close(self):
+        """断开连接"""
+        if not self._released:
+            self._released = True
+            self._pool.release_dedicated(self)
+
+    def discard(self):
+        """断开连接"""
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def _is_client_active(client: paramiko.SSHClient) -> bool:
+    transport = client.get_transport()
+    return bool(transport and transport.is_active())
+
+
+def _close_quietly(client: paramiko.SSHClient):
+    try:
+        client.close()
+    except Exception as e:
+        logger.debug(f"关闭SSH连接出错: {str(e)}")
+
+
+def _close_abandoned(future: asyncio.Future):
+    """借用方已取消，关闭之后才建立成功的连接"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    logger.debug("借用已取消，关闭迟到的SSH连接")
+    _close_quietly(future.result())
+
+
+class SSHConnectionPool:
+    """SSH连接池
+
+    - 按机器ID和认证信息区分连接，认证信息变化后自动使用新连接
+    - 每台机器同时借出的连接数有上限，超过上限的调用方排队等待
+    - 空闲超时的连接会被回收，断开的连接在借出前透明重建
+    - 连接开启keepalive，避免被中间设备静默断开
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = None,
+        idle_timeout: int = None,
+        keepalive_interval: int = None,
+        max_dedicated_per_host: int = None
+    ):
+        self.max_per_host = max_per_host or settings.SSH_POOL_MAX_PER_HOST
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.SSH_POOL_IDLE_TIMEOUT
+        self.keepalive_interval = keepalive_interval if keepalive_interval is not None else settings.SSH_KEEPALIVE_INTERVAL
+        self.max_dedicated_per_host = max_dedicated_per_host or settings.SSH_DEDICATED_MAX_PER_HOST
+        self._entries: Dict[PoolKey, _PoolEntry] = {}
+        # 熔断器键（机器ID） -> 已占用的独立连接名额、已建立的独立连接
+        self._dedicated_slots: Dict[Any, int] = {}
+        self._dedicated: Dict[Any, Set[DedicatedSSHClient]] = {}
+        self._lock = threading.Lock()
+        self._reaper_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def make_key(
+        host: str,
+        port: int,
+        username: str,
+        password: Optional[str] = None,
+        key_file: Optional[str] = None,
+        machine_id: Optional[int] = None
+    ) -> PoolKey:
+        """生成连接池键，认证信息只保存摘要"""
+        credential = f"{password or ''}\0{key_file or ''}".encode("utf-8")
+        digest = hashlib.sha256(credential).hexdigest()
+        return (machine_id, host, int(port), username, digest)
+
+    @staticmethod
+    def breaker_key(host: str, port: int, machine_id: Optional[int] = None):
+        """熔断器键，优先按机器ID区分"""
+        return machine_id if machine_id is not None else f"{host}:{port}"
+
+    def _get_entry(self, key: PoolKey) -> _PoolEntry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _PoolEntry(key, self.max_per_host)
+                self._entries[key] = entry
+            # 在同一把锁内登记等待，回收时不会删除仍有人等待名额的键
+            entry.waiting += 1
+            return entry
+
+    def _take_idle(self, entry: _PoolEntry) -> Optional[paramiko.SSHClient]:
+        """取出一个可用的空闲连接，顺便关闭已断开的连接"""
+        dead = []
+        client = None
+        with self._lock:
+            entry.waiting -= 1
+            entry.in_use += 1
+            while entry.idle:
+                candidate, _ = entry.idle.pop()
+                if _is_client_active(candidate):
+                    client = candidate
+                    break
+                dead.append(candidate)
+        for candidate in dead:
+            logger.info(f"SSH连接已断开，重新建立连接: {entry.key[1]}:{entry.key[2]}")
+            _close_quietly(candidate)
+        return client
+
+    def _connect(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: Optional[str],
+        key_file: Optional[str],
+        timeout: int
+    ) -> paramiko.SSHClient:
+        """建立新的SSH连接（阻塞）"""
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+        connect_kwargs = {
+            "hostname": host,
+            "port": port,
+            "username": username,
+            "timeout": timeout,
+        }
+        if password:
+            connect_kwargs["password"] = str(password)
+        if key_file and os.path.exists(key_file):
+            connect_kwargs["key_filename"] = key_file
+
+        client.connect(**connect_kwargs)
+
+        transport = client.get_transport()
+        if transport and self.keepalive_interval:
+            transport.set_keepalive(self.keepalive_interval)
+
+        logger.info(f"SSH连接池新建连接: {host}:{port} 用户名: {username}")
+        return client
+
+    async def _open(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: Optional[str],
+        key_file: Optional[str],
+        machine_id: Optional[int],
+        timeout: int
+    ) -> paramiko.SSHClient:
+        """经过熔断器建立新连接"""
+        # 不可达的机器熔断期间立即失败，不再等待连接超时
+        breaker = circuit_breakers.get(self.breaker_key(host, port, machine_id))
+        try:
+            breaker.before_call()
+            connecting = asyncio.ensure_future(run_ssh_blocking(
+                self._connect, host, port, username, password, key_file, timeout
+            ))
+            try:
+                client = await asyncio.shield(connecting)
+            except asyncio.CancelledError:
+                # 取消只能放弃等待，线程中的连接仍会完成，完成后关闭
+                connecting.add_done_callback(_close_abandoned)
+                raise
+        except BaseException as e:
+            if isinstance(e, paramiko.AuthenticationException):
+                # 认证失败说明机器可达
+                breaker.record_success()
+            elif isinstance(e, (OSError, EOFError, paramiko.SSHException)):
+                breaker.record_failure(str(e))
+            elif not isinstance(e, CircuitOpenError):
+                breaker.release_probe()
+            raise
+        breaker.record_success()
+        return client
+
+    async def acquire(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: Optional[str] = None,
+        key_file: Optional[str] = None,
+        machine_id: Optional[int] = None,
+        timeout: int = 15
+    ) -> PooledSSHClient:
+        """借出一个SSH连接，连接失败时抛出paramiko/socket异常"""
+        key = self.make_key(host, port, username, password, key_file, machine_id)
+        entry = self._get_entry(key)
+
+        try:
+            await entry.semaphore.acquire()
+        except BaseException:
+            with self._lock:
+                entry.waiting -= 1
+            raise
+        try:
+            client = self._take_idle(entry)
+        except BaseException:
+            with self._lock:
+                entry.in_use -= 1
+            entry.semaphore.release()
+            raise
+
+        if client is None:
+            try:
+                client = await self._open(host, port, username, password, key_file, machine_id, timeout)
+            except BaseException:
+                with self._lock:
+                    entry.in_use -= 1
+                entry.semaphore.release()
+                raise
+
+        return PooledSSHClient(self, entry, client)
+
+    async def open_dedicated(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: Optional[str] = None,
+        key_file: Optional[str] = None,
+        machine_id: Optional[int] = None,
+        timeout: int = 15
+    ) -> DedicatedSSHClient:
+        """
+        建立不计入单机连接上限的独立连接，调用方负责关闭
+
+        Raises:
+            DedicatedLimitError: 机器的独立连接数已达上限
+            paramiko/socket异常: 连接失败
+        """
+        owner = self.breaker_key(host, port, machine_id)
+        with self._lock:
+            used = self._dedicated_slots.get(owner, 0)
+            if used >= self.max_dedicated_per_host:
+                raise DedicatedLimitError(f"独立连接数已达上限 {self.max_dedicated_per_host}")
+            self._dedicated_slots[owner] = used + 1
+        try:
+            client = await self._open(host, port, username, password, key_file, machine_id, timeout)
+        except BaseException:
+            self._release_dedicated_slot(owner)
+            raise
+        lease = DedicatedSSHClient(self, owner, client)
+        with self._lock:
+            self._dedicated.setdefault(owner, set()).add(lease)
+        return lease
+
+    def _release_dedicated_slot(self, owner):
+        with self._lock:
+            used = self._dedicated_slots.get(owner, 0) - 1
+            if used > 0:
+                self._dedicated_slots[owner] = used
+            else:
+                self._dedicated_slots.pop(owner, None)
+
+    def release_dedicated(self, lease: DedicatedSSHClient):
+        """断开独立连接并归还名额"""
+        with self._lock:
+            leases = self._dedicated.get(lease._owner)
+            owned = leases is not None and lease in leases
+            if owned:
+                leases.discard(lease)
+                if not leases:
+                    del self._dedicated[lease._owner]
+        if owned:
+            self._release_dedicated_slot(lease._owner)
+        _close_quietly(lease._client)
+
+    def release(self, lease: PooledSSHClient, broken: bool = False):
+        """归还连接，损坏或已失效的连接直接关闭"""
+        entry = lease._entry
+        client = lease._client
+        keep = not broken and not entry.closed and _is_client_active(client)
+        with self._lock:
+            entry.in_use -= 1
+            if keep:
+                entry.idle.append((client, time.monotonic()))
+        if not keep:
+            _close_quietly(client)
+        entry.semaphore.release()
+        self.evict_idle()
+
+    @asynccontextmanager
+    async def connection(self, **kwargs):
+        """以上下文管理器方式借用连接"""
+        lease = await self.acquire(**kwargs)
+        try:
+            yield lease
+        finally:
+            lease.close()
+
+    def evict_idle(self):
+        """关闭空闲超时的连接，并清理不再使用的连接池键"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                alive = []
+                for client, last_used in entry.idle:
+                    if now - last_used > self.idle_timeout:
+                        expired.append(client)
+                    else:
+                        alive.append((client, last_used))
+                entry.idle = alive
+                if not entry.idle and entry.in_use == 0 and entry.waiting == 0:
+                    del self._entries[key]
+        for client in expired:
+            _close_quietly(client)
+        if expired:
+            logger.debug(f"SSH连接池回收空闲连接 {len(expired)} 个")
+
+    def invalidate(self, machine_id: int):
+        """使某台机器的所有连接失效（例如认证信息被修改后）
+
+        空闲连接和独立连接立即关闭，正在使用的连接在归还时关闭，熔断记录同时清除。
+        """
+        circuit_breakers.reset(machine_id)
+        to_close = []
+        with self._lock:
+            dedicated = list(self._dedicated.get(machine_id, ()))
+            for key, entry in list(self._entries.items()):
+                if key[0] != machine_id:
+                    continue
+                entry.closed = True
+                to_close.extend(client for client, _ in entry.idle)
+                entry.idle = []
+                del self._entries[key]
+        for client in to_close:
+            _close_quietly(client)
+        # 独立连接断开后，使用方（如日志跟踪）随通道关闭而结束
+        for lease in dedicated:
+            lease.close()
+        if to_close or dedicated:
+            logger.info(f"机器 {machine_id} 的SSH连接已失效，关闭空闲连接 {len(to_close)} 个、独立连接 {len(dedicated)} 个")
+
+    def close_all(self):
+        """关闭连接池中所有连接"""
+        to_close = []
+        with self._lock:
+            for entry in self._entries.values():
+                entry.closed = True
+                to_close.extend(client for client, _ in entry.idle)
+                entry.idle = []
+            self._entries.clear()
+            dedicated = [lease for leases in self._dedicated.values() for lease in leases]
+        for client in to_close:
+            _close_quietly(client)
+        for lease in dedicated:
+            lease.close()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """连接池状态，按"主机:端口"汇总"""
+        result: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            for key, entry in self._entries.items():
+                item = result.setdefault(f"{key[1]}:{key[2]}", {"idle": 0, "in_use": 0})
+                item["idle"] += len(entry.idle)
+                item["in_use"] += entry.in_use
+        return result
+
+    async def _reap_forever(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.error(f"SSH连接池回收出错: {str(e)}")
+
+    def start(self, interval: int = 60):
+        """启动后台回收任务"""
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = asyncio.create_task(self._reap_forever(interval))
+
+    async def shutdown(self):
+        """停止后台回收任务并关闭所有连接"""
+        if self._reaper_task is not None:
+            self._reaper_task.cancel()
+            try:
+                await self._reaper_task
+            except asyncio.CancelledError:
+                pass
+            self._reaper_task = None
+        self.close_all()
+
+
+# 进程级连接池实例
+ssh_pool = SSHConnectionPool()
@@ -0,0 +1,223 @@
+"""
+打包流式传输模块
+
+把项目目录边打包边通过一个exec通道写入远程的 tar -x：
+- 本地和远程都不生成临时归档文件
+- 打包时按与SFTP上传相同的规则跳过隐藏文件和临时文件，并应用项目的忽略规则（被忽略的目录不再遍历）
+- 可选gzip或zstd压缩；zstd需要本地安装zstandard、远程有zstd命令，否则退回gzip
+- 大量小文件时，成千上万次SFTP往返合并为一次流式复制
+
+与SFTP上传不同，打包传输总是发送全部文件，不跳过未修改的文件。
+"""
+
+import os
+import time
+import shlex
+import asyncio
+import logging
+import tarfile
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import paramiko
+
+from app.core.config import settings
+from app.utils.ignore_handler import get_project_ignore_matcher
+from app.utils.ssh_executor import run_ssh_blocking, run_transfer_blocking
+from app.utils.sftp_transfer import TransferProgress, iter_upload_entries, report_progress
+
+try:
+    import zstandard
+    HAS_ZSTANDARD = True
+except ImportError:
+    HAS_ZSTANDARD = False
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_ZSTD)
+
+# tar流的写缓冲大小，减少通道写入次数
+BUFFER_SIZE = 256 * 1024
+# 发送失败后等待远程命令退出的时间（秒）
+REMOTE_EXIT_GRACE = 5
+
+
+class _ChannelWriter:
+    """把写入的数据发送到SSH通道"""
+
+    def __init__(self, channel: paramiko.Channel, progress: TransferProgress):
+        self.channel = channel
+        self.progress = progress
+
+    def write(self, data) -> int:
+        # 通道窗口满时sendall阻塞，远程解包速度自然限制发送速度
+        self.channel.sendall(data)
+        self.progress.add_bytes(0, sent=len(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def build_extract_command(remote_root: str, compression: str) -> str:
+    """远程从标准输入解包的命令"""
+    root = shlex.quote(remote_root)
+    if compression == COMPRESSION_ZSTD:
+        extract = f"zstd -d -q -c | tar -x --no-same-owner -C {root} -f -"
+    elif compression == COMPRESSION_GZIP:
+        extract = f"tar -x -z --no-same-owner -C {root} -f -"
+    else:
+        extract = f"tar -x --no-same-owner -C {root} -f -"
+    return f"mkdir -p -- {root} && {extract}"
+
+
+class TarStreamUploader:
+    """通过一个exec通道流式上传打包的目录"""
+
+    def __init__(self, client: paramiko.SSHClient, compression: Optional[str] = None):
+        self.client = client
+        self.compression = compression or settings.DEPLOY_BUNDLE_COMPRESSION
+        if self.compression not in COMPRESSIONS:
+            raise ValueError(f"不支持的压缩方式: {self.compression}")
+        self._stop = threading.Event()
+
+    def _remote_has_zstd_blocking(self) -> bool:
+        stdin, stdout, stderr = self.client.exec_command("command -v zstd")
+        stdout.read()
+        return stdout.channel.recv_exit_status() == 0
+
+    async def resolve_compression(self) -> str:
+        """确认压缩方式可用，zstd不可用时退回gzip"""
+        if self.compression != COMPRESSION_ZSTD:
+            return self.compression
+        if not HAS_ZSTANDARD:
+            logger.warning("zstandard库未安装，打包传输改用gzip压缩")
+            return COMPRESSION_GZIP
+        if not await run_ssh_blocking(self._remote_has_zstd_blocking):
+            logger.warning("远程机器没有zstd命令，打包传输改用gzip压缩")
+            return COMPRESSION_GZIP
+        return COMPRESSION_ZSTD
+
+    @staticmethod
+    def _wait_exit(channel: paramiko.Channel, timeout: Optional[float] = None) -> bool:
+        """等待远程命令退出，期间读取输出避免通道窗口写满"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not channel.exit_status_ready():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if channel.recv_ready():
+                channel.recv(65536)
+            else:
+                time.sleep(0.01)
+        return True
+
+    @staticmethod
+    def _check_exit(channel: paramiko.Channel):
+        err = b""
+        while channel.recv_stderr_ready():
+            err += channel.recv_stderr(65536)
+        exit_status = channel.recv_exit_status()
+        if exit_status != 0:
+            message = err.decode('utf-8', errors='replace').strip()
+            raise IOError(f"远程解包失败（退出码 {exit_status}）: {message}")
+
+    def _stream_blocking(
+        self,
+        entries: List[Tuple[str, str, Optional[os.stat_result]]],
+        remote_root: str,
+        compression: str,
+        progress: TransferProgress
+    ):
+        channel = self.client.get_transport().open_session()
+        try:
+            channel.exec_command(build_extract_command(remote_root, compression))
+            writer = _ChannelWriter(channel, progress)
+            sink = writer
+            if compression == COMPRESSION_ZSTD:
+                sink = zstandard.ZstdCompressor(level=3).stream_writer(writer, closefd=False)
+            mode = "w|gz" if compression == COMPRESSION_GZIP else "w|"
+
+            try:
+                with tarfile.open(fileobj=sink, mode=mode, bufsize=BUFFER_SIZE, format=tarfile.PAX_FORMAT) as tar:
+                    for local_path, relative, stat in entries:
+                        if self._stop.is_set():
+                            raise IOError("打包传输已取消")
+                        try:
+                            tar.add(local_path, arcname=relative, recursive=False)
+                        except FileNotFoundError as e:
+                            # 收集文件列表后被删除的文件，尚未写入任何数据，可以跳过
+                            progress.file_failed(local_path, str(e))
+                            continue
+                        if stat is not None:
+                            progress.add_bytes(stat.st_size, sent=0)
+                            progress.file_done()
+                if sink is not writer:
+                    sink.close()
+                # 发送EOF，等待远程解包完成
+                channel.shutdown_write()
+            except (OSError, EOFError):
+                # 远程解包提前退出时通道已关闭，报告远程的错误输出
+                if self._wait_exit(channel, REMOTE_EXIT_GRACE):
+                    self._check_exit(channel)
+                raise
+
+            self._wait_exit(channel)
+            self._check_exit(channel)
+        finally:
+            channel.close()
+
+    async def upload_directory(
+        self,
+        local_root: str,
+        remote_root: str,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        progress_interval: float = 1.0
+    ) -> TransferProgress:
+        """
+        打包上传本地目录到远程目录
+
+        Args:
+            local_root: 本地目录
+            remote_root: 远程目录，不存在时自动创建
+            on_progress: 进度回调，上传期间每progress_interval秒调用一次，结束时再调用一次
+            progress_interval: 进度回调间隔（秒）
+
+        Returns:
+            上传进度统计，bytes_sent为压缩后实际发送的字节数
+
+        Raises:
+            IOError: 远程解包失败
+        """
+        self._stop.clear()
+        progress = TransferProgress()
+        entries = await asyncio.to_thread(
+            lambda: list(iter_upload_entries(local_root, matcher=get_project_ignore_matcher(local_root)))
+        )
+        progress.files_total = sum(1 for _, _, stat in entries if stat is not None)
+        progress.bytes_total = sum(stat.st_size for _, _, stat in entries if stat is not None)
+        compression = await self.resolve_compression()
+
+        reporter = None
+        if on_progress:
+            reporter = asyncio.create_task(report_progress(progress, on_progress, progress_interval))
+        try:
+            await run_transfer_blocking(self._stream_blocking, entries, remote_root, compression, progress)
+        finally:
+            # 取消时通知打包线程停止
+            self._stop.set()
+            if reporter:
+                reporter.cancel()
+            progress.finished = time.monotonic()
+
+        if on_progress:
+            on_progress(progress.snapshot())
+        snapshot = progress.snapshot()
+        logger.info(
+            f"打包上传完成: {remote_root}, {snapshot['files_done']} 个文件, "
+            f"{snapshot['bytes_done']} 字节, 发送 {snapshot['bytes_sent']} 字节（{compression}）, "
+            f"耗时 {snapshot['elapsed']}秒"
+        )
+        return progress
@@ -0,0 +1,136 @@
+"""
+目录树遍历模块
+
+基于os.scandir遍历目录树，各处遍历项目目录时共用：
+- 目录项的类型来自scandir，不再对每个条目单独调用isfile/isdir
+- 被剪枝的目录不会被列出，忽略的子树完全不遍历
+- 产出os.DirEntry，其stat()结果会被缓存
+- 可选多线程并行列出目录，适合网络文件系统等单次列目录延迟较高的场景
+
+父目录总是先于其内容产出。单线程时按深度优先顺序遍历；多线程时各目录的
+列出顺序不确定，但同一目录内的条目仍可按名称排序。
+"""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from app.utils.ignore_handler import IgnoreMatcher
+
+logger = logging.getLogger(__name__)
+
+# (相对路径（/分隔）, 目录项)
+WalkItem = Tuple[str, os.DirEntry]
+# 判断是否剪枝目录、排除文件的函数，参数为相对路径和目录项
+EntryFilter = Callable[[str, os.DirEntry], bool]
+# 列出目录的结果: (目录路径, 相对路径前缀, [(目录项, 是否目录)], 错误)
+_Listing = Tuple[str, str, List[Tuple[os.DirEntry, bool]], Optional[OSError]]
+
+
+def _scan(path: str, prefix: str, sort: bool, prefetch_stat: bool) -> _Listing:
+    """列出一个目录"""
+    items: List[Tuple[os.DirEntry, bool]] = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if prefetch_stat and not is_dir:
+                    try:
+                        entry.stat()
+                    except OSError:
+                        pass
+                items.append((entry, is_dir))
+    except OSError as e:
+        return path, prefix, [], e
+    if sort:
+        items.sort(key=lambda item: item[0].name)
+    return path, prefix, items, None
+
+
+def walk_tree(
+    root: str,
+    matcher: Optional[IgnoreMatcher] = None,
+    prune: Optional[EntryFilter] = None,
+    exclude: Optional[EntryFilter] = None,
+    include_dirs: bool = False,
+    follow_symlinks: bool = False,
+    sort: bool = False,
+    threads: int = 0,
+    prefetch_stat: bool = False,
+    on_error: Optional[Callable[[str, OSError], None]] = None
+) -> Iterator[WalkItem]:
+    """
+    遍历目录树
+
+    Args:
+        root: 根目录
+        matcher: 忽略规则，提供时默认用match_dir剪枝目录、用match排除文件
+        prune: 返回True时跳过该目录及其全部内容，优先于matcher
+        exclude: 返回True时跳过该文件，优先于matcher
+        include_dirs: 是否产出目录本身
+        follow_symlinks: 是否进入指向目录的符号链接
+        sort: 同一目录内的条目按名称排序
+        threads: 并行列出目录的线程数，小于2时单线程遍历
+        prefetch_stat: 列出目录时预先读取文件的stat（多线程时在工作线程中完成）
+        on_error: 无法列出目录时的回调，默认记录警告并跳过
+
+    Yields:
+        (相对路径, 目录项)，相对路径以/分隔
+    """
+    if matcher is not None:
+        prune = prune or (lambda rel_path, entry: matcher.match_dir(rel_path))
+        exclude = exclude or (lambda rel_path, entry: matcher.match(rel_path))
+
+    def handle(listing: _Listing) -> Iterator[Tuple[WalkItem, Optional[Tuple[str, str]]]]:
+        """处理一个目录的列出结果，产出条目及需要继续列出的子目录"""
+        path, prefix, items, error = listing
+        if error is not None:
+            if on_error:
+                on_error(path, error)
+            else:
+                logger.warning(f"无法列出目录 {path}: {str(error)}")
+            return
+        for entry, is_dir in items:
+            rel_path = prefix + entry.name
+            if is_dir:
+                if prune is not None and prune(rel_path, entry):
+                    continue
+                descend = follow_symlinks or not entry.is_symlink()
+                yield ((rel_path, entry) if include_dirs else None), ((entry.path, rel_path + "/") if descend else None)
+            else:
+                if exclude is not None and exclude(rel_path, entry):
+                    continue
+                yield (rel_path, entry), None
+
+    if threads < 2:
+        stack = [(root, "")]
+        while stack:
+            path, prefix = stack.pop()
+            subdirs = []
+            for item, subdir in handle(_scan(path, prefix, sort, prefetch_stat)):
+                if item is not None:
+                    yield item
+                if subdir is not None:
+                    subdirs.append(subdir)
+            # 逆序入栈，按列出顺序深度优先遍历
+            stack.extend(reversed(subdirs))
+        return
+
+    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="tree-walk")
+    try:
+        pending = {pool.submit(_scan, root, "", sort, prefetch_stat)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for item, subdir in handle(future.result()):
+                    if subdir is not None:
+                        pending.add(pool.submit(_scan, subdir[0], subdir[1], sort, prefetch_stat))
+                    if item is not None:
+                        yield item
+    finally:
+        # 调用方提前结束遍历时取消尚未开始的列目录任务
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,262 @@
+"""
+项目ZIP包解压模块
+
+把上传的ZIP包解压到项目存储目录（阻塞，应在线程中调用）：
+- 按项目的.gitignore（ZIP包中有.gitignore时使用包中的规则）跳过被忽略的文件
+- 替换模式先清空存储目录（保留.gitignore）
+- 大文件单独成为一个任务，小文件按数量和大小分批，由线程池并行解压，每个线程使用自己的ZipFile句柄
+- 增量模式下，磁盘上已有文件的大小和CRC32与ZIP中央目录记录的一致时不再解压
+- 进度只统计计数，由调用方定期读取推送
+"""
+
+import os
+import zlib
+import shutil
+import logging
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.utils.ignore_handler import get_ignore_matcher, parse_ignore_file
+
+logger = logging.getLogger(__name__)
+
+MODE_REPLACE = "replace"
+MODE_INCREMENT = "increment"
+IGNORE_FILE = ".gitignore"
+# 解压和计算CRC时的缓冲区大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class ZipExtractProgress:
+    """解压进度计数和变化的文件"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files_total = 0
+        self.files_added = 0
+        self.files_updated = 0
+        self.files_unchanged = 0
+        self.files_ignored = 0
+        self.bytes_extracted = 0
+        self.added: List[str] = []
+        self.updated: List[str] = []
+
+    def add(self, **counts: int):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def extracted(self, path: str, size: int, existed: bool):
+        with self._lock:
+            self.bytes_extracted += size
+            if existed:
+                self.files_updated += 1
+                self.updated.append(path)
+            else:
+                self.files_added += 1
+                self.added.append(path)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "files_total": self.files_total,
+                "files_done": self.files_added + self.files_updated + self.files_unchanged,
+                "files_added": self.files_added,
+                "files_updated": self.files_updated,
+                "files_unchanged": self.files_unchanged,
+                "files_ignored": self.files_ignored,
+                "bytes_extracted": self.bytes_extracted,
+            }
+
+
+def target_path(storage_path: str, filename: str) -> str:
+    """成员解压后的路径，与ZipFile.extract一样去掉盘符、空路径段和..，不会落到存储目录之外"""
+    arcname = filename.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid = ('', os.path.curdir, os.path.pardir)
+    arcname = os.path.sep.join(part for part in arcname.split(os.path.sep) if part not in invalid)
+    return os.path.join(storage_path, arcname)
+
+
+def file_crc32(path: str) -> int:
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def partition_members(members: List[zipfile.ZipInfo], large_size: int, batch_files: int) -> List[List[zipfile.ZipInfo]]:
+    """
+    把成员分成解压任务
+
+    不小于large_size的文件各自成为一个任务，按大小降序排在前面，避免最后只剩一个大文件在解压；
+    小文件按数量（batch_files）和累计大小（large_size）分批，减少任务调度开销。
+    """
+    large = sorted((info for info in members if info.file_size >= large_size), key=lambda info: -info.file_size)
+    tasks = [[info] for info in large]
+    batch: List[zipfile.ZipInfo] = []
+    batch_bytes = 0
+    for info in members:
+        if info.file_size >= large_size:
+            continue
+        batch.append(info)
+        batch_bytes += info.file_size
+        if len(batch) >= batch_files or batch_bytes >= large_size:
+            tasks.append(batch)
+            batch, batch_bytes = [], 0
+    if batch:
+        tasks.append(batch)
+    return tasks
+
+
+class _ParallelExtractor:
+    """在线程池中解压成员，每个线程打开自己的ZipFile"""
+
+    def __init__(self, zip_path: str, storage_path: str, incremental: bool, progress: ZipExtractProgress):
+        self.zip_path = zip_path
+        self.storage_path = storage_path
+        self.incremental = incremental
+        self.progress = progress
+        self._local = threading.local()
+        self._handles: List[zipfile.ZipFile] = []
+        self._lock = threading.Lock()
+
+    def _handle(self) -> zipfile.ZipFile:
+        handle = getattr(self._local, "zip_file", None)
+        if handle is None:
+            handle = zipfile.ZipFile(self.zip_path, 'r')
+            self._local.zip_file = handle
+            with self._lock:
+                self._handles.append(handle)
+        return handle
+
+    def _is_unchanged(self, path: str, info: zipfile.ZipInfo) -> bool:
+        try:
+            if os.stat(path).st_size != info.file_size:
+                return False
+            return file_crc32(path) == info.CRC
+        except OSError:
+            return False
+
+    def _extract_batch(self, batch: List[zipfile.ZipInfo]):
+        zip_file = self._handle()
+        for info in batch:
+            path = target_path(self.storage_path, info.filename)
+            if self.incremental and self._is_unchanged(path, info):
+                self.progress.add(files_unchanged=1)
+                continue
+            existed = os.path.exists(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with zip_file.open(info) as source, open(path, 'wb') as target:
+                shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+            self.progress.extracted(info.filename, info.file_size, existed)
+
+    def run(self, members: List[zipfile.ZipInfo], workers: int, large_size: int, batch_files: int):
+        tasks = partition_members(members, large_size, batch_files)
+        if not tasks:
+            return
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks))), thread_name_prefix="zip-extract") as pool:
+                futures = [pool.submit(self._extract_batch, batch) for batch in tasks]
+            for future in futures:
+                future.result()
+        finally:
+            for handle in self._handles:
+                handle.close()
+
+
+def _clear_storage(storage_path: str):
+    """清空存储目录，保留.gitignore"""
+    for item in os.listdir(storage_path):
+        if item == IGNORE_FILE:
+            continue
+        item_path = os.path.join(storage_path, item)
+        if os.path.isdir(item_path) and not os.path.islink(item_path):
+            shutil.rmtree(item_path)
+        else:
+            os.remove(item_path)
+
+
+def extract_project_zip(
+    zip_path: str,
+    storage_path: str,
+    mode: str = MODE_REPLACE,
+    progress: Optional[ZipExtractProgress] = None,
+    workers: int = 8,
+    large_size: int = 4 * 1024 * 1024,
+    batch_files: int = 64
+) -> ZipExtractProgress:
+    """
+    解压项目ZIP包
+
+    Args:
+        zip_path: ZIP文件路径
+        storage_path: 项目存储目录
+        mode: replace（替换现有文件）, increment（增量更新，跳过未变化的文件）
+        progress: 进度计数，为空时新建
+        workers: 解压线程数
+        large_size: 单独解压的文件大小下限，也是一批小文件的累计大小上限
+        batch_files: 一批小文件的数量上限
+
+    Returns:
+        进度计数，包含新增和更新的文件
+    """
+    progress = progress or ZipExtractProgress()
+    os.makedirs(storage_path, exist_ok=True)
+
+    # 读取.gitignore文件(如果存在)
+    gitignore_file_path = os.path.join(storage_path, IGNORE_FILE)
+    ignore_patterns = parse_ignore_file(gitignore_file_path)
+
+    # 在替换模式下，如果.gitignore文件存在，需要保存它
+    gitignore_content = None
+    if mode == MODE_REPLACE and os.path.exists(gitignore_file_path):
+        with open(gitignore_file_path, 'r', encoding='utf-8') as f:
+            gitignore_content = f.read()
+
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        infos = zip_ref.infolist()
+
+        # ZIP包中有.gitignore时使用包中的忽略规则
+        gitignore_in_zip = next(
+            (info.filename for info in infos if info.filename == IGNORE_FILE or info.filename.endswith("/" + IGNORE_FILE)),
+            None
+        )
+        if gitignore_in_zip:
+            gitignore_content = zip_ref.read(gitignore_in_zip).decode('utf-8', errors='ignore')
+            ignore_patterns = [
+                line.strip() for line in gitignore_content.splitlines()
+                if line.strip() and not line.strip().startswith('#')
+            ]
+
+    if mode == MODE_REPLACE:
+        _clear_storage(storage_path)
+
+    ignore_matcher = get_ignore_matcher(ignore_patterns)
+    # 同名成员以最后一个为准，避免多个线程写同一个文件
+    members: Dict[str, zipfile.ZipInfo] = {}
+    for info in infos:
+        if info.is_dir():
+            continue
+        if ignore_matcher.match(info.filename):
+            progress.add(files_ignored=1)
+            continue
+        members[target_path(storage_path, info.filename)] = info
+    progress.files_total = len(members)
+
+    _ParallelExtractor(zip_path, storage_path, mode == MODE_INCREMENT, progress).run(
+        list(members.values()), workers, large_size, batch_files
+    )
+
+    # 保存.gitignore文件内容（如果存在）
+    if gitignore_content:
+        with open(gitignore_file_path, 'w', encoding='utf-8') as f:
+            f.write(gitignore_content)
+
+    logger.info(f"ZIP包解压完成: {zip_path} -> {storage_path}, {progress.snapshot()}")
+    return progress
@@ -0,0 +1,48 @@
+import sqlite3
+import os
+import logging
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+def add_auto_sync_columns():
+    """向projects表和deployments表添加auto_sync列"""
+    db_path = os.path.join(os.getcwd(), "project_center.db")
+    
+    if not os.path.exists(db_path):
+        logger.error(f"数据库文件不存在: {db_path}")
+        return
+    
+    logger.info(f"正在修改数据库: {db_path}")
+    
+    try:
+        # 连接到SQLite数据库
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # projects.auto_sync: 监听本地源文件夹并自动同步；deployments.auto_sync: 自动推送到部署
+        for table in ("projects", "deployments"):
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = cursor.fetchall()
+            column_names = [column[1] for column in columns]
+            
+            if "auto_sync" not in column_names:
+                logger.info(f"{table}表的auto_sync列不存在，正在添加...")
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN auto_sync BOOLEAN DEFAULT 0")
+                conn.commit()
+                logger.info(f"{table}表的auto_sync列添加成功")
+            else:
+                logger.info(f"{table}表的auto_sync列已存在，无需添加")
+        
+        conn.close()
+        logger.info("数据库修改完成")
+        
+    except Exception as e:
+        logger.error(f"修改数据库出错: {str(e)}")
+
+if __name__ == "__main__":
+    add_auto_sync_columns()
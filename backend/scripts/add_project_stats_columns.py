@@ -0,0 +1,48 @@
+import sqlite3
+import os
+import logging
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+def add_project_stats_columns():
+    """向projects表添加stats和stats_index列"""
+    db_path = os.path.join(os.getcwd(), "project_center.db")
+    
+    if not os.path.exists(db_path):
+        logger.error(f"数据库文件不存在: {db_path}")
+        return
+    
+    logger.info(f"正在修改数据库: {db_path}")
+    
+    try:
+        # 连接到SQLite数据库
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("PRAGMA table_info(projects)")
+        columns = cursor.fetchall()
+        column_names = [column[1] for column in columns]
+        
+        # stats: 上次统计的结果；stats_index: 代码文件的行数缓存
+        for column, column_type in (("stats", "JSON"), ("stats_index", "BLOB")):
+            if column not in column_names:
+                logger.info(f"{column}列不存在，正在添加...")
+                cursor.execute(f"ALTER TABLE projects ADD COLUMN {column} {column_type}")
+                conn.commit()
+                logger.info(f"{column}列添加成功")
+            else:
+                logger.info(f"{column}列已存在，无需添加")
+        
+        conn.close()
+        logger.info("数据库修改完成")
+        
+    except Exception as e:
+        logger.error(f"修改数据库出错: {str(e)}")
+
+if __name__ == "__main__":
+    add_project_stats_columns()
@@ -0,0 +1,48 @@
+import sqlite3
+import os
+import logging
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+def add_sync_manifest_column():
+    """向deployments表添加sync_manifest列"""
+    db_path = os.path.join(os.getcwd(), "project_center.db")
+    
+    if not os.path.exists(db_path):
+        logger.error(f"数据库文件不存在: {db_path}")
+        return
+    
+    logger.info(f"正在修改数据库: {db_path}")
+    
+    try:
+        # 连接到SQLite数据库
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # 检查sync_manifest列是否存在
+        cursor.execute("PRAGMA table_info(deployments)")
+        columns = cursor.fetchall()
+        column_names = [column[1] for column in columns]
+        
+        if "sync_manifest" not in column_names:
+            logger.info("sync_manifest列不存在，正在添加...")
+            # 添加sync_manifest列，保存上次同步后的远程文件清单
+            cursor.execute("ALTER TABLE deployments ADD COLUMN sync_manifest BLOB")
+            conn.commit()
+            logger.info("sync_manifest列添加成功")
+        else:
+            logger.info("sync_manifest列已存在，无需添加")
+        
+        conn.close()
+        logger.info("数据库修改完成")
+        
+    except Exception as e:
+        logger.error(f"修改数据库出错: {str(e)}")
+
+if __name__ == "__main__":
+    add_sync_manifest_column()
@@ -0,0 +1,90 @@
+"""
+代码行数统计性能对比
+
+在临时目录生成合成项目树，对比原来逐行解码文本的统计方式和按块统计换行符的方式：
+- text:     逐个文件按文本读取并逐行计数（原实现）
+- block:    逐个文件按二进制块统计换行符
+- parallel: 按块统计，由线程池并行读取
+- project:  compute_project_stats完整统计（遍历+并行计数），以及缓存全部命中时的再次统计
+
+用法: python scripts/benchmark_line_count.py [--files 100000] [--workers 8] [--dir PATH]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.project_stats import LANGUAGE_EXTENSIONS, compute_project_stats, count_lines, count_lines_many
+
+
+def legacy_count_lines(path: str) -> int:
+    """原实现：解码文本后逐行计数"""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return sum(1 for _ in f)
+
+
+def build_tree(root: str, files: int, seed: int = 0):
+    """生成合成项目树，大部分是小文件，少量是几MB的生成文件"""
+    rng = random.Random(seed)
+    extensions = list(LANGUAGE_EXTENSIONS)
+    line = "const value = compute(alpha, beta, gamma); // generated\n"
+    for i in range(files):
+        directory = os.path.join(root, f"pkg{i % 100:02d}", f"mod{i % 1000 // 100}")
+        os.makedirs(directory, exist_ok=True)
+        if i % 1000 == 0:
+            lines = rng.randint(20000, 80000)
+        else:
+            lines = int(rng.expovariate(1 / 120))
+        with open(os.path.join(directory, f"file{i}{rng.choice(extensions)}"), 'w') as f:
+            f.write(line * lines)
+
+
+def measure(name: str, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<18} {elapsed:8.2f}s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="代码行数统计性能对比")
+    parser.add_argument("--files", type=int, default=100000, help="合成文件数量")
+    parser.add_argument("--workers", type=int, default=8, help="并行统计的线程数")
+    parser.add_argument("--dir", help="合成项目树的目录，默认使用临时目录并在结束后删除")
+    args = parser.parse_args()
+
+    root = args.dir or tempfile.mkdtemp(prefix="line_count_bench_")
+    try:
+        if not os.listdir(root):
+            print(f"生成 {args.files} 个文件到 {root} ...")
+            build_tree(root, args.files)
+        paths = [os.path.join(directory, name) for directory, _, names in os.walk(root) for name in names]
+        total_bytes = sum(os.path.getsize(path) for path in paths)
+        print(f"{len(paths)} 个文件，共 {total_bytes / 1024 / 1024:.1f} MB\n")
+
+        # 页缓存预热，各方式都读取已缓存的文件
+        count_lines_many(paths, args.workers)
+
+        text_lines, text_time = measure("text", lambda: sum(legacy_count_lines(path) for path in paths))
+        block_lines, block_time = measure("block", lambda: sum(count_lines(path) for path in paths))
+        parallel_lines, parallel_time = measure("parallel", lambda: sum(count_lines_many(paths, args.workers)))
+        result, _ = measure("project", lambda: compute_project_stats(root, workers=args.workers))
+        cached, _ = measure("project (cached)", lambda: compute_project_stats(root, index=result.index, workers=args.workers))
+
+        assert text_lines == block_lines == parallel_lines == result.stats["code_lines"] == cached.stats["code_lines"], "行数不一致"
+        assert cached.recounted == 0
+        print(f"\n总行数 {text_lines}，相对 text 加速: block {text_time / block_time:.1f}x, parallel {text_time / parallel_time:.1f}x")
+    finally:
+        if not args.dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
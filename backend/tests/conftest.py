@@ -2,8 +2,18 @@
 测试配置文件，用于设置 pytest 相关环境
 """
 
+import io
 import os
 import sys
+import time
+import asyncio
+import subprocess
+import threading
+import unittest.mock as mock
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
 
 # 添加项目根目录到Python路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,4 +24,240 @@ if parent_dir not in sys.path:
 
 # 打印当前路径信息，用于调试
 print(f"当前工作目录: {os.getcwd()}")
-print(f"Python 路径: {sys.path}") 
\ No newline at end of file
+print(f"Python 路径: {sys.path}") 
+
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker  # noqa: E402
+
+from app.core.machines import MachineManager, probe_flight  # noqa: E402
+from app.db.base_class import Base  # noqa: E402
+from app.models.machine import Machine  # noqa: E402
+
+# 一次完整的机器探测输出
+PROBE_OUTPUT = """@@backend
+ubuntu    1234  0.5  2.1 python -m uvicorn app.main:app --port 8011
+@@frontend
+@@uptime
+ 10:00:00 up 3 days,  2 users,  load average: 0.50, 0.40, 0.30
+@@memory_h
+              total        used        free
+Mem:           7.7Gi       3.1Gi       4.6Gi
+@@disk_h
+/dev/vda1        99G   40G   59G  41% /
+@@cores
+4
+@@loadavg
+0.50 0.40 0.30 1/200 12345
+@@cpu
+12.5
+@@memory
+Mem:     8000000000  2000000000  6000000000  0  0  0
+@@disk
+/dev/vda1  100000000000  40000000000  60000000000  40% /
+@@network
+1000 2000 10 20
+@@processes
+Ss
+R+
+S
+D
+@@end
+"""
+
+
+
+def write_file(path, content, mtime=None):
+    """写入文件并创建上级目录，content为bytes时按二进制写入"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if isinstance(content, bytes):
+        with open(path, 'wb') as f:
+            f.write(content)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class FakeRemoteFile:
+    """SFTP远程文件，写入本地路径"""
+    
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self.path = path
+        self.pipelined = False
+    
+    def set_pipelined(self, pipelined=True):
+        self.pipelined = pipelined
+    
+    def write(self, data):
+        self._file.write(data)
+    
+    def utime(self, times):
+        self._file.flush()
+        os.utime(self.path, times)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self._file.close()
+
+
+class FakeSFTP:
+    """SFTP通道，远程路径即本地路径，每次请求有固定延迟"""
+    
+    def __init__(self, client):
+        self.client = client
+    
+    def stat(self, path):
+        time.sleep(self.client.latency)
+        return os.stat(path)
+    
+    def open(self, path, mode):
+        time.sleep(self.client.latency)
+        with self.client._lock:
+            self.client.uploaded.append(path)
+        return FakeRemoteFile(path)
+    
+    def mkdir(self, path):
+        os.mkdir(path)
+    
+    def close(self):
+        pass
+
+
+class ProcessChannel:
+    """exec通道，命令在本地shell进程中运行，写入的数据送到进程的标准输入"""
+    
+    def __init__(self, client):
+        self.client = client
+        self._err = None
+    
+    def exec_command(self, command):
+        self.client.commands.append(command)
+        self.proc = subprocess.Popen(
+            ["sh", "-c", command], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+    
+    def sendall(self, data):
+        self.client.sent += len(data)
+        self.proc.stdin.write(data)
+    
+    def shutdown_write(self):
+        self.proc.stdin.close()
+    
+    def exit_status_ready(self):
+        return self.proc.poll() is not None
+    
+    def recv_ready(self):
+        return False
+    
+    def recv_stderr_ready(self):
+        if self._err is None and self.exit_status_ready():
+            self._err = self.proc.stderr.read()
+        return bool(self._err)
+    
+    def recv_stderr(self, size):
+        data, self._err = self._err[:size], self._err[size:]
+        return data
+    
+    def recv_exit_status(self):
+        return self.proc.wait()
+    
+    def close(self):
+        pass
+
+
+class LocalSSHClient:
+    """
+    在本地执行的SSH连接，远程目录即本地目录
+    
+    记录执行的命令、上传的文件、打开的SFTP通道数和exec通道发送的字节数。
+    """
+    
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.commands = []
+        self.uploaded = []
+        self.channels = 0
+        self.sent = 0
+        self._lock = threading.Lock()
+    
+    def exec_command(self, command):
+        with self._lock:
+            self.commands.append(command)
+        result = subprocess.run(["sh", "-c", command], capture_output=True)
+        stdout = io.BytesIO(result.stdout)
+        stdout.channel = SimpleNamespace(recv_exit_status=lambda: result.returncode)
+        return None, stdout, io.BytesIO(result.stderr)
+    
+    def open_sftp(self):
+        with self._lock:
+            self.channels += 1
+        return FakeSFTP(self)
+    
+    def get_transport(self):
+        return SimpleNamespace(open_session=lambda: ProcessChannel(self))
+
+
+class FakeSSHClient:
+    """模拟借出的SSH连接"""
+    
+    def close(self):
+        pass
+    
+    def discard(self):
+        pass
+
+
+@pytest.fixture
+def write():
+    """写入测试文件"""
+    return write_file
+
+
+@pytest.fixture
+def local_ssh():
+    """创建在本地执行的SSH连接，参数为SFTP请求延迟"""
+    return LocalSSHClient
+
+
+@pytest.fixture
+def probe_output():
+    """机器探测脚本的样例输出"""
+    return PROBE_OUTPUT
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    """内存数据库，包含一台机器"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as db:
+        db.add(Machine(id=1, name="m1", host="10.0.0.1", port=22, username="root", password="secret"))
+        await db.commit()
+    yield factory
+    await engine.dispose()
+
+
+@pytest.fixture
+def fake_ssh():
+    """模拟SSH连接和探测命令，返回执行过的命令列表"""
+    calls = []
+    
+    async def execute_command(client, command, timeout=None):
+        calls.append(command)
+        await asyncio.sleep(0.05)
+        return PROBE_OUTPUT, "", 0
+    
+    async def get_ssh_client(machine, password=None, dedicated=False):
+        return FakeSSHClient(), ""
+    
+    probe_flight.clear()
+    with mock.patch.object(MachineManager, "get_ssh_client", side_effect=get_ssh_client), \
+            mock.patch.object(MachineManager, "execute_command", side_effect=execute_command):
+        yield calls
+    probe_flight.clear()
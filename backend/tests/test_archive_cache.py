@@ -0,0 +1,103 @@
+"""
+项目下载包缓存测试
+"""
+
+import os
+
+import pytest
+
+from app.utils.archive_cache import ArchiveCache, tree_fingerprint
+from app.utils.ignore_handler import IgnoreMatcher
+
+
+def test_fingerprint_tracks_changes_and_ignore_rules(tmp_path, write):
+    project = tmp_path / "project"
+    write(str(project / "main.py"), b"print(1)\n")
+    write(str(project / "build" / "out.bin"), b"0")
+    matcher = IgnoreMatcher(["build/"])
+    
+    first = tree_fingerprint(str(project), matcher)
+    assert tree_fingerprint(str(project), matcher) == first
+    
+    # 被忽略的文件不影响指纹
+    write(str(project / "build" / "out.bin"), b"changed")
+    assert tree_fingerprint(str(project), matcher) == first
+    
+    write(str(project / "main.py"), b"print(2)\n")
+    os.utime(str(project / "main.py"), ns=(1, 1))
+    second = tree_fingerprint(str(project), matcher)
+    assert second != first
+    
+    write(str(project / "lib" / "util.py"), b"")
+    assert tree_fingerprint(str(project), matcher) != second
+
+
+def test_store_then_get(tmp_path):
+    cache = ArchiveCache(str(tmp_path / "cache"), 1024 * 1024)
+    
+    assert cache.get(1, "abc") is None
+    assert b"".join(cache.store(1, "abc", [b"part1", b"part2"])) == b"part1part2"
+    
+    path = cache.get(1, "abc")
+    with open(path, 'rb') as f:
+        assert f.read() == b"part1part2"
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_interrupted_store_is_discarded(tmp_path):
+    cache = ArchiveCache(str(tmp_path / "cache"), 1024 * 1024)
+    
+    def chunks():
+        yield b"part1"
+        raise OSError("disk gone")
+    
+    with pytest.raises(OSError):
+        b"".join(cache.store(1, "abc", chunks()))
+    
+    # 客户端断开时生成器被关闭
+    stream = cache.store(1, "def", [b"a", b"b"])
+    next(stream)
+    stream.close()
+    
+    assert cache.get(1, "abc") is None
+    assert cache.get(1, "def") is None
+    assert os.listdir(str(tmp_path / "cache")) == []
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ArchiveCache(str(tmp_path / "cache"), 25)
+    
+    b"".join(cache.store(1, "a", [b"x" * 10]))
+    b"".join(cache.store(2, "b", [b"x" * 10]))
+    assert cache.get(1, "a")
+    b"".join(cache.store(3, "c", [b"x" * 10]))
+    
+    assert cache.get(2, "b") is None
+    assert cache.get(1, "a")
+    assert cache.get(3, "c")
+    assert cache.stats()["bytes"] == 20
+    
+    # 超过上限的包不缓存
+    b"".join(cache.store(4, "d", [b"x" * 30]))
+    assert cache.get(4, "d") is None
+
+
+def test_invalidate_and_reload(tmp_path, write):
+    directory = str(tmp_path / "cache")
+    cache = ArchiveCache(directory, 1024)
+    b"".join(cache.store(1, "old", [b"1"]))
+    b"".join(cache.store(1, "new", [b"2"]))
+    b"".join(cache.store(2, "keep", [b"3"]))
+    write(os.path.join(directory, "leftover.tmp"), b"partial")
+    
+    cache.invalidate(1)
+    
+    assert cache.get(1, "old") is None
+    assert cache.get(1, "new") is None
+    
+    # 重启后从磁盘恢复缓存，清理临时文件
+    reloaded = ArchiveCache(directory, 1024)
+    assert reloaded.get(2, "keep")
+    assert reloaded.stats()["entries"] == 1
+    assert not os.path.exists(os.path.join(directory, "leftover.tmp"))
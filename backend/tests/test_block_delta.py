@@ -0,0 +1,153 @@
+"""
+块级增量传输测试
+
+远程命令和exec通道都由本地shell进程模拟，远程脚本在本地python3中运行。
+"""
+
+import os
+import random
+import shutil
+
+import pytest
+
+from app.utils.block_delta import (
+    BlockDeltaUploader, DeltaAbort, compute_delta, literal_bytes, strong_checksum, weak_checksum
+)
+from app.utils.manifest_sync import ManifestSync
+from app.utils.sftp_transfer import TransferProgress
+
+pytestmark = pytest.mark.skipif(shutil.which("python3") is None, reason="需要python3")
+
+
+def signatures_of(data, block_size):
+    signatures = {}
+    for index in range(len(data) // block_size):
+        block = data[index * block_size:(index + 1) * block_size]
+        a, b = weak_checksum(block)
+        signatures.setdefault(a | (b << 16), []).append((index, strong_checksum(block)))
+    return signatures
+
+
+def apply_delta(old, new, ops):
+    return b"".join(old[first:first + second] if op == "C" else new[first:second] for op, first, second in ops)
+
+
+def random_bytes(size, seed):
+    return random.Random(seed).randbytes(size)
+
+
+def test_compute_delta_finds_shifted_blocks():
+    old = random_bytes(200_000, 1)
+    new = old[:5000] + b"inserted bytes" + old[5000:150_000] + old[160_000:] + b"tail"
+    
+    ops = compute_delta(new, signatures_of(old, 2048), 2048)
+    
+    assert apply_delta(old, new, ops) == new
+    assert literal_bytes(ops) < 3 * 2048 + 100
+
+
+def test_compute_delta_gives_up_on_rewritten_file():
+    old, new = random_bytes(100_000, 1), random_bytes(100_000, 2)
+    
+    with pytest.raises(DeltaAbort):
+        compute_delta(new, signatures_of(old, 2048), 2048, max_roll=10_000)
+
+
+@pytest.mark.asyncio
+async def test_delta_upload_rebuilds_remote_file(tmp_path, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    local.mkdir()
+    remote.mkdir()
+    old = random_bytes(1_000_000, 3)
+    new = old[:400_000] + b"changed" * 10 + old[400_070:]
+    (remote / "model.bin").write_bytes(old)
+    (local / "model.bin").write_bytes(new)
+    os.utime(local / "model.bin", (1_700_000_000, 1_700_000_000))
+    client = local_ssh()
+    progress = TransferProgress()
+    item = (str(local / "model.bin"), str(remote / "model.bin"), len(new), 1_700_000_000.0)
+    
+    done, fallback = await BlockDeltaUploader(client).upload_files([("model.bin", item)], str(remote), progress)
+    
+    assert fallback == []
+    assert "model.bin" in done
+    assert (remote / "model.bin").read_bytes() == new
+    assert os.stat(remote / "model.bin").st_mtime == 1_700_000_000
+    assert client.sent < 20_000
+    assert progress.bytes_done == len(new)
+
+
+@pytest.mark.asyncio
+async def test_manifest_sync_uses_delta_for_large_files(tmp_path, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    local.mkdir()
+    data = random_bytes(500_000, 4)
+    (local / "data.db").write_bytes(data)
+    (local / "app.py").write_text("print(1)\n")
+    await ManifestSync(local_ssh(), delta_min_size=100_000).sync(str(local), str(remote))
+    
+    (local / "data.db").write_bytes(data[:250_000] + b"x" * 100 + data[250_100:])
+    (local / "app.py").write_text("print(2)\n")
+    for name in ("data.db", "app.py"):
+        os.utime(local / name, (1_700_000_100, 1_700_000_100))
+    client = local_ssh()
+    result = await ManifestSync(client, delta_min_size=100_000).sync(str(local), str(remote))
+    
+    assert result.delta_files == 1
+    assert [os.path.basename(path) for path in client.uploaded] == ["app.py"]
+    assert (remote / "data.db").read_bytes() == (local / "data.db").read_bytes()
+    assert (remote / "app.py").read_text() == "print(2)\n"
+
+
+@pytest.mark.asyncio
+async def test_files_above_max_size_are_uploaded_whole(tmp_path, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    local.mkdir()
+    data = random_bytes(500_000, 7)
+    (local / "data.db").write_bytes(data)
+    await ManifestSync(local_ssh(), delta_min_size=100_000).sync(str(local), str(remote))
+    
+    (local / "data.db").write_bytes(data[:250_000] + b"x" * 100 + data[250_100:])
+    os.utime(local / "data.db", (1_700_000_100, 1_700_000_100))
+    client = local_ssh()
+    result = await ManifestSync(client, delta_min_size=100_000, delta_max_size=400_000).sync(str(local), str(remote))
+    
+    assert result.delta_files == 0
+    assert [os.path.basename(path) for path in client.uploaded] == ["data.db"]
+    assert (remote / "data.db").read_bytes() == (local / "data.db").read_bytes()
+
+
+@pytest.mark.asyncio
+async def test_missing_remote_file_falls_back_to_upload(tmp_path, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    local.mkdir()
+    remote.mkdir()
+    (local / "big.bin").write_bytes(random_bytes(300_000, 5))
+    item = (str(local / "big.bin"), str(remote / "big.bin"), 300_000, 0.0)
+    
+    done, fallback = await BlockDeltaUploader(local_ssh()).upload_files(
+        [("big.bin", item)], str(remote), TransferProgress()
+    )
+    
+    assert done == {}
+    assert fallback == [("big.bin", item)]
+
+
+@pytest.mark.asyncio
+async def test_truncated_local_file_falls_back_to_upload(tmp_path, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    local.mkdir()
+    remote.mkdir()
+    data = random_bytes(300_000, 6)
+    (remote / "big.bin").write_bytes(data)
+    (local / "big.bin").write_bytes(data)
+    item = (str(local / "big.bin"), str(remote / "big.bin"), 300_000, 0.0)
+    # 生成清单后文件被截断为空
+    (local / "big.bin").write_bytes(b"")
+    
+    done, fallback = await BlockDeltaUploader(local_ssh()).upload_files(
+        [("big.bin", item)], str(remote), TransferProgress()
+    )
+    
+    assert done == {}
+    assert fallback == [("big.bin", item)]
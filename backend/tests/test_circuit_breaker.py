@@ -0,0 +1,89 @@
+"""
+SSH连接熔断测试
+"""
+
+import socket
+import time
+import unittest.mock as mock
+
+import paramiko
+import pytest
+
+from app.utils.circuit_breaker import CircuitBreaker, CircuitState, CircuitOpenError, circuit_breakers
+from app.utils.ssh_pool import SSHConnectionPool
+
+
+def test_breaker_opens_after_threshold_and_backs_off():
+    """连续失败达到阈值后打开，半开探测失败后退避时间加倍"""
+    breaker = CircuitBreaker("m1", failure_threshold=2, base_backoff=0.05, max_backoff=1)
+    
+    breaker.before_call()
+    breaker.record_failure("timed out")
+    assert breaker.state == CircuitState.CLOSED
+    breaker.record_failure("timed out")
+    assert breaker.state == CircuitState.OPEN
+    offline_since = breaker.offline_since
+    
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    
+    time.sleep(0.06)
+    breaker.before_call()  # 半开，放行一个探测
+    assert breaker.state == CircuitState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # 探测进行中，其余调用仍然立即失败
+    
+    breaker.record_failure("timed out")
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.offline_since == offline_since
+    time.sleep(0.06)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # 第二次熔断时长加倍
+    
+    time.sleep(0.05)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.snapshot() == {"circuit_state": "closed", "offline_since": None, "next_retry_at": None}
+
+
+@pytest.mark.asyncio
+async def test_pool_fails_fast_while_open():
+    """熔断打开后连接池不再尝试连接，认证信息变化后熔断清除"""
+    pool = SSHConnectionPool(max_per_host=2, idle_timeout=60)
+    conn = dict(host="10.0.0.9", port=22, username="root", password="secret", machine_id=9001)
+    failing = mock.MagicMock()
+    failing.connect.side_effect = socket.timeout("timed out")
+    
+    try:
+        with mock.patch("app.utils.ssh_pool.paramiko.SSHClient", return_value=failing):
+            for _ in range(circuit_breakers.failure_threshold):
+                with pytest.raises(socket.timeout):
+                    await pool.acquire(**conn)
+            
+            with pytest.raises(CircuitOpenError) as exc_info:
+                await pool.acquire(**conn)
+            assert exc_info.value.offline_since is not None
+            assert failing.connect.call_count == circuit_breakers.failure_threshold
+        
+        pool.invalidate(9001)
+        assert circuit_breakers.snapshot(9001)["circuit_state"] == CircuitState.CLOSED
+    finally:
+        circuit_breakers.reset(9001)
+
+
+@pytest.mark.asyncio
+async def test_authentication_failure_does_not_trip():
+    """认证失败说明机器可达，不计入熔断"""
+    pool = SSHConnectionPool(max_per_host=2, idle_timeout=60)
+    conn = dict(host="10.0.0.10", port=22, username="root", password="wrong", machine_id=9002)
+    client = mock.MagicMock()
+    client.connect.side_effect = paramiko.AuthenticationException("bad password")
+    
+    try:
+        with mock.patch("app.utils.ssh_pool.paramiko.SSHClient", return_value=client):
+            for _ in range(circuit_breakers.failure_threshold + 1):
+                with pytest.raises(paramiko.AuthenticationException):
+                    await pool.acquire(**conn)
+        assert circuit_breakers.snapshot(9002)["circuit_state"] == CircuitState.CLOSED
+    finally:
+        circuit_breakers.reset(9002)
@@ -0,0 +1,216 @@
+"""
+目录监听和自动同步测试
+"""
+
+import os
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.core import project_watcher
+from app.core.project_watcher import ProjectWatch, ProjectWatcherHub
+from app.utils.fs_watcher import InotifyWatcher, PollingWatcher, WatcherError, create_watcher, inotify_available
+from app.utils.ignore_handler import IgnoreMatcher
+from app.utils.local_sync import LocalFolderSync
+
+
+class Collector:
+    def __init__(self):
+        self.paths = set()
+        self.changed = threading.Event()
+    
+    def __call__(self, paths, rescan):
+        self.paths |= paths
+        self.changed.set()
+    
+    def wait_for(self, expected, timeout=3):
+        deadline = time.monotonic() + timeout
+        while not expected <= self.paths and time.monotonic() < deadline:
+            self.changed.wait(0.05)
+            self.changed.clear()
+        return self.paths
+
+
+BACKENDS = ["polling"] + (["inotify"] if inotify_available() else [])
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_watcher_reports_changes_and_skips_pruned_dirs(tmp_path, backend, write):
+    write(str(tmp_path / "a.py"), "a")
+    write(str(tmp_path / "node_modules" / "pkg.js"), "m")
+    collector = Collector()
+    watcher = create_watcher(
+        str(tmp_path), collector, prune=lambda rel_path, entry: rel_path == "node_modules",
+        backend=backend, poll_interval=0.05
+    )
+    try:
+        write(str(tmp_path / "a.py"), "changed")
+        write(str(tmp_path / "node_modules" / "pkg.js"), "changed")
+        os.makedirs(tmp_path / "sub")
+        time.sleep(0.1)
+        write(str(tmp_path / "sub" / "b.py"), "b")
+        
+        paths = collector.wait_for({"a.py", "sub/b.py"})
+    finally:
+        watcher.stop()
+    
+    assert {"a.py", "sub/b.py"} <= paths
+    assert not any(path.startswith("node_modules") for path in paths)
+
+
+@pytest.fixture
+def broken_inotify(monkeypatch):
+    """inotify监听线程处理第一个事件时意外出错"""
+    def handle(self, data):
+        raise OSError("inotify读取失败")
+    
+    monkeypatch.setattr(InotifyWatcher, "_handle", handle)
+
+
+@pytest.mark.skipif(not inotify_available(), reason="需要inotify")
+def test_watch_thread_error_is_reported(tmp_path, write, broken_inotify):
+    """监听线程意外退出时回调on_error，之后停止监听不报错"""
+    errors = []
+    watcher = create_watcher(str(tmp_path), Collector(), backend="inotify", on_error=errors.append)
+    write(str(tmp_path / "a.py"), "a")
+    watcher._thread.join(3)
+    assert not watcher._thread.is_alive()
+    assert [type(error) for error in errors] == [OSError]
+    
+    watcher.stop()
+    assert watcher._thread is None
+
+
+def test_apply_syncs_only_given_paths(tmp_path, write):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write(str(src / "a.py"), "a")
+    write(str(src / "lib" / "b.py"), "b")
+    folder_sync = LocalFolderSync(IgnoreMatcher(["*.log", "build/"]), link_mode="copy")
+    folder_sync.sync(str(src), str(dst))
+    
+    write(str(src / "a.py"), "a2")
+    write(str(src / "new" / "deep" / "c.py"), "c")
+    write(str(src / "build" / "out.js"), "x")
+    write(str(src / "debug.log"), "log")
+    os.remove(src / "lib" / "b.py")
+    os.rmdir(src / "lib")
+    
+    stats = LocalFolderSync(IgnoreMatcher(["*.log", "build/"]), link_mode="copy").apply(
+        str(src), str(dst), ["a.py", "new", "lib/b.py", "lib", "build/out.js", "debug.log"]
+    ).snapshot()
+    
+    assert (dst / "a.py").read_text() == "a2"
+    assert (dst / "new" / "deep" / "c.py").read_text() == "c"
+    assert not (dst / "lib").exists()
+    assert not (dst / "build").exists()
+    assert not (dst / "debug.log").exists()
+    assert stats["files_copied"] == 2
+
+
+class FakeHub:
+    def __init__(self):
+        self.pushed = []
+    
+    async def push_project(self, project_id):
+        self.pushed.append(project_id)
+
+
+@pytest.mark.asyncio
+async def test_project_watch_debounces_bursts(tmp_path, monkeypatch, write):
+    monkeypatch.setattr(settings, "LOCAL_WATCH_BACKEND", "polling")
+    monkeypatch.setattr(settings, "LOCAL_WATCH_POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(settings, "LOCAL_WATCH_DEBOUNCE", 0.2)
+    monkeypatch.setattr(settings, "LOCAL_SYNC_LINK_MODE", "copy")
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write(str(src / "a.py"), "a")
+    hub = FakeHub()
+    watch = ProjectWatch(hub, 1, str(src), str(dst))
+    flushes = []
+    original_flush = watch._flush
+    
+    async def counting_flush(paths, rescan):
+        flushes.append((set(paths), rescan))
+        await original_flush(paths, rescan)
+    
+    monkeypatch.setattr(watch, "_flush", counting_flush)
+    await watch.start()
+    try:
+        await asyncio.sleep(0.4)
+        assert (dst / "a.py").read_text() == "a"
+        flushes.clear()
+        
+        for i in range(5):
+            write(str(src / f"f{i}.py"), str(i))
+            await asyncio.sleep(0.06)
+        await asyncio.sleep(0.6)
+    finally:
+        await watch.stop()
+    
+    assert len(flushes) == 1
+    assert flushes[0][0] == {f"f{i}.py" for i in range(5)}
+    assert sorted(os.listdir(dst)) == ["a.py"] + [f"f{i}.py" for i in range(5)]
+    assert hub.pushed == [1, 1]
+
+
+async def wait_until(predicate, timeout=3):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return predicate()
+
+
+@pytest.fixture
+def inotify_settings(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_WATCH_ENABLED", True)
+    monkeypatch.setattr(settings, "LOCAL_WATCH_BACKEND", "inotify")
+    monkeypatch.setattr(settings, "LOCAL_WATCH_POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(settings, "LOCAL_WATCH_DEBOUNCE", 0.05)
+    monkeypatch.setattr(settings, "LOCAL_SYNC_LINK_MODE", "copy")
+
+
+@pytest.mark.skipif(not inotify_available(), reason="需要inotify")
+@pytest.mark.asyncio
+async def test_project_watch_falls_back_to_polling(tmp_path, write, inotify_settings, broken_inotify):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write(str(src / "a.py"), "a")
+    watch = ProjectWatch(FakeHub(), 1, str(src), str(dst))
+    await watch.start()
+    try:
+        assert isinstance(watch._watcher, InotifyWatcher)
+        write(str(src / "a.py"), "a2")
+        assert await wait_until(lambda: isinstance(watch._watcher, PollingWatcher))
+        
+        write(str(src / "b.py"), "b")
+        assert await wait_until(lambda: (dst / "b.py").exists())
+        assert (dst / "a.py").read_text() == "a2"
+    finally:
+        await watch.stop()
+
+
+@pytest.mark.skipif(not inotify_available(), reason="需要inotify")
+@pytest.mark.asyncio
+async def test_hub_forgets_watch_that_cannot_recover(tmp_path, monkeypatch, inotify_settings, broken_inotify):
+    src = tmp_path / "src"
+    src.mkdir()
+    original_create = project_watcher.create_watcher
+    
+    def create_watcher(root, callback, backend, **kwargs):
+        if backend == "polling":
+            raise WatcherError("无法遍历目录")
+        return original_create(root, callback, backend=backend, **kwargs)
+    
+    monkeypatch.setattr(project_watcher, "create_watcher", create_watcher)
+    hub = ProjectWatcherHub()
+    project = SimpleNamespace(id=1, repository_url=str(src), storage_path=str(tmp_path / "dst"))
+    assert await hub.watch(project)
+    try:
+        # 等待开始监听时的完整同步结束
+        await asyncio.sleep(0.3)
+        (src / "a.py").write_text("a")
+        assert await wait_until(lambda: not hub.is_watching(1))
+    finally:
+        await hub.shutdown()
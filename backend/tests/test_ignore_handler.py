@@ -0,0 +1,78 @@
+"""
+忽略规则测试
+"""
+
+import os
+
+from app.utils.ignore_handler import (
+    IgnoreMatcher, get_gitignore_file_matcher, get_ignore_matcher, get_project_ignore_matcher, should_ignore_file
+)
+
+
+def test_matcher_rules():
+    matcher = IgnoreMatcher(["*.log", "build/", "/dist", "docs/*.md"])
+    
+    assert matcher.match("logs/app.log")
+    assert matcher.match("build/out.js")
+    assert matcher.match("dist/main.js")
+    assert not matcher.match("src/dist/main.js")
+    assert matcher.match("docs/guide.md")
+    # 白名单、保护目录、总是忽略的目录和扩展名
+    assert not matcher.match("docs/README.md")
+    assert not matcher.match("backend")
+    assert matcher.match("frontend/node_modules/react/index.js")
+    assert matcher.match("app/module.pyc")
+    assert not matcher.match("src/main.py")
+
+
+def test_negated_patterns():
+    matcher = IgnoreMatcher(["*.log", "!keep.log"])
+    
+    assert matcher.match("debug.log")
+    assert not matcher.match("logs/keep.log")
+
+
+def test_match_dir_prunes_directory_only_patterns():
+    matcher = IgnoreMatcher(["build/", "*.log"])
+    
+    # 只匹配目录的规则不匹配目录路径本身，剪枝时按目录判断
+    assert not matcher.match("build")
+    assert matcher.match_dir("build")
+    assert matcher.match_dir("src/build")
+    assert not matcher.match_dir("src")
+    assert not matcher.match_dir("app")
+
+
+def test_should_ignore_file_uses_cached_matcher():
+    patterns = ["*.tmp", "cache/"]
+    
+    assert get_ignore_matcher(patterns) is get_ignore_matcher(list(patterns))
+    assert should_ignore_file("a/b.tmp", patterns)
+    assert not should_ignore_file("a/b.txt", patterns)
+
+
+def test_gitignore_matcher_recompiled_after_change(tmp_path):
+    gitignore = tmp_path / ".gitignore"
+    gitignore.write_text("*.log\n")
+    first = get_gitignore_file_matcher(str(gitignore))
+    
+    assert first is get_gitignore_file_matcher(str(gitignore))
+    assert first.match("a.log")
+    
+    gitignore.write_text("*.txt\n")
+    os.utime(gitignore, (1_700_000_000, 1_700_000_000))
+    second = get_gitignore_file_matcher(str(gitignore))
+    
+    assert second is not first
+    assert second.match("a.txt") and not second.match("a.log")
+
+
+def test_project_matcher(tmp_path):
+    project = tmp_path / "data" / "projects" / "demo"
+    project.mkdir(parents=True)
+    (project / ".gitignore").write_text("secret/\n")
+    
+    matcher = get_project_ignore_matcher(str(project))
+    
+    assert matcher.match_dir("secret")
+    assert matcher is get_project_ignore_matcher(str(project))
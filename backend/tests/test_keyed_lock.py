@@ -0,0 +1,49 @@
+"""
+按键区分的互斥锁测试
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.project_watcher import ProjectWatcherHub
+from app.utils.keyed_lock import KeyedLock, deployment_locks
+
+
+@pytest.mark.asyncio
+async def test_same_key_is_serialized_and_released():
+    """同一个键依次执行，不同键并行，结束后键被移除"""
+    locks = KeyedLock()
+    events = []
+    
+    async def job(key, name):
+        async with locks.hold(key):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.05)
+            events.append(f"{name} end")
+    
+    await asyncio.gather(job(1, "a"), job(1, "b"), job(2, "c"))
+    
+    assert events.index("a end") < events.index("b start")
+    assert events.index("c start") < events.index("a end")
+    assert not locks.locked(1)
+    assert locks._locks == {} and locks._users == {}
+
+
+@pytest.mark.asyncio
+async def test_auto_push_waits_for_manual_sync(monkeypatch):
+    """手动同步持有部署锁时，自动推送等待同步结束后再执行"""
+    hub = ProjectWatcherHub()
+    pushed = []
+    
+    async def push_once(deployment_id):
+        pushed.append(deployment_id)
+    
+    monkeypatch.setattr(hub, "_push_once", push_once)
+    async with deployment_locks.hold(7):
+        hub.push_deployment(7)
+        await asyncio.sleep(0.05)
+        assert pushed == []
+    
+    await asyncio.wait_for(hub._pushes[7], 1)
+    assert pushed == [7]
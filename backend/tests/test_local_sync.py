@@ -0,0 +1,111 @@
+"""
+本地文件夹增量同步测试
+"""
+
+import os
+
+import pytest
+
+from app.utils.ignore_handler import IgnoreMatcher
+from app.utils.local_sync import LocalFolderSync
+
+MTIME = 1700000000
+
+
+def make_source(write, root):
+    write(os.path.join(root, "main.py"), "print('hello')\n", MTIME)
+    write(os.path.join(root, "lib", "util.py"), "x = 1\n", MTIME)
+    write(os.path.join(root, "node_modules", "pkg", "index.js"), "module", MTIME)
+    write(os.path.join(root, "debug.log"), "log", MTIME)
+    write(os.path.join(root, "README.md"), "readme", MTIME)
+
+
+def make_sync(**kwargs):
+    kwargs.setdefault("link_mode", "copy")
+    return LocalFolderSync(IgnoreMatcher(["node_modules/", "*.log", "*.md"]), important_files=["README.md"], **kwargs)
+
+
+def listing(root):
+    return sorted(
+        os.path.relpath(os.path.join(path, name), root).replace(os.sep, "/")
+        for path, _, names in os.walk(root) for name in names
+    )
+
+
+def test_first_sync_copies_files_and_skips_ignored(tmp_path, write):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    make_source(write, str(src))
+    
+    stats = make_sync().sync(str(src), str(dst)).snapshot()
+    
+    assert listing(dst) == ["README.md", "lib/util.py", "main.py"]
+    assert stats["files_copied"] == 3
+    assert os.stat(dst / "main.py").st_mtime == 1700000000
+
+
+def test_resync_copies_only_changes_and_deletes_removed(tmp_path, write):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    make_source(write, str(src))
+    make_sync().sync(str(src), str(dst))
+    
+    write(str(src / "main.py"), "print('changed')\n", 1700000100)
+    write(str(src / "new" / "a.py"), "a = 1\n", MTIME)
+    os.remove(src / "lib" / "util.py")
+    os.rmdir(src / "lib")
+    
+    stats = make_sync().sync(str(src), str(dst)).snapshot()
+    
+    assert listing(dst) == ["README.md", "main.py", "new/a.py"]
+    assert (dst / "main.py").read_text() == "print('changed')\n"
+    assert stats["files_copied"] == 2
+    assert stats["files_unchanged"] == 1
+    assert stats["dirs_deleted"] == 1
+
+
+def test_unchanged_resync_copies_nothing(tmp_path, write):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    make_source(write, str(src))
+    make_sync().sync(str(src), str(dst))
+    
+    stats = make_sync().sync(str(src), str(dst)).snapshot()
+    
+    assert stats["files_copied"] == 0
+    assert stats["files_unchanged"] == stats["files_total"] == 3
+
+
+def test_keep_preserves_target_only_files(tmp_path, write):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    make_source(write, str(src))
+    write(str(dst / ".gitignore"), "*.log\n", MTIME)
+    write(str(dst / "stale.py"), "old", MTIME)
+    
+    make_sync(keep=[".gitignore"]).sync(str(src), str(dst))
+    
+    assert (dst / ".gitignore").exists()
+    assert not (dst / "stale.py").exists()
+
+
+def test_hash_compare_skips_touched_files(tmp_path, write):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    make_source(write, str(src))
+    make_sync().sync(str(src), str(dst))
+    os.utime(src / "main.py", (1700005000, 1700005000))
+    
+    stats = make_sync(compare="hash").sync(str(src), str(dst)).snapshot()
+    
+    assert stats["files_copied"] == 0
+    assert os.stat(dst / "main.py").st_mtime == 1700005000
+
+
+@pytest.mark.parametrize("link_mode", ["hardlink", "reflink"])
+def test_link_modes_produce_same_content(tmp_path, link_mode, write):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    make_source(write, str(src))
+    
+    stats = make_sync(link_mode=link_mode, workers=2).sync(str(src), str(dst)).snapshot()
+    
+    assert listing(dst) == ["README.md", "lib/util.py", "main.py"]
+    assert (dst / "lib" / "util.py").read_text() == "x = 1\n"
+    assert stats["files_copied"] + stats["files_linked"] == 3
+    if link_mode == "hardlink":
+        assert os.stat(dst / "main.py").st_ino == os.stat(src / "main.py").st_ino
@@ -0,0 +1,119 @@
+"""
+远程日志搜索测试
+
+用本地shell执行生成的远程命令，验证过滤和分页。
+"""
+
+import io
+import shutil
+import subprocess
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import log_search
+from app.core.log_search import LogSearchError, search_logs, parse_cursor, lower_pattern
+from app.schemas.machine import LogSearchRequest
+
+pytestmark = pytest.mark.skipif(shutil.which("awk") is None, reason="需要awk")
+
+OLD_LOG = """2024-01-01 10:00:00,100 - app.main - INFO - 服务启动
+2024-01-01 10:05:00,000 - app.core - ERROR - 连接数据库失败
+Traceback (most recent call last):
+  ValueError: boom
+2024-01-01 10:06:00,000 - app.core - INFO - 重试成功
+"""
+
+NEW_LOG = """INFO:     Started server process
+2024-01-02 09:00:00,000 - app.api - WARNING - 请求过慢
+2024-01-02 09:30:00,000 - app.api - ERROR - Timeout talking to worker
+2024-01-02 11:00:00,000 - app.api - INFO - done
+"""
+
+
+class LocalClient:
+    """在本地shell中执行命令的SSH连接"""
+    
+    def __init__(self):
+        self.closed = False
+    
+    def exec_command(self, command, timeout=None):
+        result = subprocess.run(["sh", "-c", command], capture_output=True, timeout=timeout)
+        stdout = io.BytesIO(result.stdout)
+        stdout.channel = SimpleNamespace(recv_exit_status=lambda: result.returncode)
+        return None, stdout, io.BytesIO(result.stderr)
+    
+    def close(self):
+        self.closed = True
+    
+    def discard(self):
+        self.closed = True
+
+
+@pytest.fixture
+def machine(tmp_path, monkeypatch):
+    (tmp_path / "backend_20240101_100000.log").write_text(OLD_LOG)
+    (tmp_path / "backend_20240102_085959.log").write_text(NEW_LOG)
+    (tmp_path / "frontend_20240101_100000.log").write_text("vite ready\nERROR in frontend\n")
+    
+    async def get_ssh_client(machine):
+        return LocalClient(), None
+    
+    monkeypatch.setattr(log_search, "REMOTE_LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(log_search.MachineManager, "get_ssh_client", staticmethod(get_ssh_client))
+    return SimpleNamespace(id=1, name="test")
+
+
+@pytest.mark.asyncio
+async def test_search_across_rotated_files(machine):
+    """按时间顺序搜索轮转的文件，异常堆栈沿用上一行的级别"""
+    result = await search_logs(machine, LogSearchRequest(level="error"))
+    
+    assert [(m.file, m.line) for m in result.matches] == [
+        ("backend_20240101_100000.log", "2024-01-01 10:05:00,000 - app.core - ERROR - 连接数据库失败"),
+        ("backend_20240101_100000.log", "Traceback (most recent call last):"),
+        ("backend_20240101_100000.log", "  ValueError: boom"),
+        ("backend_20240102_085959.log", "2024-01-02 09:30:00,000 - app.api - ERROR - Timeout talking to worker"),
+    ]
+    assert result.next_cursor is None
+    assert result.files_scanned == 2
+
+
+@pytest.mark.asyncio
+async def test_pagination_by_byte_offset(machine, tmp_path):
+    """游标按字节偏移续读，匹配行的偏移指向文件中的原始位置"""
+    request = LogSearchRequest(pattern="timeout|失败", regex=True, ignore_case=True, limit=1, compress=True)
+    
+    first = await search_logs(machine, request)
+    assert [m.line.split(" - ")[-1] for m in first.matches] == ["连接数据库失败"]
+    content = (tmp_path / first.matches[0].file).read_bytes()
+    assert content[first.matches[0].offset:].startswith(b"2024-01-01 10:05:00")
+    
+    second = await search_logs(machine, request.model_copy(update={"cursor": first.next_cursor}))
+    assert [m.line.split(" - ")[-1] for m in second.matches] == ["Timeout talking to worker"]
+    
+    third = await search_logs(machine, request.model_copy(update={"cursor": second.next_cursor}))
+    assert third.matches == []
+    assert third.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_time_range_skips_files(machine):
+    """时间范围外的文件不扫描，超过结束时间后停止"""
+    request = LogSearchRequest(
+        start_time=datetime(2024, 1, 2, 9, 0),
+        end_time=datetime(2024, 1, 2, 10, 0)
+    )
+    result = await search_logs(machine, request)
+    
+    assert [m.line[:19] for m in result.matches] == ["2024-01-02 09:00:00", "2024-01-02 09:30:00"]
+    assert result.next_cursor is None
+
+
+def test_invalid_cursor_and_pattern_helpers():
+    assert parse_cursor("backend_1.log:42") == ("backend_1.log", 42)
+    assert parse_cursor(None) == (None, 0)
+    with pytest.raises(LogSearchError):
+        parse_cursor("../etc/passwd:1x")
+    assert lower_pattern(r"Error\S+[A-Z]") == r"error\S+[a-z]"
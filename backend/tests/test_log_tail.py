@@ -0,0 +1,161 @@
+"""
+远程日志实时跟踪测试
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import log_tail
+from app.core.log_tail import LogTailError, LogTailHub, LogTailSubscriber
+
+
+class FakeChannel:
+    """模拟 tail -F 的SSH通道"""
+    
+    def __init__(self):
+        self.buffer = b""
+        self.finished = False
+        self.closed = False
+        self.command = None
+    
+    def exec_command(self, command):
+        self.command = command
+    
+    def feed(self, data: bytes):
+        self.buffer += data
+    
+    def recv_ready(self):
+        return bool(self.buffer)
+    
+    def recv(self, size):
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+    
+    def recv_stderr_ready(self):
+        return False
+    
+    def exit_status_ready(self):
+        return self.finished
+    
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    def __init__(self, channels):
+        self.channels = channels
+        self.returned = False
+    
+    def get_transport(self):
+        return SimpleNamespace(open_session=self._open_session)
+    
+    def _open_session(self):
+        channel = FakeChannel()
+        self.channels.append(channel)
+        return channel
+    
+    def close(self):
+        self.returned = True
+    
+    def discard(self):
+        self.returned = True
+
+
+@pytest.fixture
+def channels(monkeypatch):
+    opened = []
+    
+    async def get_ssh_client(machine, dedicated=False):
+        # 跟踪日志使用独立连接，不占用连接池名额
+        assert dedicated
+        return FakeClient(opened), None
+    
+    monkeypatch.setattr(log_tail.MachineManager, "get_ssh_client", staticmethod(get_ssh_client))
+    monkeypatch.setattr(log_tail.settings, "LOG_TAIL_FLUSH_MS", 20)
+    return opened
+
+
+def make_machine():
+    return SimpleNamespace(id=1, name="test")
+
+
+@pytest.mark.asyncio
+async def test_subscribers_share_one_channel(channels):
+    """同一日志的多个查看者共享一个通道并收到相同的批次"""
+    hub = LogTailHub()
+    first = await hub.subscribe(make_machine(), "backend", 10)
+    second = await hub.subscribe(make_machine(), "backend", 10)
+    
+    assert len(channels) == 1
+    assert "tail -n 10 -F" in channels[0].command
+    
+    channels[0].feed(b"line 1\nline 2\nparti")
+    first_message = await asyncio.wait_for(first.get(), 1)
+    second_message = await asyncio.wait_for(second.get(), 1)
+    assert first_message == {"type": "lines", "lines": ["line 1", "line 2"]}
+    assert second_message == first_message
+    
+    # 后加入的查看者先收到最近的日志
+    third = await hub.subscribe(make_machine(), "backend", 10)
+    assert await third.get() == {"type": "lines", "lines": ["line 1", "line 2"]}
+    
+    hub.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_last_unsubscribe_closes_channel(channels):
+    """最后一个查看者离开时关闭通道并归还连接"""
+    hub = LogTailHub()
+    first = await hub.subscribe(make_machine(), "frontend")
+    second = await hub.subscribe(make_machine(), "frontend")
+    client = first.tail._client
+    
+    hub.unsubscribe(first)
+    assert not channels[0].closed
+    assert hub.stats() == {"1:frontend": 1}
+    
+    hub.unsubscribe(second)
+    assert channels[0].closed
+    assert client.returned
+    assert hub.stats() == {}
+
+
+@pytest.mark.asyncio
+async def test_remote_exit_notifies_subscribers(channels):
+    """远程命令退出时推送剩余输出和关闭消息"""
+    hub = LogTailHub()
+    subscriber = await hub.subscribe(make_machine(), "backend")
+    channels[0].feed(b"last line")
+    channels[0].finished = True
+    
+    assert await asyncio.wait_for(subscriber.get(), 1) == {"type": "lines", "lines": ["last line"]}
+    message = await asyncio.wait_for(subscriber.get(), 1)
+    assert message["type"] == "closed"
+    assert await asyncio.wait_for(subscriber.get(), 1) is None
+    
+    hub.unsubscribe(subscriber)
+
+
+@pytest.mark.asyncio
+async def test_unknown_log_type_is_rejected(channels):
+    """未知的日志类型不打开通道"""
+    hub = LogTailHub()
+    with pytest.raises(LogTailError):
+        await hub.subscribe(make_machine(), "backend?x=1")
+    
+    assert channels == []
+    assert hub.stats() == {}
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest_batches():
+    """慢速查看者队列满时丢弃最旧的批次并收到提示"""
+    subscriber = LogTailSubscriber(tail=None, queue_size=2)
+    for index in range(5):
+        subscriber.push({"type": "lines", "lines": [str(index)]})
+    
+    assert await subscriber.get() == {"type": "dropped", "batches": 3}
+    assert await subscriber.get() == {"type": "lines", "lines": ["3"]}
+    assert await subscriber.get() == {"type": "lines", "lines": ["4"]}
@@ -0,0 +1,36 @@
+"""
+机器探测脚本解析测试
+"""
+
+import pytest
+
+from app.core.machine_probe import parse_probe_output, build_status, build_metrics
+
+
+def test_build_status_from_probe(probe_output):
+    """一次探测输出构建机器状态"""
+    status = build_status(parse_probe_output(probe_output))
+    
+    assert status.is_online
+    assert status.backend_running
+    assert not status.frontend_running
+    assert "load average" in status.cpu_usage
+    assert status.memory_usage.startswith("total")
+    assert status.disk_usage.startswith("/dev/vda1")
+
+
+def test_build_metrics_from_probe(probe_output):
+    """一次探测输出构建监控指标"""
+    metrics = build_metrics(parse_probe_output(probe_output))
+    
+    assert metrics.cpu == {"cores": 4, "usage_percent": 12.5, "load_avg": [0.5, 0.4, 0.3]}
+    assert metrics.memory["usage_percent"] == 25.0
+    assert metrics.disk["free"] == 60000000000
+    assert metrics.network == {"rx_bytes": 1000, "tx_bytes": 2000, "rx_packets": 10, "tx_packets": 20}
+    assert metrics.processes == {"total": 4, "running": 1, "sleeping": 2}
+
+
+def test_truncated_output_is_rejected(probe_output):
+    """缺少结束标记的输出视为失败"""
+    with pytest.raises(ValueError):
+        parse_probe_output(probe_output.split("@@disk\n")[0])
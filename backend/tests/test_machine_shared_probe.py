@@ -0,0 +1,46 @@
+"""
+合并的机器状态检查和监控指标获取测试（SSH使用模拟）
+"""
+
+import asyncio
+import unittest.mock as mock
+
+import pytest
+from sqlalchemy import select
+
+from app.core.machines import MachineManager
+from app.models.machine import Machine
+from app.models.machine_log import MachineLog
+
+
+@pytest.mark.asyncio
+async def test_check_machine_status_shared(fake_ssh, session_factory):
+    """并发的状态检查只探测一次，结果写入数据库"""
+    with mock.patch("app.core.machines.async_session_factory", session_factory):
+        results = await asyncio.gather(*[MachineManager.check_machine_status_shared(1) for _ in range(3)])
+    
+    assert len(fake_ssh) == 1
+    for success, status, error in results:
+        assert success and error == ""
+        assert status.is_online and status.backend_running
+    
+    async with session_factory() as db:
+        machine = (await db.execute(select(Machine).where(Machine.id == 1))).scalars().first()
+        logs = (await db.execute(select(MachineLog))).scalars().all()
+    assert machine.is_online and machine.backend_running
+    assert len(logs) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_machine_metrics_shared(fake_ssh, session_factory):
+    """并发的监控指标请求只探测一次，TTL内复用结果"""
+    with mock.patch("app.core.machines.async_session_factory", session_factory), \
+            mock.patch("app.core.machines.metrics_store") as store:
+        results = await asyncio.gather(*[MachineManager.get_machine_metrics_shared(1) for _ in range(3)])
+        cached = await MachineManager.get_machine_metrics_shared(1)
+    
+    assert len(fake_ssh) == 1
+    assert store.record.call_count == 1
+    for success, metrics, error in results + [cached]:
+        assert success and error == ""
+        assert metrics.cpu["usage_percent"] == 12.5
@@ -0,0 +1,102 @@
+"""
+机器状态批量检查测试
+"""
+
+import asyncio
+import unittest.mock as mock
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.core.machines import MachineManager
+from app.core.machine_sweep import sweep_machines
+from app.db.base_class import Base
+from app.models.machine import Machine
+from app.models.machine_log import MachineLog
+from app.schemas.machine import MachineStatus, MachineCheckResult
+
+
+def make_machine(machine_id: int, name: str) -> Machine:
+    return Machine(id=machine_id, name=name, host=f"10.0.0.{machine_id}", port=22, username="root")
+
+
+@pytest.mark.asyncio
+async def test_results_stream_in_completion_order():
+    """结果按完成顺序返回，慢机器超时不拖累其他机器"""
+    delays = {1: 0.3, 2: 0.0, 3: 5.0}
+    
+    async def fake_probe(machine):
+        await asyncio.sleep(delays[machine.id])
+        return True, MachineStatus(is_online=True), ""
+    
+    machines = [make_machine(i, f"m{i}") for i in delays]
+    with mock.patch.object(MachineManager, "probe_status", side_effect=fake_probe):
+        results = [r async for r in sweep_machines(machines, concurrency=3, timeout=0.5)]
+    
+    assert [r.machine_id for r in results] == [2, 1, 3]
+    assert results[2].success is False
+    assert results[2].status.is_online is False
+    assert "超时" in results[2].error
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit():
+    """同时探测的机器数不超过上限"""
+    running = 0
+    peak = 0
+    
+    async def fake_probe(machine):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        return True, MachineStatus(is_online=True), ""
+    
+    machines = [make_machine(i, f"m{i}") for i in range(10)]
+    with mock.patch.object(MachineManager, "probe_status", side_effect=fake_probe):
+        results = [r async for r in sweep_machines(machines, concurrency=3, timeout=5)]
+    
+    assert len(results) == 10
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_record_status_results_batches_writes():
+    """检查结果批量写入，失败的机器保留原有监控信息"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    
+    async with session_factory() as db:
+        db.add_all([make_machine(1, "ok"), make_machine(2, "down")])
+        await db.commit()
+        await db.execute(
+            Machine.__table__.update().where(Machine.id == 2).values(cpu_usage="old", backend_running=True)
+        )
+        await db.commit()
+        machines = {m.id: m for m in (await db.execute(select(Machine))).scalars().all()}
+        
+        results = [
+            MachineCheckResult(machine_id=1, name="ok", success=True, status=MachineStatus(
+                is_online=True, backend_running=True, cpu_usage="load 0.1", last_check=datetime.now()
+            )),
+            MachineCheckResult(machine_id=2, name="down", success=False, error="timed out",
+                               status=MachineStatus(is_online=False)),
+        ]
+        await MachineManager.record_status_results(db, machines, results)
+    
+    async with session_factory() as db:
+        rows = {m.id: m for m in (await db.execute(select(Machine))).scalars().all()}
+        logs = (await db.execute(select(MachineLog).order_by(MachineLog.machine_id))).scalars().all()
+    await engine.dispose()
+    
+    assert rows[1].is_online and rows[1].cpu_usage == "load 0.1"
+    assert not rows[2].is_online
+    assert rows[2].cpu_usage == "old" and rows[2].backend_running
+    assert rows[2].last_check is not None
+    assert [(log.machine_id, log.status) for log in logs] == [(1, "success"), (2, "failed")]
+    assert logs[1].content == "状态检查失败: timed out"
@@ -0,0 +1,257 @@
+"""
+清单增量同步测试
+
+用本地目录模拟远程部署目录，远程命令通过本地shell执行，SFTP通道为本地文件操作。
+"""
+
+import os
+import subprocess
+
+import pytest
+
+from app.utils import manifest_sync
+from app.utils.manifest_sync import (
+    ManifestSync, file_hash, build_local_manifest, parse_remote_manifest, build_remote_manifest_command, decode_manifest, encode_manifest
+)
+
+
+def make_project(write, root):
+    write(os.path.join(root, "main.py"), "print('hello')\n", 1700000000)
+    write(os.path.join(root, "app", "util.py"), "x = 1\n", 1700000000)
+    write(os.path.join(root, "app", "data", "config.json"), "{}\n", 1700000000)
+    write(os.path.join(root, ".gitignore"), "*.log\n", 1700000000)
+
+
+def test_parse_remote_manifest(tmp_path, write):
+    write(str(tmp_path / "a.txt"), "abc")
+    write(str(tmp_path / "sub" / "b.txt"), "hello")
+    write(str(tmp_path / "node_modules" / "pkg.js"), "skip")
+    write(str(tmp_path / ".env"), "skip")
+    
+    output = subprocess.run(["sh", "-c", build_remote_manifest_command(str(tmp_path))], capture_output=True, text=True).stdout
+    files, dirs, fingerprint = parse_remote_manifest(output)
+    
+    assert set(files) == {"a.txt", "sub/b.txt"}
+    assert files["sub/b.txt"][0] == 5
+    assert dirs == {"sub"}
+    assert fingerprint and fingerprint != "missing"
+
+
+@pytest.mark.asyncio
+async def test_first_sync_uploads_everything(tmp_path, write, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_project(write, str(local))
+    client = local_ssh()
+    
+    result = await ManifestSync(client, parallelism=2).sync(str(local), str(remote))
+    
+    assert result.uploaded == 3
+    assert (remote / "app" / "data" / "config.json").read_text() == "{}\n"
+    assert os.stat(remote / "main.py").st_mtime == 1700000000
+    # 隐藏文件按上传规则跳过
+    assert not (remote / ".gitignore").exists()
+
+
+@pytest.mark.asyncio
+async def test_unchanged_redeploy_is_one_round_trip(tmp_path, write, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_project(write, str(local))
+    await ManifestSync(local_ssh()).sync(str(local), str(remote))
+    
+    client = local_ssh()
+    result = await ManifestSync(client).sync(str(local), str(remote))
+    
+    assert result.round_trips == 1
+    assert len(client.commands) == 1
+    assert client.uploaded == []
+    assert result.summary()["unchanged"] == 3
+
+
+@pytest.mark.asyncio
+async def test_dependency_dirs_are_not_reuploaded(tmp_path, write, local_ssh):
+    """本地依赖目录与远程清单一样跳过，重新部署时不会被当作新增文件"""
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_project(write, str(local))
+    write(str(local / "web" / "node_modules" / "pkg" / "index.js"), "module.exports = 1;\n", 1700000000)
+    write(str(local / "venv" / "bin" / "python"), "#!", 1700000000)
+    write(str(local / "app" / "__pycache__" / "util.cpython-311.pyc"), "pyc", 1700000000)
+    
+    files, dirs = build_local_manifest(str(local))
+    assert set(files) == {"main.py", "app/util.py", "app/data/config.json"}
+    assert dirs == {"app", "app/data", "web"}
+    
+    await ManifestSync(local_ssh()).sync(str(local), str(remote))
+    client = local_ssh()
+    result = await ManifestSync(client).sync(str(local), str(remote))
+    
+    assert client.uploaded == []
+    assert result.summary()["unchanged"] == 3
+
+
+@pytest.mark.asyncio
+async def test_changed_added_and_deleted_files(tmp_path, write, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_project(write, str(local))
+    first = await ManifestSync(local_ssh()).sync(str(local), str(remote))
+    
+    write(str(local / "main.py"), "print('changed')\n", 1700000100)
+    write(str(local / "app" / "new.py"), "y = 2\n", 1700000100)
+    os.remove(local / "app" / "data" / "config.json")
+    os.rmdir(local / "app" / "data")
+    
+    client = local_ssh()
+    result = await ManifestSync(client).sync(str(local), str(remote), previous_manifest=first.manifest)
+    
+    assert sorted(os.path.relpath(path, remote) for path in client.uploaded) == ["app/new.py", "main.py"]
+    assert (remote / "main.py").read_text() == "print('changed')\n"
+    assert not (remote / "app" / "data").exists()
+    assert result.summary()["deleted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_ignored_remote_files_are_preserved(tmp_path, write, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_project(write, str(local))
+    await ManifestSync(local_ssh()).sync(str(local), str(remote))
+    write(str(remote / "node_modules" / "pkg" / "index.js"), "module")
+    write(str(remote / "logs" / "backend_1.log"), "log")
+    write(str(remote / "server.pid"), "123")
+    write(str(remote / "stale.py"), "old")
+    
+    await ManifestSync(local_ssh(), delete=True).sync(str(local), str(remote))
+    
+    assert (remote / "node_modules" / "pkg" / "index.js").exists()
+    assert (remote / "logs" / "backend_1.log").exists()
+    assert (remote / "server.pid").exists()
+    assert not (remote / "stale.py").exists()
+
+
+@pytest.mark.asyncio
+async def test_only_previously_synced_files_are_deleted(tmp_path, write, local_ssh):
+    """远程运行时生成的文件不在上次同步的清单中，不会被删除"""
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_project(write, str(local))
+    first = await ManifestSync(local_ssh()).sync(str(local), str(remote))
+    write(str(remote / "data.db"), "sqlite")
+    write(str(remote / "uploads" / "avatar.png"), "png")
+    os.remove(local / "main.py")
+    
+    # 没有上次的清单时不删除任何文件
+    result = await ManifestSync(local_ssh()).sync(str(local), str(remote))
+    assert result.summary()["deleted"] == 0
+    assert (remote / "main.py").exists()
+    
+    result = await ManifestSync(local_ssh()).sync(str(local), str(remote), previous_manifest=first.manifest)
+    
+    assert result.summary()["deleted"] == 1
+    assert not (remote / "main.py").exists()
+    assert (remote / "data.db").read_text() == "sqlite"
+    assert (remote / "uploads" / "avatar.png").exists()
+
+
+@pytest.mark.asyncio
+async def test_same_content_with_new_mtime_is_not_uploaded(tmp_path, write, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_project(write, str(local))
+    await ManifestSync(local_ssh()).sync(str(local), str(remote))
+    # 重新检出等操作只改变修改时间
+    os.utime(local / "main.py", (1700005000, 1700005000))
+    
+    client = local_ssh()
+    result = await ManifestSync(client).sync(str(local), str(remote))
+    
+    assert client.uploaded == []
+    assert result.verified_unchanged == 1
+    assert os.stat(remote / "main.py").st_mtime == 1700005000
+    
+    client = local_ssh()
+    result = await ManifestSync(client).sync(str(local), str(remote))
+    assert result.round_trips == 1
+
+
+def is_listing(command):
+    return "-type f" in command
+
+
+@pytest.mark.asyncio
+async def test_cached_manifest_skips_remote_listing(tmp_path, write, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_project(write, str(local))
+    first = await ManifestSync(local_ssh()).sync(str(local), str(remote))
+    assert first.manifest
+    
+    client = local_ssh()
+    result = await ManifestSync(client).sync(str(local), str(remote), cached_manifest=first.manifest)
+    
+    assert result.cache_hit
+    assert result.round_trips == 1
+    assert not any(is_listing(command) for command in client.commands)
+    assert result.manifest == first.manifest
+    
+    # 修改一行后重新部署：核对指纹、上传、更新指纹，不列出远程目录
+    write(str(local / "app" / "util.py"), "x = 2\n", 1700000200)
+    client = local_ssh()
+    result = await ManifestSync(client).sync(str(local), str(remote), cached_manifest=first.manifest)
+    
+    assert result.cache_hit
+    assert [os.path.relpath(path, remote) for path in client.uploaded] == ["app/util.py"]
+    assert not any(is_listing(command) for command in client.commands)
+    assert decode_manifest(result.manifest, str(remote))[1]["app/util.py"][1] == 1700000200
+
+
+@pytest.mark.asyncio
+async def test_changed_remote_invalidates_cache(tmp_path, write, local_ssh):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_project(write, str(local))
+    first = await ManifestSync(local_ssh()).sync(str(local), str(remote))
+    os.remove(remote / "main.py")
+    
+    client = local_ssh()
+    result = await ManifestSync(client).sync(str(local), str(remote), cached_manifest=first.manifest)
+    
+    assert not result.cache_hit
+    assert any(is_listing(command) for command in client.commands)
+    assert (remote / "main.py").exists()
+
+
+@pytest.mark.asyncio
+async def test_refreshed_manifest_survives_install_step(tmp_path, write, local_ssh):
+    """同步后安装依赖改写顶层的锁文件，更新指纹后下次同步仍使用缓存的清单"""
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_project(write, str(local))
+    write(str(local / "package-lock.json"), "{}\n", 1700000000)
+    first = await ManifestSync(local_ssh()).sync(str(local), str(remote))
+    # 模拟 npm install
+    write(str(remote / "package-lock.json"), '{"lockfileVersion": 3}\n', 1700000500)
+    
+    result = await ManifestSync(local_ssh()).sync(str(local), str(remote), cached_manifest=first.manifest)
+    assert not result.cache_hit
+    write(str(remote / "package-lock.json"), '{"lockfileVersion": 3}\n', 1700000600)
+    
+    manifest = await ManifestSync(local_ssh()).refresh_manifest(str(remote), result.manifest)
+    client = local_ssh()
+    result = await ManifestSync(client).sync(str(local), str(remote), cached_manifest=manifest)
+    
+    assert result.cache_hit
+    assert client.uploaded == []
+    assert not any(is_listing(command) for command in client.commands)
+
+
+def test_decode_manifest_rejects_other_root_and_garbage():
+    blob = encode_manifest("/srv/app", "123 45", {"a.py": (3, 1.5, None)}, {"lib"})
+    
+    assert decode_manifest(blob, "/srv/app") == ("123 45", {"a.py": (3, 1.5, None)}, {"lib"})
+    assert decode_manifest(blob, "/srv/other") is None
+    assert decode_manifest(b"not a manifest", "/srv/app") is None
+
+
+def test_hash_cache_is_bounded(tmp_path, write, monkeypatch):
+    monkeypatch.setattr(manifest_sync, "HASH_CACHE_SIZE", 2)
+    monkeypatch.setattr(manifest_sync, "_hash_cache", manifest_sync.OrderedDict())
+    paths = [str(tmp_path / f"{name}.py") for name in "abc"]
+    for path in paths:
+        write(path, path)
+        stat = os.stat(path)
+        file_hash(path, stat.st_size, stat.st_mtime)
+    
+    assert list(manifest_sync._hash_cache) == paths[1:]
@@ -0,0 +1,104 @@
+"""
+监控指标时序存储测试
+"""
+
+import unittest.mock as mock
+from datetime import datetime
+
+import pytest
+
+from app.core.machines import MachineManager
+from app.core.metrics_store import MetricsStore, RingBuffer, FIELDS, TIER_RAW, TIER_MINUTE, TIER_HOUR
+from app.schemas.machine import MachineMetrics
+
+
+def make_metrics(timestamp: float, cpu: float, rx: int) -> MachineMetrics:
+    return MachineMetrics(
+        timestamp=datetime.fromtimestamp(timestamp),
+        cpu={"cores": 2, "usage_percent": cpu, "load_avg": [0.5, 0.4, 0.3]},
+        memory={"total": 100, "used": 50, "free": 50, "usage_percent": 50.0},
+        disk={"total": 100, "used": 20, "free": 80, "usage_percent": 20.0},
+        network={"rx_bytes": rx, "tx_bytes": 0, "rx_packets": 0, "tx_packets": 0},
+        processes={"total": 100, "running": 1, "sleeping": 99},
+    )
+
+
+def test_ring_buffer_overwrites_oldest():
+    """缓冲区满后覆盖最旧的采样，范围查询保持时间顺序"""
+    ring = RingBuffer(3)
+    for t in range(5):
+        ring.append(float(t), [float(t)] * len(FIELDS))
+    
+    assert ring.oldest() == 2.0
+    assert [t for t, _ in ring.range(0, 10)] == [2.0, 3.0, 4.0]
+    assert [t for t, _ in ring.range(2.5, 3.5)] == [3.0]
+
+
+@pytest.mark.asyncio
+async def test_downsampling_and_query():
+    """原始采样降采样为1分钟精度，数值取平均，累计计数取最后值"""
+    store = MetricsStore()
+    base = 1_700_000_040.0  # 整分钟
+    for i in range(12):
+        # 每10秒一个采样，共两分钟
+        store.record(1, make_metrics(base + i * 10, cpu=float(i), rx=i * 100))
+    
+    tier, step, raw = await store.query(1, base, base + 120, step=0)
+    assert tier == TIER_RAW and step == 0
+    assert len(raw) == 12
+    
+    tier, step, points = await store.query(1, base, base + 120, step=60)
+    assert tier == TIER_MINUTE
+    cpu = FIELDS.index("cpu_percent")
+    rx = FIELDS.index("rx_bytes")
+    # 第一分钟已定稿，第二分钟是尚未定稿的当前时间桶
+    assert [p[0] for p in points] == [base, base + 60]
+    assert points[0][1][cpu] == pytest.approx(2.5)
+    assert points[0][1][rx] == 500
+    assert points[1][1][cpu] == pytest.approx(8.5)
+    
+    # 原始采样按步长重新分桶
+    tier, step, points = await store.query(1, base, base + 120, step=30)
+    assert tier == TIER_RAW
+    assert len(points) == 4
+    assert points[0][1][cpu] == pytest.approx(1.0)
+
+
+def test_pending_rows_for_flush():
+    """原始采样和定稿的降采样都会进入待写入队列"""
+    store = MetricsStore()
+    base = 1_700_000_040.0
+    store.record(1, make_metrics(base, cpu=1.0, rx=0))
+    store.record(1, make_metrics(base + 61, cpu=3.0, rx=0))
+    
+    tiers = [row["tier"] for row in store._pending]
+    assert tiers == [TIER_RAW, TIER_RAW, TIER_MINUTE]
+    assert store._pending[-1]["cpu_percent"] == 1.0
+    
+    store.forget(1)
+    assert store._pending == []
+
+
+@pytest.mark.asyncio
+async def test_probe_is_queryable_in_every_tier(fake_ssh, session_factory):
+    """一次监控指标探测后，原始、1分钟、1小时精度都能查到该采样"""
+    store = MetricsStore()
+    
+    with mock.patch("app.core.machines.async_session_factory", session_factory), \
+            mock.patch("app.core.metrics_store.async_session_factory", session_factory), \
+            mock.patch("app.core.machines.metrics_store", store):
+        success, metrics, _ = await MachineManager.get_machine_metrics_shared(1)
+        assert success
+        
+        timestamp = metrics.timestamp.timestamp()
+        cpu = FIELDS.index("cpu_percent")
+        for step, tier in ((0, TIER_RAW), (60, TIER_MINUTE), (3600, TIER_HOUR)):
+            used_tier, _, points = await store.query(1, timestamp - 7200, timestamp + 1, step=step)
+            assert used_tier == tier
+            assert len(points) == 1
+            assert points[0][1][cpu] == 12.5
+        
+        # 批量写入数据库后，新的存储实例从数据库读到原始采样
+        await store.flush()
+        _, _, points = await MetricsStore().query(1, timestamp - 1, timestamp + 1, step=0)
+        assert [point[0] for point in points] == [timestamp]
@@ -0,0 +1,121 @@
+"""
+机器监控调度测试
+"""
+
+import asyncio
+import time
+import unittest.mock as mock
+
+import pytest
+
+from app.core.metrics_store import MetricsStore, FIELDS
+from app.core.monitor_scheduler import MonitorScheduler, JOB_STATUS, JOB_METRICS, _Job
+
+
+def make_scheduler(runner, machine_ids, **kwargs) -> MonitorScheduler:
+    """创建只调度状态任务、机器列表固定的调度器"""
+    scheduler = MonitorScheduler(status_interval=0.05, metrics_interval=0, refresh_interval=60, **kwargs)
+    scheduler._runners[JOB_STATUS] = runner
+    
+    async def refresh():
+        scheduler.sync_jobs(set(machine_ids))
+    
+    scheduler.refresh = refresh
+    return scheduler
+
+
+@pytest.mark.asyncio
+async def test_global_budget_and_skip_if_running():
+    """并发不超过全局预算，上一次未完成的机器跳过本次调度"""
+    running = 0
+    peak = 0
+    
+    async def slow_probe(machine_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.12)
+        running -= 1
+        return True
+    
+    scheduler = make_scheduler(slow_probe, range(1, 6), max_concurrency=2, jitter=0.1)
+    scheduler.start()
+    await asyncio.sleep(0.4)
+    stats = scheduler.stats()
+    await scheduler.shutdown(timeout=1)
+    
+    assert peak == 2
+    assert stats["machines"] == 5
+    assert stats["runs"] > 0
+    assert stats["skipped"] > 0
+    assert stats["queue_depth"] > 0
+    assert stats["lag_max_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_removed_machines_stop_being_scheduled():
+    """从机器列表移除的机器不再调度"""
+    calls = []
+    
+    async def probe(machine_id):
+        calls.append(machine_id)
+        return True
+    
+    scheduler = make_scheduler(probe, [1, 2], jitter=0)
+    scheduler.sync_jobs({1, 2})
+    scheduler.sync_jobs({1})
+    
+    with mock.patch("app.core.monitor_scheduler.random.uniform", return_value=0):
+        scheduler._budget = asyncio.Semaphore(4)
+        scheduler._dispatch_due(time.monotonic() + 1)
+        await asyncio.gather(*scheduler._tasks)
+    
+    assert calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_shutdown_waits_then_cancels():
+    """关闭时等待正在执行的任务，超时后取消"""
+    cancelled = False
+    
+    async def stuck_probe(machine_id):
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        return True
+    
+    scheduler = make_scheduler(stuck_probe, [1], jitter=0)
+    scheduler.start()
+    await asyncio.sleep(0.15)
+    await asyncio.wait_for(scheduler.shutdown(timeout=0.1), timeout=2)
+    
+    assert cancelled
+    assert not scheduler.stats()["running"]
+
+
+@pytest.mark.asyncio
+async def test_metrics_job_records_sample(fake_ssh, session_factory):
+    """监控指标任务经由合并的探测采集，采样写入时序存储"""
+    store = MetricsStore()
+    scheduler = MonitorScheduler(status_interval=0, metrics_interval=60, refresh_interval=60)
+    scheduler._budget = asyncio.Semaphore(1)
+    job = _Job(1, JOB_METRICS, 60)
+    job.running = True
+    
+    with mock.patch("app.core.machines.async_session_factory", session_factory), \
+            mock.patch("app.core.machines.metrics_store", store):
+        await scheduler._execute(job, time.monotonic())
+    
+    stats = scheduler.stats()
+    assert stats["runs"] == 1
+    assert stats["failures"] == 0
+    assert not job.running
+    assert len(fake_ssh) == 1
+    now = time.time()
+    with mock.patch("app.core.metrics_store.async_session_factory", session_factory):
+        _, _, points = await store.query(1, now - 60, now + 1, step=0)
+    assert len(points) == 1
+    assert points[0][1][FIELDS.index("cpu_percent")] == 12.5
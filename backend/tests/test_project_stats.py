@@ -0,0 +1,97 @@
+"""
+项目统计测试
+"""
+
+import os
+
+from app.utils.ignore_handler import IgnoreMatcher
+from app.utils.project_stats import (
+    compute_project_stats, count_lines, count_lines_many, decode_stats_index, encode_stats_index
+)
+
+
+def make_project(write, root):
+    write(os.path.join(root, "main.py"), "import os\n\nprint(1)\n")
+    write(os.path.join(root, "lib", "util.py"), "x = 1\ny = 2")
+    write(os.path.join(root, "web", "app.ts"), "let a = 1;\n")
+    write(os.path.join(root, "web", "view.tsx"), "<div/>\n<span/>\n")
+    write(os.path.join(root, "README.md"), "# readme\n")
+    write(os.path.join(root, "node_modules", "pkg", "index.js"), "module.exports = 1;\n")
+
+
+def test_stats_and_language_breakdown(tmp_path, write):
+    root = str(tmp_path)
+    make_project(write, root)
+    
+    result = compute_project_stats(root, IgnoreMatcher(["node_modules/"]))
+    stats = result.stats
+    
+    assert stats["file_count"] == 5
+    assert stats["code_lines"] == 8
+    assert stats["ignore_file_exists"] is False
+    assert list(stats["languages"]) == ["Python", "TypeScript"]
+    assert stats["languages"]["Python"]["files"] == 2
+    assert stats["languages"]["Python"]["code_lines"] == 5
+    assert stats["languages"]["TypeScript"]["code_lines"] == 3
+    assert result.recounted == 4
+    assert set(result.index) == {"main.py", "lib/util.py", "web/app.ts", "web/view.tsx"}
+
+
+def test_only_changed_files_are_recounted(tmp_path, write):
+    root = str(tmp_path)
+    make_project(write, root)
+    matcher = IgnoreMatcher(["node_modules/"])
+    first = compute_project_stats(root, matcher)
+    
+    index = decode_stats_index(encode_stats_index(first.index))
+    assert index == first.index
+    
+    second = compute_project_stats(root, matcher, index)
+    assert second.recounted == 0
+    assert second.stats == first.stats
+    
+    write(os.path.join(root, "main.py"), "print(1)\n")
+    os.remove(os.path.join(root, "web", "app.ts"))
+    third = compute_project_stats(root, matcher, second.index)
+    
+    assert third.recounted == 1
+    assert third.stats["code_lines"] == 5
+    assert "web/app.ts" not in third.index
+    assert third.stats["languages"]["TypeScript"]["files"] == 1
+
+
+def test_invalid_index_is_ignored():
+    assert decode_stats_index(None) == {}
+    assert decode_stats_index(b"not zlib") == {}
+
+
+def test_count_lines_matches_text_iteration(tmp_path):
+    cases = {
+        "empty": b"",
+        "trailing": b"a\nb\n",
+        "no_trailing": b"a\nb",
+        "crlf": b"a\r\nb\r\n",
+        "blank_lines": b"\n\n\n",
+        # 单独的\r不再视为换行
+        "binary": bytes(b for b in range(256) if b != 0x0d) * 10 + b"\xff\xfe",
+    }
+    for name, content in cases.items():
+        path = str(tmp_path / name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        with open(path, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+            expected = sum(1 for _ in f)
+        # 小块大小覆盖跨块的情况
+        assert count_lines(path, block_size=3) == count_lines(path) == expected, name
+
+
+def test_count_lines_many_in_parallel(tmp_path):
+    paths = []
+    for i in range(100):
+        path = str(tmp_path / f"{i}.py")
+        with open(path, 'w') as f:
+            f.write("x\n" * i)
+        paths.append(path)
+    paths.append(str(tmp_path / "missing.py"))
+    
+    assert count_lines_many(paths, workers=4) == list(range(100)) + [None]
@@ -0,0 +1,68 @@
+"""
+SFTP并行上传测试
+
+用本地目录模拟远程目录，SFTP通道为本地文件操作加上固定延迟。
+"""
+
+import pytest
+
+from app.utils.sftp_transfer import SFTPUploader, build_mkdir_commands
+
+LATENCY = 0.02
+
+
+def make_tree(root, count=20):
+    for index in range(count):
+        path = root / f"pkg{index % 4}" / "sub" / f"file{index}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"print({index})\n" * 100)
+    (root / ".git").mkdir()
+    (root / ".git" / "HEAD").write_text("ref")
+    (root / "cache.tmp").write_text("x")
+
+
+@pytest.mark.asyncio
+async def test_upload_directory(tmp_path, local_ssh):
+    """批量创建目录、并行上传、保留修改时间，再次上传时跳过未修改的文件"""
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    make_tree(local)
+    client = local_ssh(LATENCY)
+    
+    progress = await SFTPUploader(client, parallelism=4).upload_directory(str(local), str(remote))
+    
+    snapshot = progress.snapshot()
+    assert snapshot["files_total"] == 20
+    assert snapshot["files_done"] == 20
+    assert snapshot["files_skipped"] == 0
+    assert snapshot["bytes_done"] == snapshot["bytes_total"] > 0
+    assert len(client.commands) == 1 and client.commands[0].startswith("mkdir -p -- ")
+    assert client.channels == 4
+    assert not (remote / ".git").exists() and not (remote / "cache.tmp").exists()
+    source, target = local / "pkg1" / "sub" / "file5.py", remote / "pkg1" / "sub" / "file5.py"
+    assert target.read_bytes() == source.read_bytes()
+    assert int(target.stat().st_mtime) == int(source.stat().st_mtime)
+    
+    progress = await SFTPUploader(client, parallelism=4).upload_directory(str(local), str(remote))
+    assert progress.files_skipped == 20
+    assert progress.bytes_done == 0
+
+
+@pytest.mark.asyncio
+async def test_parallel_upload_is_faster_than_serial(tmp_path, local_ssh):
+    """多个通道并行时，每个文件的往返延迟互相重叠"""
+    local = tmp_path / "local"
+    make_tree(local, count=24)
+    
+    timings = {}
+    for parallelism in (1, 6):
+        remote = tmp_path / f"remote{parallelism}"
+        progress = await SFTPUploader(local_ssh(LATENCY), parallelism=parallelism).upload_directory(str(local), str(remote))
+        assert progress.files_done == 24
+        timings[parallelism] = progress.elapsed
+    
+    assert timings[6] < timings[1] / 2
+
+
+def test_mkdir_commands_are_batched_and_quoted():
+    commands = build_mkdir_commands(["/srv/app", "/srv/app/it's here", "/srv/app/b"], limit=30)
+    assert commands == ["mkdir -p -- /srv/app", "mkdir -p -- '/srv/app/it'\"'\"'s here'", "mkdir -p -- /srv/app/b"]
@@ -0,0 +1,83 @@
+"""
+请求合并测试
+"""
+
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """并发的相同调用只执行一次"""
+    flight = SingleFlight()
+    calls = 0
+    
+    async def probe():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+    
+    results = await asyncio.gather(*(flight.do(("status", 1), probe) for _ in range(5)))
+    
+    assert calls == 1
+    assert [value for value, _ in results] == [1] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+
+
+@pytest.mark.asyncio
+async def test_results_are_cached_for_ttl():
+    """TTL内复用结果，过期或绕过缓存时重新执行"""
+    flight = SingleFlight()
+    calls = 0
+    
+    async def probe():
+        nonlocal calls
+        calls += 1
+        return calls
+    
+    assert await flight.do("k", probe, ttl=0.1) == (1, False)
+    assert await flight.do("k", probe, ttl=0.1) == (1, True)
+    assert await flight.do("k", probe, ttl=0.1, use_cache=False) == (2, False)
+    await asyncio.sleep(0.15)
+    assert await flight.do("k", probe, ttl=0.1) == (3, False)
+    
+    flight.forget("k")
+    assert await flight.do("k", probe) == (4, False)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_abort_shared_call():
+    """某个调用方取消后，其他调用方仍拿到结果"""
+    flight = SingleFlight()
+    
+    async def probe():
+        await asyncio.sleep(0.05)
+        return "ok"
+    
+    first = asyncio.ensure_future(flight.do("k", probe))
+    second = asyncio.ensure_future(flight.do("k", probe))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    
+    assert await second == ("ok", True)
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached():
+    """出错的调用不缓存"""
+    flight = SingleFlight()
+    
+    async def failing():
+        raise RuntimeError("boom")
+    
+    with pytest.raises(RuntimeError):
+        await flight.do("k", failing, ttl=10)
+    
+    async def probe():
+        return "ok"
+    
+    assert await flight.do("k", probe, ttl=10) == ("ok", False)
@@ -0,0 +1,86 @@
+"""
+SSH执行器测试
+"""
+
+import asyncio
+import time
+import threading
+import unittest.mock as mock
+
+import pytest
+
+from app.core.machines import MachineManager
+from app.utils import ssh_executor
+
+
+def make_blocking_client(delay: float):
+    """创建执行命令时阻塞指定时间的模拟客户端"""
+    client = mock.MagicMock()
+    
+    def exec_command(command, timeout=None):
+        time.sleep(delay)
+        stdout = mock.MagicMock()
+        stdout.read.return_value = f"ran {command}".encode()
+        stdout.channel.recv_exit_status.return_value = 0
+        stderr = mock.MagicMock()
+        stderr.read.return_value = b""
+        return mock.MagicMock(), stdout, stderr
+    
+    client.exec_command.side_effect = exec_command
+    return client
+
+
+@pytest.mark.asyncio
+async def test_execute_command_does_not_block_event_loop():
+    """远程命令执行期间事件循环仍可调度其他任务"""
+    client = make_blocking_client(0.2)
+    ticks = 0
+    
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+    
+    task = asyncio.create_task(ticker())
+    out, err, code = await MachineManager.execute_command(client, "uptime")
+    task.cancel()
+    
+    assert (out, err, code) == ("ran uptime", "", 0)
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_commands_on_many_machines_run_concurrently():
+    """多台机器的命令并发执行，总耗时接近单条命令耗时"""
+    clients = [make_blocking_client(0.2) for _ in range(8)]
+    
+    start = time.monotonic()
+    results = await asyncio.gather(*(
+        MachineManager.execute_command(client, "hostname") for client in clients
+    ))
+    elapsed = time.monotonic() - start
+    
+    assert all(code == 0 for _, _, code in results)
+    assert elapsed < 0.2 * len(clients) / 2
+
+
+@pytest.mark.asyncio
+async def test_transfers_do_not_occupy_command_threads(monkeypatch):
+    """批量传输占满传输线程池时，命令仍在SSH线程池中执行"""
+    monkeypatch.setattr(ssh_executor.settings, "SSH_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(ssh_executor.settings, "SSH_TRANSFER_CONCURRENCY", 2)
+    ssh_executor.shutdown_ssh_executor()
+    release = threading.Event()
+    try:
+        transfers = [asyncio.ensure_future(ssh_executor.run_transfer_blocking(release.wait, 5)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        
+        out, _, code = await asyncio.wait_for(
+            MachineManager.execute_command(make_blocking_client(0), "uptime"), timeout=1
+        )
+        assert (out, code) == ("ran uptime", 0)
+    finally:
+        release.set()
+        await asyncio.gather(*transfers)
+        ssh_executor.shutdown_ssh_executor()
@@ -0,0 +1,229 @@
+"""
+SSH连接池测试
+"""
+
+import asyncio
+import threading
+import unittest.mock as mock
+
+import pytest
+
+from app.utils.ssh_pool import DedicatedLimitError, SSHConnectionPool
+
+
+def make_fake_client(active=True):
+    """创建模拟的paramiko客户端"""
+    client = mock.MagicMock()
+    client.get_transport.return_value.is_active.return_value = active
+    return client
+
+
+@pytest.fixture
+def fake_paramiko():
+    """替换连接池中的paramiko.SSHClient，记录创建的连接"""
+    created = []
+
+    def factory():
+        client = make_fake_client()
+        created.append(client)
+        return client
+
+    with mock.patch("app.utils.ssh_pool.paramiko.SSHClient", side_effect=factory):
+        yield created
+
+
+CONN = dict(host="10.0.0.1", port=22, username="root", password="secret", machine_id=1)
+
+
+@pytest.mark.asyncio
+async def test_connection_is_reused(fake_paramiko):
+    """归还后的连接会被下一次借用复用"""
+    pool = SSHConnectionPool(max_per_host=2, idle_timeout=60, keepalive_interval=30)
+
+    lease = await pool.acquire(**CONN)
+    lease.close()
+    lease = await pool.acquire(**CONN)
+    lease.close()
+
+    assert len(fake_paramiko) == 1
+    fake_paramiko[0].connect.assert_called_once()
+    fake_paramiko[0].get_transport.return_value.set_keepalive.assert_called_with(30)
+    assert pool.stats() == {"10.0.0.1:22": {"idle": 1, "in_use": 0}}
+
+
+@pytest.mark.asyncio
+async def test_dead_connection_is_replaced(fake_paramiko):
+    """断开的空闲连接在借出前被替换"""
+    pool = SSHConnectionPool(max_per_host=2, idle_timeout=60)
+
+    lease = await pool.acquire(**CONN)
+    lease.close()
+    fake_paramiko[0].get_transport.return_value.is_active.return_value = False
+
+    lease = await pool.acquire(**CONN)
+    assert lease.client is fake_paramiko[1]
+    fake_paramiko[0].close.assert_called()
+    lease.close()
+
+
+@pytest.mark.asyncio
+async def test_max_per_host_blocks_extra_borrowers(fake_paramiko):
+    """超过单机连接上限的借用会等待归还"""
+    pool = SSHConnectionPool(max_per_host=1, idle_timeout=60)
+
+    first = await pool.acquire(**CONN)
+    waiter = asyncio.ensure_future(pool.acquire(**CONN))
+    await asyncio.sleep(0.05)
+    assert not waiter.done()
+
+    first.close()
+    second = await asyncio.wait_for(waiter, timeout=1)
+    assert second.client is first.client
+    second.close()
+    assert len(fake_paramiko) == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_closes_connections(fake_paramiko):
+    """凭据变化后失效的连接被关闭，不再复用"""
+    pool = SSHConnectionPool(max_per_host=2, idle_timeout=60)
+
+    idle = await pool.acquire(**CONN)
+    busy = await pool.acquire(**CONN)
+    idle.close()
+
+    pool.invalidate(1)
+    fake_paramiko[0].close.assert_called_once()
+
+    # 正在使用的连接归还时关闭
+    busy.close()
+    fake_paramiko[1].close.assert_called_once()
+
+    lease = await pool.acquire(**CONN)
+    assert lease.client is fake_paramiko[2]
+    lease.close()
+
+
+@pytest.mark.asyncio
+async def test_idle_connections_are_evicted(fake_paramiko):
+    """超过空闲时间的连接被回收"""
+    pool = SSHConnectionPool(max_per_host=2, idle_timeout=0)
+
+    lease = await pool.acquire(**CONN)
+    lease.close()
+    await asyncio.sleep(0.01)
+    pool.evict_idle()
+
+    fake_paramiko[0].close.assert_called()
+    assert pool.stats() == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_connect_releases_slot():
+    """连接失败不会占用连接名额"""
+    pool = SSHConnectionPool(max_per_host=1, idle_timeout=60)
+
+    failing = make_fake_client()
+    failing.connect.side_effect = OSError("timed out")
+    with mock.patch("app.utils.ssh_pool.paramiko.SSHClient", return_value=failing):
+        with pytest.raises(OSError):
+            await pool.acquire(**CONN)
+
+    with mock.patch("app.utils.ssh_pool.paramiko.SSHClient", return_value=make_fake_client()):
+        lease = await asyncio.wait_for(pool.acquire(**CONN), timeout=1)
+        lease.close()
+
+
+@pytest.mark.asyncio
+async def test_broken_release_keeps_entry_for_waiters(fake_paramiko):
+    """损坏的连接归还时仍有等待者，连接池键保留，单机上限继续生效"""
+    pool = SSHConnectionPool(max_per_host=1, idle_timeout=60)
+
+    first = await pool.acquire(**CONN)
+    waiter = asyncio.ensure_future(pool.acquire(**CONN))
+    await asyncio.sleep(0.05)
+
+    first.discard()
+    late = asyncio.ensure_future(pool.acquire(**CONN))
+    second = await asyncio.wait_for(waiter, timeout=1)
+    await asyncio.sleep(0.05)
+    assert not late.done()
+    assert pool.stats() == {"10.0.0.1:22": {"idle": 0, "in_use": 1}}
+
+    second.close()
+    third = await asyncio.wait_for(late, timeout=1)
+    third.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_acquire_closes_late_connection():
+    """借用在连接建立期间被取消，连接建立后被关闭并释放名额"""
+    pool = SSHConnectionPool(max_per_host=1, idle_timeout=60)
+    started = threading.Event()
+    proceed = threading.Event()
+    clients = []
+
+    def slow_connect(*args):
+        started.set()
+        proceed.wait(5)
+        client = make_fake_client()
+        clients.append(client)
+        return client
+
+    with mock.patch.object(pool, "_connect", side_effect=slow_connect):
+        task = asyncio.ensure_future(pool.acquire(**CONN))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        proceed.set()
+        for _ in range(100):
+            if clients and clients[0].close.called:
+                break
+            await asyncio.sleep(0.01)
+        clients[0].close.assert_called_once()
+
+        lease = await asyncio.wait_for(pool.acquire(**CONN), timeout=1)
+        assert lease.client is clients[1]
+        lease.close()
+
+
+@pytest.mark.asyncio
+async def test_dedicated_connection_is_outside_host_limit(fake_paramiko):
+    """独立连接不占用单机连接名额，关闭时真正断开"""
+    pool = SSHConnectionPool(max_per_host=1, idle_timeout=60)
+
+    dedicated = await pool.open_dedicated(**CONN)
+    lease = await asyncio.wait_for(pool.acquire(**CONN), timeout=1)
+    assert lease.client is not dedicated.client
+    assert pool.stats() == {"10.0.0.1:22": {"idle": 0, "in_use": 1}}
+    lease.close()
+
+    dedicated.close()
+    fake_paramiko[0].close.assert_called_once()
+    assert pool.stats() == {"10.0.0.1:22": {"idle": 1, "in_use": 0}}
+
+
+@pytest.mark.asyncio
+async def test_dedicated_connections_are_capped_and_invalidated(fake_paramiko):
+    """每台机器的独立连接数有上限，连接失效时独立连接一并断开"""
+    pool = SSHConnectionPool(max_per_host=1, idle_timeout=60, max_dedicated_per_host=2)
+
+    first = await pool.open_dedicated(**CONN)
+    second = await pool.open_dedicated(**CONN)
+    with pytest.raises(DedicatedLimitError):
+        await pool.open_dedicated(**CONN)
+
+    # 关闭后名额归还
+    first.close()
+    third = await pool.open_dedicated(**CONN)
+
+    pool.invalidate(1)
+    fake_paramiko[1].close.assert_called_once()
+    fake_paramiko[2].close.assert_called_once()
+
+    second.close()
+    third.close()
+    fake_paramiko[1].close.assert_called_once()
+    assert len([await pool.open_dedicated(**CONN), await pool.open_dedicated(**CONN)]) == 2
@@ -0,0 +1,85 @@
+"""
+打包流式传输测试
+
+用本地shell进程模拟远程exec通道，打包数据直接写入本地的 tar -x。
+"""
+
+import os
+import shutil
+
+import pytest
+
+from app.utils import tar_stream
+from app.utils.tar_stream import TarStreamUploader
+
+pytestmark = pytest.mark.skipif(shutil.which("tar") is None, reason="需要tar")
+
+
+def make_tree(root):
+    for index in range(30):
+        path = root / f"dir{index % 3}" / f"file{index}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("hello world\n" * 200)
+    (root / "empty").mkdir()
+    (root / ".env").write_text("SECRET=1")
+    (root / "build.tmp").write_text("x")
+    os.utime(root / "dir0" / "file0.txt", (1_600_000_000, 1_600_000_000))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", ["gzip", "none"])
+async def test_bundle_is_extracted_on_remote(tmp_path, compression, local_ssh):
+    """一个通道完成传输，远程目录与本地一致，跳过隐藏文件和临时文件"""
+    local, remote = tmp_path / "local", tmp_path / "remote" / "app"
+    make_tree(local)
+    client = local_ssh()
+    
+    progress = await TarStreamUploader(client, compression=compression).upload_directory(str(local), str(remote))
+    
+    assert len(client.commands) == 1
+    assert progress.files_done == progress.files_total == 30
+    assert progress.bytes_done == progress.bytes_total
+    if compression == "gzip":
+        assert progress.bytes_sent < progress.bytes_total
+    assert (remote / "dir1" / "file4.txt").read_text() == (local / "dir1" / "file4.txt").read_text()
+    assert (remote / "empty").is_dir()
+    assert not (remote / ".env").exists() and not (remote / "build.tmp").exists()
+    assert int((remote / "dir0" / "file0.txt").stat().st_mtime) == 1_600_000_000
+
+
+@pytest.mark.asyncio
+async def test_bundle_applies_project_ignore_rules(tmp_path, local_ssh):
+    """项目.gitignore忽略的目录和文件不打包"""
+    local, remote = tmp_path / "local", tmp_path / "remote" / "app"
+    make_tree(local)
+    (local / ".gitignore").write_text("dist/\n*.log\n")
+    (local / "dist").mkdir()
+    (local / "dist" / "bundle.js").write_text("compiled")
+    (local / "dir1" / "debug.log").write_text("log")
+    
+    progress = await TarStreamUploader(local_ssh(), compression="none").upload_directory(str(local), str(remote))
+    
+    assert progress.files_total == 30
+    assert not (remote / "dist").exists()
+    assert not (remote / "dir1" / "debug.log").exists()
+    assert (remote / "dir1" / "file4.txt").exists()
+
+
+@pytest.mark.asyncio
+async def test_remote_extract_failure_raises(tmp_path, local_ssh):
+    """远程解包失败时抛出IOError并带上错误输出"""
+    local = tmp_path / "local"
+    make_tree(local)
+    blocker = tmp_path / "blocker"
+    blocker.write_text("not a directory")
+    
+    with pytest.raises(IOError, match="远程解包失败"):
+        await TarStreamUploader(local_ssh()).upload_directory(str(local), str(blocker / "app"))
+
+
+@pytest.mark.asyncio
+async def test_zstd_falls_back_to_gzip_without_library(monkeypatch, local_ssh):
+    monkeypatch.setattr(tar_stream, "HAS_ZSTANDARD", False)
+    assert await TarStreamUploader(local_ssh(), compression="zstd").resolve_compression() == "gzip"
+    with pytest.raises(ValueError):
+        TarStreamUploader(local_ssh(), compression="bz2")
@@ -0,0 +1,78 @@
+"""
+目录树遍历测试
+"""
+
+import os
+
+import pytest
+
+from app.utils.ignore_handler import IgnoreMatcher
+from app.utils.tree_walker import walk_tree
+
+
+def make_tree(root):
+    for path in ["src/main.py", "src/lib/util.py", "build/out.js", "node_modules/pkg/index.js", "README.md", "app.log"]:
+        full_path = root / path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_text("x")
+
+
+@pytest.mark.parametrize("threads", [0, 4])
+def test_walk_prunes_ignored_directories(tmp_path, threads):
+    make_tree(tmp_path)
+    matcher = IgnoreMatcher(["build/", "*.log"])
+    pruned = []
+    
+    def prune(rel_path, entry):
+        if matcher.match_dir(rel_path):
+            pruned.append(rel_path)
+            return True
+        return False
+    
+    files = sorted(rel_path for rel_path, entry in walk_tree(str(tmp_path), matcher=matcher, prune=prune, threads=threads))
+    
+    assert files == ["README.md", "src/lib/util.py", "src/main.py"]
+    assert sorted(pruned) == ["build", "node_modules"]
+
+
+@pytest.mark.parametrize("threads", [0, 4])
+def test_parents_before_children(tmp_path, threads):
+    make_tree(tmp_path)
+    
+    seen = []
+    for rel_path, entry in walk_tree(str(tmp_path), include_dirs=True, sort=True, threads=threads):
+        parent = os.path.dirname(rel_path)
+        assert not parent or parent in seen
+        seen.append(rel_path)
+    
+    assert "node_modules/pkg/index.js" in seen
+    if threads == 0:
+        assert seen[:6] == ["README.md", "app.log", "build", "node_modules", "src", "build/out.js"]
+
+
+def test_entries_carry_stat(tmp_path):
+    (tmp_path / "a.txt").write_text("hello")
+    
+    [(rel_path, entry)] = list(walk_tree(str(tmp_path), prefetch_stat=True))
+    
+    assert rel_path == "a.txt"
+    assert entry.stat().st_size == 5
+
+
+def test_symlinked_directories_are_not_followed_by_default(tmp_path):
+    (tmp_path / "real").mkdir()
+    (tmp_path / "real" / "file.txt").write_text("x")
+    os.symlink(tmp_path / "real", tmp_path / "link")
+    
+    files = sorted(rel_path for rel_path, _ in walk_tree(str(tmp_path)))
+    followed = sorted(rel_path for rel_path, _ in walk_tree(str(tmp_path), follow_symlinks=True))
+    
+    assert files == ["real/file.txt"]
+    assert followed == ["link/file.txt", "real/file.txt"]
+
+
+def test_unreadable_directory_reported(tmp_path):
+    errors = []
+    
+    assert list(walk_tree(str(tmp_path / "missing"), on_error=lambda path, e: errors.append(path))) == []
+    assert errors == [str(tmp_path / "missing")]
@@ -0,0 +1,83 @@
+"""
+项目ZIP包解压测试
+"""
+
+import os
+import zipfile
+
+from app.utils.zip_extract import extract_project_zip, partition_members
+
+
+def make_zip(path, files):
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+    return str(path)
+
+
+def test_replace_mode_clears_storage_and_applies_zip_ignore_rules(tmp_path):
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    (storage / "old.py").write_text("old")
+    (storage / ".gitignore").write_text("*.tmp\n")
+    zip_path = make_zip(tmp_path / "p.zip", {
+        ".gitignore": "*.log\n",
+        "main.py": "print(1)\n",
+        "app/util.py": "x = 1\n",
+        "debug.log": "log",
+    })
+    
+    progress = extract_project_zip(zip_path, str(storage), "replace")
+    stats = progress.snapshot()
+    
+    assert not (storage / "old.py").exists()
+    assert not (storage / "debug.log").exists()
+    assert (storage / "app" / "util.py").read_text() == "x = 1\n"
+    assert (storage / ".gitignore").read_text() == "*.log\n"
+    assert stats["files_ignored"] == 1
+    assert stats["files_total"] == 3
+    # 替换模式保留了原有的.gitignore
+    assert progress.updated == [".gitignore"]
+
+
+def test_increment_mode_keeps_existing_files(tmp_path):
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    (storage / "keep.py").write_text("keep")
+    zip_path = make_zip(tmp_path / "p.zip", {"main.py": "print(2)\n"})
+    
+    extract_project_zip(zip_path, str(storage), "increment")
+    
+    assert (storage / "keep.py").read_text() == "keep"
+    assert (storage / "main.py").read_text() == "print(2)\n"
+
+
+def test_increment_mode_skips_members_with_matching_crc(tmp_path):
+    storage = tmp_path / "storage"
+    files = {f"src/m{i}.py": f"v = {i}\n" for i in range(200)}
+    files["big.bin"] = "x" * 5000
+    extract_project_zip(make_zip(tmp_path / "v1.zip", files), str(storage), "increment", workers=4, large_size=1024, batch_files=16)
+    
+    files["src/m7.py"] = "v = 'changed'\n"
+    files["src/new.py"] = "new = True\n"
+    progress = extract_project_zip(
+        make_zip(tmp_path / "v2.zip", files), str(storage), "increment", workers=4, large_size=1024, batch_files=16
+    )
+    stats = progress.snapshot()
+    
+    assert progress.updated == ["src/m7.py"]
+    assert progress.added == ["src/new.py"]
+    assert stats["files_unchanged"] == 200
+    assert (storage / "src" / "m7.py").read_text() == "v = 'changed'\n"
+    assert (storage / "big.bin").stat().st_size == 5000
+
+
+def test_partition_puts_large_members_first_and_batches_small_ones():
+    members = [zipfile.ZipInfo(f"f{i}") for i in range(10)]
+    for i, info in enumerate(members):
+        info.file_size = 100 if i < 8 else 5000 + i
+    
+    tasks = partition_members(members, large_size=1000, batch_files=3)
+    
+    assert [task[0].filename for task in tasks[:2]] == ["f9", "f8"]
+    assert [len(task) for task in tasks[2:]] == [3, 3, 2]
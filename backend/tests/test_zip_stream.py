@@ -0,0 +1,47 @@
+"""
+项目ZIP包流式生成测试
+"""
+
+import io
+import os
+import zipfile
+
+from app.utils.ignore_handler import IgnoreMatcher
+from app.utils.zip_stream import CHUNK_SIZE, iter_project_zip
+
+
+def test_stream_is_valid_zip_and_respects_ignore_rules(tmp_path, write):
+    write(str(tmp_path / "main.py"), b"print('hello')\n" * 100)
+    write(str(tmp_path / "lib" / "util.py"), b"x = 1\n")
+    write(str(tmp_path / "node_modules" / "pkg.js"), b"module")
+    write(str(tmp_path / "debug.log"), b"log")
+    
+    data = b"".join(iter_project_zip(str(tmp_path), IgnoreMatcher(["node_modules/", "*.log"])))
+    
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert sorted(zf.namelist()) == ["lib/util.py", "main.py"]
+        assert zf.read("main.py") == b"print('hello')\n" * 100
+        assert zf.getinfo("main.py").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_compressed_types_are_stored(tmp_path, write):
+    write(str(tmp_path / "logo.PNG"), os.urandom(2048))
+    write(str(tmp_path / "bundle.tar.gz"), os.urandom(2048))
+    
+    data = b"".join(iter_project_zip(str(tmp_path)))
+    
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
+
+
+def test_large_file_is_streamed_in_bounded_chunks(tmp_path, write):
+    payload = os.urandom(5 * CHUNK_SIZE)
+    write(str(tmp_path / "big.bin"), payload)
+    
+    chunks = list(iter_project_zip(str(tmp_path)))
+    
+    assert len(chunks) > 3
+    assert max(len(chunk) for chunk in chunks) < 3 * CHUNK_SIZE
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert zf.read("big.bin") == payload